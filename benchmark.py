@@ -0,0 +1,930 @@
+#!/usr/bin/env python3
+"""
+Benchmarks locais do ExtratorADK (não usam a API do Gemini)
+
+Uso:
+    python3 benchmark.py            # executa todos
+    python3 benchmark.py sinks      # executa apenas um
+"""
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+
+def _sample_result(i: int) -> dict:
+    """Resultado sintético no formato retornado por extract_from_image"""
+    data = {
+        "tipo_documento": "CNH",
+        "numero_registro": f"{i:011d}",
+        "nome_completo": f"Pessoa Exemplo {i}",
+        "data_nascimento": "15/05/1990",
+        "cpf": "111.444.777-35",
+        "data_emissao": "01/01/2020",
+        "data_validade": f"{1 + i % 28:02d}/{1 + i % 12:02d}/{2025 + i % 10}",
+        "categoria": "AB",
+        "orgao_emissor": "DETRAN/SP"
+    }
+    return {
+        "status": "success",
+        "message": "Documento processado com sucesso",
+        "image_path": f"data/cnh_{i}.jpg",
+        "document_type": "cnh",
+        "data": data,
+        "raw_response": json.dumps(data, ensure_ascii=False)
+    }
+
+
+def bench_sinks(n: int = 20000) -> None:
+    """Compara um arquivo JSON por resultado com os sinks em massa"""
+    from result_sinks import create_sink
+
+    print(f"\n📝 Gravação de {n} resultados")
+    results = [_sample_result(i) for i in range(n)]
+    tmp = Path(tempfile.mkdtemp(prefix="extrator_bench_"))
+
+    try:
+        start = time.perf_counter()
+        per_file = tmp / "json"
+        per_file.mkdir()
+        for i, result in enumerate(results):
+            with open(per_file / f"{i}.json", "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+        elapsed = time.perf_counter() - start
+        print(f"   {'1 JSON por resultado':<24} {n / elapsed:>12,.0f} reg/s")
+
+        for output in ("out.jsonl", "out.jsonl.gz", "out.jsonl.zst", "out.db", "csv/"):
+            start = time.perf_counter()
+            try:
+                with create_sink(f"{tmp}/{output}") as sink:
+                    for result in results:
+                        sink.write(result)
+            except ValueError as e:
+                print(f"   {output:<24} ignorado ({e})")
+                continue
+            elapsed = time.perf_counter() - start
+            print(f"   {output:<24} {n / elapsed:>12,.0f} reg/s")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_store(n: int = 100000, lookups: int = 1000) -> None:
+    """Mede consultas indexadas no ExtractionStore"""
+    from extraction_store import ExtractionStore
+
+    print(f"\n🗄️  Consultas no ExtractionStore ({n} documentos)")
+    tmp = Path(tempfile.mkdtemp(prefix="extrator_bench_"))
+
+    try:
+        store = ExtractionStore(str(tmp / "store.db"), schemas={"cnh": list(_sample_result(0)["data"])})
+        start = time.perf_counter()
+        store.write_many(_sample_result(i) for i in range(n))
+        store.flush()
+        elapsed = time.perf_counter() - start
+        print(f"   {'inserção':<24} {n / elapsed:>12,.0f} reg/s")
+
+        queries = {
+            "numero_registro": lambda i: {"numero_registro": f"{i * 97 % n:011d}"},
+            "nome (prefixo)": lambda i: {"nome": f"Pessoa Exemplo {i * 97 % n}"},
+            "validade (faixa)": lambda i: {"validade_de": "01/01/2030", "validade_ate": "31/01/2030", "limit": 10},
+        }
+        for label, make_filters in queries.items():
+            start = time.perf_counter()
+            for i in range(lookups):
+                store.query(**make_filters(i))
+            elapsed = time.perf_counter() - start
+            print(f"   {label:<24} {elapsed / lookups * 1000:>12.3f} ms/consulta")
+        store.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_records(n: int = 50000) -> None:
+    """Compara a memória de dicts de resultado com registros compactos"""
+    import gc
+    import tracemalloc
+    from models import record_from_dict
+
+    print(f"\n🧠 Memória de {n} resultados de CNH")
+
+    def measure(build):
+        gc.collect()
+        tracemalloc.start()
+        items = build()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del items
+        return current
+
+    def sample(i):
+        result = _sample_result(i)
+        result["validations"] = {
+            "cpf": {"valid": True, "cpf": "11144477735", "formatted": "111.444.777-35"},
+            "data_nascimento": {"valid": True, "date": "1990-05-15", "formatted": "15/05/1990",
+                                "is_future": False, "age_years": 35}
+        }
+        # Simula respostas decodificadas do JSON (strings não compartilhadas)
+        return json.loads(json.dumps(result))
+
+    baseline = measure(lambda: [sample(i) for i in range(n)])
+    print(f"   {'dicts':<24} {baseline / n:>10,.0f} bytes/reg")
+
+    for label, keep_raw in (("registros + raw", True), ("registros", False)):
+        def build():
+            return [record_from_dict(sample(i), keep_raw_response=keep_raw) for i in range(n)]
+        size = measure(build)
+        print(f"   {label:<24} {size / n:>10,.0f} bytes/reg  ({size / baseline:.0%} dos dicts)")
+
+    start = time.perf_counter()
+    items = [sample(i) for i in range(n)]
+    mid = time.perf_counter()
+    records = [record_from_dict(item) for item in items]
+    converted = time.perf_counter()
+    for record in records:
+        record.to_dict()
+    end = time.perf_counter()
+    print(f"   {'dict → registro':<24} {n / (converted - mid):>10,.0f} reg/s")
+    print(f"   {'registro → dict':<24} {n / (end - converted):>10,.0f} reg/s")
+
+
+def bench_dates(n: int = 200000) -> None:
+    """Compara strptime + datetime.now() por data com o DateEngine"""
+    from datetime import datetime
+    from date_engine import DateEngine
+
+    print(f"\n📅 Validação de {n} datas")
+    values = [f"{1 + i % 28:02d}/{1 + i % 12:02d}/{1950 + i % 70}" for i in range(n)]
+
+    start = time.perf_counter()
+    for value in values:
+        parsed = datetime.strptime(value.strip(), "%d/%m/%Y")
+        hoje = datetime.now()
+        _ = parsed > hoje, (hoje - parsed).days // 365
+    elapsed = time.perf_counter() - start
+    print(f"   {'strptime por data':<24} {n / elapsed:>12,.0f} datas/s")
+
+    engine = DateEngine()
+    start = time.perf_counter()
+    for value in values:
+        engine.validate(value)
+    elapsed = time.perf_counter() - start
+    print(f"   {'DateEngine.validate':<24} {n / elapsed:>12,.0f} datas/s")
+
+    start = time.perf_counter()
+    engine.validate_column(values)
+    elapsed = time.perf_counter() - start
+    print(f"   {'DateEngine.validate_column':<24} {n / elapsed:>10,.0f} datas/s")
+
+
+def _fake_extractor(latency: float = 0.2, **kwargs):
+    """DocumentExtractor com backend falso (dispensa a API)"""
+    import os
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    from document_extractor import DocumentExtractor
+    from fake_backend import FakeGeminiModel
+
+    extractor = DocumentExtractor(**kwargs)
+    extractor.model = FakeGeminiModel(latency, response_text=json.dumps(_sample_result(0)["data"]))
+    return extractor
+
+
+def _make_images(directory: Path, n: int, size=(3000, 2000)) -> list:
+    """Gera JPEGs sintéticos grandes (como fotos de celular)"""
+    from PIL import Image, ImageDraw
+
+    paths = []
+    image = Image.new("RGB", size, (200, 190, 170))
+    draw = ImageDraw.Draw(image)
+    for y in range(0, size[1], 40):
+        draw.line([(0, y), (size[0], y + 20)], fill=(40, 40, 40), width=3)
+    for i in range(n):
+        path = directory / f"doc_{i}.jpg"
+        image.save(path, quality=95)
+        paths.append(str(path))
+    return paths
+
+
+def bench_pipeline(n: int = 48, latency: float = 0.2) -> None:
+    """Compara extract_batch sequencial com o pipeline em dois estágios"""
+    from pipeline import ExtractionPipeline
+
+    print(f"\n🏭 Pipeline com {n} imagens 3000x2000 (backend falso, {latency}s por chamada)")
+    tmp = Path(tempfile.mkdtemp(prefix="extrator_bench_"))
+
+    try:
+        paths = _make_images(tmp, n)
+        extractor = _fake_extractor(latency)
+
+        sample = paths[: max(1, n // 8)]
+        start = time.perf_counter()
+        extractor.extract_batch(sample, "cnh")
+        elapsed = time.perf_counter() - start
+        print(f"   {'extract_batch':<24} {len(sample) / elapsed:>10,.2f} docs/s")
+
+        summary = ExtractionPipeline(extractor, request_workers=16).run(paths, "cnh")
+        stages = summary["stages"]
+        print(f"   {'pipeline':<24} {stages['items_per_second']:>10,.2f} docs/s")
+        print(f"   {'  preparação':<24} {stages['prep']['items_per_second']:>10,.2f} docs/s "
+              f"({stages['prep']['avg_seconds']}s/img)")
+        print(f"   {'  requisições':<24} {stages['request']['items_per_second']:>10,.2f} docs/s")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _card_photo(cards: int = 1, angle: float = 8.0, size=(3000, 2000)):
+    """Foto sintética: cartão(ões) com texto sobre uma mesa texturizada"""
+    from PIL import Image, ImageDraw
+
+    photo = Image.new("RGB", size, (92, 64, 45))
+    draw = ImageDraw.Draw(photo)
+    for y in range(0, size[1], 25):
+        draw.line([(0, y), (size[0], y + 60)], fill=(80, 55, 38), width=2)
+
+    card_w, card_h = 856, 540
+    for i in range(cards):
+        card = Image.new("RGB", (card_w, card_h), (236, 234, 220))
+        card_draw = ImageDraw.Draw(card)
+        for line in range(10):
+            card_draw.text((40, 60 + line * 40), "NOME COMPLETO 123.456.789-09", fill=(20, 20, 20))
+        card = card.rotate(angle, expand=True, fillcolor=(92, 64, 45))
+        photo.paste(card, (300 + i * (card_w + 200), 600))
+    return photo
+
+
+def bench_roi() -> None:
+    """Mede o recorte local do documento e a redução de pixels enviados"""
+    from PIL import Image
+    from image_roi import crop_document
+
+    print("\n✂️  Recorte do documento (image_roi)")
+    cases = [
+        ("cartão inclinado 8°", _card_photo(1)),
+        ("frente e verso", _card_photo(2, angle=0.0)),
+    ]
+    sample = Path(__file__).parent / "data" / "foto_cnh.jpeg"
+    if sample.exists():
+        with Image.open(sample) as image:
+            cases.append(("data/foto_cnh.jpeg", image.convert("RGB")))
+
+    for name, image in cases:
+        crop_document(image)
+        runs = 5
+        start = time.perf_counter()
+        for _ in range(runs):
+            roi = crop_document(image)
+        elapsed = (time.perf_counter() - start) / runs
+        print(f"   {name:<24} {len(roi['regions'])} região(ões), "
+              f"{roi['area_ratio']:.0%} dos pixels, {elapsed * 1000:>7.1f} ms")
+
+
+def bench_quality() -> None:
+    """Mede o custo da verificação local de qualidade"""
+    from PIL import Image, ImageDraw, ImageEnhance, ImageFilter
+    from image_quality import measure_quality, quality_issues
+
+    print("\n🔎 Verificação de qualidade (image_quality)")
+    card = _card_photo(1)
+    # Scan limpo: texto preto em página branca (brilho ~250, quase tudo estourado)
+    scan = Image.new("RGB", (2480, 3508), (255, 255, 255))
+    draw = ImageDraw.Draw(scan)
+    for line in range(60):
+        draw.text((200, 200 + line * 50), "CNPJ 12.345.678/0001-95 RAZAO SOCIAL EXEMPLO LTDA", fill=(0, 0, 0))
+    cases = [
+        ("foto nítida 3000x2000", card),
+        ("scan limpo A4", scan),
+        ("desfocada", card.filter(ImageFilter.GaussianBlur(6))),
+        ("escura", ImageEnhance.Brightness(card).enhance(0.3)),
+        ("superexposta", ImageEnhance.Brightness(ImageEnhance.Contrast(card).enhance(0.35)).enhance(1.9)),
+        ("baixa resolução", card.resize((400, 266))),
+    ]
+    for name, image in cases:
+        runs = 20
+        start = time.perf_counter()
+        for _ in range(runs):
+            metrics = measure_quality(image)
+        elapsed = (time.perf_counter() - start) / runs
+        issues = quality_issues(metrics)
+        verdict = "ok" if not issues else f"{len(issues)} problema(s)"
+        print(f"   {name:<24} {elapsed * 1000:>7.2f} ms  nitidez={metrics['sharpness']:<8} {verdict}")
+
+
+def bench_adaptive(n: int = 600, quota: int = 100, latency: float = 0.05) -> None:
+    """Compara concorrência fixa com o controle adaptativo contra um backend com cota"""
+    from concurrent.futures import ThreadPoolExecutor
+    from fake_backend import FakeGeminiModel
+    from loguru import logger
+    from rate_control import AdaptiveLimiter, RateController
+
+    # Cada 429 da concorrência fixa geraria uma linha de ERROR
+    logger.disable("document_extractor")
+    print(f"\n🚦 Controle de vazão: {n} chamadas, cota de {quota} req/s, "
+          f"servidor satura acima de 16 simultâneas")
+    prepared = {
+        "status": "success", "image_path": "data/cnh.jpg", "mime_type": "image/jpeg",
+        "data": b"", "size": (1600, 1200)
+    }
+
+    def run(label, controller, threads):
+        extractor = _fake_extractor(rate_controller=controller)
+        backend = FakeGeminiModel(
+            latency, requests_per_window=quota, window_seconds=1.0, max_concurrency=16
+        )
+        extractor.model = backend
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(lambda _: extractor.extract_from_prepared(prepared, "cnh"), range(n)))
+        elapsed = time.perf_counter() - start
+        ok = sum(1 for r in results if r["status"] == "success")
+        print(f"   {label:<24} {elapsed:>6.2f}s  {ok / elapsed:>7,.1f} docs ok/s  {ok:>4}/{n} ok  "
+              f"429: {backend.throttled:<5} pico simultâneo: {backend.peak_in_flight}")
+        return controller
+
+    run("fixo, 2 threads", None, 2)
+    run("fixo, 64 threads", None, 64)
+    run("AIMD sem orçamento", RateController(AdaptiveLimiter(initial=4, max_limit=64, window=10), retry_delay=0.2), 64)
+    controller = run(
+        "AIMD + 95 req/s",
+        RateController(AdaptiveLimiter(initial=4, max_limit=64, window=10), rpm=95, period=1.0, retry_delay=0.2),
+        64
+    )
+    print(f"   {'':<24} {controller.stats()}")
+    logger.enable("document_extractor")
+
+
+def bench_scheduler(bulk: int = 400, interactive: int = 20, latency: float = 0.05) -> None:
+    """Espera de chamadas interativas com um lote grande disputando a mesma cota"""
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from scheduler import RequestScheduler, request_context
+
+    print(f"\n🗂️  Escalonador: {bulk} chamadas em lote (2 lotes) + {interactive} interativas, 4 vagas")
+    prepared = {
+        "status": "success", "image_path": "data/cnh.jpg", "mime_type": "image/jpeg",
+        "data": b"", "size": (1600, 1200)
+    }
+
+    def run(label, fifo):
+        scheduler = RequestScheduler(4)
+        extractor = _fake_extractor(latency, scheduler=scheduler)
+        waits = []
+
+        def bulk_call(i):
+            with request_context("bulk", "lote" if fifo else ("lote-a" if i % 4 else "lote-b")):
+                extractor.extract_from_prepared(prepared, "cnh")
+
+        def chat():
+            for _ in range(interactive):
+                time.sleep(latency * 2)
+                start = time.perf_counter()
+                with request_context(*(("bulk", "lote") if fifo else ("interactive", "chat"))):
+                    extractor.extract_from_prepared(prepared, "cnh")
+                waits.append(time.perf_counter() - start)
+
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            pending = pool.map(bulk_call, range(bulk))
+            chat_thread = threading.Thread(target=chat)
+            chat_thread.start()
+            list(pending)
+            chat_thread.join()
+
+        waits.sort()
+        classes = scheduler.stats()["classes"]
+        print(f"   {label:<28} interativa p50 {waits[len(waits) // 2] * 1000:>7.0f} ms  "
+              f"p95 {waits[int(len(waits) * 0.95) - 1] * 1000:>7.0f} ms  "
+              f"espera média bulk {classes['bulk']['avg_wait'] * 1000:>6.0f} ms")
+
+    run("fila única (FIFO)", True)
+    run("interactive > bulk", False)
+
+
+def bench_tool_results(n: int = 100) -> None:
+    """Compara o tamanho (tokens aproximados) dos resultados completos e compactos"""
+    from tool_results import ResultRegistry, approx_tokens, compact_result
+    from validation_rules import ValidationEngine
+
+    print(f"\n🧾 Resultados das ferramentas do agente ({n} CNHs validadas, ~4 caracteres/token)")
+    results = ValidationEngine().validate_batch([_sample_result(i) for i in range(n)])
+    registry = ResultRegistry()
+
+    full = approx_tokens(results[0])
+    compact = approx_tokens(compact_result(results[0], registry.put(results[0])))
+    print(f"   {'por documento':<24} completo {full:>6,} tokens  compacto {compact:>6,} tokens "
+          f"({1 - compact / full:.0%} menos)")
+
+    full = approx_tokens(results)
+    compact = approx_tokens([compact_result(r, registry.put(r)) for r in results])
+    print(f"   {f'{n} documentos':<24} completo {full:>6,} tokens  compacto {compact:>6,} tokens "
+          f"({1 - compact / full:.0%} menos)")
+
+
+def bench_requery() -> None:
+    """Compara a extração completa com a releitura só dos campos inválidos"""
+    from image_prep import prepare_image
+    from rate_control import estimate_tokens
+    from validation_rules import ValidationEngine
+
+    print("\n🎯 Releitura de campos (CPF inválido em uma CNH, backend falso)")
+    tmp = Path(tempfile.mkdtemp(prefix="extrator_bench_"))
+    try:
+        path = tmp / "cnh.jpg"
+        _card_photo(1, angle=0.0).save(path, quality=95)
+        extractor = _fake_extractor(0.0, crop_documents=True)
+        sent = []
+        generate = extractor.model.generate_content
+        extractor.model.generate_content = lambda contents, **kw: (sent.append(contents), generate(contents))[1]
+        engine = ValidationEngine(correct=False)
+
+        prepared = prepare_image(str(path), crop=True)
+        full_tokens = estimate_tokens(extractor.PROMPTS["cnh"], prepared["roi"]["sizes"])
+        start = time.perf_counter()
+        result = extractor.extract_from_image(str(path), "cnh")
+        full_seconds = time.perf_counter() - start
+        rows = [("extração completa", full_tokens, sent[-1], full_seconds)]
+
+        for name, crop in (("releitura do CPF", False), ("releitura + recorte", True)):
+            result["data"]["cpf"] = "111.444.777-36"
+            engine.validate_batch([result])
+            start = time.perf_counter()
+            extractor.reextract_fields(result, crop_fields=crop, engine=engine)
+            rows.append((name, result["requery"]["estimated_tokens"], sent[-1], time.perf_counter() - start))
+
+        for name, tokens, contents, seconds in rows:
+            image_bytes = sum(len(part["data"]) for part in contents[1:])
+            print(f"   {name:<24} ~{tokens:>5,} tokens  prompt {len(contents[0]):>5,} caracteres  "
+                  f"imagem {image_bytes / 1024:>6,.0f} KB  {seconds * 1000:>6.1f} ms locais")
+        print(f"   CPF após a releitura: {result['validations']['cpf']}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_cascade(n: int = 200) -> None:
+    """Compara um modelo único com a cascata modelo leve -> modelo forte"""
+    from fake_backend import FakeGeminiModel
+    from image_prep import prepare_image
+    from model_cascade import ModelCascade
+
+    data = dict(_sample_result(0)["data"], numero_registro="12345678900")
+    text = json.dumps(data, ensure_ascii=False)
+    backends = {
+        # Modelo leve: 3x mais rápido, mas 15% das respostas vêm malformadas
+        "gemini-2.5-flash-lite": dict(latency=0.01, malformed_rate=0.15),
+        "gemini-2.5-flash": dict(latency=0.03),
+    }
+
+    print(f"\n🪜 Cascata de modelos ({n} CNHs, backend falso, preços de tabela)")
+    tmp = Path(tempfile.mkdtemp(prefix="extrator_bench_"))
+    try:
+        path = tmp / "cnh.jpg"
+        _card_photo(1, angle=0.0).save(path, quality=95)
+        prepared = prepare_image(str(path))
+
+        for name, routes in (
+            ("só gemini-2.5-flash", {"default": ("gemini-2.5-flash",)}),
+            ("flash-lite -> flash", {"default": ("gemini-2.5-flash-lite", "gemini-2.5-flash")}),
+        ):
+            cascade = ModelCascade(
+                routes, model_factory=lambda model: FakeGeminiModel(response_text=text, **backends[model])
+            )
+            extractor = _fake_extractor(0.0, cascade=cascade)
+            start = time.perf_counter()
+            results = [extractor.extract_from_prepared(prepared, "cnh") for _ in range(n)]
+            elapsed = time.perf_counter() - start
+            stats = cascade.stats()
+            valid = sum(1 for r in results if all(v["valid"] for v in r["validations"].values()))
+            print(f"   {name:<24} {elapsed / n * 1000:>6.1f} ms/doc  US$ {stats['cost_per_document'] * 1000:.4f}/mil docs  "
+                  f"escalados {stats['escalation_rate']:.0%}  válidos {valid}/{n}")
+            for model, tier in stats["tiers"].items():
+                print(f"      {model:<22} acerto {tier['hit_rate']:.0%}  p95 {tier['p95_seconds'] * 1000:.0f} ms  "
+                      f"falhas {tier['failed']}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_replay(n: int = 24, latency: float = 0.1) -> None:
+    """Grava as respostas do backend em um cassete e reproduz o pipeline sem rede"""
+    from cassette import use_cassette
+    from pipeline import ExtractionPipeline
+
+    print(f"\n📼 Cassete: gravação e reprodução do pipeline ({n} imagens, {latency}s por chamada)")
+    tmp = Path(tempfile.mkdtemp(prefix="extrator_bench_"))
+    try:
+        paths = []
+        for i in range(n):
+            path = tmp / f"doc_{i}.jpg"
+            _card_photo(1, angle=float(i % 12)).save(path, quality=90)
+            paths.append(str(path))
+        cassette_path = str(tmp / "cassete.jsonl")
+
+        runs = {}
+        for name, mode, replay_latency in (
+            ("gravação", "record", "original"),
+            ("reprodução original", "replay", "original"),
+            ("reprodução sem latência", "replay", "zero"),
+        ):
+            extractor = _fake_extractor(latency)
+            cassette = use_cassette(extractor, cassette_path, mode, replay_latency)
+            summary = ExtractionPipeline(extractor, request_workers=8).run(paths, "cnh", validate=True)
+            stages = summary["stages"]
+            runs[name] = [json.dumps(r.get("validations"), sort_keys=True) for r in summary["results"]]
+            print(f"   {name:<24} {stages['items_per_second']:>8,.1f} docs/s  "
+                  f"(requisições {stages['request']['avg_seconds'] * 1000:>6.1f} ms/doc)  {cassette.stats()['hits']:>3} reproduzidas  "
+                  f"{cassette.stats()['recorded']:>3} gravadas")
+
+        same = sorted(runs["gravação"]) == sorted(runs["reprodução sem latência"])
+        print(f"   resultados idênticos à gravação: {'sim' if same else 'NÃO'}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_logging(n: int = 20000) -> None:
+    """Custo por documento dos logs: f-strings síncronos x eventos em segundo plano com amostragem"""
+    from loguru import logger
+    from event_log import configure_logging, log_event
+
+    print(f"\n📜 Logs por documento ({n} documentos, 3 linhas INFO cada, em arquivo)")
+    tmp = Path(tempfile.mkdtemp(prefix="extrator_bench_"))
+    path, kind = "data/cnh_0001.jpg", "cnh"
+
+    def fstrings() -> None:
+        logger.info(f"Processando imagem: {path}")
+        logger.info(f"Enviando para Gemini Vision (tipo: {kind})")
+        logger.info(f"Extração concluída com sucesso")
+
+    def events() -> None:
+        log_event("extraction.prepare", "Processando imagem: {image_path}", image_path=path)
+        log_event("extraction.request", "Enviando para Gemini Vision (tipo: {document_type})",
+                  image_path=path, document_type=kind)
+        log_event("extraction.success", "Extração concluída com sucesso: {image_path}",
+                  image_path=path, document_type=kind, seconds=1.234)
+
+    class SlowDisk:
+        """Stream com 0,2 ms por gravação (disco/rede lentos)"""
+
+        def __init__(self, path):
+            self.file = open(path, "a", encoding="utf-8")
+
+        def write(self, message):
+            time.sleep(0.0002)
+            self.file.write(message)
+
+        def flush(self):
+            self.file.flush()
+
+        def stop(self):
+            self.file.close()
+
+    cases = [
+        ("f-string síncrono", fstrings, dict(enqueue=False)),
+        ("eventos síncronos", events, dict(enqueue=False)),
+        ("eventos em fila", events, dict(enqueue=True)),
+        ("eventos em fila, 1%", events, dict(enqueue=True, sample_rate=0.01)),
+        ("JSON em fila, 1%", events, dict(enqueue=True, sample_rate=0.01, serialize=True)),
+        ("disco lento, síncrono", events, dict(enqueue=False, slow=True)),
+        ("disco lento, em fila", events, dict(enqueue=True, slow=True)),
+    ]
+    try:
+        for i, (name, emit, options) in enumerate(cases):
+            log_file = tmp / f"log_{i}.log"
+            slow = options.pop("slow", False)
+            count = n // 20 if slow else n
+            configure_logging("INFO", SlowDisk(log_file) if slow else str(log_file), **options)
+            start = time.perf_counter()
+            for _ in range(count):
+                emit()
+            elapsed = time.perf_counter() - start
+            logger.remove()
+            size = log_file.stat().st_size if log_file.exists() else 0
+            print(f"   {name:<24} {elapsed / count * 1e6:>8.1f} µs/doc no caminho da requisição  "
+                  f"{size / count:>6.0f} bytes/doc em disco")
+    finally:
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _random_cpf(rng) -> str:
+    """CPF aleatório com dígitos verificadores corretos"""
+    digits = [rng.randrange(10) for _ in range(9)]
+    for size in (9, 10):
+        total = sum(d * (size + 1 - i) for i, d in enumerate(digits))
+        digits.append(0 if total % 11 < 2 else 11 - total % 11)
+    return "".join(map(str, digits))
+
+
+def bench_ocr(n: int = 2000) -> None:
+    """Mede a correção local de CPFs com erros de leitura simulados"""
+    import random
+    from ocr_correction import DIGIT_CONFUSIONS, LETTER_DIGITS, correct_number
+
+    rng = random.Random(42)
+    letters = {}
+    for letter, digit in LETTER_DIGITS.items():
+        letters.setdefault(digit, []).append(letter)
+
+    def misread(cpf: str, errors: int, any_digit: bool) -> str:
+        chars = list(cpf)
+        positions = [p for p in range(11) if any_digit or DIGIT_CONFUSIONS[cpf[p]] or cpf[p] in letters]
+        for position in rng.sample(positions, errors):
+            digit = chars[position]
+            if any_digit:
+                # Erro fora da tabela de confusões: qualquer outro dígito
+                options = [d for d in "0123456789" if d != digit and d not in DIGIT_CONFUSIONS[digit]]
+            else:
+                options = list(DIGIT_CONFUSIONS[digit]) + letters.get(digit, [])
+            chars[position] = rng.choice(options)
+        return "".join(chars)
+
+    print(f"\n🔢 Correção de OCR em CPF ({n} números por cenário)")
+    for errors, any_digit in ((1, False), (2, False), (1, True)):
+        counts = {"right": 0, "wrong": 0, "ambiguous": 0, "uncorrectable": 0, "valid": 0}
+        slowest = 0.0
+        start = time.perf_counter()
+        for _ in range(n):
+            cpf = _random_cpf(rng)
+            read = misread(cpf, errors, any_digit)
+            t0 = time.perf_counter()
+            result = correct_number(read, "cpf")
+            slowest = max(slowest, time.perf_counter() - t0)
+            if result["status"] == "corrected":
+                counts["right" if result["corrected"] == cpf else "wrong"] += 1
+            else:
+                counts[result["status"]] += 1
+        elapsed = time.perf_counter() - start
+        label = f"{errors} erro(s){' fora da tabela' if any_digit else ''}"
+        print(f"   {label:<24} corrigidos {counts['right'] / n:>5.1%}  errados {counts['wrong'] / n:>5.1%}  "
+              f"ambíguos {counts['ambiguous'] / n:>5.1%}  sem correção {(counts['uncorrectable'] + counts['valid']) / n:>5.1%}  "
+              f"({elapsed / n * 1000:.3f} ms/número, pior {slowest * 1000:.2f} ms)")
+
+
+def bench_deadlines(n: int = 20, latency: float = 0.1, hang_rate: float = 0.3, hang_seconds: float = 3.0) -> None:
+    """Chamadas travadas com e sem prazo por documento (SLO)"""
+    from fake_backend import FakeGeminiModel
+
+    print(f"\n⏳ Prazos: {n} CNHs, {hang_rate:.0%} das chamadas travam por {hang_seconds}s")
+    tmp = Path(tempfile.mkdtemp(prefix="extrator_bench_"))
+    try:
+        paths = []
+        for i in range(n):
+            path = tmp / f"doc_{i}.jpg"
+            _card_photo(1, angle=float(i % 12), size=(1500, 1000)).save(path, quality=90)
+            paths.append(str(path))
+
+        for label, slo in (("sem prazo", None), ("SLO cnh=1s", {"cnh": 1.0})):
+            extractor = _fake_extractor(latency, slo_budgets=slo)
+            extractor.model = FakeGeminiModel(latency, hang_rate=hang_rate, hang_seconds=hang_seconds)
+            start = time.perf_counter()
+            batch = extractor.extract_batch(paths, "cnh")
+            elapsed = time.perf_counter() - start
+            stats = extractor.deadline_stats.stats().get("cnh", {})
+            print(f"   {label:<14} {elapsed:>6.2f}s  {batch['success']} ok  {batch['timeouts']} timeout  "
+                  f"perdidos {stats.get('missed', '-')} {stats.get('stages', '')}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_stream(n: int = 5, latency: float = 1.5) -> None:
+    """Tempo até o primeiro campo (e até o CPF validado) com streaming x resposta completa"""
+    import asyncio
+
+    print(f"\n📡 Streaming: {n} CNHs, {latency}s por resposta completa")
+    tmp = Path(tempfile.mkdtemp(prefix="extrator_bench_"))
+    try:
+        path = tmp / "cnh.jpg"
+        _card_photo(1).save(path, quality=90)
+        extractor = _fake_extractor(latency)
+
+        start = time.perf_counter()
+        for _ in range(n):
+            extractor.extract_cnh(str(path))
+        full = (time.perf_counter() - start) / n
+        print(f"   {'resposta completa':<26} primeiro campo {full:>6.2f}s   total {full:>6.2f}s")
+
+        async def consume() -> tuple:
+            first = cpf = total = None
+            start = time.perf_counter()
+            async for event in extractor.aextract_stream(str(path), "cnh"):
+                elapsed = time.perf_counter() - start
+                if event["event"] == "field" and first is None:
+                    first = elapsed
+                elif event["event"] == "validation" and event["rule"] == "cpf" and cpf is None:
+                    cpf = elapsed
+                elif event["event"] == "done":
+                    total = elapsed
+            return first, cpf, total
+
+        timings = [asyncio.run(consume()) for _ in range(n)]
+        first, cpf, total = (sum(t[i] for t in timings) / n for i in range(3))
+        print(f"   {'streaming':<26} primeiro campo {first:>6.2f}s   total {total:>6.2f}s   CPF validado {cpf:.2f}s")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_redrive(n: int = 60, latency: float = 0.02, every: int = 8) -> None:
+    """Reprocessa só as falhas passageiras de um lote em vez de repetir o lote inteiro"""
+    from dead_letters import DeadLetterStore, redrive
+    from fake_backend import FakeGeminiModel, QuotaExceeded
+
+    data = dict(_sample_result(0)["data"], numero_registro="12345678900")
+    text = json.dumps(data, ensure_ascii=False)
+
+    class FlakyModel(FakeGeminiModel):
+        """Uma em cada `every` chamadas falha com 429 (cota esgotada depois das novas tentativas)"""
+
+        def generate_content(self, contents, **kwargs):
+            response = super().generate_content(contents, **kwargs)
+            if self.calls % every == 0:
+                raise QuotaExceeded("429 Resource has been exhausted (e.g. check quota).")
+            return response
+
+    print(f"\n🔁 Fila de falhas: {n} CNHs, 1 em cada {every} chamadas com 429 ({latency}s por chamada)")
+    tmp = Path(tempfile.mkdtemp(prefix="extrator_bench_"))
+    try:
+        paths = []
+        for i in range(n):
+            path = tmp / f"doc_{i}.jpg"
+            _card_photo(1, angle=float(i % 12)).save(path, quality=90)
+            paths.append(str(path))
+
+        extractor = _fake_extractor(latency)
+        extractor.model = FlakyModel(latency, response_text=text)
+        store = DeadLetterStore(str(tmp / "falhas.db"))
+        start = time.perf_counter()
+        batch = extractor.extract_batch(paths, "cnh", validate=True, dead_letters=store)
+        elapsed = time.perf_counter() - start
+        print(f"   {'lote':<26} {elapsed:>6.2f}s  {batch['success']} ok, {batch['errors']} falhas  {store.counts()['pending']}")
+
+        # Repetir o lote inteiro: todas as chamadas de novo
+        calls = extractor.model.calls
+        start = time.perf_counter()
+        again = extractor.extract_batch(paths, "cnh", validate=True)
+        print(f"   {'repetir o lote':<26} {time.perf_counter() - start:>6.2f}s  {extractor.model.calls - calls} chamadas  "
+              f"{again['errors']} falhas")
+
+        extractor.model = FakeGeminiModel(latency, response_text=text)
+        summary = redrive(store, extractor, ["quota"], workers=4)
+        print(f"   {'redrive quota':<26} {summary['seconds']:>6.2f}s  {extractor.model.calls} chamadas  "
+              f"{summary['resolved']}/{summary['redriven']} resolvidas  fila {summary['queue']['pending_total']}")
+        store.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_warmup(workers: int = 8, per_worker: int = 6, latency: float = 0.05, connect: float = 0.3) -> None:
+    """Compara um cliente frio por worker com o pool compartilhado e aquecido"""
+    import os
+    from concurrent.futures import ThreadPoolExecutor
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    from client_pool import ClientPool
+    from document_extractor import DocumentExtractor
+    from fake_backend import FakeGeminiModel
+    from image_prep import prepare_image
+
+    text = json.dumps(_sample_result(0)["data"], ensure_ascii=False)
+
+    def factory(name: str) -> FakeGeminiModel:
+        return FakeGeminiModel(latency, response_text=text, connect_latency=connect)
+
+    print(f"\n🔌 Clientes: {workers} workers x {per_worker} docs (backend falso, "
+          f"{latency}s por chamada, {connect}s para conectar)")
+    tmp = Path(tempfile.mkdtemp(prefix="extrator_bench_"))
+    try:
+        path = tmp / "cnh.jpg"
+        _card_photo(1, angle=0.0).save(path, quality=95)
+        prepared = prepare_image(str(path))
+
+        def run(extractor_for_worker) -> tuple:
+            def worker(i: int) -> list:
+                extractor = extractor_for_worker(i)
+                seconds = []
+                for _ in range(per_worker):
+                    start = time.perf_counter()
+                    extractor.extract_from_prepared(prepared, "cnh")
+                    seconds.append(time.perf_counter() - start)
+                return seconds
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(workers) as executor:
+                per_worker_seconds = list(executor.map(worker, range(workers)))
+            return time.perf_counter() - start, per_worker_seconds
+
+        # Um DocumentExtractor (e um cliente) por worker, sem aquecimento
+        elapsed, seconds = run(lambda i: DocumentExtractor(client_pool=ClientPool(model_factory=factory)))
+        first = [s[0] for s in seconds]
+        rest = [x for s in seconds for x in s[1:]]
+        print(f"   {'cliente por worker':<26} total {elapsed:>5.2f}s  1ª requisição {max(first) * 1000:>6.0f} ms  "
+              f"seguintes {sum(rest) / len(rest) * 1000:>5.0f} ms  clientes {workers}")
+
+        pool = ClientPool(model_factory=factory)
+        shared = DocumentExtractor(client_pool=pool)
+        pool.warm_up([shared.model_name])
+        elapsed, seconds = run(lambda i: shared)
+        first = [s[0] for s in seconds]
+        rest = [x for s in seconds for x in s[1:]]
+        stats = pool.stats()
+        print(f"   {'pool compartilhado':<26} total {elapsed:>5.2f}s  1ª requisição {max(first) * 1000:>6.0f} ms  "
+              f"seguintes {sum(rest) / len(rest) * 1000:>5.0f} ms  clientes {stats['clients_created']}  "
+              f"(aquecimento {stats['warmup_seconds']}s na inicialização, reuso {stats['reuse_rate']:.0%})")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_keys(n: int = 60, workers: int = 8, latency: float = 0.05, quota: int = 10) -> None:
+    """Uma chave x várias chaves com orçamento próprio (uma delas recusada pela API)"""
+    import os
+    from concurrent.futures import ThreadPoolExecutor
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    from client_pool import ClientPool
+    from document_extractor import DocumentExtractor
+    from fake_backend import FakeGeminiModel
+    from image_prep import prepare_image
+    from key_pool import ApiKey, KeyPool
+    from rate_control import AdaptiveLimiter, RateController
+
+    text = json.dumps(_sample_result(0)["data"], ensure_ascii=False)
+
+    def factory(name: str, key: str) -> FakeGeminiModel:
+        # Cota do backend por chave: `quota` requisições por segundo
+        return FakeGeminiModel(latency, requests_per_window=quota, window_seconds=1.0,
+                               response_text=text, invalid_key=key == "chave-revogada")
+
+    print(f"\n🔑 Chaves: {n} CNHs, {workers} workers, cota de {quota} req/s por chave ({latency}s por chamada)")
+    tmp = Path(tempfile.mkdtemp(prefix="extrator_bench_"))
+    try:
+        path = tmp / "cnh.jpg"
+        _card_photo(1, angle=0.0).save(path, quality=95)
+        prepared = prepare_image(str(path))
+
+        for label, names in (
+            ("1 chave", ["chave-a"]),
+            ("3 chaves + 1 revogada", ["chave-a", "chave-b", "chave-c", "chave-revogada"]),
+        ):
+            keys = KeyPool([ApiKey(name, rpm=quota, period=1.0) for name in names])
+            extractor = DocumentExtractor(
+                client_pool=ClientPool(model_factory=factory, key_pool=keys),
+                rate_controller=RateController(AdaptiveLimiter(max_limit=workers), retry_delay=0.1)
+            )
+            start = time.perf_counter()
+            with ThreadPoolExecutor(workers) as executor:
+                results = list(executor.map(lambda _: extractor.extract_from_prepared(prepared, "cnh"), range(n)))
+            elapsed = time.perf_counter() - start
+            stats = keys.stats()
+            ok = sum(1 for r in results if r["status"] == "success")
+            usage = "  ".join(
+                f"{k['key']}:{k['calls']}" + ("" if k["healthy"] else f" ({k['quarantine_reason']})")
+                for k in stats["per_key"]
+            )
+            print(f"   {label:<22} {elapsed:>6.2f}s  {n / elapsed:>6.1f} docs/s  {ok} ok  "
+                  f"quarentenas {stats['quarantines']}  [{usage}]")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+BENCHMARKS = {
+    "sinks": bench_sinks,
+    "store": bench_store,
+    "records": bench_records,
+    "dates": bench_dates,
+    "pipeline": bench_pipeline,
+    "roi": bench_roi,
+    "quality": bench_quality,
+    "adaptive": bench_adaptive,
+    "scheduler": bench_scheduler,
+    "tool_results": bench_tool_results,
+    "ocr": bench_ocr,
+    "requery": bench_requery,
+    "cascade": bench_cascade,
+    "replay": bench_replay,
+    "logging": bench_logging,
+    "warmup": bench_warmup,
+    "redrive": bench_redrive,
+    "stream": bench_stream,
+    "deadlines": bench_deadlines,
+    "keys": bench_keys,
+}
+
+
+def main() -> None:
+    from loguru import logger
+
+    # Logs INFO por documento distorcem as medições
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    print("=" * 60)
+    print("⏱️  BENCHMARKS - ExtratorADK")
+    print("=" * 60)
+    for name in selected:
+        if name not in BENCHMARKS:
+            print(f"❌ Benchmark desconhecido: {name} (opções: {', '.join(BENCHMARKS)})")
+            sys.exit(1)
+        BENCHMARKS[name]()
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,560 @@
+#!/usr/bin/env python3
+"""
+Processamento em massa pela linha de comando, com progresso ao vivo
+(docs/s, latência p50/p95, taxa de erros, tokens e ETA) e resumo final em JSON
+
+Uso:
+    python3 -m bulk_runner data/lote/ --type cnh --workers 16 --output data/processed/lote.jsonl
+    python3 -m bulk_runner manifesto.txt --validate --summary data/processed/resumo.json
+    python3 -m bulk_runner manifesto.txt --shard-dir /mnt/lote --processes 8 --output lote.jsonl
+    python3 -m bulk_runner --dead-letters falhas.db --redrive quota,timeout --workers 2 --rpm 30
+    python3 -m bulk_runner data/lote/ --type cnh --slo cnh=20 --request-timeout 30 --deadline 3600
+    python3 -m bulk_runner data/lote/ --keys chaves.txt --key-rpm 60 --workers 16
+
+Entradas podem ser diretórios, imagens/PDFs ou manifestos (.txt/.lst com um
+caminho por linha, .jsonl com "path" ou "image_path", .csv com coluna "path").
+O progresso vai para stderr; o resumo, para stdout (ou --summary).
+Com --shard-dir o lote é dividido em fragmentos reservados por arquivos de
+lease (ver src/shard_batch.py): vários processos, e outras máquinas com o
+mesmo diretório compartilhado, dividem o trabalho.
+
+Códigos de saída: 0 = concluído, 1 = taxa de erros acima de --max-error-rate,
+2 = nenhuma imagem para processar
+"""
+import argparse
+import csv
+import json
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+# Manifestos: listas de caminhos em vez de imagens
+MANIFEST_SUFFIXES = (".txt", ".lst", ".jsonl", ".csv")
+
+# Amostra de latências usada no p50/p95 (as mais recentes)
+LATENCY_WINDOW = 5000
+
+# Erros listados no resumo (os demais só entram na contagem)
+ERROR_SAMPLES = 20
+
+
+def _read_manifest(manifest: Path) -> List[str]:
+    """Caminhos listados em um manifesto (relativos ao diretório do manifesto)"""
+    entries = []
+    with open(manifest, encoding="utf-8", newline="") as f:
+        if manifest.suffix.lower() == ".jsonl":
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    entries.append(record.get("path") or record.get("image_path"))
+        elif manifest.suffix.lower() == ".csv":
+            reader = csv.reader(f)
+            header = next(reader, [])
+            column = header.index("path") if "path" in header else 0
+            if "path" not in header and header:
+                entries.append(header[column])
+            entries.extend(row[column] for row in reader if row)
+        else:
+            entries = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+    return [
+        str(path if path.is_absolute() else manifest.parent / path)
+        for path in (Path(entry) for entry in entries if entry)
+    ]
+
+
+def collect_paths(inputs: List[str], recursive: bool = True) -> Tuple[List[str], List[str]]:
+    """
+    Expande diretórios e manifestos em uma lista de imagens.
+
+    Args:
+        inputs: Diretórios, imagens/PDFs ou manifestos
+        recursive: Se True, inclui subdiretórios
+
+    Returns:
+        Tupla (caminhos sem repetição, na ordem de entrada; entradas não encontradas)
+    """
+    from image_prep import IMAGE_EXTENSIONS, find_images
+
+    paths: List[str] = []
+    missing: List[str] = []
+    for entry in inputs:
+        path = Path(entry)
+        if path.is_dir():
+            paths.extend(find_images(str(path), recursive))
+        elif not path.exists():
+            missing.append(entry)
+        elif path.suffix.lower() in MANIFEST_SUFFIXES:
+            paths.extend(_read_manifest(path))
+        elif path.suffix.lower() in IMAGE_EXTENSIONS:
+            paths.append(str(path))
+        else:
+            missing.append(entry)
+
+    return list(dict.fromkeys(paths)), missing
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def _clock(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "--:--:--"
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class Progress:
+    """Contadores do lote e linha de progresso periódica (thread-safe)"""
+
+    def __init__(
+        self,
+        total: int,
+        interval: float = 2.0,
+        stream: TextIO = sys.stderr,
+        controller: Any = None
+    ):
+        """
+        Inicializa o progresso.
+
+        Args:
+            total: Documentos no lote
+            interval: Segundos entre linhas de progresso (0 desliga)
+            stream: Saída das linhas de progresso
+            controller: RateController do extrator (tokens usados)
+        """
+        self.total = total
+        self.interval = interval
+        self.stream = stream
+        self.controller = controller
+        self.done = 0
+        self.errors = 0
+        self.error_samples: List[Dict[str, Any]] = []
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self.latency_max = 0.0
+        self.started = time.perf_counter()
+        self._last_print = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, result: Dict[str, Any], seconds: float) -> None:
+        """Registra um documento concluído (callback de ExtractionPipeline.run)"""
+        with self._lock:
+            self.done += 1
+            self.latencies.append(seconds)
+            self.latency_max = max(self.latency_max, seconds)
+            if result.get("status") != "success":
+                self.errors += 1
+                if len(self.error_samples) < ERROR_SAMPLES:
+                    self.error_samples.append(
+                        {
+                            "image_path": result.get("image_path"),
+                            "failure": result.get("failure"),
+                            "message": result.get("message")
+                        }
+                    )
+
+            now = time.perf_counter()
+            if self.interval and now - self._last_print >= self.interval:
+                self._last_print = now
+                self._print(self._snapshot(now))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado atual: concluídos, vazão, latência, erros, tokens e ETA"""
+        with self._lock:
+            return self._snapshot(time.perf_counter())
+
+    def _snapshot(self, now: float) -> Dict[str, Any]:
+        elapsed = now - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        latencies = sorted(self.latencies)
+        remaining = self.total - self.done
+        return {
+            "done": self.done,
+            "total": self.total,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.done, 4) if self.done else 0.0,
+            "elapsed_seconds": round(elapsed, 1),
+            "items_per_second": round(rate, 2),
+            "latency_p50": round(_percentile(latencies, 0.5), 3) if latencies else None,
+            "latency_p95": round(_percentile(latencies, 0.95), 3) if latencies else None,
+            "latency_max": round(self.latency_max, 3),
+            "tokens_used": self.controller.tokens_used if self.controller is not None else None,
+            "eta_seconds": round(remaining / rate, 1) if rate > 0 else None
+        }
+
+    def _print(self, snap: Dict[str, Any]) -> None:
+        width = len(str(self.total))
+        tokens = snap["tokens_used"]
+        line = (
+            f"[{snap['done']:>{width}}/{self.total}] {snap['items_per_second']:>7.2f} docs/s | "
+            f"p50 {snap['latency_p50'] or 0:.2f}s p95 {snap['latency_p95'] or 0:.2f}s | "
+            f"erros {snap['error_rate']:.1%} | "
+            f"{f'{tokens:,} tokens | ' if tokens is not None else ''}"
+            f"ETA {_clock(snap['eta_seconds'])}"
+        )
+        print(line, file=self.stream, flush=True)
+
+    def finish(self) -> Dict[str, Any]:
+        """Imprime a última linha e devolve o estado final"""
+        snap = self.snapshot()
+        if self.interval:
+            self._print(snap)
+        return snap
+
+
+def _slo_budgets(spec: str) -> Dict[str, float]:
+    """Valor de --slo: "default" (deadlines.SLO_BUDGETS) ou pares tipo=segundos"""
+    from deadlines import SLO_BUDGETS, parse_budgets
+    if spec == "default":
+        return dict(SLO_BUDGETS)
+    try:
+        return parse_budgets(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    from deadlines import REQUEST_TIMEOUT
+
+    parser = argparse.ArgumentParser(
+        prog="python3 -m bulk_runner",
+        description="Extrai documentos em massa com progresso ao vivo e resumo em JSON"
+    )
+    parser.add_argument("inputs", nargs="*", help="Diretórios, imagens/PDFs ou manifestos")
+    parser.add_argument("--type", dest="document_type", default="auto",
+                        choices=["auto", "rg", "cnh", "cpf", "cnpj"], help="Tipo do documento (padrão: auto)")
+    parser.add_argument("--workers", type=int, default=8, help="Requisições simultâneas ao Gemini (padrão: 8)")
+    parser.add_argument("--prep-workers", type=int, default=None, help="Processos de preparação (padrão: núcleos)")
+    parser.add_argument("--output", help="Sink: .jsonl(.gz/.zst), .db ou diretório CSV (terminado em /)")
+    parser.add_argument("--summary", help="Grava o resumo JSON neste arquivo em vez de stdout")
+    parser.add_argument("--validate", action="store_true", help="Aplica as validações a cada documento")
+    parser.add_argument("--no-recursive", dest="recursive", action="store_false",
+                        help="Não entra em subdiretórios")
+    parser.add_argument("--model", default="gemini-2.5-flash", help="Modelo Gemini")
+    parser.add_argument("--crop", action="store_true", help="Recorta o documento da foto antes do envio")
+    parser.add_argument("--quality-gate", choices=["reject", "flag"], help="Verificação local de qualidade")
+    parser.add_argument("--rpm", type=float, help="Requisições por minuto permitidas")
+    parser.add_argument("--tpm", type=float, help="Tokens por minuto permitidos")
+    parser.add_argument("--slo", type=_slo_budgets, metavar="TIPO=SEGUNDOS",
+                        help="Prazo de cada documento por tipo (ex: cnh=20,rg=25; \"default\" usa os padrões)")
+    parser.add_argument("--request-timeout", type=float, default=REQUEST_TIMEOUT,
+                        help=f"Limite de cada chamada ao Gemini em segundos (padrão: {REQUEST_TIMEOUT:g})")
+    parser.add_argument("--deadline", type=float, help="Prazo do lote inteiro em segundos (sem --shard-dir)")
+    parser.add_argument("--keys", help="Arquivo com uma chave da API por linha (chave[:rpm[:tpm]]); "
+                                       "padrão: GOOGLE_API_KEYS / GOOGLE_API_KEYS_FILE")
+    parser.add_argument("--key-rpm", type=float, help="Requisições por minuto de cada chave")
+    parser.add_argument("--key-tpm", type=float, help="Tokens por minuto de cada chave")
+    parser.add_argument("--cassette", help="Cassete de respostas (ver src/cassette.py)")
+    parser.add_argument("--cassette-mode", default="replay", choices=["record", "replay", "auto"])
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false",
+                        help="Não abre a conexão com o Gemini antes das primeiras imagens")
+    parser.add_argument("--shard-dir", help="Modo fragmentado: diretório de trabalho (local ou compartilhado)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Processos neste host no modo fragmentado (padrão: 1)")
+    parser.add_argument("--shard-size", type=int, default=500, help="Documentos por fragmento (padrão: 500)")
+    parser.add_argument("--lease-seconds", type=float, default=300.0,
+                        help="Lease sem renovação por este tempo é retomado por outro worker (padrão: 300)")
+    parser.add_argument("--dead-letters", help="Banco SQLite onde as falhas são guardadas por categoria")
+    parser.add_argument("--redrive", nargs="?", const="", metavar="CATEGORIAS",
+                        help="Reprocessa as falhas de --dead-letters (ex: quota,timeout; "
+                             "vazio = passageiras; all = todas) em vez de ler entradas")
+    parser.add_argument("--redrive-limit", type=int, help="Máximo de falhas reprocessadas")
+    parser.add_argument("--interval", type=float, default=2.0,
+                        help="Segundos entre linhas de progresso (0 desliga)")
+    parser.add_argument("--max-error-rate", type=float, default=0.05,
+                        help="Acima desta taxa de erros o código de saída é 1 (padrão: 0.05)")
+    parser.add_argument("--verbose", action="store_true", help="Mostra os logs INFO por documento")
+    parser.add_argument("--log-file", help="Grava os logs (INFO) neste arquivo em vez de stderr")
+    parser.add_argument("--log-json", action="store_true", help="Logs em JSON (um evento por linha)")
+    parser.add_argument("--log-sample-rate", type=float, default=0.01,
+                        help="Fração mantida dos eventos de sucesso por documento (padrão: 0.01)")
+    return parser
+
+
+def _configure_logging(args: argparse.Namespace) -> None:
+    from event_log import configure_logging
+    configure_logging(
+        level="INFO" if args.verbose or args.log_file else "WARNING",
+        sink=args.log_file or sys.stderr,
+        serialize=args.log_json,
+        sample_rate=args.log_sample_rate
+    )
+
+
+def _build_extractor(args: argparse.Namespace, processes: int = 1) -> Tuple[Any, Any]:
+    """DocumentExtractor e RateController das opções (a cota é dividida entre os processos)"""
+    from cassette import use_cassette
+    from client_pool import get_client_pool
+    from document_extractor import DocumentExtractor
+    from key_pool import KeyPool
+    from rate_control import AdaptiveLimiter, RateController
+
+    controller = RateController(
+        AdaptiveLimiter(max_limit=args.workers),
+        rpm=args.rpm / processes if args.rpm else None,
+        tpm=args.tpm / processes if args.tpm else None
+    )
+    # Várias chaves: cada processo fica com a sua parte do orçamento de cada chave
+    key_pool = KeyPool.from_env(args.keys, share=processes, rpm=args.key_rpm, tpm=args.key_tpm)
+    extractor = DocumentExtractor(
+        args.model,
+        crop_documents=args.crop,
+        quality_gate=args.quality_gate,
+        rate_controller=controller,
+        client_pool=get_client_pool(key_pool=key_pool) if key_pool is not None else None,
+        slo_budgets=args.slo,
+        request_timeout=args.request_timeout
+    )
+    if args.cassette:
+        use_cassette(extractor, args.cassette, args.cassette_mode)
+    elif args.warmup:
+        # Conecta enquanto as primeiras imagens são preparadas
+        extractor.client_pool.warm_up([args.model], background=True)
+    return extractor, controller
+
+
+def _sink_options(kind: Optional[str]) -> Dict[str, Any]:
+    from document_extractor import DocumentExtractor
+    if kind != "csv":
+        return {}
+    return {
+        "fieldnames": {
+            doc_type: DocumentExtractor.get_fields(doc_type)
+            for doc_type in DocumentExtractor.PROMPTS if doc_type != "auto"
+        }
+    }
+
+
+def _open_dead_letters(args: argparse.Namespace) -> Any:
+    if not args.dead_letters:
+        return None
+    from dead_letters import DeadLetterStore
+    return DeadLetterStore(args.dead_letters)
+
+
+def run_redrive(args: argparse.Namespace) -> int:
+    """
+    Modo --redrive: reprocessa as falhas guardadas em --dead-letters, só nas
+    categorias pedidas, com --workers/--rpm/--tpm próprios.
+    """
+    from dead_letters import FAILURE_CATEGORIES, TRANSIENT_CATEGORIES, redrive
+    from result_sinks import create_sink, sink_kind
+
+    categories = (
+        list(FAILURE_CATEGORIES) if args.redrive == "all"
+        else [c.strip() for c in args.redrive.split(",") if c.strip()] or list(TRANSIENT_CATEGORIES)
+    )
+    extractor, _ = _build_extractor(args)
+    store = _open_dead_letters(args)
+    sink = create_sink(args.output, **_sink_options(sink_kind(args.output))) if args.output else None
+    print(f"🔁 Reprocessando falhas ({', '.join(categories)}) de {args.dead_letters}: "
+          f"{store.counts()['pending']}", file=sys.stderr)
+    try:
+        summary = redrive(
+            store, extractor, categories, workers=args.workers, rpm=args.rpm, tpm=args.tpm,
+            validate=args.validate, limit=args.redrive_limit, sink=sink
+        )
+    finally:
+        if sink is not None:
+            sink.close()
+        store.close()
+    if sink is not None:
+        summary["output"] = sink.stats()
+    _write_summary(args, summary)
+    return 0
+
+
+def _shard_worker(args: argparse.Namespace, processes: int) -> Dict[str, Any]:
+    """Um processo do modo fragmentado: reserva e processa fragmentos até acabarem"""
+    from shard_batch import run_worker
+
+    # Processos criados por fork não herdam a thread de gravação dos logs
+    _configure_logging(args)
+    extractor, _ = _build_extractor(args, processes)
+
+    def report(stats: Dict[str, Any]) -> None:
+        # Uma só escrita por linha: vários processos dividem o mesmo stderr
+        sys.stderr.write(f"[{stats['id']}] {stats['documents']} docs em {stats['seconds']:.1f}s "
+                         f"({stats['errors']} erros) por {stats['owner']}\n")
+        sys.stderr.flush()
+
+    dead_letters = _open_dead_letters(args)
+    totals = run_worker(
+        args.shard_dir, extractor, args.document_type, validate=args.validate,
+        lease_seconds=args.lease_seconds, poll_seconds=min(5.0, args.lease_seconds / 4), on_shard=report,
+        dead_letters=dead_letters
+    )
+    if dead_letters is not None:
+        dead_letters.close()
+    from loguru import logger
+    logger.complete()
+    return totals
+
+
+def run_sharded(args: argparse.Namespace, paths: List[str], missing: List[str]) -> int:
+    """
+    Modo fragmentado (--shard-dir): divide o lote, processa os fragmentos em
+    --processes processos e junta as saídas em --output.
+
+    Outras máquinas com o mesmo diretório (compartilhado) e as mesmas entradas
+    entram no mesmo lote; a que terminar por último junta as saídas.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from result_sinks import sink_kind
+    from shard_batch import claim_merge, merge_outputs, plan_shards, shard_status
+
+    plan = plan_shards(args.shard_dir, paths, args.shard_size)
+    processes = max(1, args.processes)
+    print(f"🧩 {plan['total']} documentos em {len(plan['shards'])} fragmentos, "
+          f"{processes} processos neste host", file=sys.stderr)
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    started = time.perf_counter()
+
+    if processes == 1:
+        workers = [_shard_worker(args, 1)]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            workers = list(pool.map(_shard_worker, [args] * processes, [processes] * processes))
+    elapsed = time.perf_counter() - started
+
+    merged = None
+    if args.output and claim_merge(args.shard_dir):
+        merged = merge_outputs(args.shard_dir, args.output, **_sink_options(sink_kind(args.output)))
+        print(f"📝 Saídas juntadas em {args.output}", file=sys.stderr)
+
+    documents = sum(w["documents"] for w in workers)
+    errors = sum(w["errors"] for w in workers)
+    error_rate = round(errors / documents, 4) if documents else 0.0
+    failed = error_rate > args.max_error_rate
+    summary = {
+        "status": "failed" if failed else "completed",
+        "started_at": started_at,
+        "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "document_type": args.document_type,
+        "shard_dir": args.shard_dir,
+        "processes": processes,
+        "total": plan["total"],
+        "documents_this_host": documents,
+        "success_this_host": sum(w["success"] for w in workers),
+        "errors_this_host": errors,
+        "error_rate": error_rate,
+        "elapsed_seconds": round(elapsed, 1),
+        "items_per_second": round(documents / elapsed, 2) if elapsed > 0 else None,
+        "shards": shard_status(args.shard_dir, args.lease_seconds),
+        "workers": workers,
+        "output": merged,
+        "missing_inputs": missing
+    }
+    _write_summary(args, summary)
+    return 1 if failed else 0
+
+
+def _write_summary(args: argparse.Namespace, summary: Dict[str, Any]) -> None:
+    text = json.dumps(summary, ensure_ascii=False, indent=2, default=str)
+    if args.summary:
+        Path(args.summary).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.summary).write_text(text + "\n", encoding="utf-8")
+        print(f"📝 Resumo gravado em {args.summary}", file=sys.stderr)
+    else:
+        print(text)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    from loguru import logger
+    _configure_logging(args)
+
+    if args.cassette and args.cassette_mode == "replay":
+        # Reprodução dispensa a chave (ver document_extractor)
+        import os
+        os.environ.setdefault("GEMINI_CASSETTE", args.cassette)
+        os.environ.setdefault("GEMINI_CASSETTE_MODE", "replay")
+
+    if args.redrive is not None:
+        if not args.dead_letters:
+            build_parser().error("--redrive requer --dead-letters")
+        return run_redrive(args)
+
+    paths, missing = collect_paths(args.inputs, args.recursive)
+    for entry in missing:
+        logger.warning(f"Entrada ignorada (não encontrada ou formato desconhecido): {entry}")
+    if not paths:
+        print(json.dumps({"status": "empty", "total": 0, "missing_inputs": missing}, ensure_ascii=False))
+        return 2
+
+    if args.shard_dir:
+        return run_sharded(args, paths, missing)
+
+    from pipeline import ExtractionPipeline
+    from result_sinks import create_sink, sink_kind
+
+    extractor, controller = _build_extractor(args)
+
+    sink = None
+    if args.output:
+        kind = sink_kind(args.output)
+        sink = create_sink(args.output, kind, **_sink_options(kind))
+
+    print(f"📦 {len(paths)} documentos, {args.workers} requisições simultâneas", file=sys.stderr)
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    progress = Progress(len(paths), args.interval, sys.stderr, controller)
+    dead_letters = _open_dead_letters(args)
+    try:
+        result = ExtractionPipeline(
+            extractor, prep_workers=args.prep_workers, request_workers=args.workers
+        ).run(
+            paths, args.document_type, sink=sink, validate=args.validate, on_result=progress.record,
+            dead_letters=dead_letters, deadline=args.deadline
+        )
+    finally:
+        if sink is not None:
+            sink.close()
+    final = progress.finish()
+    logger.complete()
+
+    failed = final["error_rate"] > args.max_error_rate
+    summary = {
+        "status": "failed" if failed else "completed",
+        "started_at": started_at,
+        "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "document_type": args.document_type,
+        "workers": args.workers,
+        "total": len(paths),
+        "success": result["success"],
+        "errors": result["errors"],
+        "timeouts": result["timeouts"],
+        "error_rate": final["error_rate"],
+        "elapsed_seconds": final["elapsed_seconds"],
+        "items_per_second": final["items_per_second"],
+        "latency": {
+            "p50": final["latency_p50"],
+            "p95": final["latency_p95"],
+            "max": final["latency_max"]
+        },
+        "tokens_used": final["tokens_used"],
+        "tokens_per_document": round(final["tokens_used"] / len(paths)) if final["tokens_used"] else None,
+        "output": sink.stats() if sink is not None else None,
+        "dead_letters": dead_letters.counts() if dead_letters is not None else None,
+        "keys": extractor.client_pool.stats()["keys"],
+        "missing_inputs": missing,
+        "error_samples": progress.error_samples,
+        "stages": result["stages"]
+    }
+
+    if dead_letters is not None:
+        dead_letters.close()
+    _write_summary(args, summary)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
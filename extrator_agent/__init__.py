@@ -4,6 +4,6 @@ Agente inteligente para extração e análise de documentos
 """
 __version__ = "1.0.0"
 
-from .agent import root_agent
+from .agent import root_agent, stream_extraction, stream_extraction_sse
 
-__all__ = ["root_agent"]
+__all__ = ["root_agent", "stream_extraction", "stream_extraction_sse"]
@@ -3,20 +3,178 @@ ExtratorADK Agent - Extração de Documentos Brasileiros (RG, CNH, CPF)
 Powered by Google ADK e Gemini Vision 2.0 Flash
 """
 from __future__ import annotations
+import json
+import os
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any
-from loguru import logger
+from typing import Dict, Any, AsyncIterator, List, Optional
 
 # Adiciona src ao path
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
+from cassette import use_cassette
+from dead_letters import FAILURE_CATEGORIES, TRANSIENT_CATEGORIES, DeadLetterStore, redrive
+from deadlines import REQUEST_TIMEOUT, SLO_BUDGETS, Deadline, deadline_context, parse_budgets
 from document_extractor import DocumentExtractor
+from event_log import configure_logging, log_event
+from extraction_store import ExtractionStore
+from image_prep import find_images
+from model_cascade import ModelCascade, parse_routes
+from ocr_correction import correct_number
+from rate_control import AdaptiveLimiter, RateController
+from result_sinks import ResultSink, create_sink, sink_kind
+from scheduler import RequestScheduler, request_context
+from tool_results import ResultRegistry, compact_result
+from validation_rules import ValidationEngine
 from validators import DocumentValidator
 
+# Logs: nível, arquivo (vazio = stderr), formato (text/json) e fração mantida dos
+# eventos de sucesso por documento (erros e avisos são sempre registrados)
+configure_logging(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    sink=os.getenv("LOG_FILE") or sys.stderr,
+    serialize=os.getenv("LOG_FORMAT", "text").lower() == "json",
+    sample_rate=float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+)
+
+# Verificação local de qualidade: "flag" (padrão, anota os problemas), "reject" ou vazio para desligar
+QUALITY_GATE = os.getenv("QUALITY_GATE", "flag") or None
+
+# Cota do projeto no Gemini (vazio = sem limite local de RPM/TPM)
+GEMINI_RPM = float(os.getenv("GEMINI_RPM") or 0) or None
+GEMINI_TPM = float(os.getenv("GEMINI_TPM") or 0) or None
+
+# Cascata de modelos (ex: "gemini-2.5-flash-lite,gemini-2.5-flash"); vazio = só gemini-2.5-flash.
+# GEMINI_CASCADE_<TIPO> (ex: GEMINI_CASCADE_CNPJ) define a ordem de um tipo de documento
+GEMINI_CASCADE = parse_routes(os.getenv("GEMINI_CASCADE", ""))
+CASCADE_ROUTES = {
+    doc_type: parse_routes(os.getenv(f"GEMINI_CASCADE_{doc_type.upper()}", ""))
+    for doc_type in DocumentExtractor.PROMPTS
+    if os.getenv(f"GEMINI_CASCADE_{doc_type.upper()}")
+}
+cascade = (
+    ModelCascade({"default": GEMINI_CASCADE or ("gemini-2.5-flash",), **CASCADE_ROUTES})
+    if GEMINI_CASCADE or CASCADE_ROUTES else None
+)
+
+# Chamadas simultâneas de todas as sessões passam pelo mesmo controle de vazão
+rate_controller = RateController(AdaptiveLimiter(max_limit=16), rpm=GEMINI_RPM, tpm=GEMINI_TPM)
+
+# Pedidos do chat (interactive) passam à frente de lotes (bulk) na mesma cota
+scheduler = RequestScheduler(lambda: rate_controller.limiter.limit)
+CHAT_TENANT = "chat"
+
+# Documentos extraídos em paralelo pelas ferramentas em lote
+BATCH_TOOL_WORKERS = int(os.getenv("BATCH_TOOL_WORKERS", "8"))
+
+# Prazos: SLO por tipo de documento (EXTRACTION_SLO="cnh=20,rg=25" ajusta os
+# padrões de deadlines.SLO_BUDGETS; "off" desliga), prazo total de uma chamada
+# de ferramenta e limite de cada chamada ao Gemini
+EXTRACTION_SLO = os.getenv("EXTRACTION_SLO", "")
+SLO = {} if EXTRACTION_SLO.lower() == "off" else {**SLO_BUDGETS, **parse_budgets(EXTRACTION_SLO)}
+TOOL_DEADLINE = float(os.getenv("TOOL_DEADLINE_SECONDS") or 300)
+GEMINI_REQUEST_TIMEOUT = float(os.getenv("GEMINI_REQUEST_TIMEOUT") or REQUEST_TIMEOUT)
+
+# Resultados compactos para o LLM; os completos ficam no servidor sob um handle
+COMPACT_TOOL_RESULTS = os.getenv("COMPACT_TOOL_RESULTS", "true").lower() not in ("0", "false", "no")
+result_registry = ResultRegistry()
+
 # Inicializa extrator e validador
-extractor = DocumentExtractor()
+extractor = DocumentExtractor(
+    quality_gate=QUALITY_GATE,
+    rate_controller=rate_controller,
+    scheduler=scheduler,
+    cascade=cascade,
+    slo_budgets=SLO,
+    request_timeout=GEMINI_REQUEST_TIMEOUT
+)
 validator = DocumentValidator()
+validation_engine = ValidationEngine()
+
+# Cassete de respostas do Gemini: grava (record/auto) ou reproduz sem rede (replay)
+GEMINI_CASSETTE = os.getenv("GEMINI_CASSETTE")
+cassette = use_cassette(
+    extractor,
+    GEMINI_CASSETTE,
+    os.getenv("GEMINI_CASSETTE_MODE", "replay"),
+    os.getenv("GEMINI_CASSETTE_LATENCY", "original")
+) if GEMINI_CASSETTE else None
+
+# Abre as conexões com o Gemini em segundo plano na inicialização, para a
+# primeira extração não pagar o handshake (desnecessário reproduzindo cassete)
+GEMINI_WARMUP = os.getenv("GEMINI_WARMUP", "true").lower() not in ("0", "false", "no")
+if GEMINI_WARMUP and cassette is None:
+    extractor.client_pool.warm_up(
+        [extractor.model_name, *(cascade.routes["default"] if cascade is not None else ())],
+        background=True
+    )
+
+# Banco local de extrações (aberto sob demanda)
+EXTRACTION_STORE_PATH = os.getenv("EXTRACTION_STORE", "data/processed/extractions.db")
+_store: Optional[ExtractionStore] = None
+
+
+def _get_store() -> ExtractionStore:
+    """Abre o banco de extrações na primeira utilização"""
+    global _store
+    if _store is None:
+        _store = ExtractionStore(EXTRACTION_STORE_PATH, schemas=_document_schemas())
+    return _store
+
+
+# Falhas dos lotes (por categoria) e reprocessamento com cota própria; extract_documents
+# só grava as falhas na fila com DEAD_LETTER_RECORD=true
+DEAD_LETTER_STORE_PATH = os.getenv("DEAD_LETTER_STORE", "data/processed/dead_letters.db")
+DEAD_LETTER_RECORD = os.getenv("DEAD_LETTER_RECORD", "false").lower() in ("1", "true", "yes")
+REDRIVE_WORKERS = int(os.getenv("REDRIVE_WORKERS", "2"))
+REDRIVE_RPM = float(os.getenv("REDRIVE_RPM") or 0) or None
+_dead_letters: Optional[DeadLetterStore] = None
+
+
+def _get_dead_letters() -> DeadLetterStore:
+    """Abre a fila de falhas na primeira utilização"""
+    global _dead_letters
+    if _dead_letters is None:
+        _dead_letters = DeadLetterStore(DEAD_LETTER_STORE_PATH)
+    return _dead_letters
+
+
+# Sinks abertos por save_extraction/extract_batch, um por destino (reaproveitados entre chamadas)
+_sinks: Dict[str, ResultSink] = {}
+_sinks_lock = threading.Lock()
+
+
+def _write_to_sink(output_file: str, kind: str, results: List[Dict[str, Any]]) -> None:
+    """Anexa resultados ao sink do destino (aberto na primeira utilização) e descarrega"""
+    with _sinks_lock:
+        sink = _sinks.get(output_file)
+        if sink is None:
+            sink = _sinks[output_file] = create_sink(output_file, kind, **_sink_options(kind))
+        sink.write_many(results)
+        sink.flush()
+
+
+def _document_schemas() -> Dict[str, list]:
+    """Campos de cada tipo de documento, derivados dos prompts"""
+    return {
+        doc_type: DocumentExtractor.get_fields(doc_type)
+        for doc_type in DocumentExtractor.PROMPTS
+        if doc_type != "auto"
+    }
+
+def _register(result: Dict[str, Any]) -> Optional[str]:
+    """Guarda o resultado completo no servidor (modo compacto) e devolve o handle"""
+    return result_registry.put(result) if COMPACT_TOOL_RESULTS else None
+
+
+def _tool_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Resultado devolvido ao LLM: compacto, com handle, ou completo se desligado"""
+    if not COMPACT_TOOL_RESULTS:
+        return result
+    return compact_result(result, _register(result))
+
 
 # ==================== FERRAMENTAS DE EXTRAÇÃO ====================
 
@@ -32,42 +190,24 @@ def extract_rg(image_path: str, validate: bool = True) -> Dict[str, Any]:
         Dict com dados extraídos e validações
     """
     try:
-        logger.info(f"Extraindo RG: {image_path}")
-        result = extractor.extract_rg(image_path)
+        log_event("tool.extract", "Extraindo RG: {image_path}", image_path=image_path, document_type="rg")
+        with request_context("interactive", CHAT_TENANT), deadline_context(TOOL_DEADLINE):
+            result = extractor.extract_rg(image_path)
 
-        if result["status"] == "error":
-            return result
+        if result["status"] != "success":
+            return _tool_result(result)
 
-        # Validação opcional
+        # Validação opcional (regras em validation_rules.VALIDATION_RULES)
         if validate and result.get("data"):
-            data = result["data"]
-            validations = {}
-
-            # Valida CPF se presente
-            if data.get("cpf"):
-                validations["cpf"] = validator.validate_cpf(data["cpf"])
+            validation_engine.validate_batch([result], "rg")
 
-            # Valida data de nascimento
-            if data.get("data_nascimento"):
-                validations["data_nascimento"] = validator.validate_date(data["data_nascimento"])
-
-            # Valida data de emissão
-            if data.get("data_emissao"):
-                validations["data_emissao"] = validator.validate_date(data["data_emissao"])
-
-            # Valida RG
-            if data.get("numero_rg"):
-                validations["rg"] = validator.validate_rg(
-                    data["numero_rg"],
-                    data.get("uf_emissor")
-                )
-
-            result["validations"] = validations
-
-        return result
+        return _tool_result(result)
 
     except Exception as e:
-        logger.error(f"Erro ao extrair RG: {e}")
+        log_event(
+            "tool.error", "Erro ao extrair RG: {error}", "ERROR",
+            tool="extract_rg", image_path=image_path, error=str(e)
+        )
         return {
             "status": "error",
             "message": f"Erro ao extrair RG: {str(e)}"
@@ -86,42 +226,24 @@ def extract_cnh(image_path: str, validate: bool = True) -> Dict[str, Any]:
         Dict com dados extraídos e validações
     """
     try:
-        logger.info(f"Extraindo CNH: {image_path}")
-        result = extractor.extract_cnh(image_path)
+        log_event("tool.extract", "Extraindo CNH: {image_path}", image_path=image_path, document_type="cnh")
+        with request_context("interactive", CHAT_TENANT), deadline_context(TOOL_DEADLINE):
+            result = extractor.extract_cnh(image_path)
 
-        if result["status"] == "error":
-            return result
+        if result["status"] != "success":
+            return _tool_result(result)
 
-        # Validação opcional
+        # Validação opcional (regras em validation_rules.VALIDATION_RULES)
         if validate and result.get("data"):
-            data = result["data"]
-            validations = {}
-
-            # Valida CNH
-            if data.get("numero_registro"):
-                validations["cnh"] = validator.validate_cnh(data["numero_registro"])
+            validation_engine.validate_batch([result], "cnh")
 
-            # Valida CPF
-            if data.get("cpf"):
-                validations["cpf"] = validator.validate_cpf(data["cpf"])
-
-            # Valida data de nascimento
-            if data.get("data_nascimento"):
-                validations["data_nascimento"] = validator.validate_date(data["data_nascimento"])
-
-            # Valida datas de emissão e validade
-            if data.get("data_emissao") and data.get("data_validade"):
-                validations["validade_cnh"] = validator.validate_cnh_expiration(
-                    data["data_emissao"],
-                    data["data_validade"]
-                )
-
-            result["validations"] = validations
-
-        return result
+        return _tool_result(result)
 
     except Exception as e:
-        logger.error(f"Erro ao extrair CNH: {e}")
+        log_event(
+            "tool.error", "Erro ao extrair CNH: {error}", "ERROR",
+            tool="extract_cnh", image_path=image_path, error=str(e)
+        )
         return {
             "status": "error",
             "message": f"Erro ao extrair CNH: {str(e)}"
@@ -140,31 +262,24 @@ def extract_cpf_document(image_path: str, validate: bool = True) -> Dict[str, An
         Dict com dados extraídos e validações
     """
     try:
-        logger.info(f"Extraindo CPF: {image_path}")
-        result = extractor.extract_cpf(image_path)
+        log_event("tool.extract", "Extraindo CPF: {image_path}", image_path=image_path, document_type="cpf")
+        with request_context("interactive", CHAT_TENANT), deadline_context(TOOL_DEADLINE):
+            result = extractor.extract_cpf(image_path)
 
-        if result["status"] == "error":
-            return result
+        if result["status"] != "success":
+            return _tool_result(result)
 
-        # Validação opcional
+        # Validação opcional (regras em validation_rules.VALIDATION_RULES)
         if validate and result.get("data"):
-            data = result["data"]
-            validations = {}
-
-            # Valida CPF
-            if data.get("numero_cpf"):
-                validations["cpf"] = validator.validate_cpf(data["numero_cpf"])
+            validation_engine.validate_batch([result], "cpf")
 
-            # Valida data de nascimento
-            if data.get("data_nascimento"):
-                validations["data_nascimento"] = validator.validate_date(data["data_nascimento"])
-
-            result["validations"] = validations
-
-        return result
+        return _tool_result(result)
 
     except Exception as e:
-        logger.error(f"Erro ao extrair CPF: {e}")
+        log_event(
+            "tool.error", "Erro ao extrair CPF: {error}", "ERROR",
+            tool="extract_cpf_document", image_path=image_path, error=str(e)
+        )
         return {
             "status": "error",
             "message": f"Erro ao extrair CPF: {str(e)}"
@@ -183,35 +298,24 @@ def extract_cnpj_document(image_path: str, validate: bool = True) -> Dict[str, A
         Dict com dados extraídos e validações
     """
     try:
-        logger.info(f"Extraindo CNPJ: {image_path}")
-        result = extractor.extract_cnpj(image_path)
+        log_event("tool.extract", "Extraindo CNPJ: {image_path}", image_path=image_path, document_type="cnpj")
+        with request_context("interactive", CHAT_TENANT), deadline_context(TOOL_DEADLINE):
+            result = extractor.extract_cnpj(image_path)
 
-        if result["status"] == "error":
-            return result
+        if result["status"] != "success":
+            return _tool_result(result)
 
-        # Validação opcional
+        # Validação opcional (regras em validation_rules.VALIDATION_RULES)
         if validate and result.get("data"):
-            data = result["data"]
-            validations = {}
-
-            # Valida CNPJ
-            if data.get("numero_cnpj"):
-                validations["cnpj"] = validator.validate_cnpj(data["numero_cnpj"])
-
-            # Valida data de abertura
-            if data.get("data_abertura"):
-                validations["data_abertura"] = validator.validate_date(data["data_abertura"])
-
-            # Valida data de situação cadastral
-            if data.get("data_situacao_cadastral"):
-                validations["data_situacao_cadastral"] = validator.validate_date(data["data_situacao_cadastral"])
+            validation_engine.validate_batch([result], "cnpj")
 
-            result["validations"] = validations
-
-        return result
+        return _tool_result(result)
 
     except Exception as e:
-        logger.error(f"Erro ao extrair CNPJ: {e}")
+        log_event(
+            "tool.error", "Erro ao extrair CNPJ: {error}", "ERROR",
+            tool="extract_cnpj_document", image_path=image_path, error=str(e)
+        )
         return {
             "status": "error",
             "message": f"Erro ao extrair CNPJ: {str(e)}"
@@ -230,29 +334,24 @@ def extract_document_auto(image_path: str, validate: bool = True) -> Dict[str, A
         Dict com dados extraídos e validações
     """
     try:
-        logger.info(f"Extraindo documento (auto-detect): {image_path}")
-        result = extractor.extract_from_image(image_path, "auto")
+        log_event("tool.extract", "Extraindo documento (auto-detect): {image_path}", image_path=image_path, document_type="auto")
+        with request_context("interactive", CHAT_TENANT), deadline_context(TOOL_DEADLINE):
+            result = extractor.extract_from_image(image_path, "auto")
 
-        if result["status"] == "error":
-            return result
+        if result["status"] != "success":
+            return _tool_result(result)
 
-        # Identifica tipo e executa validação apropriada
+        # Valida conforme o tipo identificado pelo modelo, sem reextrair a imagem
         if validate and result.get("data"):
-            doc_type = result["data"].get("tipo_documento", "").upper()
-
-            if doc_type == "RG":
-                return extract_rg(image_path, validate=True)
-            elif doc_type == "CNH":
-                return extract_cnh(image_path, validate=True)
-            elif doc_type == "CPF":
-                return extract_cpf_document(image_path, validate=True)
-            elif doc_type == "CNPJ":
-                return extract_cnpj_document(image_path, validate=True)
+            validation_engine.validate_batch([result])
 
-        return result
+        return _tool_result(result)
 
     except Exception as e:
-        logger.error(f"Erro ao extrair documento: {e}")
+        log_event(
+            "tool.error", "Erro ao extrair documento: {error}", "ERROR",
+            tool="extract_document_auto", image_path=image_path, error=str(e)
+        )
         return {
             "status": "error",
             "message": f"Erro ao extrair documento: {str(e)}"
@@ -270,7 +369,7 @@ def list_images(directory: str = "data") -> Dict[str, Any]:
         Dict com lista de imagens
     """
     try:
-        logger.info(f"Listando imagens em: {directory}")
+        log_event("tool.list_images", "Listando imagens em: {directory}", directory=directory)
         path = Path(directory)
 
         if not path.exists():
@@ -279,12 +378,7 @@ def list_images(directory: str = "data") -> Dict[str, Any]:
                 "message": f"Diretório não encontrado: {directory}"
             }
 
-        # Busca imagens
-        extensions = [".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tiff"]
-        images = []
-
-        for ext in extensions:
-            images.extend([str(f) for f in path.rglob(f"*{ext}")])
+        images = find_images(str(path))
 
         return {
             "status": "success",
@@ -293,7 +387,10 @@ def list_images(directory: str = "data") -> Dict[str, Any]:
             "count": len(images)
         }
     except Exception as e:
-        logger.error(f"Erro ao listar imagens: {e}")
+        log_event(
+            "tool.error", "Erro ao listar imagens: {error}", "ERROR",
+            tool="list_images", directory=directory, error=str(e)
+        )
         return {
             "status": "error",
             "message": f"Erro ao listar imagens: {str(e)}"
@@ -302,24 +399,38 @@ def list_images(directory: str = "data") -> Dict[str, Any]:
 
 def save_extraction(data: Dict[str, Any], output_file: str) -> Dict[str, Any]:
     """
-    Salva resultado de extração em arquivo JSON.
+    Salva resultado de extração em arquivo.
+
+    Arquivos .json recebem um documento JSON formatado. Para gravação em
+    massa, use .jsonl (.jsonl.gz / .jsonl.zst), .db (SQLite) ou um diretório
+    terminado em "/" (um CSV por tipo de documento): o resultado é anexado ao destino.
 
     Args:
-        data: Dados extraídos
+        data: Dados extraídos (um resultado compacto com "handle" é gravado
+            na versão completa)
         output_file: Caminho do arquivo de saída
 
     Returns:
         Dict com status da operação
     """
     try:
-        logger.info(f"Salvando extração em: {output_file}")
+        log_event("tool.save", "Salvando extração em: {output_file}", output_file=output_file)
         import json
 
+        # Resultado compacto (com "handle") é trocado pelo completo guardado no servidor
+        data = result_registry.resolve(data)
+
         output_path = Path(output_file)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
 
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        kind = sink_kind(output_file)
+
+        if kind is None:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+        else:
+            _write_to_sink(output_file, kind, [data])
 
         return {
             "status": "success",
@@ -327,13 +438,126 @@ def save_extraction(data: Dict[str, Any], output_file: str) -> Dict[str, Any]:
             "path": str(output_path)
         }
     except Exception as e:
-        logger.error(f"Erro ao salvar extração: {e}")
+        log_event(
+            "tool.error", "Erro ao salvar extração: {error}", "ERROR",
+            tool="save_extraction", output_file=output_file, error=str(e)
+        )
         return {
             "status": "error",
             "message": f"Erro ao salvar extração: {str(e)}"
         }
 
 
+def _sink_options(kind: str) -> Dict[str, Any]:
+    """Opções extras do sink (colunas CSV derivadas dos prompts)"""
+    if kind != "csv":
+        return {}
+    return {"fieldnames": _document_schemas()}
+
+
+def store_extraction(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Armazena um resultado de extração no banco local consultável.
+
+    Args:
+        data: Resultado retornado por uma ferramenta de extração (o resultado
+            compacto basta: o completo é recuperado pelo "handle")
+
+    Returns:
+        Dict com status da operação
+    """
+    try:
+        data = result_registry.resolve(data)
+        if data.get("status") != "success":
+            return {
+                "status": "error",
+                "message": "Apenas extrações bem-sucedidas podem ser armazenadas"
+            }
+
+        store = _get_store()
+        store.write(data)
+        store.flush()
+
+        return {
+            "status": "success",
+            "message": f"Extração armazenada em: {EXTRACTION_STORE_PATH}",
+            "image_path": data.get("image_path")
+        }
+    except Exception as e:
+        log_event(
+            "tool.error", "Erro ao armazenar extração: {error}", "ERROR",
+            tool="store_extraction", error=str(e)
+        )
+        return {
+            "status": "error",
+            "message": f"Erro ao armazenar extração: {str(e)}"
+        }
+
+
+def search_extractions(
+    document_type: Optional[str] = None,
+    cpf: Optional[str] = None,
+    cnpj: Optional[str] = None,
+    numero_registro: Optional[str] = None,
+    nome: Optional[str] = None,
+    validade_de: Optional[str] = None,
+    validade_ate: Optional[str] = None,
+    limit: int = 50
+) -> Dict[str, Any]:
+    """
+    Busca extrações já armazenadas, sem reprocessar imagens.
+
+    Args:
+        document_type: Tipo do documento ("rg", "cnh", "cpf", "cnpj")
+        cpf: CPF do titular
+        cnpj: CNPJ da empresa
+        numero_registro: Número de registro da CNH
+        nome: Início do nome completo ou razão social
+        validade_de: Validade a partir de (DD/MM/AAAA)
+        validade_ate: Validade até (DD/MM/AAAA)
+        limit: Máximo de resultados
+
+    Returns:
+        Dict com os documentos encontrados
+    """
+    try:
+        results = _get_store().query(
+            document_type=document_type,
+            cpf=cpf,
+            cnpj=cnpj,
+            numero_registro=numero_registro,
+            nome=nome,
+            validade_de=validade_de,
+            validade_ate=validade_ate,
+            limit=limit
+        )
+
+        return {
+            "status": "success",
+            "message": f"Encontrados {len(results)} documentos",
+            "results": results,
+            "count": len(results)
+        }
+    except Exception as e:
+        log_event(
+            "tool.error", "Erro ao buscar extrações: {error}", "ERROR",
+            tool="search_extractions", error=str(e)
+        )
+        return {
+            "status": "error",
+            "message": f"Erro ao buscar extrações: {str(e)}"
+        }
+
+
+def _with_correction(result: Dict[str, Any], value: str, kind: str) -> Dict[str, Any]:
+    """Anexa a sugestão de ocr_correction a uma validação que falhou (nada é alterado)"""
+    if not result.get("valid"):
+        correction = correct_number(value, kind)
+        if correction["status"] in ("corrected", "ambiguous"):
+            result["correction"] = correction
+    return result
+
+
 def validate_cpf_number(cpf: str) -> Dict[str, Any]:
     """
     Valida um número de CPF.
@@ -342,9 +566,10 @@ def validate_cpf_number(cpf: str) -> Dict[str, Any]:
         cpf: Número do CPF (com ou sem formatação)
 
     Returns:
-        Dict com resultado da validação
+        Dict com resultado da validação (se inválido, pode trazer em
+        "correction" o número provável, quando o erro parece de leitura)
     """
-    return validator.validate_cpf(cpf)
+    return _with_correction(validator.validate_cpf(cpf), cpf, "cpf")
 
 
 def validate_cnh_number(cnh: str) -> Dict[str, Any]:
@@ -355,9 +580,10 @@ def validate_cnh_number(cnh: str) -> Dict[str, Any]:
         cnh: Número da CNH
 
     Returns:
-        Dict com resultado da validação
+        Dict com resultado da validação (se inválido, pode trazer em
+        "correction" o número provável, quando o erro parece de leitura)
     """
-    return validator.validate_cnh(cnh)
+    return _with_correction(validator.validate_cnh(cnh), cnh, "cnh")
 
 
 def validate_cnpj_number(cnpj: str) -> Dict[str, Any]:
@@ -368,9 +594,371 @@ def validate_cnpj_number(cnpj: str) -> Dict[str, Any]:
         cnpj: Número do CNPJ (com ou sem formatação)
 
     Returns:
-        Dict com resultado da validação
+        Dict com resultado da validação (se inválido, pode trazer em
+        "correction" o número provável, quando o erro parece de leitura)
+    """
+    return _with_correction(validator.validate_cnpj(cnpj), cnpj, "cnpj")
+
+
+def get_full_result(handle: str) -> Dict[str, Any]:
+    """
+    Recupera o resultado completo de uma extração (resposta bruta do modelo,
+    validações detalhadas, métricas de qualidade e recorte).
+
+    Args:
+        handle: Handle devolvido pelas ferramentas de extração (ex: "res_1a2b3c4d5e")
+
+    Returns:
+        Dict com o resultado completo
+    """
+    result = result_registry.get(handle)
+    if result is None:
+        return {
+            "status": "error",
+            "message": f"Resultado não encontrado ou expirado: {handle}"
+        }
+    return result
+
+
+def reextract_fields(handle: str, fields: Optional[List[str]] = None, crop: bool = False) -> Dict[str, Any]:
+    """
+    Relê apenas os campos com problema de uma extração (mais rápido e barato
+    que extrair o documento de novo).
+
+    Args:
+        handle: Handle devolvido pelas ferramentas de extração
+        fields: Campos a reler (padrão: os que falharam na validação)
+        crop: Se True, envia só a região dos campos (layouts conhecidos)
+
+    Returns:
+        Dict com o resultado atualizado e revalidado, e em "requery" os
+        campos relidos e os que mudaram
+    """
+    result = result_registry.get(handle)
+    if result is None:
+        return {
+            "status": "error",
+            "message": f"Resultado não encontrado ou expirado: {handle}"
+        }
+
+    try:
+        with request_context("interactive", CHAT_TENANT), deadline_context(TOOL_DEADLINE):
+            extractor.reextract_fields(result, fields, crop_fields=crop, engine=validation_engine)
+        # O resultado completo é atualizado no lugar: o handle continua válido
+        return compact_result(result, handle)
+
+    except Exception as e:
+        log_event(
+            "tool.error", "Erro ao reler campos: {error}", "ERROR",
+            tool="reextract_fields", handle=handle, error=str(e)
+        )
+        return {
+            "status": "error",
+            "message": f"Erro ao reler campos: {str(e)}"
+        }
+
+
+# ==================== FERRAMENTAS EM LOTE ====================
+
+# Campos usados para identificar cada documento no resumo
+_SUMMARY_NAME_FIELDS = ("nome_completo", "razao_social")
+_SUMMARY_ID_FIELDS = ("cpf", "numero_cpf", "numero_cnpj", "numero_registro", "numero_rg")
+
+
+def _summarize_document(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Linha do resumo de um documento: tipo, nome, identificador e problemas"""
+    if result.get("status") != "success":
+        return {
+            "image_path": result.get("image_path"),
+            "status": "timeout" if result.get("status") == "timeout" else "error",
+            "failure": result.get("failure"),
+            "message": result.get("message")
+        }
+
+    data = result.get("data") or {}
+    summary = {
+        "image_path": result.get("image_path"),
+        "status": "success",
+        "tipo": data.get("tipo_documento") or result.get("document_type"),
+        "nome": next((data[f] for f in _SUMMARY_NAME_FIELDS if data.get(f)), None),
+        "documento": next((data[f] for f in _SUMMARY_ID_FIELDS if data.get(f)), None)
+    }
+    problems = [
+        f"{name}: {outcome.get('error', 'inválido')}"
+        for name, outcome in (result.get("validations") or {}).items()
+        if isinstance(outcome, dict) and not outcome.get("valid", True)
+    ]
+    if problems:
+        summary["problemas"] = problems
+    if result.get("quality", {}).get("issues"):
+        summary["qualidade"] = result["quality"]["issues"]
+    return summary
+
+
+def extract_documents(
+    image_paths: List[str],
+    document_type: str = "auto",
+    validate: bool = True,
+    output_file: Optional[str] = None,
+    store: bool = False
+) -> Dict[str, Any]:
+    """
+    Extrai vários documentos de uma vez, em paralelo, e devolve um resumo.
+
+    Args:
+        image_paths: Caminhos das imagens
+        document_type: Tipo de todos os documentos ("rg", "cnh", "cpf", "cnpj" ou "auto")
+        validate: Se True, valida os dados extraídos (em uma única passada)
+        output_file: Se informado, grava os resultados completos
+            (.json, .jsonl, .db ou diretório CSV, como em save_extraction)
+        store: Se True, armazena os resultados no banco local consultável
+
+    Returns:
+        Dict com totais, contagem por tipo, uma linha por documento
+        (tipo, nome, documento, problemas de validação) e os erros
+    """
+    try:
+        log_event("tool.extract_batch", "Extraindo {documents} documentos em lote", documents=len(image_paths))
+        # Um prazo para a chamada inteira: esgotado, os documentos restantes saem com status "timeout"
+        deadline = Deadline(TOOL_DEADLINE)
+
+        def extract(image_path: str) -> Dict[str, Any]:
+            with request_context("normal", CHAT_TENANT), deadline_context(deadline=deadline):
+                return extractor.extract_from_image(image_path, document_type)
+
+        workers = max(1, min(BATCH_TOOL_WORKERS, len(image_paths)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(extract, image_paths))
+
+        if validate:
+            validation_engine.validate_batch(results, None if document_type == "auto" else document_type)
+        if DEAD_LETTER_RECORD:
+            _get_dead_letters().record(results)
+
+        if output_file:
+            kind = sink_kind(output_file)
+            if kind is None:
+                save_extraction({"results": results}, output_file)
+            else:
+                _write_to_sink(output_file, kind, results)
+
+        successes = [r for r in results if r["status"] == "success"]
+        if store and successes:
+            _get_store().write_many(successes)
+            _get_store().flush()
+
+        documents = [_summarize_document(r) for r in results]
+        for document, result in zip(documents, results):
+            handle = _register(result)
+            if handle:
+                document["handle"] = handle
+        by_type: Dict[str, int] = {}
+        for doc in documents:
+            if doc["status"] == "success":
+                key = str(doc.get("tipo") or "desconhecido").upper()
+                by_type[key] = by_type.get(key, 0) + 1
+
+        return {
+            "status": "success",
+            "message": f"{len(successes)} de {len(results)} documentos extraídos",
+            "total": len(results),
+            "success": len(successes),
+            "errors": len(results) - len(successes),
+            "timeouts": sum(1 for r in results if r["status"] == "timeout"),
+            "with_problems": sum(1 for d in documents if "problemas" in d),
+            "by_type": by_type,
+            "documents": documents,
+            "output_file": output_file
+        }
+
+    except Exception as e:
+        log_event(
+            "tool.error", "Erro ao extrair documentos em lote: {error}", "ERROR",
+            tool="extract_documents", documents=len(image_paths), error=str(e)
+        )
+        return {
+            "status": "error",
+            "message": f"Erro ao extrair documentos em lote: {str(e)}"
+        }
+
+
+def extract_directory(
+    directory: str = "data",
+    document_type: str = "auto",
+    validate: bool = True,
+    recursive: bool = True,
+    output_file: Optional[str] = None,
+    store: bool = False
+) -> Dict[str, Any]:
+    """
+    Extrai todas as imagens de um diretório em uma única chamada.
+
+    Args:
+        directory: Diretório com as imagens
+        document_type: Tipo de todos os documentos ("auto" detecta cada um)
+        validate: Se True, valida os dados extraídos
+        recursive: Se True, inclui subdiretórios
+        output_file: Se informado, grava os resultados completos
+        store: Se True, armazena os resultados no banco local consultável
+
+    Returns:
+        Dict no formato de extract_documents
+    """
+    path = Path(directory)
+    if not path.exists():
+        return {
+            "status": "error",
+            "message": f"Diretório não encontrado: {directory}"
+        }
+
+    images = find_images(str(path), recursive)
+    if not images:
+        return {
+            "status": "error",
+            "message": f"Nenhuma imagem encontrada em: {directory}"
+        }
+
+    return extract_documents(images, document_type, validate, output_file, store)
+
+
+def redrive_failures(categories: Optional[List[str]] = None, limit: int = 100) -> Dict[str, Any]:
+    """
+    Reprocessa documentos que falharam em lotes anteriores, só nas categorias
+    pedidas (falhas de validação releem apenas os campos inválidos).
+
+    Args:
+        categories: Categorias de falha: "missing_file", "unreadable_image",
+            "quality", "quota", "timeout", "parse", "validation", "error"
+            (padrão: as passageiras, "quota", "timeout" e "error"); falhas de
+            validação são relidas no máximo 2 vezes
+        limit: Máximo de documentos reprocessados
+
+    Returns:
+        Dict com reprocessados, resolvidos, falhas restantes por categoria
+        e a fila de falhas pendentes
     """
-    return validator.validate_cnpj(cnpj)
+    try:
+        categories = categories or list(TRANSIENT_CATEGORIES)
+        unknown = [c for c in categories if c not in FAILURE_CATEGORIES]
+        if unknown:
+            return {
+                "status": "error",
+                "message": f"Categoria inválida: {', '.join(unknown)} (opções: {', '.join(FAILURE_CATEGORIES)})"
+            }
+        summary = redrive(
+            _get_dead_letters(), extractor, categories,
+            workers=REDRIVE_WORKERS, rpm=REDRIVE_RPM, limit=limit
+        )
+        summary.pop("rate", None)
+        summary["status"] = "success"
+        summary["message"] = f"{summary['resolved']} de {summary['redriven']} documentos resolvidos"
+        return summary
+
+    except Exception as e:
+        log_event(
+            "tool.error", "Erro ao reprocessar falhas: {error}", "ERROR",
+            tool="redrive_failures", error=str(e)
+        )
+        return {
+            "status": "error",
+            "message": f"Erro ao reprocessar falhas: {str(e)}"
+        }
+
+
+def _validate_numbers(values: List[str], validate_batch, label: str) -> Dict[str, Any]:
+    """Valida uma lista de números e resume válidos/inválidos"""
+    outcomes = validate_batch(values)
+    invalid = [
+        {"valor": value, "error": outcome.get("error")}
+        for value, outcome in zip(values, outcomes)
+        if not outcome.get("valid")
+    ]
+    return {
+        "status": "success",
+        "message": f"{len(values) - len(invalid)} de {len(values)} {label} válidos",
+        "total": len(values),
+        "valid": len(values) - len(invalid),
+        "invalid": len(invalid),
+        "invalid_items": invalid,
+        "formatted": [outcome.get("formatted") for outcome in outcomes]
+    }
+
+
+def validate_cpfs(cpfs: List[str]) -> Dict[str, Any]:
+    """
+    Valida uma lista de CPFs de uma vez.
+
+    Args:
+        cpfs: Números de CPF (com ou sem formatação)
+
+    Returns:
+        Dict com totais, os CPFs inválidos (com o motivo) e a lista formatada
+    """
+    return _validate_numbers(cpfs, DocumentValidator.validate_cpf_batch, "CPFs")
+
+
+def validate_cnpjs(cnpjs: List[str]) -> Dict[str, Any]:
+    """
+    Valida uma lista de CNPJs de uma vez.
+
+    Args:
+        cnpjs: Números de CNPJ (com ou sem formatação)
+
+    Returns:
+        Dict com totais, os CNPJs inválidos (com o motivo) e a lista formatada
+    """
+    return _validate_numbers(cnpjs, DocumentValidator.validate_cnpj_batch, "CNPJs")
+
+
+# ==================== STREAMING ====================
+
+async def stream_extraction(
+    image_path: str,
+    document_type: str = "auto",
+    validate: bool = True,
+    timeout: Optional[float] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Extrai um documento em streaming, para interfaces que mostram os campos
+    à medida que chegam (ex: um endpoint HTTP ao lado do agente). Se o
+    cliente desconectar (o iterador é abandonado), a extração é cancelada.
+
+    Args:
+        image_path: Caminho para a imagem
+        document_type: "rg", "cnh", "cpf", "cnpj" ou "auto"
+        validate: Se True, valida cada campo assim que ele chega
+        timeout: Prazo em segundos (padrão: TOOL_DEADLINE_SECONDS; o SLO
+            do tipo de documento também vale)
+
+    Returns:
+        Iterador assíncrono de eventos "field" e "validation"; o último,
+        "done", traz o resultado no mesmo formato das ferramentas de extração
+    """
+    log_event(
+        "tool.extract_stream", "Extraindo em streaming: {image_path}",
+        image_path=image_path, document_type=document_type
+    )
+    # A prioridade vai para a extração, e não para este gerador: um request_context
+    # aberto aqui ficaria preso entre os yields, no contexto de quem consome
+    events = extractor.aextract_stream(
+        image_path, document_type, validate, timeout or TOOL_DEADLINE,
+        priority="interactive", tenant=CHAT_TENANT
+    )
+    async for event in events:
+        if event["event"] == "done":
+            event = {**event, "result": _tool_result(event["result"])}
+        yield event
+
+
+async def stream_extraction_sse(
+    image_path: str,
+    document_type: str = "auto",
+    validate: bool = True,
+    timeout: Optional[float] = None
+) -> AsyncIterator[str]:
+    """Eventos de stream_extraction no formato text/event-stream (Server-Sent Events)"""
+    async for event in stream_extraction(image_path, document_type, validate, timeout):
+        yield f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
 
 
 # ==================== DEFINIÇÃO DO AGENTE ====================
@@ -412,7 +1000,30 @@ root_agent = Agent(
         "- validate_cnpj_number(cnpj): Valida CNPJ (verifica dígitos verificadores)\n\n"
 
         "**3. GERENCIAMENTO:**\n"
-        "- save_extraction(data, output_file): Salva resultados em JSON\n\n"
+        "- save_extraction(data, output_file): Salva resultados em JSON (.json), "
+        "ou anexa em JSONL (.jsonl/.jsonl.gz), SQLite (.db) ou CSV (diretório terminado em /)\n"
+        "- store_extraction(data): Armazena a extração no banco local consultável\n"
+        "- search_extractions(document_type, cpf, cnpj, numero_registro, nome, validade_de, validade_ate): "
+        "Busca extrações já armazenadas (ex: CNHs que vencem no próximo mês, documentos de um CPF)\n"
+        "- get_full_result(handle): Resultado completo de uma extração (resposta bruta, validações "
+        "detalhadas). As ferramentas de extração devolvem uma versão compacta com 'handle'; só peça o "
+        "completo se o usuário precisar dos detalhes. Para salvar/armazenar, passe o resultado compacto "
+        "(com 'handle') diretamente\n"
+        "- reextract_fields(handle, fields=None, crop=False): Quando uma validação falhar (CPF/CNH "
+        "inválido, data ilegível), relê SÓ esses campos em vez de extrair o documento de novo\n\n"
+
+        "**4. LOTES (vários itens em UMA chamada):**\n"
+        "- extract_documents(image_paths, document_type='auto', validate=True, output_file=None, store=False): "
+        "Extrai uma lista de imagens em paralelo e devolve um resumo\n"
+        "- extract_directory(directory, document_type='auto', validate=True, recursive=True, "
+        "output_file=None, store=False): Extrai todas as imagens de um diretório\n"
+        "- validate_cpfs(cpfs) / validate_cnpjs(cnpjs): Valida listas de números\n"
+        "- redrive_failures(categories=None, limit=100): Reprocessa documentos que falharam em lotes "
+        "anteriores (cada erro de lote traz 'failure': quota, timeout, parse, validation...). Use quando o "
+        "usuário pedir para tentar de novo as falhas; arquivo ausente e imagem ilegível não se resolvem "
+        "sozinhos\n"
+        "- Para mais de um documento ou número, SEMPRE use estas ferramentas em vez de chamar "
+        "as ferramentas individuais uma a uma\n\n"
 
         "📋 **WORKFLOW PARA IMAGENS NO CHAT:**\n\n"
         "Quando o usuário enviar uma imagem de documento:\n\n"
@@ -437,6 +1048,11 @@ root_agent = Agent(
         "   'processe a CNH cnh_joao.png' → extract_cnh('data/cnh_joao.png')\n"
         "   'extraia o CNPJ data/cartao_cnpj.jpg' → extract_cnpj_document('data/cartao_cnpj.jpg')\n\n"
 
+        "📂 LOTES:\n"
+        "   'processe todas as imagens de data/' → extract_directory('data')\n"
+        "   'extraia as CNHs a.jpg e b.jpg e salve em saida.jsonl' → "
+        "extract_documents(['a.jpg', 'b.jpg'], 'cnh', output_file='saida.jsonl')\n\n"
+
         "✅ VALIDAÇÃO:\n"
         "   'valide o CPF 123.456.789-09' → validate_cpf_number('123.456.789-09')\n"
         "   'valide o CNPJ 11.222.333/0001-81' → validate_cnpj_number('11.222.333/0001-81')\n\n"
@@ -446,6 +1062,8 @@ root_agent = Agent(
         "- SEMPRE valide CPF, CNH e CNPJ extraídos usando as ferramentas\n"
         "- Mostre dados extraídos E validações de forma clara\n"
         "- Se validação falhar, explique o erro\n"
+        "- Se a imagem for rejeitada pela verificação de qualidade (campo 'quality'), repasse os motivos "
+        "ao usuário e peça uma nova foto\n"
         "- Para CNH, verifique se está vencida\n"
         "- Seja preciso com formatação (CPF: XXX.XXX.XXX-XX, CNPJ: XX.XXX.XXX/XXXX-XX)\n\n"
 
@@ -483,8 +1101,17 @@ root_agent = Agent(
         extract_document_auto,
         list_images,
         save_extraction,
+        store_extraction,
+        search_extractions,
         validate_cpf_number,
         validate_cnh_number,
         validate_cnpj_number,
+        get_full_result,
+        reextract_fields,
+        extract_documents,
+        extract_directory,
+        validate_cpfs,
+        validate_cnpjs,
+        redrive_failures,
     ],
 )
@@ -0,0 +1,223 @@
+"""
+Gravação e reprodução das respostas do Gemini (cassetes) para execuções
+determinísticas e sem rede: cada resposta é guardada sob a chave
+(hash das imagens, hash do prompt, modelo) em um arquivo JSON Lines
+"""
+import hashlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from fake_backend import FakeResponse, FakeStreamResponse, FakeUsage, stream_chunks
+from streaming import chunk_text
+
+# "record" grava tudo (sobrescreve chaves repetidas), "replay" só reproduz,
+# "auto" reproduz o que existe e grava o que falta
+CASSETTE_MODES = ("record", "replay", "auto")
+# Latência na reprodução: a gravada ou nenhuma (mede só parsing, validação e E/S)
+REPLAY_LATENCIES = ("original", "zero")
+
+
+class CassetteMiss(KeyError):
+    """Chamada sem resposta gravada no modo replay"""
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def request_key(contents: List[Any], model_name: str) -> Dict[str, Any]:
+    """
+    Chave de uma chamada generate_content.
+
+    Args:
+        contents: Lista enviada ao modelo (prompts em texto e partes de imagem)
+        model_name: Nome do modelo
+
+    Returns:
+        Dict com "key" e os hashes que a compõem
+    """
+    prompts, images = [], []
+    for part in contents:
+        if isinstance(part, str):
+            prompts.append(part)
+        elif isinstance(part, dict) and "data" in part:
+            images.append(_digest(part["data"]))
+        else:
+            prompts.append(repr(part))
+
+    prompt_hash = _digest("\n".join(prompts).encode("utf-8"))
+    key = f"{model_name}:{prompt_hash}:{'+'.join(images)}"
+    return {"key": key, "model": model_name, "prompt_hash": prompt_hash, "image_hashes": images}
+
+
+class Cassette:
+    """Arquivo de respostas gravadas (JSON Lines, um registro por chamada)"""
+
+    def __init__(self, path: str):
+        """
+        Abre (ou cria na primeira gravação) um cassete.
+
+        Args:
+            path: Caminho do arquivo .jsonl
+        """
+        self.path = Path(path)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries[entry["key"]] = entry
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def put(self, entry: Dict[str, Any]) -> None:
+        """Grava uma resposta (anexa ao arquivo; a última gravação de uma chave prevalece)"""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.entries[entry["key"]] = entry
+            self.recorded += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "recorded": self.recorded
+        }
+
+
+class CassetteModel:
+    """Envolve um modelo (mesmo generate_content) gravando ou reproduzindo respostas"""
+
+    def __init__(
+        self,
+        model: Any,
+        cassette: Cassette,
+        model_name: str,
+        mode: str = "replay",
+        latency: str = "original"
+    ):
+        """
+        Inicializa o modelo gravado.
+
+        Args:
+            model: Modelo real (genai.GenerativeModel); pode ser None em "replay"
+            cassette: Cassete onde as respostas são gravadas/lidas
+            model_name: Nome do modelo (parte da chave)
+            mode: "record", "replay" ou "auto" (ver CASSETTE_MODES)
+            latency: "original" (espera a latência gravada) ou "zero"
+        """
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Modo inválido: {mode} (opções: {', '.join(CASSETTE_MODES)})")
+        if latency not in REPLAY_LATENCIES:
+            raise ValueError(f"Latência inválida: {latency} (opções: {', '.join(REPLAY_LATENCIES)})")
+        self.model = model
+        self.cassette = cassette
+        self.model_name = model_name
+        self.mode = mode
+        self.latency = latency
+
+    def generate_content(self, contents: Any, stream: bool = False, **kwargs) -> Any:
+        contents = contents if isinstance(contents, list) else [contents]
+        key = request_key(contents, self.model_name)
+
+        if self.mode != "record":
+            entry = self.cassette.get(key["key"])
+            if entry is not None:
+                latency = entry.get("latency", 0.0) if self.latency == "original" else 0.0
+                usage = entry.get("usage")
+                usage = FakeUsage(usage["prompt_tokens"], usage["output_tokens"]) if usage else None
+                if stream:
+                    # A latência gravada é a da resposta completa, distribuída entre os trechos
+                    return FakeStreamResponse(stream_chunks(entry["text"], latency), usage)
+                time.sleep(latency)
+                return FakeResponse(entry["text"], usage)
+            if self.mode == "replay":
+                raise CassetteMiss(f"Resposta não gravada: {key['key']}")
+
+        start = time.perf_counter()
+        if stream:
+            response = self.model.generate_content(contents, stream=True, **kwargs)
+            return FakeStreamResponse(self._record_stream(response, key, start))
+        response = self.model.generate_content(contents, **kwargs)
+        self._put(key, response, time.perf_counter() - start)
+        return response
+
+    def _record_stream(self, response: Any, key: Dict[str, Any], start: float) -> Iterator[str]:
+        """Repassa os trechos de uma resposta em streaming e grava o texto completo no final"""
+        parts = []
+        for chunk in response:
+            text = chunk_text(chunk)
+            parts.append(text)
+            yield text
+        self._put(key, FakeResponse("".join(parts), getattr(response, "usage_metadata", None)),
+                  time.perf_counter() - start)
+
+    def _put(self, key: Dict[str, Any], response: Any, latency: float) -> None:
+        usage = getattr(response, "usage_metadata", None)
+        self.cassette.put({
+            **key,
+            "text": response.text,
+            "latency": round(latency, 4),
+            "usage": {
+                "prompt_tokens": int(getattr(usage, "prompt_token_count", 0) or 0),
+                "output_tokens": int(getattr(usage, "candidates_token_count", 0) or 0)
+            } if usage is not None else None,
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        })
+
+
+def use_cassette(extractor: Any, path: str, mode: str = "replay", latency: str = "original") -> Cassette:
+    """
+    Passa todas as chamadas de um DocumentExtractor por um cassete.
+
+    Envolve o modelo principal e, se houver cascata, os modelos de cada nível.
+
+    Args:
+        extractor: DocumentExtractor
+        path: Arquivo do cassete (.jsonl)
+        mode: "record", "replay" ou "auto"
+        latency: "original" ou "zero" (só na reprodução)
+
+    Returns:
+        O cassete (ver Cassette.stats)
+    """
+    cassette = Cassette(path)
+    extractor.model = CassetteModel(extractor.model, cassette, extractor.model_name, mode, latency)
+
+    cascade = getattr(extractor, "cascade", None)
+    if cascade is not None:
+        factory = cascade.model_factory
+        cascade.models.clear()
+
+        def wrapped(name: str) -> Any:
+            real = None
+            if mode != "replay":
+                if factory is not None:
+                    real = factory(name)
+                else:
+                    from client_pool import get_client_pool
+                    real = get_client_pool().model(name)
+            return CassetteModel(real, cassette, name, mode, latency)
+
+        cascade.model_factory = wrapped
+    return cassette
@@ -0,0 +1,369 @@
+"""
+Clientes do Gemini compartilhados por processo: um modelo por nome, reusado
+por todas as threads (o SDK mantém um único canal gRPC com conexões
+keep-alive por processo), aquecimento opcional na inicialização e
+reconfiguração depois de um fork, já que canais gRPC não sobrevivem a ele.
+Com várias chaves da API (ver key_pool), cada chamada usa o cliente da
+chave escolhida pelo KeyPool
+"""
+import os
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from key_pool import ApiKey, KeyPool, key_error_kind
+
+# Texto enviado no aquecimento: count_tokens abre o canal (TLS, autenticação)
+# sem gerar conteúdo nem consumir a cota de requisições de geração
+WARMUP_TEXT = "ok"
+
+# Versões do google-generativeai em que o cliente por chave (_client_for, que
+# usa internos do SDK) foi verificado; nas demais vale o caminho público
+KEYED_CLIENT_VERSIONS = ("0.7.", "0.8.")
+
+# genai.configure vale para o processo inteiro: o caminho público reconfigura sob este lock
+_configure_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def keyed_clients_supported() -> bool:
+    """True se o SDK instalado permite um cliente próprio por chave (ver KEYED_CLIENT_VERSIONS)"""
+    try:
+        from importlib.metadata import version
+        from google.generativeai import client as genai_client
+        import google.generativeai as genai
+        sdk_version = version("google-generativeai")
+    except Exception:
+        return False
+    return (
+        sdk_version.startswith(KEYED_CLIENT_VERSIONS)
+        and hasattr(genai_client, "_ClientManager")
+        and hasattr(genai.GenerativeModel(), "_client")
+    )
+
+
+class ConfiguredModel:
+    """
+    Modelo de uma chave pelo caminho público do SDK (genai.configure +
+    GenerativeModel), para versões sem cliente por chave. Cada chamada
+    reconfigura o SDK sob um lock do processo: correto, mas as chamadas
+    ficam em série e sem reuso de conexão
+    """
+
+    def __init__(self, name: str, options: Dict[str, Any]):
+        self.model_name = name
+        self._options = options
+
+    def _call(self, method: str, contents: Any, **kwargs: Any) -> Any:
+        import google.generativeai as genai
+        with _configure_lock:
+            genai.configure(**self._options)
+            return getattr(genai.GenerativeModel(self.model_name), method)(contents, **kwargs)
+
+    def generate_content(self, contents: Any, **kwargs: Any) -> Any:
+        return self._call("generate_content", contents, **kwargs)
+
+    def count_tokens(self, contents: Any, **kwargs: Any) -> Any:
+        return self._call("count_tokens", contents, **kwargs)
+
+
+class PooledModel:
+    """Envolve um modelo do pool (mesmo generate_content) medindo reuso e latência"""
+
+    def __init__(self, model: Any, name: str, pool: "ClientPool"):
+        self.model = model
+        self.model_name = name
+        self._pool = pool
+        # Com KeyPool: um modelo por chave (criado no primeiro uso da chave)
+        self._keyed: Dict[str, Any] = {}
+
+    def _target(self) -> "PooledModel":
+        """Este modelo ou, em um processo filho criado por fork, o do pool do filho"""
+        if self._pool.pid == os.getpid():
+            return self
+        return get_client_pool().model(self.model_name)
+
+    def _for_key(self, key: ApiKey) -> Any:
+        model = self._keyed.get(key.key)
+        if model is None:
+            with self._pool._lock:
+                model = self._keyed.get(key.key)
+                if model is None:
+                    model = self._keyed[key.key] = self._pool._create(self.model_name, key.key)
+                    self._pool.clients_created += 1
+        return model
+
+    def generate_content(self, contents: Any, **kwargs) -> Any:
+        target = self._target()
+        key_pool = target._pool.key_pool
+        if key_pool is None:
+            start = time.perf_counter()
+            try:
+                return target.model.generate_content(contents, **kwargs)
+            finally:
+                target._pool._record(time.perf_counter() - start)
+
+        # Chave recusada ou sem cota: a mesma chamada vai para a próxima chave saudável
+        for attempt in range(len(key_pool.keys)):
+            key = key_pool.acquire()
+            start = time.perf_counter()
+            try:
+                response = target._for_key(key).generate_content(contents, **kwargs)
+            except Exception as e:
+                key_pool.release(key, error=e)
+                kind = key_error_kind(e)
+                if attempt < len(key_pool.keys) - 1 and kind is not None and (
+                    kind == "auth" or key_pool.has_healthy()
+                ):
+                    continue
+                raise
+            finally:
+                target._pool._record(time.perf_counter() - start)
+            key_pool.release(key, response)
+            return response
+
+    def count_tokens(self, contents: Any, **kwargs) -> Any:
+        target = self._target()
+        if target._pool.key_pool is None:
+            return target.model.count_tokens(contents, **kwargs)
+        return target._for_key(target._pool.key_pool.choose()).count_tokens(contents, **kwargs)
+
+    def warm_up(self) -> None:
+        """Abre a conexão deste modelo (de cada chave, com KeyPool)"""
+        key_pool = self._pool.key_pool
+        if key_pool is None:
+            self.model.count_tokens(WARMUP_TEXT)
+            return
+        for key in key_pool.keys:
+            self._for_key(key).count_tokens(WARMUP_TEXT)
+
+
+class ClientPool:
+    """Modelos do Gemini compartilhados entre threads de um processo"""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        transport: Optional[str] = None,
+        model_factory: Optional[Callable[..., Any]] = None,
+        key_pool: Optional[KeyPool] = None
+    ):
+        """
+        Inicializa o pool.
+
+        Args:
+            api_key: Chave da API (padrão: GOOGLE_API_KEY do ambiente)
+            transport: "grpc" (padrão do SDK) ou "rest"
+            model_factory: Cria o modelo a partir do nome (padrão:
+                genai.GenerativeModel); ex: FakeGeminiModel nos benchmarks.
+                Com key_pool, recebe também a chave: model_factory(nome, chave)
+            key_pool: Chaves da API entre as quais as chamadas são
+                distribuídas (padrão: KeyPool.from_env() se nem api_key nem
+                model_factory forem informados; None = uma chave só)
+        """
+        self.api_key = api_key
+        self.transport = transport
+        self.model_factory = model_factory
+        if key_pool is None and not api_key and model_factory is None:
+            key_pool = KeyPool.from_env()
+        self.key_pool = key_pool
+        self.pid = os.getpid()
+        self.models: Dict[str, PooledModel] = {}
+        self._clients: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+        self.clients_created = 0
+        self.requests = 0
+        self.first_request_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self.warmed: Dict[str, bool] = {}
+        self._seconds = 0.0
+        self._recent: deque = deque(maxlen=1000)
+        self._warmup_thread: Optional[threading.Thread] = None
+
+        if model_factory is None:
+            self._configure()
+            if key_pool is not None and not keyed_clients_supported():
+                from event_log import log_event
+                log_event(
+                    "client.keyed_fallback",
+                    "SDK do Gemini sem cliente por chave: as chamadas das {keys} chaves serão feitas em série",
+                    "WARNING", keys=len(key_pool.keys)
+                )
+
+    def _options(self, api_key: Optional[str]) -> Dict[str, Any]:
+        """Argumentos de genai.configure para uma chave"""
+        options: Dict[str, Any] = {"api_key": api_key}
+        if self.transport:
+            options["transport"] = self.transport
+        return options
+
+    def _configure(self) -> None:
+        """(Re)cria a configuração do SDK neste processo, descartando canais herdados"""
+        import google.generativeai as genai
+        api_key = self.api_key or os.getenv("GOOGLE_API_KEY")
+        if not api_key and self.key_pool is not None:
+            api_key = self.key_pool.keys[0].key
+        with _configure_lock:
+            genai.configure(**self._options(api_key))
+
+    def _create(self, name: str, api_key: Optional[str] = None) -> Any:
+        """
+        Modelo novo; com api_key, ligado a um cliente próprio daquela chave
+        (ou, em versões do SDK não verificadas, um ConfiguredModel)
+        """
+        if self.model_factory is not None:
+            return self.model_factory(name) if api_key is None else self.model_factory(name, api_key)
+        if api_key is not None and not keyed_clients_supported():
+            return ConfiguredModel(name, self._options(api_key))
+        import google.generativeai as genai
+        model = genai.GenerativeModel(name)
+        if api_key is not None:
+            model._client = self._client_for(api_key)
+        return model
+
+    def _client_for(self, api_key: str) -> Any:
+        """
+        Cliente do SDK de uma chave.
+
+        genai.configure vale para o processo inteiro; um _ClientManager por
+        chave dá a cada uma o seu canal, e o GenerativeModel usa o cliente
+        atribuído em _client no lugar do padrão. Ambos são internos do SDK:
+        só usados nas versões de KEYED_CLIENT_VERSIONS (ver keyed_clients_supported).
+        """
+        client = self._clients.get(api_key)
+        if client is None:
+            from google.generativeai import client as genai_client
+            manager = genai_client._ClientManager()
+            manager.configure(**self._options(api_key))
+            client = self._clients[api_key] = manager.get_default_client("generative")
+        return client
+
+    def model(self, name: str) -> PooledModel:
+        """Modelo compartilhado (criado na primeira utilização)"""
+        with self._lock:
+            pooled = self.models.get(name)
+            if pooled is None:
+                # Com KeyPool os modelos são criados por chave, no primeiro uso de cada uma
+                model = self._create(name) if self.key_pool is None else None
+                pooled = self.models[name] = PooledModel(model, name, self)
+                self.clients_created += model is not None
+            return pooled
+
+    def _record(self, seconds: float) -> None:
+        with self._lock:
+            self.requests += 1
+            if self.first_request_seconds is None:
+                self.first_request_seconds = seconds
+            else:
+                self._seconds += seconds
+                self._recent.append(seconds)
+
+    def warm_up(self, names: Iterable[str], background: bool = False) -> None:
+        """
+        Abre as conexões antes da primeira extração.
+
+        Args:
+            names: Modelos a aquecer
+            background: Se True, aquece em uma thread e retorna na hora
+                (as primeiras chamadas reais esperam só o que faltar)
+        """
+        names = list(dict.fromkeys(names))
+
+        def run() -> None:
+            start = time.perf_counter()
+            for name in names:
+                try:
+                    self.model(name).warm_up()
+                    self.warmed[name] = True
+                except Exception as e:
+                    # Sem rede ou sem chave: a primeira extração paga a conexão
+                    self.warmed[name] = False
+                    from event_log import log_event
+                    log_event("client.warmup_error", "Falha no aquecimento de {model}: {error}",
+                              level="WARNING", model=name, error=str(e))
+            self.warmup_seconds = time.perf_counter() - start
+
+        if background:
+            self._warmup_thread = threading.Thread(target=run, name="client-warmup", daemon=True)
+            self._warmup_thread.start()
+        else:
+            run()
+
+    def wait_warm(self, timeout: Optional[float] = None) -> None:
+        """Espera o aquecimento em segundo plano terminar"""
+        if self._warmup_thread is not None:
+            self._warmup_thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Clientes criados, requisições que reusaram a conexão e latência da primeira x seguintes"""
+        with self._lock:
+            # Sem aquecimento, a primeira requisição é a que abre a conexão
+            opened = 0 if any(self.warmed.values()) or self.first_request_seconds is None else 1
+            reused = self.requests - opened
+            recent = sorted(self._recent)
+            return {
+                "pid": self.pid,
+                "models": list(self.models),
+                "clients_created": self.clients_created,
+                "requests": self.requests,
+                "reused": reused,
+                "reuse_rate": round(reused / self.requests, 3) if self.requests else None,
+                "warmed": dict(self.warmed),
+                "warmup_seconds": round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None,
+                "first_request_seconds": (
+                    round(self.first_request_seconds, 3) if self.first_request_seconds is not None else None
+                ),
+                "avg_seconds": round(self._seconds / (self.requests - 1), 3) if self.requests > 1 else None,
+                "p95_seconds": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 3) if recent else None,
+                "keys": self.key_pool.stats() if self.key_pool is not None else None
+            }
+
+
+# Um pool por processo: depois de um fork o filho cria o seu
+_pool: Optional[ClientPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_client_pool(**kwargs: Any) -> ClientPool:
+    """
+    Pool do processo atual (criado na primeira chamada ou depois de um fork).
+
+    Args:
+        **kwargs: Argumentos de ClientPool, usados só na primeira criação
+
+    Returns:
+        ClientPool compartilhado por todas as threads do processo
+    """
+    global _pool
+    pool = _pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ClientPool(**kwargs)
+        elif _pool.pid != os.getpid():
+            # Filho de um fork: mesma configuração, conexões novas
+            _pool = ClientPool(
+                _pool.api_key, _pool.transport, _pool.model_factory,
+                _pool.key_pool.clone() if _pool.key_pool is not None else None
+            )
+        return _pool
+
+
+def init_worker(warm_models: Iterable[str] = (), **kwargs: Any) -> None:
+    """
+    Inicializador de ProcessPoolExecutor: cria o pool do processo filho e,
+    se pedido, aquece os modelos antes da primeira tarefa.
+
+    Args:
+        warm_models: Modelos a aquecer no processo
+        **kwargs: Argumentos de ClientPool
+    """
+    global _pool
+    with _pool_lock:
+        _pool = ClientPool(**kwargs)
+    if warm_models:
+        _pool.warm_up(warm_models)
@@ -0,0 +1,202 @@
+"""
+Motor de datas: reconhece os formatos que chegam da extração
+(DD/MM/AAAA, DD-MM-AAAA, DD.MM.AAAA, DD/MM/AA, DD-MM-AA, DD.MM.AA, dia e
+mês com um ou dois dígitos, e ISO)
+com um parser manual e cache, e valida colunas de datas em lote
+"""
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+# Anos com 2 dígitos acima do pivô pertencem ao século passado (ex: "15/05/90" -> 1990)
+CENTURY_PIVOT = (date.today().year + 10) % 100
+
+DAY_FIRST_SEPARATORS = "/-."
+
+
+@lru_cache(maxsize=65536)
+def parse_date(text: str) -> Optional[date]:
+    """
+    Converte uma data textual em date, sem strptime.
+
+    Args:
+        text: Data em DD/MM/AAAA, DD-MM-AAAA, DD.MM.AAAA, DD/MM/AA (e variantes
+            com - e .; dia e mês com 1 ou 2 dígitos, ex: 5/3/2020) ou
+            AAAA-MM-DD (opcionalmente seguida de hora)
+
+    Returns:
+        date, ou None se o texto não for uma data válida
+    """
+    s = text.strip()
+    n = len(s)
+
+    try:
+        if n >= 10 and s[4] == "-" and s[7] == "-" and (n == 10 or s[10] in "T "):
+            # ISO: AAAA-MM-DD[THH:MM:SS]
+            year, month, day = s[0:4], s[5:7], s[8:10]
+        elif 6 <= n <= 10 and (s[1] in DAY_FIRST_SEPARATORS or s[2] in DAY_FIRST_SEPARATORS):
+            # D?M?AAAA até DD?MM?AAAA (ou ano com 2 dígitos), com o mesmo separador
+            parts = s.split(s[1] if s[1] in DAY_FIRST_SEPARATORS else s[2])
+            if len(parts) != 3:
+                return None
+            day, month, year = parts
+            if not (len(day) <= 2 and len(month) <= 2 and len(year) in (2, 4)):
+                return None
+        else:
+            return None
+
+        if not (day.isdigit() and month.isdigit() and year.isdigit()):
+            return None
+
+        y = int(year)
+        if len(year) == 2:
+            y += 1900 if y > CENTURY_PIVOT else 2000
+
+        return date(y, int(month), int(day))
+    except (ValueError, IndexError):
+        return None
+
+
+class DateEngine:
+    """Valida datas contra uma única data de referência ("hoje") por lote"""
+
+    def __init__(self, today: Optional[date] = None):
+        """
+        Inicializa o motor.
+
+        Args:
+            today: Data de referência (padrão: date.today() no momento da criação)
+        """
+        self.today = today or date.today()
+
+    def validate(self, date_str: Optional[str]) -> Dict[str, Any]:
+        """
+        Valida uma data (mesmo formato de DocumentValidator.validate_date).
+
+        Args:
+            date_str: Data em qualquer formato suportado
+
+        Returns:
+            Dict com status e data normalizada (AAAA-MM-DD)
+        """
+        if not date_str:
+            return {
+                "valid": False,
+                "error": "Data não fornecida",
+                "date": None
+            }
+
+        parsed = parse_date(date_str) if isinstance(date_str, str) else None
+        if parsed is None:
+            return {
+                "valid": False,
+                "error": "Data inválida ou formato incorreto. Esperado: DD/MM/AAAA, DD-MM-AA, DD.MM.AAAA ou AAAA-MM-DD",
+                "date": date_str
+            }
+
+        today = self.today
+        return {
+            "valid": True,
+            "date": parsed.isoformat(),
+            "formatted": date_str,
+            "is_future": parsed > today,
+            "age_years": (today - parsed).days // 365 if parsed < today else 0
+        }
+
+    def validate_expiration(self, emissao: Optional[str], validade: Optional[str]) -> Dict[str, Any]:
+        """
+        Valida se a validade é coerente com a emissão (cada data é lida uma vez).
+
+        Args:
+            emissao: Data de emissão
+            validade: Data de validade
+
+        Returns:
+            Dict com análise das datas (mesmo formato de validate_cnh_expiration)
+        """
+        emissao_result = self.validate(emissao)
+        validade_result = self.validate(validade)
+
+        if not emissao_result["valid"] or not validade_result["valid"]:
+            return {
+                "valid": False,
+                "error": "Datas inválidas",
+                "emissao": emissao_result,
+                "validade": validade_result
+            }
+
+        emissao_date = parse_date(emissao)
+        validade_date = parse_date(validade)
+
+        if validade_date <= emissao_date:
+            return {
+                "valid": False,
+                "error": "Data de validade deve ser posterior à emissão",
+                "emissao": emissao_result,
+                "validade": validade_result
+            }
+
+        dias_para_vencer = (validade_date - self.today).days
+
+        return {
+            "valid": True,
+            "emissao": emissao_result,
+            "validade": validade_result,
+            "status": "vencida" if dias_para_vencer < 0 else "válida",
+            "dias_para_vencer": dias_para_vencer if dias_para_vencer > 0 else 0,
+            "vencida": dias_para_vencer < 0
+        }
+
+    def validate_column(self, values: Iterable[Optional[str]]) -> List[Dict[str, Any]]:
+        """
+        Valida uma coluna de datas (ex: data_validade de todos os registros).
+
+        Args:
+            values: Datas textuais
+
+        Returns:
+            Lista de resultados, na mesma ordem
+        """
+        cache: Dict[Any, Dict[str, Any]] = {}
+        results = []
+        for value in values:
+            result = cache.get(value)
+            if result is None:
+                result = cache[value] = self.validate(value)
+            results.append(dict(result))
+        return results
+
+    def validate_records(
+        self,
+        records: Sequence[Dict[str, Any]],
+        fields: Sequence[str]
+    ) -> Dict[str, List[Optional[Dict[str, Any]]]]:
+        """
+        Valida várias colunas de datas em muitos registros.
+
+        Args:
+            records: Dicts de dados extraídos (result["data"])
+            fields: Campos de data a validar
+
+        Returns:
+            Dict campo -> lista de resultados (None onde o campo está ausente)
+        """
+        columns = {}
+        for field in fields:
+            present = [(i, r.get(field)) for i, r in enumerate(records) if r.get(field)]
+            column: List[Optional[Dict[str, Any]]] = [None] * len(records)
+            for (i, _), result in zip(present, self.validate_column(v for _, v in present)):
+                column[i] = result
+            columns[field] = column
+        return columns
+
+
+def validate_dates_bulk(args_list: List[tuple]) -> List[Dict[str, Any]]:
+    """Validador em lote para regras de data (validation_rules)"""
+    return DateEngine().validate_column(args[0] for args in args_list)
+
+
+def validate_expirations_bulk(args_list: List[tuple]) -> List[Dict[str, Any]]:
+    """Validador em lote para regras de emissão/validade (validation_rules)"""
+    engine = DateEngine()
+    return [engine.validate_expiration(emissao, validade) for emissao, validade in args_list]
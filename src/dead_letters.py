@@ -0,0 +1,383 @@
+"""
+Fila de falhas (dead letters) persistente: cada documento que falhou é
+guardado em SQLite com uma categoria (arquivo ausente, imagem ilegível,
+qualidade, cota, timeout, resposta sem JSON, validação) e pode ser
+reprocessado depois, só nas categorias escolhidas, com concorrência e cota
+próprias, sem repetir o lote inteiro
+"""
+import copy
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from event_log import log_event
+from rate_control import AdaptiveLimiter, RateController, is_throttle_error
+from scheduler import request_context
+
+# Categorias de falha, na ordem em que aparecem no resumo
+FAILURE_CATEGORIES = (
+    "missing_file",      # arquivo não existe
+    "unreadable_image",  # não foi possível decodificar a imagem/página
+    "quality",           # recusada pela verificação local de qualidade
+    "quota",             # 429 / RESOURCE_EXHAUSTED depois das novas tentativas
+    "timeout",           # prazo da chamada esgotado
+    "parse",             # resposta do modelo sem JSON válido
+    "validation",        # dados extraídos falharam nas validações
+    "error",             # outros erros
+)
+
+# Falhas passageiras: o padrão do reprocessamento
+TRANSIENT_CATEGORIES = ("quota", "timeout", "error")
+
+# Um documento que falhou tantas vezes não é mais reprocessado automaticamente
+MAX_ATTEMPTS = 5
+
+# Falhas de validação costumam ser do próprio documento (ex: número impresso
+# errado) e não somem relendo: limite próprio, menor que MAX_ATTEMPTS
+MAX_VALIDATION_ATTEMPTS = 2
+
+
+def failure_category(error: BaseException) -> str:
+    """
+    Categoria de uma exceção da chamada ao modelo.
+
+    Args:
+        error: Exceção capturada
+
+    Returns:
+        "quota", "timeout" ou "error"
+    """
+    if is_throttle_error(error):
+        return "quota"
+    text = str(error).lower()
+    if (
+        isinstance(error, TimeoutError)
+        or type(error).__name__ in ("DeadlineExceeded", "Timeout", "ReadTimeout")
+        or getattr(error, "code", None) == 504
+        or "deadline" in text or "timed out" in text or "timeout" in text
+    ):
+        return "timeout"
+    return "error"
+
+
+def classify_failure(result: Dict[str, Any]) -> Optional[str]:
+    """
+    Categoria de falha de um resultado de extração, ou None se ele está ok.
+
+    Args:
+        result: Resultado de extract_from_image (validado ou não)
+
+    Returns:
+        Uma de FAILURE_CATEGORIES, ou None
+    """
+    if result.get("status") != "success":
+        failure = result.get("failure")
+        if failure in FAILURE_CATEGORIES:
+            return failure
+        # Resultados gravados antes das categorias: só a mensagem
+        message = str(result.get("message", ""))
+        if message.startswith("Arquivo não encontrado"):
+            return "missing_file"
+        if message.startswith(("Erro ao preparar", "Imagem não preparada")):
+            return "unreadable_image"
+        if message.startswith("Imagem inadequada"):
+            return "quality"
+        return failure_category(Exception(message))
+
+    data = result.get("data")
+    if not isinstance(data, dict) or "raw_text" in data:
+        return "parse"
+    if any(
+        isinstance(outcome, dict) and not outcome.get("valid", True)
+        for outcome in (result.get("validations") or {}).values()
+    ):
+        return "validation"
+    return None
+
+
+class DeadLetterStore:
+    """Banco SQLite das falhas, um registro por imagem"""
+
+    def __init__(self, path: str):
+        """
+        Abre (ou cria) o banco de falhas.
+
+        Args:
+            path: Caminho do arquivo .db
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.Lock()
+        self._create_schema()
+
+    # ==================== ESQUEMA ====================
+
+    def _create_schema(self) -> None:
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS dead_letters (
+                    image_path TEXT PRIMARY KEY,
+                    document_type TEXT,
+                    category TEXT NOT NULL,
+                    message TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 1,
+                    result TEXT,
+                    first_failed_at TEXT,
+                    last_failed_at TEXT,
+                    resolved_at TEXT
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_dead_letters_pending "
+                "ON dead_letters (category) WHERE resolved_at IS NULL"
+            )
+
+    # ==================== ESCRITA ====================
+
+    def record(self, results: Iterable[Dict[str, Any]]) -> int:
+        """
+        Guarda as falhas de um bloco de resultados (os bem-sucedidos são ignorados).
+
+        Uma imagem que já estava na fila tem as tentativas incrementadas e a
+        categoria atualizada.
+
+        Args:
+            results: Resultados de extração (já validados, para a categoria "validation")
+
+        Returns:
+            Quantidade de falhas gravadas
+        """
+        now = datetime.now().isoformat(timespec="seconds")
+        rows = []
+        for result in results:
+            category = classify_failure(result)
+            if category is None:
+                continue
+            stored = {k: v for k, v in result.items() if k != "raw_response"}
+            rows.append((
+                result.get("image_path"), result.get("document_type"), category,
+                result.get("message"), json.dumps(stored, ensure_ascii=False, default=str), now, now
+            ))
+        if not rows:
+            return 0
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO dead_letters (image_path, document_type, category, message, result, "
+                "first_failed_at, last_failed_at) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (image_path) DO UPDATE SET "
+                "category = excluded.category, message = excluded.message, result = excluded.result, "
+                "last_failed_at = excluded.last_failed_at, resolved_at = NULL, "
+                "attempts = dead_letters.attempts + 1, "
+                "document_type = COALESCE(excluded.document_type, dead_letters.document_type)",
+                rows
+            )
+        return len(rows)
+
+    def resolve(self, image_paths: Iterable[str]) -> None:
+        """Marca imagens como resolvidas (reprocessadas com sucesso)"""
+        now = datetime.now().isoformat(timespec="seconds")
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE dead_letters SET resolved_at = ? WHERE image_path = ?",
+                [(now, path) for path in image_paths]
+            )
+
+    # ==================== CONSULTA ====================
+
+    def pending(
+        self,
+        categories: Optional[Iterable[str]] = None,
+        limit: Optional[int] = None,
+        max_attempts: Optional[int] = MAX_ATTEMPTS
+    ) -> List[Dict[str, Any]]:
+        """
+        Falhas ainda não resolvidas, das mais antigas para as mais recentes.
+
+        Args:
+            categories: Categorias a listar (padrão: todas)
+            limit: Máximo de registros
+            max_attempts: Ignora imagens que já falharam este número de vezes
+
+        Returns:
+            Lista de dicts com image_path, document_type, category, message,
+            attempts, datas e o resultado guardado em "result"
+        """
+        sql = "SELECT * FROM dead_letters WHERE resolved_at IS NULL"
+        params: List[Any] = []
+        if categories:
+            categories = list(categories)
+            sql += f" AND category IN ({', '.join('?' for _ in categories)})"
+            params.extend(categories)
+        if max_attempts:
+            sql += " AND attempts < ?"
+            params.append(max_attempts)
+        sql += " ORDER BY first_failed_at"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        entries = []
+        for row in rows:
+            entry = dict(row)
+            entry["result"] = json.loads(entry["result"]) if entry["result"] else None
+            entries.append(entry)
+        return entries
+
+    def counts(self) -> Dict[str, Any]:
+        """Falhas pendentes por categoria e total de resolvidas"""
+        with self._lock:
+            pending = dict(self._conn.execute(
+                "SELECT category, COUNT(*) FROM dead_letters WHERE resolved_at IS NULL GROUP BY category"
+            ).fetchall())
+            resolved = self._conn.execute(
+                "SELECT COUNT(*) FROM dead_letters WHERE resolved_at IS NOT NULL"
+            ).fetchone()[0]
+        return {
+            "pending": {category: pending[category] for category in FAILURE_CATEGORIES if category in pending},
+            "pending_total": sum(pending.values()),
+            "resolved": resolved
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "DeadLetterStore":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def redrive(
+    store: DeadLetterStore,
+    extractor: Any,
+    categories: Optional[Iterable[str]] = TRANSIENT_CATEGORIES,
+    workers: int = 4,
+    rpm: Optional[float] = None,
+    tpm: Optional[float] = None,
+    validate: bool = True,
+    limit: Optional[int] = None,
+    max_attempts: Optional[int] = MAX_ATTEMPTS,
+    sink: Any = None,
+    max_validation_attempts: Optional[int] = MAX_VALIDATION_ATTEMPTS,
+    scheduler: Any = None
+) -> Dict[str, Any]:
+    """
+    Reprocessa as falhas pendentes das categorias escolhidas.
+
+    Usa uma cópia do extrator com controle de vazão próprio (workers, rpm,
+    tpm), para o reprocessamento não disputar a cota do lote principal além
+    do permitido. O escalonador do extrator, se houver, continua
+    compartilhado de propósito: as chamadas entram como "bulk" do tenant
+    "redrive", atrás das interativas e na fila justa com os outros lotes.
+    Falhas de validação só releem os campos inválidos (ver
+    DocumentExtractor.reextract_fields), com limite de tentativas próprio;
+    as demais repetem a extração.
+
+    Args:
+        store: Fila de falhas
+        extractor: DocumentExtractor
+        categories: Categorias a reprocessar (None = todas; padrão: TRANSIENT_CATEGORIES)
+        workers: Documentos reprocessados ao mesmo tempo
+        rpm: Requisições por minuto do reprocessamento (None = sem limite)
+        tpm: Tokens por minuto do reprocessamento (None = sem limite)
+        validate: Se True, valida os resultados (falhas de validação voltam à fila)
+        limit: Máximo de documentos nesta rodada
+        max_attempts: Ignora imagens que já falharam este número de vezes
+        sink: Destino opcional dos resultados que passaram a dar certo
+        max_validation_attempts: Como max_attempts, para a categoria "validation"
+        scheduler: Escalonador próprio do reprocessamento (padrão: o do extrator)
+
+    Returns:
+        Dict com reprocessados, resolvidos, falhas restantes por categoria e vazão
+    """
+    from validation_rules import ValidationEngine
+
+    categories = list(categories) if categories else None
+    unknown = [c for c in categories or [] if c not in FAILURE_CATEGORIES]
+    if unknown:
+        raise ValueError(f"Categoria inválida: {', '.join(unknown)} (opções: {', '.join(FAILURE_CATEGORIES)})")
+
+    selected = categories or list(FAILURE_CATEGORIES)
+    others = [c for c in selected if c != "validation"]
+    entries = store.pending(others, limit, max_attempts) if others else []
+    if "validation" in selected and (not limit or len(entries) < limit):
+        entries += store.pending(
+            ["validation"], limit - len(entries) if limit else None,
+            min(filter(None, (max_attempts, max_validation_attempts)), default=None)
+        )
+    controller = RateController(AdaptiveLimiter(max_limit=max(1, workers)), rpm=rpm, tpm=tpm)
+    worker_extractor = copy.copy(extractor)
+    worker_extractor.rate_controller = controller
+    if scheduler is not None:
+        worker_extractor.scheduler = scheduler
+    engine = ValidationEngine() if validate else None
+
+    def run(entry: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            with request_context("bulk", "redrive"):
+                previous = entry.get("result") or {}
+                if entry["category"] == "validation" and previous.get("status") == "success":
+                    return worker_extractor.reextract_fields(previous, engine=engine)
+                result = worker_extractor.extract_from_image(entry["image_path"], entry["document_type"] or "auto")
+                if engine is not None:
+                    engine.validate_batch([result])
+                return result
+        except Exception as e:
+            # Uma falha não pode interromper a rodada: vira o resultado do documento e volta à fila
+            log_event(
+                "deadletter.error", "Erro ao reprocessar {image_path}: {error}", "ERROR",
+                image_path=entry["image_path"], error=str(e)
+            )
+            return {
+                "status": "error",
+                "message": f"Erro ao reprocessar documento: {e}",
+                "image_path": entry["image_path"],
+                "document_type": entry["document_type"],
+                "failure": failure_category(e)
+            }
+
+    log_event("deadletter.redrive", "Reprocessando {count} falhas ({categories})",
+              count=len(entries), categories=",".join(categories or FAILURE_CATEGORIES))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(run, entries))
+    elapsed = time.perf_counter() - start
+
+    resolved = [r for r in results if classify_failure(r) is None]
+    failed = [r for r in results if classify_failure(r) is not None]
+    store.resolve(r["image_path"] for r in resolved)
+    store.record(failed)
+    if sink is not None and resolved:
+        sink.write_many(resolved)
+        sink.flush()
+
+    still_failing: Dict[str, int] = {}
+    for result in failed:
+        category = classify_failure(result)
+        still_failing[category] = still_failing.get(category, 0) + 1
+
+    return {
+        "status": "completed",
+        "categories": categories or list(FAILURE_CATEGORIES),
+        "redriven": len(results),
+        "resolved": len(resolved),
+        "still_failing": still_failing,
+        "seconds": round(elapsed, 3),
+        "items_per_second": round(len(results) / elapsed, 2) if elapsed > 0 else None,
+        "rate": controller.stats(),
+        "queue": store.counts()
+    }
@@ -0,0 +1,220 @@
+"""
+Prazos por requisição: o prazo de uma ferramenta do agente, de um lote ou
+do SLO do tipo de documento é propagado (contextvars) até a chamada ao
+Gemini. As esperas na fila, no orçamento RPM/TPM e entre novas tentativas
+respeitam o prazo, a chamada recebe o tempo restante como timeout e quem
+desiste pode cancelar a extração em andamento
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+# Orçamento padrão (segundos) de uma extração por tipo de documento,
+# da preparação da imagem até a resposta validada
+SLO_BUDGETS: Dict[str, float] = {
+    "rg": 30.0,
+    "cnh": 30.0,
+    "cpf": 20.0,
+    "cnpj": 45.0,
+    "auto": 40.0,
+}
+
+# Limite de uma chamada ao modelo sem prazo definido: uma conexão travada
+# não segura um worker do lote para sempre
+REQUEST_TIMEOUT = 120.0
+
+# Etapas em que o prazo pode esgotar, na ordem do caminho da extração
+DEADLINE_STAGES = ("prepare", "queue", "request", "retry", "cascade")
+
+
+def parse_budgets(spec: str) -> Dict[str, float]:
+    """
+    Converte "cnh=20,rg=25" em {"cnh": 20.0, "rg": 25.0}.
+
+    Args:
+        spec: Pares tipo=segundos separados por vírgula
+
+    Returns:
+        Dict de orçamentos (vazio se spec for vazio)
+    """
+    budgets = {}
+    for item in (part.strip() for part in (spec or "").split(",")):
+        if not item:
+            continue
+        doc_type, _, seconds = item.partition("=")
+        try:
+            budgets[doc_type.strip().lower()] = float(seconds)
+        except ValueError:
+            raise ValueError(f"Orçamento inválido: {item} (formato: tipo=segundos)")
+    return budgets
+
+
+class Deadline:
+    """Prazo de uma extração (ou de um lote), com cancelamento cooperativo"""
+
+    def __init__(self, seconds: Optional[float] = None, parent: Optional["Deadline"] = None):
+        """
+        Inicializa o prazo.
+
+        Args:
+            seconds: Orçamento em segundos (None = sem limite próprio)
+            parent: Prazo de quem chamou; vale o que vencer primeiro e o
+                cancelamento do pai cancela este também
+        """
+        self.budget = seconds
+        self.parent = parent
+        self.started = time.monotonic()
+        expires = self.started + seconds if seconds is not None else None
+        if parent is not None and parent.expires_at is not None:
+            expires = parent.expires_at if expires is None else min(expires, parent.expires_at)
+        self.expires_at = expires
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        """Quem chamou desistiu: as próximas verificações encerram a extração"""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set() or (self.parent is not None and self.parent.cancelled)
+
+    def remaining(self) -> Optional[float]:
+        """Segundos restantes (None = sem limite)"""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    @property
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return self.cancelled or (remaining is not None and remaining <= 0)
+
+    def check(self, stage: str) -> None:
+        """Lança DeadlineExceeded se o prazo esgotou ou foi cancelado"""
+        if self.expired:
+            raise DeadlineExceeded(stage, self)
+
+    def timeout(self, limit: Optional[float] = None) -> Optional[float]:
+        """Espera máxima de uma etapa: o tempo restante, limitado a `limit`"""
+        remaining = self.remaining()
+        if remaining is None:
+            return limit
+        return remaining if limit is None else min(remaining, limit)
+
+    def sleep(self, seconds: float, stage: str) -> None:
+        """Espera entre tentativas; falha na hora se o prazo acabar antes"""
+        remaining = self.remaining()
+        if remaining is not None and remaining < seconds:
+            raise DeadlineExceeded(stage, self)
+        if self._cancelled.wait(seconds):
+            raise DeadlineExceeded(stage, self)
+        self.check(stage)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Prazo esgotado (ou cancelado por quem chamou) em uma etapa da extração"""
+
+    def __init__(self, stage: str, deadline: Optional[Deadline] = None):
+        self.stage = stage
+        self.deadline = deadline
+        self.cancelled = deadline is not None and deadline.cancelled
+        if self.cancelled:
+            message = f"Extração cancelada ({stage})"
+        elif deadline is not None and deadline.budget is not None:
+            message = f"Prazo de {deadline.budget:g}s esgotado ({stage})"
+        else:
+            message = f"Prazo esgotado ({stage})"
+        super().__init__(message)
+
+
+# Prazo da extração em curso (propagado por deadline_context)
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+
+@contextmanager
+def deadline_context(
+    seconds: Optional[float] = None,
+    deadline: Optional[Deadline] = None
+) -> Iterator[Optional[Deadline]]:
+    """
+    Define o prazo das chamadas feitas dentro do bloco.
+
+    Dentro de outro prazo vale o que vencer primeiro. Sem seconds nem
+    deadline, o bloco mantém o prazo atual (se houver).
+
+    Args:
+        seconds: Orçamento em segundos a partir de agora
+        deadline: Prazo já existente (ex: o de um lote, compartilhado pelas threads)
+
+    Returns:
+        O prazo em vigor no bloco (None se não houver)
+    """
+    if deadline is None and seconds is None:
+        yield _current_deadline.get()
+        return
+    if deadline is None:
+        deadline = Deadline(seconds, _current_deadline.get())
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Prazo do contexto atual (None se não houver)"""
+    return _current_deadline.get()
+
+
+class DeadlineStats:
+    """Prazos cumpridos e perdidos por tipo de documento (thread-safe)"""
+
+    def __init__(self):
+        self._types: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        document_type: str,
+        deadline: Deadline,
+        missed: bool,
+        stage: Optional[str] = None
+    ) -> None:
+        """Registra o desfecho de uma extração com prazo"""
+        with self._lock:
+            stats = self._types.setdefault(document_type or "auto", {
+                "documents": 0, "missed": 0, "cancelled": 0, "stages": {}, "recent": deque(maxlen=1000)
+            })
+            stats["documents"] += 1
+            if missed:
+                stats["missed"] += 1
+                if deadline.cancelled:
+                    stats["cancelled"] += 1
+                if stage:
+                    stats["stages"][stage] = stats["stages"].get(stage, 0) + 1
+            if deadline.budget:
+                stats["recent"].append(deadline.elapsed() / deadline.budget)
+
+    def stats(self) -> Dict[str, Any]:
+        """Por tipo: extrações, prazos perdidos (por etapa), cancelamentos e uso do orçamento"""
+        with self._lock:
+            summary = {}
+            for doc_type, stats in self._types.items():
+                recent = sorted(stats["recent"])
+                summary[doc_type] = {
+                    "documents": stats["documents"],
+                    "missed": stats["missed"],
+                    "miss_rate": round(stats["missed"] / stats["documents"], 4),
+                    "cancelled": stats["cancelled"],
+                    "stages": dict(stats["stages"]),
+                    "p95_budget_used": (
+                        round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 3) if recent else None
+                    )
+                }
+            return summary
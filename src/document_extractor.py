@@ -3,23 +3,55 @@ Extrator de Documentos Brasileiros usando Gemini Vision 2.0 Flash
 Suporta: RG, CNH, CPF
 """
 import os
+import re
+import json
 import base64
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from contextvars import copy_context
 from pathlib import Path
-from typing import Dict, Any, Optional
-import google.generativeai as genai
-from PIL import Image
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
-from loguru import logger
+
+from client_pool import ClientPool, get_client_pool
+from dead_letters import DeadLetterStore, failure_category
+from deadlines import REQUEST_TIMEOUT, Deadline, DeadlineExceeded, DeadlineStats, current_deadline, deadline_context
+from field_requery import FIELD_OUTPUT_TOKENS, build_field_prompt, crop_region, field_formats, field_region
+from image_prep import page_count, prepare_image, prepare_page
+from event_log import log_event
+from image_quality import QualityThresholds, quality_issues
+from model_cascade import ModelCascade, escalation_reason
+from rate_control import RateController, estimate_tokens
+from scheduler import RequestScheduler, request_context
+from streaming import EventCallback, FieldStream, aiter_events, chunk_text, iter_events
+from models import record_from_dict
+from result_sinks import ResultSink
+from validation_rules import ValidationEngine, resolve_document_type
 
 # Carrega variáveis de ambiente
 load_dotenv()
 
-# Configura Gemini
+# Chave do Gemini (o SDK é configurado por client_pool, uma vez por processo),
+# ou várias chaves em GOOGLE_API_KEYS / GOOGLE_API_KEYS_FILE (ver key_pool)
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise ValueError("GOOGLE_API_KEY não encontrada no arquivo .env")
+KEY_POOL_CONFIGURED = bool(os.getenv("GOOGLE_API_KEYS") or os.getenv("GOOGLE_API_KEYS_FILE"))
+# Reprodução de cassetes (ver cassette) roda sem rede e sem chave
+REPLAY_ONLY = bool(os.getenv("GEMINI_CASSETTE")) and os.getenv("GEMINI_CASSETTE_MODE", "replay") == "replay"
+if not GOOGLE_API_KEY and not KEY_POOL_CONFIGURED and not REPLAY_ONLY:
+    raise ValueError("GOOGLE_API_KEY (ou GOOGLE_API_KEYS) não encontrada no arquivo .env")
+
+# Formatos que podem conter várias páginas (frente/verso, cartão CNPJ completo)
+MULTIPAGE_SUFFIXES = (".tif", ".tiff", ".pdf")
+
+# Modos da verificação de qualidade: "reject" não envia, "flag" envia e sinaliza
+QUALITY_GATE_MODES = ("reject", "flag")
 
-genai.configure(api_key=GOOGLE_API_KEY)
+
+def _is_timeout(error: Exception) -> bool:
+    """Prazo esgotado, cancelamento ou timeout da própria chamada ao modelo"""
+    return isinstance(error, DeadlineExceeded) or failure_category(error) == "timeout"
 
 
 class DocumentExtractor:
@@ -168,20 +200,85 @@ INSTRUÇÕES:
 """
     }
 
-    def __init__(self, model_name: str = "gemini-2.5-flash"):
+    def __init__(
+        self,
+        model_name: str = "gemini-2.5-flash",
+        crop_documents: bool = False,
+        quality_gate: Optional[str] = None,
+        quality_thresholds: Optional[QualityThresholds] = None,
+        rate_controller: Optional[RateController] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        cascade: Optional[ModelCascade] = None,
+        client_pool: Optional[ClientPool] = None,
+        slo_budgets: Optional[Dict[str, float]] = None,
+        request_timeout: Optional[float] = REQUEST_TIMEOUT
+    ):
         """
         Inicializa o extrator.
 
         Args:
             model_name: Nome do modelo Gemini a usar
+            crop_documents: Se True, recorta localmente o documento da foto
+                (e separa frente/verso lado a lado) antes do envio
+            quality_gate: Verificação local de qualidade antes da chamada:
+                None (desligada), "reject" (imagens ruins não são enviadas)
+                ou "flag" (são enviadas, com os problemas em "quality")
+            quality_thresholds: Limites da verificação (padrão: QualityThresholds())
+            rate_controller: Controle de vazão das chamadas (concorrência
+                adaptativa e orçamento RPM/TPM); None chama o modelo direto
+            scheduler: Escalonador compartilhado que ordena as chamadas por
+                prioridade e tenant (ver scheduler.request_context)
+            cascade: Roteamento por tipo de documento para um modelo mais
+                barato primeiro, subindo de modelo se a resposta não for JSON
+                ou falhar nas validações; None usa sempre model_name
+            client_pool: Clientes do Gemini compartilhados (padrão: o pool do
+                processo, ver client_pool.get_client_pool)
+            slo_budgets: Prazo em segundos de cada extração por tipo de
+                documento (ex: deadlines.SLO_BUDGETS); None não impõe prazo
+                além do de quem chamou (ver deadlines.deadline_context)
+            request_timeout: Limite de cada chamada ao modelo, mesmo sem prazo
+        """
+        if quality_gate is not None and quality_gate not in QUALITY_GATE_MODES:
+            raise ValueError(f"quality_gate inválido: {quality_gate} (opções: {', '.join(QUALITY_GATE_MODES)})")
+
+        # Extratores do mesmo processo dividem o cliente e as conexões
+        self.client_pool = client_pool or get_client_pool()
+        self.model = self.client_pool.model(model_name)
+        self.model_name = model_name
+        self.crop_documents = crop_documents
+        self.quality_gate = quality_gate
+        self.quality_thresholds = quality_thresholds or QualityThresholds()
+        self.rate_controller = rate_controller
+        self.scheduler = scheduler
+        self.cascade = cascade
+        if cascade is not None and cascade.model_factory is None:
+            cascade.model_factory = self.client_pool.model
+        self.cascade_engine = ValidationEngine() if cascade is not None else None
+        self.slo_budgets = dict(slo_budgets or {})
+        self.request_timeout = request_timeout
+        self.deadline_stats = DeadlineStats()
+        log_event("extractor.init", "DocumentExtractor inicializado com modelo: {model}", model=model_name)
+
+    @classmethod
+    def get_fields(cls, document_type: str) -> List[str]:
+        """
+        Lista os campos do esquema JSON definido no prompt de um tipo de documento.
+
+        Args:
+            document_type: Tipo do documento ("rg", "cnh", "cpf", "cnpj")
+
+        Returns:
+            Lista ordenada com os nomes dos campos (vazia para "auto")
         """
-        self.model = genai.GenerativeModel(model_name)
-        logger.info(f"DocumentExtractor inicializado com modelo: {model_name}")
+        prompt = cls.PROMPTS.get(document_type.lower(), "")
+        return re.findall(r'^\s*"(\w+)":', prompt, flags=re.MULTILINE)
 
     def extract_from_image(
         self,
         image_path: str,
-        document_type: str = "auto"
+        document_type: str = "auto",
+        field_stream: Optional[FieldStream] = None,
+        timeout: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         Extrai informações de uma imagem de documento.
@@ -189,71 +286,658 @@ INSTRUÇÕES:
         Args:
             image_path: Caminho para a imagem
             document_type: Tipo do documento ("rg", "cnh", "cpf", "auto")
+            field_stream: Se informado, a resposta é pedida em streaming e
+                cada trecho vai para ele (ver extract_streaming)
+            timeout: Prazo desta extração em segundos (vale o menor entre
+                ele, o SLO do tipo e o prazo de quem chamou)
 
         Returns:
-            Dict com dados extraídos
+            Dict com dados extraídos; status "timeout" se o prazo esgotar
         """
+        with self._deadline(document_type, timeout) as deadline:
+            result = self._extract_from_image(image_path, document_type, field_stream)
+            self._record_deadline(result, deadline, document_type)
+        return result
+
+    def _extract_from_image(
+        self,
+        image_path: str,
+        document_type: str,
+        field_stream: Optional[FieldStream]
+    ) -> Dict[str, Any]:
         try:
             # Valida caminho
             path = Path(image_path)
             if not path.exists():
                 return {
                     "status": "error",
-                    "message": f"Arquivo não encontrado: {image_path}"
+                    "message": f"Arquivo não encontrado: {image_path}",
+                    "image_path": image_path,
+                    "failure": "missing_file"
                 }
 
-            # Abre imagem
-            logger.info(f"Processando imagem: {image_path}")
-            image = Image.open(path)
+            # TIFFs multipágina e PDFs são extraídos página a página
+            suffix = path.suffix.lower()
+            if suffix == ".pdf" or (suffix in MULTIPAGE_SUFFIXES and page_count(str(path)) > 1):
+                return self.extract_pages(str(path), document_type)
 
-            # Seleciona prompt apropriado
-            prompt = self.PROMPTS.get(document_type.lower(), self.PROMPTS["auto"])
+            # Decodifica, corrige rotação e redimensiona
+            self._check_deadline("prepare")
+            log_event("extraction.prepare", "Processando imagem: {image_path}", image_path=image_path)
+            prepared = prepare_image(
+                str(path),
+                crop=self.crop_documents,
+                check_quality=self.quality_gate is not None
+            )
 
-            # Envia para Gemini Vision
-            logger.info(f"Enviando para Gemini Vision (tipo: {document_type})")
-            response = self.model.generate_content([prompt, image])
+            return self._extract_from_prepared(prepared, document_type, field_stream)
 
-            # Extrai texto da resposta
-            extracted_text = response.text.strip()
+        except Exception as e:
+            if _is_timeout(e):
+                return self._timeout_result(image_path, document_type, e)
+            log_event(
+                "extraction.error", "Erro ao extrair documento: {error}", "ERROR",
+                image_path=image_path, error=str(e)
+            )
+            return {
+                "status": "error",
+                "message": f"Erro ao processar documento: {str(e)}",
+                "image_path": image_path,
+                "failure": failure_category(e)
+            }
 
-            # Tenta parsear como JSON
-            import json
+    def extract_from_prepared(
+        self,
+        prepared: Dict[str, Any],
+        document_type: str = "auto",
+        field_stream: Optional[FieldStream] = None,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Extrai informações de uma imagem já preparada por image_prep.prepare_image.
 
-            # Remove markdown code blocks se existirem
-            if extracted_text.startswith("```"):
-                extracted_text = extracted_text.split("```")[1]
-                if extracted_text.startswith("json"):
-                    extracted_text = extracted_text[4:]
-                extracted_text = extracted_text.strip()
+        Args:
+            prepared: Dict retornado por prepare_image (bytes JPEG em "data")
+            document_type: Tipo do documento ("rg", "cnh", "cpf", "auto")
+            field_stream: Se informado, a resposta é pedida em streaming e
+                cada trecho vai para ele (sempre com model_name, sem cascata)
+            timeout: Prazo desta extração em segundos (ver extract_from_image)
 
-            try:
-                extracted_data = json.loads(extracted_text)
-            except json.JSONDecodeError:
-                # Se não conseguir parsear, retorna como texto
-                extracted_data = {
-                    "raw_text": extracted_text,
-                    "note": "Resposta não estava em formato JSON válido"
-                }
+        Returns:
+            Dict com dados extraídos; status "timeout" se o prazo esgotar
+        """
+        with self._deadline(document_type, timeout) as deadline:
+            result = self._extract_from_prepared(prepared, document_type, field_stream)
+            self._record_deadline(result, deadline, document_type)
+        return result
 
-            logger.info(f"Extração concluída com sucesso")
+    def _extract_from_prepared(
+        self,
+        prepared: Dict[str, Any],
+        document_type: str,
+        field_stream: Optional[FieldStream]
+    ) -> Dict[str, Any]:
+        start = time.perf_counter()
+        image_path = prepared.get("image_path")
+        if prepared.get("status") != "success":
+            return {
+                "status": "error",
+                "message": prepared.get("message", "Imagem não preparada"),
+                "image_path": image_path,
+                "failure": prepared.get("failure", "unreadable_image")
+            }
 
+        quality = self.check_quality(prepared)
+        if quality and quality["issues"] and self.quality_gate == "reject":
+            log_event(
+                "quality.rejected", "Imagem rejeitada pela verificação de qualidade: {image_path}", "WARNING",
+                image_path=image_path, issues=quality["issues"]
+            )
             return {
+                "status": "error",
+                "message": "Imagem inadequada para extração: " + "; ".join(quality["issues"]),
+                "image_path": image_path,
+                "quality": quality,
+                "failure": "quality"
+            }
+
+        try:
+            # Seleciona prompt apropriado
+            prompt = self.PROMPTS.get(document_type.lower(), self.PROMPTS["auto"])
+
+            # Envia para Gemini Vision
+            log_event(
+                "extraction.request", "Enviando para Gemini Vision (tipo: {document_type})",
+                image_path=image_path, document_type=document_type
+            )
+            # Recortes (frente/verso separados) vão como partes da mesma requisição
+            image_parts = prepared.get("parts") or [
+                {"mime_type": prepared["mime_type"], "data": prepared["data"]}
+            ]
+            sizes = prepared.get("roi", {}).get("sizes") or [prepared.get("size") or (0, 0)]
+            contents = [prompt] + image_parts
+            tokens = estimate_tokens(prompt, sizes)
+
+            if self.cascade is None or field_stream is not None:
+                response = self._generate(contents, tokens, field_stream=field_stream)
+                extracted_text, extracted_data = self.parse_response(response.text)
+                result = {}
+            else:
+                result = self._run_cascade(contents, tokens, document_type)
+                extracted_text, extracted_data = result.pop("raw_response"), result.pop("data")
+
+            log_event(
+                "extraction.success", "Extração concluída com sucesso: {image_path}",
+                image_path=image_path, document_type=document_type,
+                seconds=round(time.perf_counter() - start, 3)
+            )
+
+            result = {
                 "status": "success",
                 "message": "Documento processado com sucesso",
-                "image_path": str(path),
+                "image_path": image_path,
                 "document_type": document_type,
                 "data": extracted_data,
-                "raw_response": extracted_text
+                "raw_response": extracted_text,
+                **result
             }
+            if "roi" in prepared:
+                result["roi"] = prepared["roi"]
+            if quality:
+                result["quality"] = quality
+            return result
 
         except Exception as e:
-            logger.error(f"Erro ao extrair documento: {e}")
+            if _is_timeout(e):
+                return self._timeout_result(image_path, document_type, e)
+            log_event(
+                "extraction.error", "Erro ao extrair documento: {error}", "ERROR",
+                image_path=image_path, document_type=document_type, error=str(e)
+            )
             return {
                 "status": "error",
                 "message": f"Erro ao processar documento: {str(e)}",
-                "image_path": image_path
+                "image_path": image_path,
+                "failure": failure_category(e)
             }
 
+    def _run_cascade(self, contents: List[Any], estimated_tokens: int, document_type: str) -> Dict[str, Any]:
+        """
+        Chama os modelos da cascata em ordem até uma resposta ser aceita.
+
+        Returns:
+            Dict com "data", "raw_response", "validations" (e "corrections")
+            da resposta aceita (ou da última) e "cascade" com as tentativas
+        """
+        tiers = self.cascade.tiers(document_type)
+        attempts = []
+        for index, name in enumerate(tiers):
+            last = index == len(tiers) - 1
+            start = time.perf_counter()
+            if index:
+                self._check_deadline("cascade")
+            try:
+                response = self._generate(contents, estimated_tokens, self.cascade.model(name))
+            except DeadlineExceeded:
+                self.cascade.record(name, time.perf_counter() - start, reason="error")
+                self.cascade.record_document(len(attempts) + 1, resolved=False)
+                raise
+            except Exception as e:
+                self.cascade.record(name, time.perf_counter() - start, reason="error")
+                attempts.append({"model": name, "reason": "error", "error": str(e)})
+                if last:
+                    self.cascade.record_document(len(attempts), resolved=False)
+                    raise
+                log_event(
+                    "cascade.error", "Erro no modelo {model}, subindo na cascata: {error}", "WARNING",
+                    model=name, error=str(e)
+                )
+                continue
+
+            text, data = self.parse_response(response.text)
+            probe = {"status": "success", "document_type": document_type, "data": data}
+            if isinstance(data, dict) and "raw_text" not in data:
+                self.cascade_engine.validate_batch([probe])
+            reason = escalation_reason(data, probe.get("validations"))
+            self.cascade.record(name, time.perf_counter() - start, response, reason)
+            attempts.append({"model": name, "reason": reason, "seconds": round(time.perf_counter() - start, 3)})
+
+            if reason is None or last:
+                self.cascade.record_document(len(attempts), resolved=reason is None)
+                probe.pop("status")
+                probe.pop("document_type")
+                probe["raw_response"] = text
+                probe["cascade"] = {"model": name, "attempts": attempts}
+                return probe
+            log_event(
+                "cascade.escalated", "Resposta de {model} recusada ({reason}), subindo na cascata",
+                model=name, reason=reason
+            )
+
+    def _generate(
+        self,
+        contents: List[Any],
+        estimated_tokens: int,
+        model: Any = None,
+        field_stream: Optional[FieldStream] = None
+    ) -> Any:
+        """
+        Chama o modelo, passando pelo escalonador e pelo controle de vazão se configurados.
+
+        A chamada recebe como timeout o tempo restante do prazo do contexto
+        (limitado a request_timeout); em streaming, o prazo e o cancelamento
+        são verificados a cada trecho.
+        """
+        model = model or self.model
+        deadline = current_deadline()
+
+        def request() -> Any:
+            if deadline is not None:
+                deadline.check("request")
+            timeout = deadline.timeout(self.request_timeout) if deadline is not None else self.request_timeout
+            options = {"request_options": {"timeout": timeout}} if timeout is not None else {}
+            if field_stream is None:
+                return model.generate_content(contents, **options)
+            # A vaga no limitador fica ocupada até o último trecho
+            field_stream.restart()
+            response = model.generate_content(contents, stream=True, **options)
+            for chunk in response:
+                if deadline is not None:
+                    deadline.check("request")
+                field_stream.feed(chunk_text(chunk))
+            return response
+
+        def call() -> Any:
+            if self.rate_controller is None:
+                return request()
+            return self.rate_controller.call(request, estimated_tokens)
+
+        if self.scheduler is None:
+            return call()
+        # Custo na fila justa em milhares de tokens: tenants dividem a cota, não o número de chamadas
+        return self.scheduler.run(call, cost=max(estimated_tokens, 1) / 1000)
+
+    def check_quality(self, prepared: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Aplica os limites de qualidade às métricas medidas em prepare_image.
+
+        Args:
+            prepared: Dict retornado por prepare_image(check_quality=True)
+
+        Returns:
+            Dict com "passed", "issues" (motivos para o usuário) e "metrics",
+            ou None se a verificação estiver desligada ou não houver métricas
+        """
+        metrics = prepared.get("quality_metrics")
+        if self.quality_gate is None or metrics is None:
+            return None
+
+        issues = quality_issues(metrics, self.quality_thresholds)
+        return {"passed": not issues, "issues": issues, "metrics": metrics}
+
+    def _deadline(self, document_type: str, timeout: Optional[float] = None):
+        """Contexto com o prazo de uma extração: o menor entre timeout, o SLO do tipo e o de quem chamou"""
+        budgets = [b for b in (timeout, self.slo_budgets.get((document_type or "auto").lower())) if b]
+        parent = current_deadline()
+        if not budgets and parent is None:
+            return deadline_context()
+        return deadline_context(deadline=Deadline(min(budgets) if budgets else None, parent))
+
+    @staticmethod
+    def _check_deadline(stage: str) -> None:
+        deadline = current_deadline()
+        if deadline is not None:
+            deadline.check(stage)
+
+    def _timeout_result(self, image_path: Optional[str], document_type: str, error: Exception) -> Dict[str, Any]:
+        """Resultado de uma extração encerrada pelo prazo, cancelamento ou timeout da chamada"""
+        deadline = getattr(error, "deadline", None) or current_deadline()
+        outcome = {
+            "stage": getattr(error, "stage", "request"),
+            "cancelled": bool(getattr(error, "cancelled", False)),
+            "budget_seconds": deadline.budget if deadline is not None else self.request_timeout,
+            "elapsed_seconds": round(deadline.elapsed(), 3) if deadline is not None else None
+        }
+        log_event(
+            "extraction.timeout", "Prazo esgotado ({stage}): {image_path}", "WARNING",
+            image_path=image_path, document_type=document_type, error=str(error), **outcome
+        )
+        if isinstance(error, DeadlineExceeded):
+            message = str(error)
+        elif deadline is not None and deadline.expired:
+            message = str(DeadlineExceeded(outcome["stage"], deadline))
+        else:
+            message = f"Tempo da chamada ao modelo esgotado: {error}"
+        return {
+            "status": "timeout",
+            "message": message,
+            "image_path": image_path,
+            "document_type": document_type,
+            "failure": "timeout",
+            "deadline": outcome
+        }
+
+    def _record_deadline(self, result: Dict[str, Any], deadline: Optional[Deadline], document_type: str) -> None:
+        """Registra o prazo cumprido ou perdido (ver DeadlineStats)"""
+        if deadline is None:
+            return
+        missed = result.get("status") == "timeout"
+        stage = (result.get("deadline") or {}).get("stage") if missed else None
+        self.deadline_stats.record(document_type, deadline, missed, stage)
+
+    def reextract_fields(
+        self,
+        result: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        crop_fields: bool = False,
+        engine: Optional[ValidationEngine] = None
+    ) -> Dict[str, Any]:
+        """
+        Relê apenas alguns campos de um resultado, em vez de repetir a extração inteira.
+
+        Envia um prompt curto com o esquema reduzido aos campos pedidos e,
+        com crop_fields, só a região desses campos no documento (quando
+        conhecida, ver field_requery.FIELD_REGIONS). As respostas não nulas
+        substituem os valores anteriores e o resultado é revalidado.
+
+        Args:
+            result: Resultado de extract_from_image (alterado no lugar)
+            fields: Campos a reler (padrão: os que falharam na validação)
+            crop_fields: Se True, envia só o recorte da região dos campos
+                (apenas quando o ROI encontra um único documento na imagem)
+            engine: Motor de validação (padrão: ValidationEngine())
+
+        Returns:
+            O mesmo resultado, com "requery" (campos pedidos, valores
+            alterados, tokens estimados e duração)
+        """
+        data = result.get("data")
+        if result.get("status") != "success" or not isinstance(data, dict):
+            return result
+
+        engine = engine or ValidationEngine()
+        document_type = resolve_document_type(result)
+        fields = fields or engine.failed_fields(result, document_type)
+        if not fields:
+            return result
+
+        start = time.perf_counter()
+        requery: Dict[str, Any] = {
+            "fields": list(fields),
+            "attempts": (result.get("requery") or {}).get("attempts", 0) + 1
+        }
+        result["requery"] = requery
+
+        try:
+            # Frente/verso continuam separados; a região só vale quando o ROI isolou
+            # exatamente um documento (sem cartão detectado, vai a imagem inteira)
+            prepared = prepare_image(result["image_path"], crop=self.crop_documents or crop_fields)
+            if prepared.get("status") != "success":
+                raise ValueError(prepared.get("message", "Imagem não preparada"))
+
+            image_parts = prepared.get("parts") or [{"mime_type": prepared["mime_type"], "data": prepared["data"]}]
+            sizes = prepared.get("roi", {}).get("sizes") or [prepared["size"]]
+            isolated = len(prepared.get("roi", {}).get("regions") or []) == 1
+            region = field_region(document_type, fields) if crop_fields and isolated else None
+            if region is not None:
+                part, size = crop_region(image_parts[0]["data"], region)
+                image_parts, sizes = [{"mime_type": "image/jpeg", "data": part}], [size]
+            requery["cropped"] = region is not None
+
+            prompt = build_field_prompt(
+                document_type, fields, field_formats(self.PROMPTS.get(document_type, ""))
+            )
+            tokens = estimate_tokens(prompt, sizes, FIELD_OUTPUT_TOKENS * len(fields))
+            requery["estimated_tokens"] = tokens
+
+            log_event(
+                "requery.request", "Relendo campos {fields}: {image_path}",
+                image_path=result["image_path"], fields=fields
+            )
+            _, answer = self.parse_response(self._generate([prompt] + image_parts, tokens).text)
+        except Exception as e:
+            log_event(
+                "requery.error", "Erro ao reler campos: {error}", "ERROR",
+                image_path=result["image_path"], fields=fields, error=str(e)
+            )
+            requery["error"] = str(e)
+            requery["seconds"] = round(time.perf_counter() - start, 3)
+            return result
+
+        changed = {}
+        for field in fields:
+            value = answer.get(field) if isinstance(answer, dict) else None
+            if value not in (None, "") and value != data.get(field):
+                changed[field] = {"before": data.get(field), "after": value}
+                data[field] = value
+        requery["changed"] = changed
+
+        # Correções locais dos campos relidos deixam de valer
+        corrections = result.get("corrections") or {}
+        for field in fields:
+            corrections.pop(field, None)
+        if "corrections" in result and not corrections:
+            del result["corrections"]
+        if "validations" in result:
+            engine.validate_batch([result], document_type)
+
+        requery["seconds"] = round(time.perf_counter() - start, 3)
+        return result
+
+    def extract_pages(
+        self,
+        image_path: str,
+        document_type: str = "auto",
+        workers: int = 4
+    ) -> Dict[str, Any]:
+        """
+        Extrai um documento de várias páginas (TIFF multipágina ou PDF).
+
+        As páginas são rasterizadas sob demanda dentro de cada worker, de modo
+        que no máximo `workers` páginas ficam em memória ao mesmo tempo.
+
+        Args:
+            image_path: Caminho do arquivo
+            document_type: Tipo do documento
+            workers: Páginas processadas em paralelo
+
+        Returns:
+            Dict com os dados das páginas mesclados em um único documento
+        """
+        total = page_count(image_path)
+        log_event("extraction.pages", "Processando {pages} páginas: {image_path}", image_path=image_path, pages=total)
+
+        def extract_page(page: int) -> Dict[str, Any]:
+            prepared = prepare_page(image_path, page, check_quality=self.quality_gate is not None)
+            result = self._extract_from_prepared(prepared, document_type, None)
+            result["page"] = page
+            return result
+
+        # Cada página herda a prioridade/tenant da chamada original
+        contexts = [copy_context() for _ in range(total)]
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, total))) as pool:
+            pages = list(pool.map(lambda page: contexts[page].run(extract_page, page), range(total)))
+
+        return self.merge_pages(pages, image_path, document_type)
+
+    @staticmethod
+    def merge_pages(
+        pages: List[Dict[str, Any]],
+        image_path: str,
+        document_type: str = "auto"
+    ) -> Dict[str, Any]:
+        """
+        Mescla os resultados por página (ex: frente + verso) em um documento.
+
+        Para cada campo vale o primeiro valor não nulo, na ordem das páginas.
+
+        Args:
+            pages: Resultados de extract_from_prepared, na ordem das páginas
+            image_path: Caminho do arquivo original
+            document_type: Tipo do documento
+
+        Returns:
+            Dict de resultado único, com o status de cada página em "pages"
+        """
+        merged: Dict[str, Any] = {}
+        raw_responses = []
+        for page in pages:
+            data = page.get("data")
+            if page["status"] != "success" or not isinstance(data, dict):
+                continue
+            raw_responses.append(page.get("raw_response", ""))
+            for field, value in data.items():
+                if merged.get(field) in (None, "") and value not in (None, ""):
+                    merged[field] = value
+                else:
+                    merged.setdefault(field, value)
+
+        summary = [
+            {"page": page.get("page", i), "status": page["status"], "message": page.get("message")}
+            for i, page in enumerate(pages)
+        ]
+
+        if not raw_responses:
+            failure = next((page["failure"] for page in pages if page.get("failure")), "error")
+            return {
+                "status": "timeout" if failure == "timeout" else "error",
+                "message": "Nenhuma página pôde ser processada",
+                "image_path": image_path,
+                "pages": summary,
+                "failure": failure
+            }
+
+        return {
+            "status": "success",
+            "message": f"Documento processado com sucesso ({len(pages)} páginas)",
+            "image_path": image_path,
+            "document_type": document_type,
+            "data": merged,
+            "raw_response": "\n".join(raw_responses),
+            "pages": summary
+        }
+
+    @staticmethod
+    def parse_response(text: str) -> Tuple[str, Any]:
+        """
+        Converte o texto da resposta do modelo em dados estruturados.
+
+        Args:
+            text: Texto retornado pelo Gemini
+
+        Returns:
+            Tupla (texto sem markdown, dados extraídos)
+        """
+        # Extrai texto da resposta
+        extracted_text = text.strip()
+
+        # Remove markdown code blocks se existirem
+        if extracted_text.startswith("```"):
+            extracted_text = extracted_text.split("```")[1]
+            if extracted_text.startswith("json"):
+                extracted_text = extracted_text[4:]
+            extracted_text = extracted_text.strip()
+
+        try:
+            extracted_data = json.loads(extracted_text)
+        except json.JSONDecodeError:
+            # Se não conseguir parsear, retorna como texto
+            extracted_data = {
+                "raw_text": extracted_text,
+                "note": "Resposta não estava em formato JSON válido"
+            }
+
+        return extracted_text, extracted_data
+
+    def extract_streaming(
+        self,
+        image_path: str,
+        document_type: str = "auto",
+        on_event: Optional[EventCallback] = None,
+        validate: bool = True,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Extrai um documento pedindo a resposta em streaming.
+
+        Cada campo é emitido em on_event assim que o seu valor termina de
+        chegar ({"event": "field", ...}) e cada regra de validação roda
+        assim que os seus campos estão completos ({"event": "validation",
+        ...}); o último evento é {"event": "done", "result": ...}.
+
+        Args:
+            image_path: Caminho para a imagem
+            document_type: Tipo do documento ("rg", "cnh", "cpf", "auto")
+            on_event: Chamada a cada evento
+            validate: Se True, valida os campos e o resultado final
+            timeout: Prazo em segundos (ver extract_from_image)
+
+        Returns:
+            Dict com dados extraídos (e validações), com os tempos em "stream"
+        """
+        stream = FieldStream(document_type, on_event, ValidationEngine() if validate else None)
+        return stream.finish(self.extract_from_image(image_path, document_type, stream, timeout))
+
+    def _stream_runner(
+        self,
+        image_path: str,
+        document_type: str,
+        validate: bool,
+        timeout: Optional[float],
+        priority: Optional[str] = None,
+        tenant: Optional[str] = None
+    ):
+        """Função de extração para iter_events/aiter_events e o prazo que o consumidor cancela ao desistir"""
+        deadline = Deadline(timeout, current_deadline())
+
+        def run(emit: EventCallback) -> Dict[str, Any]:
+            # A prioridade vale na thread da extração: nada fica preso ao consumidor entre eventos
+            with deadline_context(deadline=deadline), (
+                request_context(priority, tenant) if priority is not None else nullcontext()
+            ):
+                return self.extract_streaming(image_path, document_type, emit, validate)
+
+        return run, deadline
+
+    def extract_stream(
+        self,
+        image_path: str,
+        document_type: str = "auto",
+        validate: bool = True,
+        timeout: Optional[float] = None,
+        priority: Optional[str] = None,
+        tenant: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Eventos de extract_streaming como um iterador (a extração roda em uma thread).
+
+        Fechar o iterador antes do evento "done" cancela a extração.
+        Sem priority, a extração herda a prioridade/tenant de quem chamou
+        (ver scheduler.request_context).
+        """
+        run, deadline = self._stream_runner(image_path, document_type, validate, timeout, priority, tenant)
+        return iter_events(run, on_abandon=deadline.cancel)
+
+    def aextract_stream(
+        self,
+        image_path: str,
+        document_type: str = "auto",
+        validate: bool = True,
+        timeout: Optional[float] = None,
+        priority: Optional[str] = None,
+        tenant: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Eventos de extract_streaming como um iterador assíncrono.
+
+        Ex: async for event in extractor.aextract_stream("cnh.jpg", "cnh"): ...
+        Abandonar o iterador (break, aclose, tarefa cancelada) cancela a
+        extração: a leitura da resposta para no próximo trecho.
+        priority/tenant valem só na extração, como em extract_stream.
+        """
+        run, deadline = self._stream_runner(image_path, document_type, validate, timeout, priority, tenant)
+        return aiter_events(run, on_abandon=deadline.cancel)
+
     def extract_rg(self, image_path: str) -> Dict[str, Any]:
         """Extrai dados de um RG"""
         return self.extract_from_image(image_path, "rg")
@@ -270,35 +954,97 @@ INSTRUÇÕES:
         """Extrai dados de um CNPJ"""
         return self.extract_from_image(image_path, "cnpj")
 
-    def extract_batch(self, image_paths: list, document_type: str = "auto") -> Dict[str, Any]:
+    def extract_batch(
+        self,
+        image_paths: list,
+        document_type: str = "auto",
+        sink: Optional[ResultSink] = None,
+        compact: bool = False,
+        validate: bool = False,
+        chunk_size: int = 100,
+        priority: str = "bulk",
+        tenant: Optional[str] = None,
+        requery: bool = False,
+        dead_letters: Optional[DeadLetterStore] = None,
+        deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
         """
         Processa múltiplas imagens em lote.
 
         Args:
             image_paths: Lista de caminhos de imagens
             document_type: Tipo do documento
+            sink: Destino opcional (ver result_sinks) onde os resultados são
+                gravados a cada bloco processado
+            compact: Se True, mantém os resultados em memória como registros
+                compactos (models.records), sem raw_response
+            validate: Se True, aplica as regras de validation_rules a cada
+                bloco de resultados em uma única passada
+            chunk_size: Quantidade de imagens por bloco de validação/gravação
+            priority: Classe no escalonador (ver scheduler.PRIORITIES)
+            tenant: Dono do lote na fila justa (padrão: um id por lote)
+            requery: Se True (com validate), relê só os campos que falharam
+                na validação (ver reextract_fields), uma vez por documento
+            dead_letters: Fila onde as falhas de cada bloco são guardadas por
+                categoria, para reprocessamento seletivo (ver dead_letters.redrive)
+            deadline: Prazo do lote inteiro em segundos; esgotado, os
+                documentos restantes saem na hora com status "timeout"
+                (cada documento também respeita o SLO do seu tipo)
 
         Returns:
             Dict com resultados de todos os documentos
         """
         results = []
         errors = []
+        timeouts = 0
+        engine = ValidationEngine() if validate else None
+        tenant = tenant or f"lote-{uuid.uuid4().hex[:8]}"
+        batch_deadline = Deadline(deadline, current_deadline()) if deadline else current_deadline()
 
-        logger.info(f"Processando {len(image_paths)} documentos em lote")
+        log_event("batch.start", "Processando {documents} documentos em lote", documents=len(image_paths))
 
-        for image_path in image_paths:
-            result = self.extract_from_image(image_path, document_type)
+        for start in range(0, len(image_paths), chunk_size):
+            with request_context(priority, tenant), deadline_context(deadline=batch_deadline):
+                chunk = [
+                    self.extract_from_image(image_path, document_type)
+                    for image_path in image_paths[start:start + chunk_size]
+                ]
 
-            if result["status"] == "success":
-                results.append(result)
-            else:
-                errors.append(result)
+            if engine is not None:
+                engine.validate_batch(chunk)
+                if requery:
+                    with request_context(priority, tenant), deadline_context(deadline=batch_deadline):
+                        for result in chunk:
+                            if engine.failed_fields(result):
+                                self.reextract_fields(result, engine=engine)
+
+            if dead_letters is not None:
+                dead_letters.record(chunk)
+
+            if sink is not None:
+                sink.write_many(chunk)
+
+            for result in chunk:
+                success = result["status"] == "success"
+                timeouts += result["status"] == "timeout"
+                if compact:
+                    result = record_from_dict(result)
+
+                if success:
+                    results.append(result)
+                else:
+                    errors.append(result)
+
+        if sink is not None:
+            sink.flush()
+            log_event("batch.sink", "Resultados gravados: {sink}", sink=sink.stats())
 
         return {
             "status": "completed",
             "total": len(image_paths),
             "success": len(results),
             "errors": len(errors),
+            "timeouts": timeouts,
             "results": results,
             "error_details": errors
         }
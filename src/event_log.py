@@ -0,0 +1,165 @@
+"""
+Log estruturado de eventos com baixo custo no caminho das requisições:
+formatação preguiçosa (só quando a linha é emitida), sink em segundo plano
+(enqueue) e amostragem por evento nos caminhos de sucesso. Avisos e erros
+nunca são amostrados
+"""
+import itertools
+import queue
+import sys
+import threading
+from typing import Any, Dict, Optional, TextIO, Union
+from loguru import logger
+
+# Número de cada nível (evita consultar o loguru a cada evento)
+LEVELS = {"TRACE": 5, "DEBUG": 10, "INFO": 20, "SUCCESS": 25, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+
+# Formato de texto com o nome do evento; serialize=True grava JSON com os campos
+TEXT_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+    "<cyan>{extra[event]}</cyan> | {message}"
+)
+
+# Fração mantida de cada evento abaixo de WARNING (padrão: _default_rate)
+_sample_rates: Dict[str, float] = {}
+_default_rate = 1.0
+_min_level = LEVELS["TRACE"]
+_counters: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+class BackgroundSink:
+    """
+    Sink do loguru que só enfileira a linha já formatada; uma thread grava.
+
+    Mais leve que enqueue=True do loguru (que serializa cada registro com
+    pickle para suportar vários processos): aqui a fila é em memória.
+    """
+
+    def __init__(self, target: Union[str, TextIO]):
+        """
+        Inicializa o sink.
+
+        Args:
+            target: Caminho do arquivo (anexado) ou stream
+        """
+        self._owned = isinstance(target, str)
+        self._stream = open(target, "a", encoding="utf-8") if self._owned else target
+        self._queue: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, message: str) -> None:
+        self._queue.put(message)
+
+    def isatty(self) -> bool:
+        return getattr(self._stream, "isatty", lambda: False)()
+
+    def _run(self) -> None:
+        while True:
+            message = self._queue.get()
+            if message is None:
+                break
+            self._stream.write(message)
+            # Só força a gravação quando a fila esvazia
+            if self._queue.empty():
+                self._flush()
+        self._flush()
+
+    def _flush(self) -> None:
+        flush = getattr(self._stream, "flush", None)
+        if flush is not None:
+            flush()
+
+    def stop(self) -> None:
+        """Grava o que restou na fila (chamado pelo loguru em logger.remove e na saída)"""
+        self._queue.put(None)
+        self._thread.join()
+        if self._owned:
+            self._stream.close()
+
+
+def configure_logging(
+    level: str = "INFO",
+    sink: Union[str, TextIO] = sys.stderr,
+    serialize: bool = False,
+    enqueue: bool = True,
+    sample_rate: float = 1.0,
+    sample_rates: Optional[Dict[str, float]] = None
+) -> int:
+    """
+    Substitui os handlers do loguru por um sink em segundo plano.
+
+    Args:
+        level: Nível mínimo emitido
+        sink: Arquivo (caminho) ou stream
+        serialize: Se True, cada linha é um JSON com evento e campos
+        enqueue: Se True, a escrita acontece em uma thread (BackgroundSink),
+            fora do caminho da requisição
+        sample_rate: Fração padrão mantida dos eventos abaixo de WARNING
+        sample_rates: Fração por evento (ex: {"extraction.success": 0.01})
+
+    Returns:
+        Id do handler criado
+    """
+    global _default_rate, _min_level
+    with _lock:
+        _default_rate = sample_rate
+        _sample_rates.clear()
+        _sample_rates.update(sample_rates or {})
+        _counters.clear()
+        _min_level = LEVELS[level.upper()]
+
+    logger.remove()
+    logger.configure(extra={"event": "-"})
+    options: Dict[str, Any] = {"level": level.upper(), "serialize": serialize}
+    if not serialize:
+        options["format"] = TEXT_FORMAT
+    if enqueue:
+        return logger.add(BackgroundSink(sink), **options)
+    if isinstance(sink, str):
+        options["encoding"] = "utf-8"
+    return logger.add(sink, **options)
+
+
+def set_sample_rate(event: str, rate: float) -> None:
+    """Define a fração mantida de um evento (1.0 = todos, 0 = nenhum)"""
+    with _lock:
+        _sample_rates[event] = rate
+        _counters.pop(event, None)
+
+
+def _sampled(event: str) -> bool:
+    """True se esta ocorrência do evento deve ser emitida (1 a cada 1/taxa, determinístico)"""
+    rate = _sample_rates.get(event, _default_rate)
+    if rate >= 1.0:
+        return True
+    if rate <= 0.0:
+        return False
+    counter = _counters.get(event)
+    if counter is None:
+        with _lock:
+            counter = _counters.setdefault(event, itertools.count())
+    return next(counter) % max(1, round(1 / rate)) == 0
+
+
+def log_event(event: str, message: str, level: str = "INFO", **fields: Any) -> None:
+    """
+    Registra um evento estruturado.
+
+    A mensagem é um modelo formatado pelo loguru só se a linha for emitida
+    (ex: "Processando imagem: {image_path}"); os campos vão também para
+    record["extra"] (e para o JSON com serialize=True).
+
+    Args:
+        event: Nome do evento (ex: "extraction.success")
+        message: Modelo da mensagem, com os campos entre chaves
+        level: Nível do loguru; abaixo de WARNING o evento é amostrado
+        **fields: Campos do evento
+    """
+    level_no = LEVELS.get(level, LEVELS["INFO"])
+    if level_no < _min_level:
+        return
+    if level_no < LEVELS["WARNING"] and not _sampled(event):
+        return
+    logger.opt(depth=1).log(level, message, event=event, **fields)
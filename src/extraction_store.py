@@ -0,0 +1,367 @@
+"""
+Armazenamento local consultável de extrações (SQLite)
+Tabela central indexada por CPF, CNPJ, registro, nome e validade,
+mais uma tabela normalizada por tipo de documento
+"""
+import json
+import re
+import sqlite3
+import threading
+import unicodedata
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional
+
+from date_engine import parse_date
+from event_log import log_event
+from result_sinks import ResultSink
+
+
+# Colunas indexadas da tabela central e os campos de origem em `data`
+INDEXED_FIELDS = {
+    "cpf": ("cpf", "numero_cpf"),
+    "cnpj": ("numero_cnpj", "cnpj"),
+    "numero_registro": ("numero_registro",),
+    "nome_completo": ("nome_completo", "razao_social"),
+    "data_validade": ("data_validade",),
+}
+
+
+def _digits(value: Optional[str]) -> Optional[str]:
+    """Mantém apenas os dígitos (None se vazio)"""
+    if not value:
+        return None
+    return re.sub(r"\D", "", str(value)) or None
+
+
+def _normalize_name(value: Optional[str]) -> Optional[str]:
+    """Nome em maiúsculas, sem acentos e com espaços simples"""
+    if not value:
+        return None
+    text = unicodedata.normalize("NFKD", str(value))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.upper().split()) or None
+
+
+def _iso_date(value: Optional[str]) -> Optional[str]:
+    """Converte uma data (formatos de date_engine) para AAAA-MM-DD; None se inválida"""
+    if not value:
+        return None
+    parsed = parse_date(str(value))
+    return parsed.isoformat() if parsed else None
+
+
+def _text(value: Any) -> Optional[str]:
+    """Valor de campo como texto (listas/dicts viram JSON)"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+NORMALIZERS = {
+    "cpf": _digits,
+    "cnpj": _digits,
+    "numero_registro": _digits,
+    "nome_completo": _normalize_name,
+    "data_validade": _iso_date,
+}
+
+
+class ExtractionStore(ResultSink):
+    """Banco SQLite de extrações com consultas por índice"""
+
+    def __init__(
+        self,
+        path: str,
+        schemas: Optional[Dict[str, List[str]]] = None,
+        batch_size: int = 500
+    ):
+        """
+        Abre (ou cria) o banco de extrações.
+
+        Args:
+            path: Caminho do arquivo .db
+            schemas: Campos por tipo de documento (ex: DocumentExtractor.get_fields);
+                cada tipo ganha uma tabela doc_<tipo> com uma coluna por campo
+            batch_size: Quantidade de registros por transação
+        """
+        super().__init__(path)
+        self.schemas = {k.lower(): list(v) for k, v in (schemas or {}).items()}
+        self.batch_size = batch_size
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._pending: List[Dict[str, Any]] = []
+        # A conexão é compartilhada entre threads (pipeline, agente): escrita e leitura em série
+        self._lock = threading.Lock()
+        self._create_schema()
+
+    # ==================== ESQUEMA ====================
+
+    def _create_schema(self) -> None:
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    image_path TEXT UNIQUE,
+                    document_type TEXT,
+                    status TEXT,
+                    cpf TEXT,
+                    cnpj TEXT,
+                    numero_registro TEXT,
+                    nome_completo TEXT,
+                    data_validade TEXT,
+                    data TEXT,
+                    validations TEXT,
+                    created_at TEXT
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_documents_type ON documents (document_type)"
+            )
+            for column in INDEXED_FIELDS:
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS ix_documents_{column} ON documents ({column})"
+                )
+
+            for doc_type, fields in self.schemas.items():
+                table = self._table(doc_type)
+                columns = ", ".join(f'"{f}" TEXT' for f in fields)
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    "document_id INTEGER PRIMARY KEY REFERENCES documents(id) ON DELETE CASCADE"
+                    f"{', ' + columns if columns else ''})"
+                )
+                # Novos campos no prompt viram novas colunas
+                existing = {row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+                for field in fields:
+                    if field not in existing:
+                        self._conn.execute(f'ALTER TABLE {table} ADD COLUMN "{field}" TEXT')
+
+    @staticmethod
+    def _table(doc_type: str) -> str:
+        return "doc_" + re.sub(r"\W", "_", doc_type.lower())
+
+    # ==================== ESCRITA ====================
+
+    def _write_many(self, results: Iterable[Dict[str, Any]]) -> int:
+        count = 0
+        with self._lock:
+            for result in results:
+                if result.get("status") != "success" or not isinstance(result.get("data"), dict):
+                    continue
+                self._pending.append(result)
+                count += 1
+                if len(self._pending) >= self.batch_size:
+                    self._flush_pending()
+        return count
+
+    def _flush(self) -> None:
+        with self._lock:
+            self._flush_pending()
+
+    def _flush_pending(self) -> None:
+        """Grava o buffer em uma transação (com _lock adquirido)"""
+        if not self._pending:
+            return
+        now = datetime.now().isoformat(timespec="seconds")
+        pending, self._pending = self._pending, []
+        try:
+            with self._conn:
+                for result in pending:
+                    self._insert(result, now)
+        except Exception:
+            # A transação do bloco foi desfeita: grava um a um e descarta só os que falharem,
+            # para um registro ruim não travar todas as gravações e consultas seguintes
+            for result in pending:
+                try:
+                    with self._conn:
+                        self._insert(result, now)
+                except Exception as e:
+                    log_event(
+                        "store.error", "Extração não armazenada: {image_path}: {error}", "ERROR",
+                        image_path=result.get("image_path"), error=str(e)
+                    )
+
+    def _insert(self, result: Dict[str, Any], now: str) -> None:
+        data = result["data"]
+        # O modelo pode devolver tipo_documento fora do formato (número, lista...)
+        doc_type = next(
+            (v for v in (data.get("tipo_documento"), result.get("document_type")) if v and isinstance(v, str)),
+            "auto"
+        ).lower()
+
+        keys = {}
+        for column, sources in INDEXED_FIELDS.items():
+            raw = next((data[s] for s in sources if data.get(s)), None)
+            keys[column] = NORMALIZERS[column](raw)
+
+        data_json = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        validations = result.get("validations")
+        validations_json = (
+            json.dumps(validations, ensure_ascii=False, separators=(",", ":"))
+            if validations is not None else None
+        )
+
+        # Reextrair a mesma imagem substitui o registro anterior
+        self._conn.execute("DELETE FROM documents WHERE image_path = ?", (result.get("image_path"),))
+        cursor = self._conn.execute(
+            "INSERT INTO documents (image_path, document_type, status, cpf, cnpj, "
+            "numero_registro, nome_completo, data_validade, data, validations, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                result.get("image_path"), doc_type, result.get("status"),
+                keys["cpf"], keys["cnpj"], keys["numero_registro"],
+                keys["nome_completo"], keys["data_validade"],
+                data_json, validations_json, now
+            )
+        )
+        self.bytes_written += len(data_json) + len(validations_json or "")
+
+        fields = self.schemas.get(doc_type)
+        if fields:
+            values = [_text(data.get(f)) for f in fields]
+            columns = ", ".join(f'"{f}"' for f in fields)
+            placeholders = ", ".join("?" for _ in fields)
+            self._conn.execute(
+                f"INSERT INTO {self._table(doc_type)} (document_id, {columns}) "
+                f"VALUES (?, {placeholders})",
+                [cursor.lastrowid] + values
+            )
+
+    def _close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ==================== CONSULTA ====================
+
+    def query(
+        self,
+        document_type: Optional[str] = None,
+        cpf: Optional[str] = None,
+        cnpj: Optional[str] = None,
+        numero_registro: Optional[str] = None,
+        nome: Optional[str] = None,
+        validade_de: Optional[str] = None,
+        validade_ate: Optional[str] = None,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """
+        Consulta extrações usando os índices da tabela central.
+
+        Args:
+            document_type: Filtra por tipo ("rg", "cnh", "cpf", "cnpj")
+            cpf: CPF (com ou sem formatação)
+            cnpj: CNPJ (com ou sem formatação)
+            numero_registro: Número de registro da CNH
+            nome: Prefixo do nome completo / razão social (sem diferenciar acentos)
+            validade_de: Data de validade mínima (DD/MM/AAAA ou AAAA-MM-DD)
+            validade_ate: Data de validade máxima (DD/MM/AAAA ou AAAA-MM-DD)
+            limit: Máximo de registros retornados
+
+        Returns:
+            Lista de dicts com image_path, document_type, data e validations
+
+        Raises:
+            ValueError: Se validade_de/validade_ate não for uma data válida
+        """
+        self.flush()
+        sql, params = self._build_query(
+            document_type, cpf, cnpj, numero_registro, nome, validade_de, validade_ate
+        )
+        # Consultas por validade saem ordenadas pelo próprio índice
+        sql += " ORDER BY data_validade, id" if (validade_de or validade_ate) else " ORDER BY id"
+        sql += " LIMIT ?"
+        params.append(int(limit))
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def explain(self, **filters) -> List[str]:
+        """Plano de execução do SQLite para uma consulta (confirma uso de índice)"""
+        sql, params = self._build_query(
+            filters.get("document_type"), filters.get("cpf"), filters.get("cnpj"),
+            filters.get("numero_registro"), filters.get("nome"),
+            filters.get("validade_de"), filters.get("validade_ate")
+        )
+        with self._lock:
+            rows = self._conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        return [row["detail"] for row in rows]
+
+    def _build_query(self, document_type, cpf, cnpj, numero_registro, nome, validade_de, validade_ate):
+        where = []
+        params: List[Any] = []
+
+        if document_type:
+            where.append("document_type = ?")
+            params.append(document_type.lower())
+        for column, value in (("cpf", cpf), ("cnpj", cnpj), ("numero_registro", numero_registro)):
+            if value:
+                where.append(f"{column} = ?")
+                params.append(_digits(value))
+        # Nome só com espaços não filtra
+        prefix = _normalize_name(nome)
+        if prefix:
+            # Faixa [prefixo, prefixo + U+FFFF) usa o índice, ao contrário de LIKE
+            where.append("nome_completo >= ? AND nome_completo < ?")
+            params.extend([prefix, prefix + "\uffff"])
+        for operator, value in ((">=", validade_de), ("<=", validade_ate)):
+            if value:
+                # Comparar o texto cru com datas ISO daria resultados sem sentido
+                date = _iso_date(value)
+                if date is None:
+                    raise ValueError(f"Data de validade inválida: {value} (use DD/MM/AAAA ou AAAA-MM-DD)")
+                where.append(f"data_validade {operator} ?")
+                params.append(date)
+
+        sql = "SELECT * FROM documents"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return sql, params
+
+    def get_fields(self, image_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Retorna a linha normalizada (tabela doc_<tipo>) de uma imagem.
+
+        Args:
+            image_path: Caminho da imagem extraída
+
+        Returns:
+            Dict campo -> valor, ou None se não encontrada
+        """
+        self.flush()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, document_type FROM documents WHERE image_path = ?", (image_path,)
+            ).fetchone()
+            if row is None or row["document_type"] not in self.schemas:
+                return None
+            fields = self._conn.execute(
+                f"SELECT * FROM {self._table(row['document_type'])} WHERE document_id = ?", (row["id"],)
+            ).fetchone()
+        return dict(fields) if fields else None
+
+    def count(self) -> Dict[str, int]:
+        """Quantidade de extrações armazenadas por tipo de documento"""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT document_type, COUNT(*) AS total FROM documents GROUP BY document_type"
+            ).fetchall()
+        return {row["document_type"]: row["total"] for row in rows}
+
+    @staticmethod
+    def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "image_path": row["image_path"],
+            "document_type": row["document_type"],
+            "status": row["status"],
+            "data": json.loads(row["data"]) if row["data"] else None,
+            "validations": json.loads(row["validations"]) if row["validations"] else None,
+            "created_at": row["created_at"]
+        }
@@ -0,0 +1,265 @@
+"""
+Backend falso do Gemini para benchmarks e testes locais: responde com
+latência configurável e simula limites de cota (429), chaves recusadas e
+lentidão do servidor sob excesso de chamadas simultâneas
+"""
+import json
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+# Resposta padrão: uma CNH fictícia com CPF válido
+SAMPLE_DATA = {
+    "tipo_documento": "CNH",
+    "numero_registro": "00000000000",
+    "nome_completo": "Pessoa Exemplo 0",
+    "data_nascimento": "15/05/1990",
+    "cpf": "111.444.777-35",
+    "data_emissao": "01/01/2020",
+    "data_validade": "01/01/2025",
+    "categoria": "AB",
+    "orgao_emissor": "DETRAN/SP"
+}
+
+# Respostas em streaming: fração da latência até o primeiro trecho (leitura
+# da imagem e do prompt); o restante chega em trechos de STREAM_CHUNK_CHARS
+FIRST_CHUNK_FRACTION = 0.3
+STREAM_CHUNK_CHARS = 24
+
+
+class QuotaExceeded(Exception):
+    """Equivalente ao 429 RESOURCE_EXHAUSTED da API"""
+
+    code = 429
+
+
+class InvalidApiKey(Exception):
+    """Equivalente ao 400 API_KEY_INVALID / 403 PERMISSION_DENIED da API"""
+
+    code = 403
+
+
+class BackendTimeout(Exception):
+    """Equivalente ao 504 DEADLINE_EXCEEDED (timeout de request_options esgotado)"""
+
+    code = 504
+
+
+def _timeout_of(request_options: Any) -> Optional[float]:
+    """Timeout pedido em request_options (dict ou objeto, como no SDK)"""
+    if isinstance(request_options, dict):
+        return request_options.get("timeout")
+    return getattr(request_options, "timeout", None)
+
+
+def _wait(seconds: float, started: float, timeout: Optional[float]) -> None:
+    """Espera `seconds`, ou até o timeout da chamada (lançando BackendTimeout)"""
+    if timeout is not None and time.monotonic() - started + seconds > timeout:
+        time.sleep(max(0.0, timeout - (time.monotonic() - started)))
+        raise BackendTimeout("504 Deadline Exceeded")
+    time.sleep(seconds)
+
+
+class FakeUsage:
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.total_token_count = prompt_tokens + output_tokens
+
+
+class FakeResponse:
+    def __init__(self, text: str, usage: Optional[FakeUsage] = None):
+        self.text = text
+        self.usage_metadata = usage
+
+
+class FakeChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeStreamResponse:
+    """Resposta de generate_content(stream=True): iterável de trechos; text e uso completos ao final"""
+
+    def __init__(self, chunks: Iterable[str], usage: Optional[FakeUsage] = None):
+        self._chunks = iter(chunks)
+        self._parts = []
+        self.usage_metadata = usage
+
+    def __iter__(self) -> Iterator[FakeChunk]:
+        for text in self._chunks:
+            self._parts.append(text)
+            yield FakeChunk(text)
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+
+def stream_chunks(
+    text: str,
+    latency: float,
+    chunk_chars: int = STREAM_CHUNK_CHARS,
+    timeout: Optional[float] = None
+) -> Iterator[str]:
+    """Divide o texto em trechos, distribuindo a latência como um modelo gerando aos poucos"""
+    started = time.monotonic()
+    pieces = [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)] or [""]
+    _wait(latency * FIRST_CHUNK_FRACTION, started, timeout)
+    yield pieces[0]
+    step = latency * (1 - FIRST_CHUNK_FRACTION) / max(1, len(pieces) - 1)
+    for piece in pieces[1:]:
+        _wait(step, started, timeout)
+        yield piece
+
+
+class FakeGeminiModel:
+    """Substitui genai.GenerativeModel (mesmo generate_content)"""
+
+    def __init__(
+        self,
+        latency: float = 0.2,
+        requests_per_window: Optional[int] = None,
+        tokens_per_window: Optional[int] = None,
+        window_seconds: float = 60.0,
+        max_concurrency: Optional[int] = None,
+        response_text: Optional[str] = None,
+        tokens_per_request: int = 1500,
+        malformed_rate: float = 0.0,
+        connect_latency: float = 0.0,
+        hang_rate: float = 0.0,
+        hang_seconds: float = 600.0,
+        invalid_key: bool = False
+    ):
+        """
+        Inicializa o backend.
+
+        Args:
+            latency: Latência de uma chamada sem fila no servidor
+            requests_per_window: Cota de requisições por janela (None = sem cota)
+            tokens_per_window: Cota de tokens por janela (None = sem cota)
+            window_seconds: Janela deslizante das cotas (60 = por minuto)
+            max_concurrency: Acima disso a latência cresce proporcionalmente
+                às chamadas simultâneas (servidor saturado)
+            response_text: Texto devolvido (padrão: JSON de SAMPLE_DATA)
+            tokens_per_request: Tokens cobrados por chamada
+            malformed_rate: Fração das respostas com JSON truncado (como um
+                modelo mais fraco que às vezes não segue o formato)
+            connect_latency: Custo da primeira chamada deste cliente (conexão,
+                TLS e autenticação); as seguintes reusam a conexão
+            hang_rate: Fração das chamadas que travam (conexão presa) por
+                hang_seconds, ou até o timeout de request_options
+            invalid_key: Se True, toda chamada falha como chave recusada
+        """
+        self.latency = latency
+        self.requests_per_window = requests_per_window
+        self.tokens_per_window = tokens_per_window
+        self.window_seconds = window_seconds
+        self.max_concurrency = max_concurrency
+        self.response_text = response_text or json.dumps(SAMPLE_DATA, ensure_ascii=False)
+        self.tokens_per_request = tokens_per_request
+        self.malformed_rate = malformed_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.invalid_key = invalid_key
+        self.timeouts = 0
+        self._random = random.Random(0)
+        self.connect_latency = connect_latency
+        self.connected = False
+        self._connect_lock = threading.Lock()
+
+        self.calls = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._window: deque = deque()
+        self._window_tokens = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> None:
+        """Chamadas simultâneas ao cliente ainda frio esperam a mesma conexão"""
+        if self.connected:
+            return
+        with self._connect_lock:
+            if not self.connected:
+                time.sleep(self.connect_latency)
+                self.connected = True
+
+    def count_tokens(self, contents: Any, **kwargs) -> FakeUsage:
+        self._connect()
+        return FakeUsage(len(str(contents)) // 4, 0)
+
+    def generate_content(
+        self,
+        contents: Any,
+        stream: bool = False,
+        request_options: Any = None,
+        **kwargs
+    ) -> Any:
+        self._connect()
+        if self.invalid_key:
+            raise InvalidApiKey("400 API key not valid. Please pass a valid API key. [API_KEY_INVALID]")
+        started = time.monotonic()
+        timeout = _timeout_of(request_options)
+        with self._lock:
+            now = time.monotonic()
+            while self._window and now - self._window[0][0] > self.window_seconds:
+                self._window_tokens -= self._window.popleft()[1]
+
+            over_requests = self.requests_per_window is not None and len(self._window) >= self.requests_per_window
+            over_tokens = (
+                self.tokens_per_window is not None
+                and self._window_tokens + self.tokens_per_request > self.tokens_per_window
+            )
+            if over_requests or over_tokens:
+                self.throttled += 1
+                raise QuotaExceeded("429 Resource has been exhausted (e.g. check quota).")
+
+            self._window.append((now, self.tokens_per_request))
+            self._window_tokens += self.tokens_per_request
+            self.calls += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            load = self.in_flight / self.max_concurrency if self.max_concurrency else 1.0
+            text = self.response_text
+            if self.malformed_rate and self._random.random() < self.malformed_rate:
+                text = text[: len(text) // 2]
+            latency = self.latency * max(1.0, load)
+            if self.hang_rate and self._random.random() < self.hang_rate:
+                latency = self.hang_seconds
+
+        output_tokens = len(text) // 4
+        usage = FakeUsage(self.tokens_per_request - output_tokens, output_tokens)
+        if stream:
+            return FakeStreamResponse(self._stream(text, latency, timeout), usage)
+
+        try:
+            _wait(latency, started, timeout)
+        except BackendTimeout:
+            self.timeouts += 1
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        return FakeResponse(text, usage)
+
+    def _stream(self, text: str, latency: float, timeout: Optional[float]) -> Iterator[str]:
+        """Trechos da resposta; a chamada fica em andamento até o último"""
+        try:
+            yield from stream_chunks(text, latency, timeout=timeout)
+        except BackendTimeout:
+            self.timeouts += 1
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "throttled": self.throttled,
+            "timeouts": self.timeouts,
+            "peak_in_flight": self.peak_in_flight
+        }
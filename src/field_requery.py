@@ -0,0 +1,116 @@
+"""
+Reextração seletiva de campos: em vez de repetir a extração do documento
+inteiro, pergunta ao modelo só pelos campos que falharam na validação, com
+um prompt curto e, opcionalmente, apenas o recorte da região desses campos
+"""
+import io
+import re
+from typing import Dict, Iterable, Optional, Tuple
+from PIL import Image
+
+# Regiões aproximadas dos campos (frações x0, y0, x1, y1 do documento já
+# recortado por image_roi, frente da CNH modelo 2017 na horizontal). São
+# largas de propósito: cobrem variações de layout e de recorte
+FIELD_REGIONS: Dict[str, Dict[str, Tuple[float, float, float, float]]] = {
+    "cnh": {
+        "nome_completo": (0.25, 0.10, 1.00, 0.32),
+        "data_nascimento": (0.55, 0.25, 1.00, 0.50),
+        "cpf": (0.55, 0.25, 1.00, 0.55),
+        "data_emissao": (0.25, 0.20, 1.00, 0.45),
+        "numero_registro": (0.25, 0.55, 0.80, 0.85),
+        "data_validade": (0.45, 0.55, 1.00, 0.85),
+        "data_primeira_habilitacao": (0.60, 0.55, 1.00, 0.85),
+        "categoria": (0.70, 0.55, 1.00, 0.90),
+    },
+}
+
+# Folga em volta da região, em fração do documento
+REGION_MARGIN = 0.05
+
+# Tokens esperados na resposta por campo pedido (um par "campo": "valor")
+FIELD_OUTPUT_TOKENS = 20
+
+
+def field_formats(prompt: str) -> Dict[str, str]:
+    """
+    Formato de exemplo de cada campo no esquema JSON de um prompt de extração.
+
+    Args:
+        prompt: Prompt de DocumentExtractor.PROMPTS
+
+    Returns:
+        Dict campo -> exemplo (ex: "cpf" -> "XXX.XXX.XXX-XX")
+    """
+    return dict(re.findall(r'^\s*"(\w+)":\s*"([^"]*)"', prompt, flags=re.MULTILINE))
+
+
+def build_field_prompt(document_type: str, fields: Iterable[str], formats: Dict[str, str]) -> str:
+    """
+    Prompt curto que pede apenas alguns campos.
+
+    Args:
+        document_type: Tipo do documento ("rg", "cnh", ...)
+        fields: Campos a reler
+        formats: Exemplo de formato por campo (ver field_formats)
+
+    Returns:
+        Prompt com o esquema JSON reduzido aos campos pedidos
+    """
+    schema = ",\n".join(f'  "{field}": "{formats.get(field, "valor")}"' for field in fields)
+    label = document_type.upper() if document_type and document_type != "auto" else "documento brasileiro"
+    return (
+        f"Nesta imagem de {label}, leia com atenção APENAS os campos abaixo, "
+        f"caractere por caractere (não confunda 0/8, 1/7, 5/6).\n\n"
+        f"Retorne APENAS o JSON, com null para campos não visíveis:\n\n{{\n{schema}\n}}\n"
+    )
+
+
+def field_region(document_type: str, fields: Iterable[str]) -> Optional[Tuple[float, float, float, float]]:
+    """
+    Região que cobre todos os campos pedidos (None se algum não tiver região).
+
+    Args:
+        document_type: Tipo do documento
+        fields: Campos a reler
+
+    Returns:
+        (x0, y0, x1, y1) em frações do documento, já com REGION_MARGIN
+    """
+    regions = FIELD_REGIONS.get((document_type or "").lower(), {})
+    boxes = [regions.get(field) for field in fields]
+    if not boxes or None in boxes:
+        return None
+    return (
+        max(0.0, min(box[0] for box in boxes) - REGION_MARGIN),
+        max(0.0, min(box[1] for box in boxes) - REGION_MARGIN),
+        min(1.0, max(box[2] for box in boxes) + REGION_MARGIN),
+        min(1.0, max(box[3] for box in boxes) + REGION_MARGIN),
+    )
+
+
+def crop_region(
+    data: bytes,
+    region: Tuple[float, float, float, float],
+    quality: int = 90
+) -> Tuple[bytes, Tuple[int, int]]:
+    """
+    Recorta uma região de um JPEG preparado por image_prep.
+
+    Args:
+        data: Bytes JPEG do documento
+        region: (x0, y0, x1, y1) em frações da imagem
+        quality: Qualidade do JPEG gerado
+
+    Returns:
+        Tupla (bytes JPEG do recorte, tamanho)
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        width, height = image.size
+        box = (
+            int(region[0] * width), int(region[1] * height),
+            int(region[2] * width), int(region[3] * height)
+        )
+        part = image.crop(box)
+        buffer = io.BytesIO()
+        part.save(buffer, format="JPEG", quality=quality)
+        return buffer.getvalue(), part.size
@@ -0,0 +1,242 @@
+"""
+Preparação local de imagens antes do envio ao Gemini
+(decodificação, rotação pela orientação EXIF, redimensionamento e JPEG).
+Também rasteriza páginas de TIFFs multipágina e PDFs sob demanda
+"""
+import io
+import time
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional
+from PIL import Image, ImageOps
+
+from image_quality import measure_quality
+from image_roi import crop_document
+
+
+# Maior lado da imagem enviada; acima disso o modelo não ganha precisão
+DEFAULT_MAX_SIDE = 2048
+DEFAULT_JPEG_QUALITY = 90
+
+# Resolução de rasterização de PDFs (cartões CNPJ e RGs digitalizados)
+PDF_DPI = 200
+
+IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tiff", ".tif", ".pdf"]
+
+
+def find_images(directory: str, recursive: bool = True) -> List[str]:
+    """
+    Caminhos das imagens e PDFs de um diretório.
+
+    Args:
+        directory: Diretório de busca
+        recursive: Se True, inclui subdiretórios
+
+    Returns:
+        Lista ordenada de caminhos
+    """
+    path = Path(directory)
+    images = []
+    for ext in IMAGE_EXTENSIONS:
+        pattern = f"*{ext}"
+        images.extend(str(f) for f in (path.rglob(pattern) if recursive else path.glob(pattern)))
+    return sorted(images)
+
+
+def prepare_image(
+    image_path: str,
+    max_side: Optional[int] = DEFAULT_MAX_SIDE,
+    quality: int = DEFAULT_JPEG_QUALITY,
+    crop: bool = False,
+    check_quality: bool = False
+) -> Dict[str, Any]:
+    """
+    Decodifica, corrige a rotação, redimensiona e recodifica uma imagem.
+
+    Função de módulo (serializável) para rodar em ProcessPoolExecutor.
+
+    Args:
+        image_path: Caminho para a imagem
+        max_side: Maior lado permitido em pixels (None mantém o tamanho)
+        quality: Qualidade do JPEG gerado
+        crop: Se True, recorta o(s) documento(s) da foto antes de codificar
+            (ver image_roi); frente e verso lado a lado viram partes separadas
+        check_quality: Se True, mede nitidez, exposição e resolução
+            (ver image_quality) em "quality_metrics"
+
+    Returns:
+        Dict com status, bytes JPEG em "data" e tamanhos original/final;
+        com crop, também "parts" (um JPEG por recorte) e "roi" (estatísticas)
+    """
+    start = time.perf_counter()
+    path = Path(image_path)
+
+    if not path.exists():
+        return {
+            "status": "error",
+            "message": f"Arquivo não encontrado: {image_path}",
+            "image_path": image_path,
+            "failure": "missing_file"
+        }
+
+    try:
+        with Image.open(path) as image:
+            return _encode(
+                image, str(path), max_side, quality, start, crop=crop, check_quality=check_quality
+            )
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Erro ao preparar imagem: {str(e)}",
+            "image_path": image_path,
+            "failure": "unreadable_image"
+        }
+
+
+def _encode(
+    image: Image.Image,
+    image_path: str,
+    max_side: Optional[int],
+    quality: int,
+    start: float,
+    page: Optional[int] = None,
+    crop: bool = False,
+    check_quality: bool = False
+) -> Dict[str, Any]:
+    """Corrige rotação, recorta (opcional), redimensiona e codifica em JPEG"""
+    original_size = image.size
+    image = ImageOps.exif_transpose(image)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    metrics = measure_quality(image, original_size) if check_quality else None
+
+    roi = crop_document(image) if crop else None
+    parts = [_to_jpeg(part, max_side, quality) for part in (roi["images"] if roi else [image])]
+
+    prepared = {
+        "status": "success",
+        "image_path": image_path,
+        "mime_type": "image/jpeg",
+        "data": parts[0][0],
+        "original_size": original_size,
+        "size": parts[0][1],
+        "seconds": time.perf_counter() - start
+    }
+    if metrics is not None:
+        prepared["quality_metrics"] = metrics
+    if roi is not None:
+        prepared["parts"] = [{"mime_type": "image/jpeg", "data": data} for data, _ in parts]
+        prepared["roi"] = {
+            "regions": roi["regions"],
+            "area_ratio": roi["area_ratio"],
+            "sizes": [size for _, size in parts],
+            "seconds": round(roi["seconds"], 4)
+        }
+    if page is not None:
+        prepared["page"] = page
+    return prepared
+
+
+def _to_jpeg(image: Image.Image, max_side: Optional[int], quality: int):
+    """Redimensiona e codifica em JPEG; retorna (bytes, tamanho)"""
+    if max_side and max(image.size) > max_side:
+        image = image.copy()
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    return buffer.getvalue(), image.size
+
+
+def _is_pdf(path: Path) -> bool:
+    return path.suffix.lower() == ".pdf"
+
+
+def _open_pdf(path: Path):
+    """Abre um PDF com PyMuPDF (dependência opcional)"""
+    try:
+        import fitz
+    except ImportError:
+        raise ValueError("Leitura de PDF requer o pacote 'pymupdf' (pip install pymupdf)")
+    return fitz.open(str(path))
+
+
+def page_count(image_path: str) -> int:
+    """
+    Quantidade de páginas de um arquivo, sem decodificar as páginas.
+
+    Args:
+        image_path: Caminho da imagem, TIFF multipágina ou PDF
+
+    Returns:
+        Número de páginas (1 para imagens simples)
+    """
+    path = Path(image_path)
+    if _is_pdf(path):
+        with _open_pdf(path) as pdf:
+            return pdf.page_count
+    with Image.open(path) as image:
+        return getattr(image, "n_frames", 1)
+
+
+def prepare_page(
+    image_path: str,
+    page: int,
+    max_side: Optional[int] = DEFAULT_MAX_SIDE,
+    quality: int = DEFAULT_JPEG_QUALITY,
+    check_quality: bool = False
+) -> Dict[str, Any]:
+    """
+    Rasteriza e prepara apenas uma página de um TIFF/PDF multipágina.
+
+    Args:
+        image_path: Caminho do arquivo
+        page: Índice da página (0 = primeira)
+        max_side: Maior lado permitido em pixels
+        quality: Qualidade do JPEG gerado
+        check_quality: Se True, mede a qualidade da página (ver prepare_image)
+
+    Returns:
+        Dict no formato de prepare_image, com "page"
+    """
+    start = time.perf_counter()
+    path = Path(image_path)
+
+    try:
+        if _is_pdf(path):
+            with _open_pdf(path) as pdf:
+                pixmap = pdf[page].get_pixmap(dpi=PDF_DPI)
+                image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+            return _encode(image, str(path), max_side, quality, start, page, check_quality=check_quality)
+
+        with Image.open(path) as image:
+            image.seek(page)
+            return _encode(image, str(path), max_side, quality, start, page, check_quality=check_quality)
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Erro ao preparar página {page + 1}: {str(e)}",
+            "image_path": image_path,
+            "page": page,
+            "failure": "unreadable_image"
+        }
+
+
+def iter_pages(
+    image_path: str,
+    max_side: Optional[int] = DEFAULT_MAX_SIDE,
+    quality: int = DEFAULT_JPEG_QUALITY
+) -> Iterator[Dict[str, Any]]:
+    """
+    Itera as páginas preparadas de um arquivo, uma por vez.
+
+    Args:
+        image_path: Caminho da imagem, TIFF multipágina ou PDF
+        max_side: Maior lado permitido em pixels
+        quality: Qualidade do JPEG gerado
+
+    Yields:
+        Dict no formato de prepare_page
+    """
+    for page in range(page_count(image_path)):
+        yield prepare_page(image_path, page, max_side, quality)
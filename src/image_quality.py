@@ -0,0 +1,196 @@
+"""
+Verificação local de qualidade da imagem antes do envio ao Gemini:
+nitidez (variância do Laplaciano), exposição (histograma e, para o
+excesso de luz, o contraste do texto junto aos realces estourados) e
+resolução, calculadas com NumPy sobre uma miniatura
+"""
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from PIL import Image
+
+# Maior lado da miniatura usada nas medições
+THUMBNAIL_SIDE = 512
+
+
+@dataclass(frozen=True)
+class QualityThresholds:
+    """Limites abaixo (ou acima) dos quais a imagem é considerada inutilizável"""
+
+    # Variância do Laplaciano na miniatura (contraste normalizado); fotos
+    # nítidas passam de algumas centenas, tremidas ficam abaixo de ~30
+    min_sharpness: float = 40.0
+    # Brilho médio (0-255); acima do máximo só conta se não houver texto
+    # (papel branco de um scan limpo também passa de 225)
+    min_brightness: float = 50.0
+    max_brightness: float = 225.0
+    # Fração máxima de pixels escuros demais (<= 5)
+    max_clipped: float = 0.35
+    # Fração máxima das bordas de texto junto a realces estourados (>= 250)
+    # em que a tinta ficou clara (lavada pela luz ou por um reflexo)
+    max_washed_edges: float = 0.4
+    # Menor lado da imagem original, em pixels
+    min_side: int = 480
+
+
+def _laplacian_variance(gray: np.ndarray) -> float:
+    """
+    Variância do Laplaciano 4-vizinhos (medida clássica de foco).
+
+    O contraste é normalizado antes (percentis 1-99), para que uma foto
+    apenas escura não seja confundida com uma foto desfocada.
+    """
+    low, high = np.percentile(gray, (1, 99))
+    if high - low > 1:
+        gray = (gray - low) * (255.0 / (high - low))
+    lap = (
+        gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:]
+        - 4.0 * gray[1:-1, 1:-1]
+    )
+    return float(lap.var())
+
+
+# Bordas de texto: diferença de brilho entre vizinhos; tinta "lavada": o
+# pixel mais escuro ao redor da borda ainda é claro
+EDGE_GRADIENT = 40.0
+WASHED_INK = 140.0
+CLIPPED_LEVEL = 250.0
+
+
+def _window(gray: np.ndarray, reduce: Any, radius: int = 2) -> np.ndarray:
+    """Mínimo ou máximo (np.minimum / np.maximum) em uma janela (2 * radius + 1)² em volta de cada pixel"""
+    size = 2 * radius + 1
+    padded = np.pad(gray, radius, mode="edge")
+    rows = padded[:-size + 1 or None]
+    for shift in range(1, size):
+        rows = reduce(rows, padded[shift:shift + gray.shape[0]])
+    out = rows[:, :gray.shape[1]]
+    for shift in range(1, size):
+        out = reduce(out, rows[:, shift:shift + gray.shape[1]])
+    return out
+
+
+def _block(gray: np.ndarray, factor: int, reduce: Any) -> np.ndarray:
+    """Reduz a imagem em blocos factor x factor pelo mínimo ou máximo (preserva traços finos)"""
+    if factor <= 1:
+        return gray
+    height, width = (gray.shape[0] // factor) * factor, (gray.shape[1] // factor) * factor
+    out = gray[:height, :width]
+    # Fatias com passo (sem cópias intermediárias): bem mais rápido que reshape + min(axis)
+    for axis in (1, 0):
+        view = out
+        out = view[:, 0::factor] if axis else view[0::factor]
+        for offset in range(1, factor):
+            out = reduce(out, view[:, offset::factor] if axis else view[offset::factor])
+    return out
+
+
+def _edge_exposure(
+    gray: np.ndarray,
+    ink: Optional[np.ndarray] = None,
+    paper: Optional[np.ndarray] = None
+) -> Tuple[float, float]:
+    """
+    Exposição medida no conteúdo do documento, não no fundo.
+
+    Args:
+        gray: Miniatura (média dos blocos)
+        ink: Mínimo de cada bloco (o traço mais escuro, mesmo que fino);
+            None se a imagem não tem realces estourados
+        paper: Máximo de cada bloco
+
+    Returns:
+        (fração dos pixels que são bordas de texto, fração das bordas junto
+        a realces estourados em que a tinta ficou clara)
+    """
+    grad = np.zeros_like(gray)
+    grad[:, :-1] = np.abs(np.diff(gray, axis=1))
+    grad[:-1, :] = np.maximum(grad[:-1, :], np.abs(np.diff(gray, axis=0)))
+    edges = grad > EDGE_GRADIENT
+    count = int(edges.sum())
+    if not count or ink is None:
+        return count / gray.size, 0.0
+    washed = (
+        edges
+        & (_window(paper, np.maximum) >= CLIPPED_LEVEL)
+        & (_window(ink, np.minimum) > WASHED_INK)
+    )
+    return count / gray.size, float(washed.sum()) / count
+
+
+def measure_quality(image: Image.Image, original_size: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
+    """
+    Mede nitidez, exposição e resolução de uma imagem.
+
+    Args:
+        image: Imagem (qualquer modo; já com a rotação EXIF aplicada)
+        original_size: Tamanho do arquivo original (padrão: image.size)
+
+    Returns:
+        Dict com "sharpness", "brightness", "dark_fraction",
+        "bright_fraction", "edge_fraction", "washed_edges", "width",
+        "height" e "seconds"
+    """
+    start = time.perf_counter()
+    width, height = original_size or image.size
+
+    # reduce() (média em blocos) é bem mais rápido que thumbnail() em fotos grandes
+    factor = max(1, max(image.size) // THUMBNAIL_SIDE)
+    small = image.reduce(factor) if factor > 1 else image
+    gray = np.asarray(small.convert("L"), dtype=np.float32)
+    hist = np.bincount(gray.astype(np.uint8).ravel(), minlength=256)
+    total = max(int(hist.sum()), 1)
+
+    # Realces estourados grandes o bastante para importar aparecem já na miniatura
+    if hist[int(CLIPPED_LEVEL):].any():
+        # Mínimo e máximo por bloco na resolução original: a média apagaria o texto fino de um scan
+        full = np.asarray(image.convert("L"))
+        ink = _block(full, factor, np.minimum)[:gray.shape[0], :gray.shape[1]].astype(np.float32)
+        paper = _block(full, factor, np.maximum)[:gray.shape[0], :gray.shape[1]].astype(np.float32)
+        edge_fraction, washed_edges = _edge_exposure(gray[:ink.shape[0], :ink.shape[1]], ink, paper)
+    else:
+        # Sem realces estourados não há tinta lavada; conta só as bordas
+        edge_fraction, washed_edges = _edge_exposure(gray)
+
+    return {
+        "sharpness": round(_laplacian_variance(gray), 1),
+        "brightness": round(float(gray.mean()), 1),
+        "dark_fraction": round(float(hist[:6].sum()) / total, 4),
+        "bright_fraction": round(float(hist[250:].sum()) / total, 4),
+        "edge_fraction": round(edge_fraction, 4),
+        "washed_edges": round(washed_edges, 4),
+        "width": width,
+        "height": height,
+        "seconds": round(time.perf_counter() - start, 4)
+    }
+
+
+def quality_issues(metrics: Dict[str, Any], thresholds: QualityThresholds = QualityThresholds()) -> List[str]:
+    """
+    Motivos (legíveis pelo usuário) pelos quais a imagem não serve para extração.
+
+    Args:
+        metrics: Resultado de measure_quality
+        thresholds: Limites a aplicar
+
+    Returns:
+        Lista de motivos (vazia se a imagem estiver boa)
+    """
+    issues = []
+    if min(metrics["width"], metrics["height"]) < thresholds.min_side:
+        issues.append(
+            f"Resolução muito baixa ({metrics['width']}x{metrics['height']}); "
+            f"o menor lado deve ter pelo menos {thresholds.min_side}px"
+        )
+    if metrics["sharpness"] < thresholds.min_sharpness:
+        issues.append("Imagem desfocada ou tremida; fotografe novamente com o documento em foco")
+    if metrics["brightness"] < thresholds.min_brightness or metrics["dark_fraction"] > thresholds.max_clipped:
+        issues.append("Imagem escura demais; fotografe em local mais iluminado")
+    # Papel branco estourado não é problema enquanto o texto continua escuro
+    overexposed = metrics["washed_edges"] > thresholds.max_washed_edges or (
+        metrics["brightness"] > thresholds.max_brightness and not metrics["edge_fraction"]
+    )
+    if overexposed:
+        issues.append("Imagem superexposta ou com reflexo; evite flash e luz direta sobre o documento")
+    return issues
@@ -0,0 +1,298 @@
+"""
+Detecção local da região do documento (NumPy/PIL) antes do envio:
+localiza o quadrilátero do cartão, corrige a perspectiva/inclinação e
+separa digitalizações com frente e verso lado a lado
+"""
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from PIL import Image
+
+# Maior lado da imagem reduzida usada na detecção
+WORK_SIDE = 512
+# Regiões menores que isso (fração da imagem) são ignoradas
+MIN_AREA_RATIO = 0.05
+# Acima disso o documento já ocupa a imagem inteira e não há o que recortar
+MAX_AREA_RATIO = 0.92
+# Margem adicionada em volta do quadrilátero detectado
+MARGIN_RATIO = 0.02
+# Largura/altura a partir da qual se procura frente e verso lado a lado
+# (um cartão ID-1 tem proporção ~1,59; dois lado a lado, ~3,2)
+SIDE_BY_SIDE_ASPECT = 2.2
+# Fração mínima da borda da foto parecida com o fundo estimado; abaixo disso
+# o documento ocupa a foto inteira (ou o fundo é irregular) e não se recorta
+MIN_BORDER_UNIFORMITY = 0.6
+# Fração mínima de primeiro plano dentro da região detectada
+MIN_SOLIDITY = 0.5
+
+Quad = List[Tuple[float, float]]
+
+
+def _box_blur(values: np.ndarray, radius: int) -> np.ndarray:
+    """Média em janela (2r+1)x(2r+1) via imagem integral"""
+    if radius <= 0:
+        return values
+    padded = np.pad(values, radius + 1, mode="edge").astype(np.float64)
+    integral = padded.cumsum(axis=0).cumsum(axis=1)
+    size = 2 * radius + 1
+    h, w = values.shape
+    total = (
+        integral[size:size + h, size:size + w]
+        - integral[0:h, size:size + w]
+        - integral[size:size + h, 0:w]
+        + integral[0:h, 0:w]
+    )
+    return (total / (size * size)).astype(np.float32)
+
+
+def _otsu(values: np.ndarray) -> float:
+    """Limiar de Otsu para valores em [0, 255]"""
+    hist = np.bincount(np.clip(values, 0, 255).astype(np.uint8).ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    if total == 0:
+        return 0.0
+    levels = np.arange(256)
+    weight = hist.cumsum()
+    mean = (hist * levels).cumsum()
+    global_mean = mean[-1] / total
+    background = weight / total
+    foreground = 1.0 - background
+    valid = (background > 0) & (foreground > 0)
+    between = np.zeros(256)
+    between[valid] = (
+        (global_mean * background[valid] - mean[valid] / total) ** 2
+        / (background[valid] * foreground[valid])
+    )
+    return float(np.argmax(between))
+
+
+def foreground_mask(gray: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Separa o documento do fundo (mesa, tecido, etc).
+
+    O fundo é estimado pela mediana da borda da foto; pixels que diferem
+    dele (em intensidade ou por concentração de bordas) viram primeiro plano.
+
+    Args:
+        gray: Imagem em tons de cinza (float32)
+
+    Returns:
+        Máscara booleana do documento, ou None se a borda da foto não for
+        um fundo uniforme (documento ocupando a foto inteira)
+    """
+    h, w = gray.shape
+    smooth = _box_blur(gray, 2)
+
+    band = max(2, min(h, w) // 40)
+    border = np.concatenate([
+        smooth[:band].ravel(), smooth[-band:].ravel(),
+        smooth[:, :band].ravel(), smooth[:, -band:].ravel()
+    ])
+    background = float(np.median(border))
+    if np.mean(np.abs(border - background) < 25) < MIN_BORDER_UNIFORMITY:
+        return None
+    diff = np.abs(smooth - background)
+
+    gy, gx = np.gradient(smooth)
+    edges = _box_blur(np.hypot(gx, gy), 4)
+
+    mask = (diff > max(_otsu(diff), 12.0)) | (edges > max(_otsu(edges), 8.0) * 1.5)
+    # Fecha buracos deixados pelo texto impresso
+    return _box_blur(mask.astype(np.float32), 3) > 0.5
+
+
+def _runs(profile: np.ndarray, threshold: float) -> List[Tuple[int, int]]:
+    """Intervalos contíguos em que o perfil ultrapassa o limiar"""
+    above = np.concatenate([[False], profile > threshold, [False]])
+    changes = np.flatnonzero(above[1:] != above[:-1])
+    return list(zip(changes[::2], changes[1::2]))
+
+
+def _main_run(profile: np.ndarray) -> Optional[Tuple[int, int]]:
+    """Intervalo com a maior massa do perfil"""
+    if profile.max() <= 0:
+        return None
+    runs = _runs(profile, 0.15 * profile.max())
+    return max(runs, key=lambda r: profile[r[0]:r[1]].sum()) if runs else None
+
+
+def _corners(mask: np.ndarray, r0: int, c0: int) -> Optional[Quad]:
+    """Cantos do quadrilátero: extremos de x+y e x-y dos pixels do documento"""
+    ys, xs = np.nonzero(mask)
+    if len(xs) == 0:
+        return None
+    xs = xs + c0
+    ys = ys + r0
+    s = xs + ys
+    d = xs - ys
+    tl = (xs[s.argmin()], ys[s.argmin()])
+    br = (xs[s.argmax()], ys[s.argmax()])
+    tr = (xs[d.argmax()], ys[d.argmax()])
+    bl = (xs[d.argmin()], ys[d.argmin()])
+    return [tuple(map(float, p)) for p in (tl, tr, br, bl)]
+
+
+def _quad_area(quad: Quad) -> float:
+    """Área pela fórmula do laço (shoelace)"""
+    area = 0.0
+    for (x1, y1), (x2, y2) in zip(quad, quad[1:] + quad[:1]):
+        area += x1 * y2 - x2 * y1
+    return abs(area) / 2.0
+
+
+def _column_spans(profile: np.ndarray, c0: int, c1: int, height: int) -> List[Tuple[int, int]]:
+    """Divide a faixa do documento em frente/verso quando estão lado a lado"""
+    runs = [r for r in _runs(profile, 0.15 * profile.max()) if c0 <= r[0] and r[1] <= c1]
+    biggest = max((profile[a:b].sum() for a, b in runs), default=0.0)
+    major = [r for r in runs if profile[r[0]:r[1]].sum() >= 0.25 * biggest]
+
+    # Junta pedaços do mesmo cartão separados por falhas estreitas na máscara
+    gap = max(2, len(profile) // 50)
+    merged: List[Tuple[int, int]] = []
+    for a, b in major:
+        if merged and a - merged[-1][1] <= gap:
+            merged[-1] = (merged[-1][0], b)
+        else:
+            merged.append((a, b))
+
+    if len(merged) == 2:
+        return merged
+
+    width = c1 - c0
+    if height > 0 and width / height >= SIDE_BY_SIDE_ASPECT:
+        # Cartões encostados: procura um vale no terço central
+        inner = profile[c0:c1]
+        lo, hi = int(width * 0.3), int(width * 0.7)
+        valley = lo + int(np.argmin(inner[lo:hi]))
+        if inner[valley] < 0.2 * inner.max():
+            return [(c0, c0 + valley), (c0 + valley, c1)]
+
+    return [(c0, c1)]
+
+
+def detect_regions(mask: np.ndarray) -> List[Quad]:
+    """
+    Localiza o(s) documento(s) na máscara.
+
+    Args:
+        mask: Máscara de primeiro plano
+
+    Returns:
+        Lista de quadriláteros (tl, tr, br, bl), em coordenadas da máscara;
+        dois quando frente e verso estão lado a lado; vazia se nada for achado
+    """
+    h, w = mask.shape
+    rows = _main_run(mask.mean(axis=1))
+    if rows is None:
+        return []
+    r0, r1 = rows
+
+    cols_profile = mask[r0:r1].mean(axis=0)
+    runs = _runs(cols_profile, 0.15 * cols_profile.max()) if cols_profile.max() > 0 else []
+    if not runs:
+        return []
+    c0, c1 = runs[0][0], runs[-1][1]
+
+    spans = _column_spans(cols_profile, c0, c1, r1 - r0)
+
+    quads = []
+    for s0, s1 in spans:
+        region = mask[r0:r1, s0:s1]
+        quad = _corners(region, r0, s0)
+        if not quad or _quad_area(quad) < MIN_AREA_RATIO * h * w / len(spans):
+            continue
+        # Cartão é uma região sólida; texto espalhado numa folha não é
+        if region.mean() < MIN_SOLIDITY:
+            continue
+        quads.append(quad)
+    return quads
+
+
+def _expand(quad: Quad, ratio: float, size: Tuple[int, int]) -> Quad:
+    """Afasta os cantos do centro (margem) sem sair da imagem"""
+    cx = sum(p[0] for p in quad) / 4
+    cy = sum(p[1] for p in quad) / 4
+    w, h = size
+    return [
+        (
+            min(max(cx + (x - cx) * (1 + ratio), 0), w - 1),
+            min(max(cy + (y - cy) * (1 + ratio), 0), h - 1)
+        )
+        for x, y in quad
+    ]
+
+
+def _perspective_coefficients(source: Quad, width: int, height: int) -> List[float]:
+    """Coeficientes de Image.PERSPECTIVE que levam o retângulo de saída ao quadrilátero"""
+    target = [(0, 0), (width, 0), (width, height), (0, height)]
+    matrix = []
+    vector = []
+    for (x, y), (u, v) in zip(target, source):
+        matrix.append([x, y, 1, 0, 0, 0, -u * x, -u * y])
+        matrix.append([0, 0, 0, x, y, 1, -v * x, -v * y])
+        vector.extend([u, v])
+    return np.linalg.solve(np.array(matrix, dtype=np.float64), np.array(vector, dtype=np.float64)).tolist()
+
+
+def warp(image: Image.Image, quad: Quad) -> Image.Image:
+    """
+    Recorta o quadrilátero e corrige perspectiva/inclinação.
+
+    Args:
+        image: Imagem original
+        quad: Cantos (tl, tr, br, bl) em coordenadas da imagem
+
+    Returns:
+        Imagem retangular do documento
+    """
+    tl, tr, br, bl = quad
+    width = int(max(np.hypot(tr[0] - tl[0], tr[1] - tl[1]), np.hypot(br[0] - bl[0], br[1] - bl[1])))
+    height = int(max(np.hypot(bl[0] - tl[0], bl[1] - tl[1]), np.hypot(br[0] - tr[0], br[1] - tr[1])))
+    coefficients = _perspective_coefficients(quad, width, height)
+    return image.transform((width, height), Image.PERSPECTIVE, coefficients, Image.BICUBIC)
+
+
+def crop_document(image: Image.Image) -> Dict[str, Any]:
+    """
+    Recorta o(s) documento(s) de uma foto.
+
+    Args:
+        image: Imagem RGB já com a rotação EXIF aplicada
+
+    Returns:
+        Dict com "images" (recortes; a original se nada for detectado),
+        "regions" (quadriláteros), "area_ratio" (pixels enviados / originais)
+        e "seconds"
+    """
+    start = time.perf_counter()
+    small = image.copy()
+    small.thumbnail((WORK_SIDE, WORK_SIDE))
+    scale_x = image.width / small.width
+    scale_y = image.height / small.height
+
+    mask = foreground_mask(np.asarray(small.convert("L"), dtype=np.float32))
+    quads = [
+        _expand([(x * scale_x, y * scale_y) for x, y in quad], MARGIN_RATIO, image.size)
+        for quad in (detect_regions(mask) if mask is not None else [])
+    ]
+
+    total_area = float(image.width * image.height)
+    covered = sum(_quad_area(q) for q in quads) / total_area
+
+    if not quads or (len(quads) == 1 and covered > MAX_AREA_RATIO):
+        return {
+            "images": [image],
+            "regions": [],
+            "area_ratio": 1.0,
+            "seconds": time.perf_counter() - start
+        }
+
+    crops = [warp(image, quad) for quad in quads]
+    sent = sum(c.width * c.height for c in crops)
+
+    return {
+        "images": crops,
+        "regions": [[(round(x), round(y)) for x, y in q] for q in quads],
+        "area_ratio": round(sent / total_area, 4),
+        "seconds": time.perf_counter() - start
+    }
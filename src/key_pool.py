@@ -0,0 +1,359 @@
+"""
+Várias chaves da API do Gemini, cada uma com o seu orçamento RPM/TPM (token
+bucket) e saúde: as chamadas vão para a chave saudável menos carregada, e
+uma chave que recebe erro de autenticação ou de cota fica em quarentena
+por um tempo
+"""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from deadlines import DeadlineExceeded, current_deadline
+from rate_control import TokenBucket, is_throttle_error, response_tokens
+
+# Quarentena após um 429: dobra a cada 429 seguido, até QUOTA_QUARANTINE_MAX
+QUOTA_QUARANTINE = 30.0
+QUOTA_QUARANTINE_MAX = 300.0
+# Chave recusada (inválida, revogada, sem permissão) só volta bem depois
+AUTH_QUARANTINE = 900.0
+# Tokens reservados por chamada antes do primeiro uso real (corrigido pela média)
+DEFAULT_TOKENS_PER_REQUEST = 1500
+
+
+def key_error_kind(error: BaseException) -> Optional[str]:
+    """
+    Tipo de falha de uma chamada que diz respeito à chave.
+
+    Args:
+        error: Exceção da chamada ao modelo
+
+    Returns:
+        "auth" (401/403, chave inválida), "quota" (429) ou None
+    """
+    if getattr(error, "code", None) in (401, 403) or type(error).__name__ in ("PermissionDenied", "Unauthenticated"):
+        return "auth"
+    text = str(error)
+    if "API_KEY_INVALID" in text or "API key not valid" in text or "PERMISSION_DENIED" in text:
+        return "auth"
+    if is_throttle_error(error):
+        return "quota"
+    return None
+
+
+def parse_key(spec: str) -> Dict[str, Any]:
+    """
+    Converte "chave[:rpm[:tpm]]" nos argumentos de ApiKey.
+
+    Args:
+        spec: Chave, opcionalmente com orçamento próprio (ex: "AIza...:60:1000000")
+
+    Returns:
+        Dict com key, rpm e tpm (None = padrão do pool)
+    """
+    key, *budget = spec.strip().split(":")
+    try:
+        rpm, tpm = (float(value) if value else None for value in (budget + [""] * 2)[:2])
+    except ValueError:
+        raise ValueError(f"Chave inválida: ...{key[-4:]} (formato: chave[:rpm[:tpm]])")
+    return {"key": key, "rpm": rpm, "tpm": tpm}
+
+
+class ApiKey:
+    """Uma chave da API com orçamento, chamadas em andamento e quarentena"""
+
+    def __init__(
+        self,
+        key: str,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        period: float = 60.0
+    ):
+        """
+        Inicializa a chave.
+
+        Args:
+            key: Chave da API
+            rpm: Requisições por período desta chave (None = sem limite)
+            tpm: Tokens por período desta chave (None = sem limite)
+            period: Duração do período em segundos
+        """
+        self.key = key
+        # Nos logs e estatísticas a chave aparece só pelo final
+        self.label = f"...{key[-4:]}"
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = TokenBucket(rpm, period) if rpm else None
+        self.tokens = TokenBucket(tpm, period) if tpm else None
+
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.throttled = 0
+        self.auth_errors = 0
+        self.tokens_used = 0
+        self.tokens_per_request = float(DEFAULT_TOKENS_PER_REQUEST)
+        self.strikes = 0
+        self.quarantined_until = 0.0
+        self.quarantine_reason: Optional[str] = None
+        self.last_error: Optional[str] = None
+
+    def healthy(self, now: float) -> bool:
+        return self.quarantined_until <= now
+
+    def stats(self, now: float) -> Dict[str, Any]:
+        return {
+            "key": self.label,
+            "healthy": self.healthy(now),
+            "quarantine_reason": None if self.healthy(now) else self.quarantine_reason,
+            "quarantine_seconds": round(max(0.0, self.quarantined_until - now), 1),
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "auth_errors": self.auth_errors,
+            "tokens_used": self.tokens_used,
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "last_error": self.last_error
+        }
+
+
+class KeyPool:
+    """Distribui as chamadas entre várias chaves da API (thread-safe)"""
+
+    def __init__(
+        self,
+        keys: List[ApiKey],
+        quota_quarantine: float = QUOTA_QUARANTINE,
+        auth_quarantine: float = AUTH_QUARANTINE
+    ):
+        """
+        Inicializa o pool.
+
+        Args:
+            keys: Chaves (ver ApiKey e parse_key)
+            quota_quarantine: Quarentena inicial após um 429 (dobra a cada
+                429 seguido, até QUOTA_QUARANTINE_MAX)
+            auth_quarantine: Quarentena após um erro de autenticação
+        """
+        if not keys:
+            raise ValueError("KeyPool precisa de pelo menos uma chave")
+        self.keys = keys
+        self.quota_quarantine = quota_quarantine
+        self.auth_quarantine = auth_quarantine
+        # Carga relativa à cota de cada chave; sem RPM, vale a maior cota do pool
+        self._weight = max((key.rpm for key in keys if key.rpm), default=1.0)
+        self.quarantines = 0
+        self.quarantine_waits = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_specs(
+        cls,
+        specs: List[str],
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        share: int = 1,
+        **kwargs: Any
+    ) -> "KeyPool":
+        """
+        Cria o pool a partir de "chave[:rpm[:tpm]]".
+
+        Args:
+            specs: Chaves, uma por item (repetidas são ignoradas)
+            rpm: RPM padrão das chaves sem orçamento próprio
+            tpm: TPM padrão das chaves sem orçamento próprio
+            share: Processos que usam as mesmas chaves (o orçamento é dividido)
+            **kwargs: Argumentos de KeyPool
+
+        Returns:
+            KeyPool
+        """
+        keys: Dict[str, ApiKey] = {}
+        for spec in specs:
+            parsed = parse_key(spec)
+            if not parsed["key"] or parsed["key"] in keys:
+                continue
+            key_rpm, key_tpm = parsed["rpm"] or rpm, parsed["tpm"] or tpm
+            keys[parsed["key"]] = ApiKey(
+                parsed["key"],
+                key_rpm / share if key_rpm else None,
+                key_tpm / share if key_tpm else None
+            )
+        return cls(list(keys.values()), **kwargs)
+
+    @classmethod
+    def from_env(
+        cls,
+        path: Optional[str] = None,
+        share: int = 1,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None
+    ) -> Optional["KeyPool"]:
+        """
+        Pool das chaves configuradas no ambiente ou em um arquivo.
+
+        GOOGLE_API_KEYS lista as chaves separadas por vírgula e
+        GOOGLE_API_KEYS_FILE (ou path) aponta para um arquivo com uma chave
+        por linha (# comenta); ambas no formato chave[:rpm[:tpm]].
+        GEMINI_KEY_RPM e GEMINI_KEY_TPM definem o orçamento padrão por chave.
+
+        Args:
+            path: Arquivo de chaves (padrão: GOOGLE_API_KEYS_FILE)
+            share: Processos que usam as mesmas chaves (o orçamento é dividido)
+            rpm: RPM padrão por chave (padrão: GEMINI_KEY_RPM)
+            tpm: TPM padrão por chave (padrão: GEMINI_KEY_TPM)
+
+        Returns:
+            KeyPool, ou None se nenhuma chave estiver configurada
+        """
+        specs = [spec for spec in os.getenv("GOOGLE_API_KEYS", "").split(",") if spec.strip()]
+        path = path or os.getenv("GOOGLE_API_KEYS_FILE")
+        if path:
+            for line in Path(path).read_text(encoding="utf-8").splitlines():
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    specs.append(line)
+        if not specs:
+            return None
+        return cls.from_specs(
+            specs,
+            rpm=rpm or float(os.getenv("GEMINI_KEY_RPM") or 0) or None,
+            tpm=tpm or float(os.getenv("GEMINI_KEY_TPM") or 0) or None,
+            share=share
+        )
+
+    def clone(self) -> "KeyPool":
+        """Mesmas chaves e orçamentos, com contadores zerados (ex: depois de um fork)"""
+        return KeyPool(
+            [ApiKey(key.key, key.rpm, key.tpm) for key in self.keys],
+            self.quota_quarantine,
+            self.auth_quarantine
+        )
+
+    def _pick(self, now: float) -> Optional[ApiKey]:
+        """Chave saudável menos carregada: sem espera no orçamento, menos chamadas em andamento"""
+        healthy = [key for key in self.keys if key.healthy(now)]
+        if not healthy:
+            return None
+        return min(healthy, key=lambda key: (
+            key.requests is not None and key.requests.available() < 1,
+            key.in_flight / (key.rpm or self._weight),
+            key.calls
+        ))
+
+    def choose(self) -> ApiKey:
+        """Chave para uma chamada que não consome cota de geração (ex: count_tokens)"""
+        with self._lock:
+            return self._pick(time.monotonic()) or min(self.keys, key=lambda key: key.quarantined_until)
+
+    def has_healthy(self) -> bool:
+        """True se alguma chave está fora de quarentena"""
+        with self._lock:
+            now = time.monotonic()
+            return any(key.healthy(now) for key in self.keys)
+
+    def acquire(self) -> ApiKey:
+        """
+        Reserva a chave da próxima chamada, esperando o orçamento dela.
+
+        Com todas as chaves em quarentena por cota, espera a primeira voltar.
+
+        Returns:
+            ApiKey (devolver com release)
+
+        Raises:
+            DeadlineExceeded: O prazo do contexto (ver deadlines) acabou esperando
+            PermissionError: Todas as chaves foram recusadas pela API
+        """
+        deadline = current_deadline()
+        waited = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                key = self._pick(now)
+                if key is not None:
+                    key.in_flight += 1
+                else:
+                    self.quarantine_waits += not waited
+                    waited = True
+                    if all(k.quarantine_reason == "auth" for k in self.keys):
+                        raise PermissionError(
+                            f"Todas as chaves da API foram recusadas: {self.keys[-1].last_error}"
+                        )
+                    wait = min(k.quarantined_until for k in self.keys) - now
+            if key is None:
+                if deadline is not None and deadline.timeout() is not None and deadline.timeout() < wait:
+                    raise DeadlineExceeded("queue", deadline)
+                time.sleep(min(wait, 0.25))
+                continue
+
+            timeout = deadline.timeout() if deadline is not None else None
+            if (
+                (key.requests is not None and not key.requests.acquire(1, timeout))
+                or (key.tokens is not None and not key.tokens.acquire(key.tokens_per_request, timeout))
+            ):
+                with self._lock:
+                    key.in_flight -= 1
+                raise DeadlineExceeded("queue", deadline)
+            return key
+
+    def release(self, key: ApiKey, response: Any = None, error: Optional[BaseException] = None) -> None:
+        """
+        Devolve a chave com o desfecho da chamada.
+
+        Args:
+            key: Chave reservada por acquire
+            response: Resposta do modelo (para o uso real de tokens)
+            error: Exceção da chamada; erros de cota ou de autenticação
+                põem a chave em quarentena
+        """
+        kind = key_error_kind(error) if error is not None else None
+        with self._lock:
+            key.in_flight -= 1
+            if error is None:
+                key.calls += 1
+                key.strikes = 0
+                used = response_tokens(response) or int(key.tokens_per_request)
+                key.tokens_used += used
+                if key.tokens is not None:
+                    # Acerta a reserva feita em acquire com o uso real
+                    key.tokens.charge(used - min(key.tokens_per_request, key.tokens.capacity))
+                key.tokens_per_request = 0.9 * key.tokens_per_request + 0.1 * used
+                return
+
+            key.errors += 1
+            key.last_error = str(error)[:200]
+            if kind is None:
+                return
+            if kind == "auth":
+                key.auth_errors += 1
+                seconds = self.auth_quarantine
+            else:
+                key.throttled += 1
+                key.strikes += 1
+                seconds = min(QUOTA_QUARANTINE_MAX, self.quota_quarantine * 2 ** (key.strikes - 1))
+            key.quarantined_until = time.monotonic() + seconds
+            key.quarantine_reason = kind
+            self.quarantines += 1
+
+        from event_log import log_event
+        log_event(
+            "keys.quarantined", "Chave {key} em quarentena por {seconds:g}s ({reason})", "WARNING",
+            key=key.label, seconds=seconds, reason=kind, error=key.last_error
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Uso e saúde de cada chave"""
+        with self._lock:
+            now = time.monotonic()
+            keys = [key.stats(now) for key in self.keys]
+            return {
+                "keys": len(self.keys),
+                "healthy": sum(1 for key in keys if key["healthy"]),
+                "quarantines": self.quarantines,
+                "quarantine_waits": self.quarantine_waits,
+                "per_key": keys
+            }
@@ -0,0 +1,210 @@
+"""
+Cascata de modelos: cada documento vai primeiro a um modelo mais barato e
+rápido e só sobe para um modelo mais forte se a resposta não for um JSON
+válido ou se os dados extraídos falharem nas validações
+"""
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+# Ordem dos modelos por tipo de documento ("default" vale para os demais)
+DEFAULT_ROUTES: Dict[str, Tuple[str, ...]] = {
+    "default": ("gemini-2.5-flash-lite", "gemini-2.5-flash"),
+    # Cartão CNPJ é denso em texto: o modelo leve erra mais e quase sempre escala
+    "cnpj": ("gemini-2.5-flash", "gemini-2.5-pro"),
+}
+
+# Preço de tabela em USD por 1M de tokens (entrada, saída); ajuste ao contrato
+DEFAULT_PRICES: Dict[str, Tuple[float, float]] = {
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+
+# Motivos de escalada (ou de falha no último modelo)
+ESCALATION_REASONS = ("parse", "validation", "error")
+
+
+def parse_routes(spec: str) -> Tuple[str, ...]:
+    """
+    Converte uma lista de modelos separada por vírgulas (ex: variável de ambiente).
+
+    Args:
+        spec: Ex: "gemini-2.5-flash-lite,gemini-2.5-flash"
+
+    Returns:
+        Tupla de nomes de modelo, na ordem da cascata
+    """
+    return tuple(name.strip() for name in spec.split(",") if name.strip())
+
+
+def response_usage(response: Any) -> Tuple[int, int]:
+    """(tokens de entrada, tokens de saída) cobrados, ou (0, 0) se indisponível"""
+    usage = getattr(response, "usage_metadata", None)
+    return (
+        int(getattr(usage, "prompt_token_count", 0) or 0),
+        int(getattr(usage, "candidates_token_count", 0) or 0)
+    )
+
+
+class _TierStats:
+    """Contadores de um modelo da cascata"""
+
+    def __init__(self):
+        self.attempts = 0
+        self.accepted = 0
+        self.failed = {reason: 0 for reason in ESCALATION_REASONS}
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+        self.seconds = 0.0
+        self.recent: deque = deque(maxlen=1000)
+
+    def to_dict(self) -> Dict[str, Any]:
+        recent = sorted(self.recent)
+        return {
+            "attempts": self.attempts,
+            "accepted": self.accepted,
+            "hit_rate": round(self.accepted / self.attempts, 3) if self.attempts else None,
+            "failed": dict(self.failed),
+            "avg_seconds": round(self.seconds / self.attempts, 3) if self.attempts else None,
+            "p95_seconds": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 3) if recent else None,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost_usd": round(self.cost, 6)
+        }
+
+
+class ModelCascade:
+    """Tabela de roteamento por tipo de documento e estatísticas por modelo"""
+
+    def __init__(
+        self,
+        routes: Optional[Dict[str, Sequence[str]]] = None,
+        prices: Optional[Dict[str, Tuple[float, float]]] = None,
+        model_factory: Optional[Callable[[str], Any]] = None
+    ):
+        """
+        Inicializa a cascata.
+
+        Args:
+            routes: Modelos por tipo de documento, do mais barato ao mais
+                forte; a chave "default" vale para os tipos não listados
+                (padrão: DEFAULT_ROUTES)
+            prices: (entrada, saída) em USD por 1M de tokens, por modelo
+            model_factory: Cria o cliente de um modelo a partir do nome
+                (padrão: o pool do processo, ver client_pool)
+
+        Raises:
+            ValueError: Sem a chave "default" ou com um tipo sem nenhum modelo
+        """
+        self.routes = {k.lower(): tuple(v) for k, v in (routes or DEFAULT_ROUTES).items()}
+        if "default" not in self.routes:
+            raise ValueError("routes precisa da chave 'default'")
+        empty = sorted(k for k, v in self.routes.items() if not v)
+        if empty:
+            raise ValueError(f"routes sem nenhum modelo para: {', '.join(empty)}")
+        self.prices = dict(DEFAULT_PRICES if prices is None else prices)
+        self.model_factory = model_factory
+        self.models: Dict[str, Any] = {}
+
+        self.documents = 0
+        self.escalated_documents = 0
+        self.unresolved_documents = 0
+        self._stats: Dict[str, _TierStats] = {}
+        self._lock = threading.Lock()
+
+    def tiers(self, document_type: str) -> Tuple[str, ...]:
+        """Modelos de um tipo de documento, na ordem da cascata"""
+        return self.routes.get((document_type or "").lower(), self.routes["default"])
+
+    def model(self, name: str) -> Any:
+        """Cliente do modelo (criado na primeira utilização)"""
+        with self._lock:
+            if name not in self.models:
+                if self.model_factory is None:
+                    from client_pool import get_client_pool
+                    self.models[name] = get_client_pool().model(name)
+                else:
+                    self.models[name] = self.model_factory(name)
+            return self.models[name]
+
+    def record(
+        self,
+        name: str,
+        seconds: float,
+        response: Any = None,
+        reason: Optional[str] = None
+    ) -> None:
+        """
+        Registra uma tentativa em um modelo.
+
+        Args:
+            name: Modelo usado
+            seconds: Duração da chamada
+            response: Resposta do modelo (para os tokens cobrados)
+            reason: Por que a resposta não foi aceita ("parse", "validation",
+                "error"), ou None se foi aceita
+        """
+        input_tokens, output_tokens = response_usage(response) if response is not None else (0, 0)
+        price_in, price_out = self.prices.get(name, (0.0, 0.0))
+        with self._lock:
+            stats = self._stats.setdefault(name, _TierStats())
+            stats.attempts += 1
+            stats.seconds += seconds
+            stats.recent.append(seconds)
+            stats.input_tokens += input_tokens
+            stats.output_tokens += output_tokens
+            stats.cost += (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+            if reason is None:
+                stats.accepted += 1
+            else:
+                stats.failed[reason] += 1
+
+    def record_document(self, attempts: int, resolved: bool) -> None:
+        """
+        Registra um documento concluído.
+
+        Args:
+            attempts: Modelos chamados
+            resolved: False se nem o último modelo produziu um resultado aceitável
+        """
+        with self._lock:
+            self.documents += 1
+            if attempts > 1:
+                self.escalated_documents += 1
+            if not resolved:
+                self.unresolved_documents += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Taxa de acerto, latência, tokens e custo por modelo, e custo médio por documento"""
+        with self._lock:
+            cost = sum(stats.cost for stats in self._stats.values())
+            return {
+                "documents": self.documents,
+                "escalation_rate": round(self.escalated_documents / self.documents, 3) if self.documents else None,
+                "unresolved": self.unresolved_documents,
+                "cost_usd": round(cost, 6),
+                "cost_per_document": round(cost / self.documents, 6) if self.documents else None,
+                "tiers": {name: stats.to_dict() for name, stats in self._stats.items()}
+            }
+
+
+def escalation_reason(data: Any, validations: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Motivo para não aceitar uma resposta (e subir de modelo), ou None.
+
+    Args:
+        data: Dados de DocumentExtractor.parse_response
+        validations: Validações dos dados (ver validation_rules)
+
+    Returns:
+        "parse" (resposta não é JSON), "validation" (alguma validação
+        falhou) ou None
+    """
+    if not isinstance(data, dict) or "raw_text" in data:
+        return "parse"
+    if any(isinstance(outcome, dict) and not outcome.get("valid", True) for outcome in (validations or {}).values()):
+        return "validation"
+    return None
+
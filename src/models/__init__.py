@@ -1 +1,22 @@
 """Módulo de modelos"""
+from .records import (
+    ExtractionRecord,
+    RGRecord,
+    CNHRecord,
+    CPFRecord,
+    CNPJRecord,
+    ValidationResult,
+    RECORD_TYPES,
+    record_from_dict,
+)
+
+__all__ = [
+    "ExtractionRecord",
+    "RGRecord",
+    "CNHRecord",
+    "CPFRecord",
+    "CNPJRecord",
+    "ValidationResult",
+    "RECORD_TYPES",
+    "record_from_dict",
+]
@@ -0,0 +1,264 @@
+"""
+Registros compactos (dataclasses com __slots__) para resultados de extração.
+Substituem os dicts aninhados quando milhões de resultados ficam em memória
+"""
+import sys
+from dataclasses import dataclass, fields
+from typing import Any, ClassVar, Dict, Optional, Tuple, Type
+
+
+# Chaves fixas do resultado de DocumentExtractor.extract_from_image
+ENVELOPE_KEYS = ("status", "message", "image_path", "document_type")
+
+# Chaves tratadas à parte; as demais (failure, quality, roi, pages, cascade...) vão para `envelope_extra`
+_MAPPED_KEYS = frozenset(ENVELOPE_KEYS + ("data", "raw_response", "validations"))
+
+# Chaves de ValidationResult guardadas em slots (o restante vai para `details`)
+VALIDATION_KEYS = ("valid", "error", "formatted")
+
+
+def _intern(value: Any) -> Any:
+    """Compartilha strings repetidas (status, tipo, mensagem) entre registros"""
+    return sys.intern(value) if type(value) is str else value
+
+
+@dataclass(slots=True)
+class ValidationResult:
+    """Resultado de uma validação de DocumentValidator"""
+
+    valid: bool
+    error: Optional[str] = None
+    formatted: Optional[str] = None
+    details: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, result: Dict[str, Any]) -> "ValidationResult":
+        """Converte o dict retornado pelos validadores"""
+        details = {k: v for k, v in result.items() if k not in VALIDATION_KEYS}
+        return cls(
+            bool(result.get("valid")),
+            _intern(result.get("error")),
+            result.get("formatted"),
+            details or None
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Reconstrói o dict no formato dos validadores"""
+        result: Dict[str, Any] = {"valid": self.valid}
+        if self.error is not None:
+            result["error"] = self.error
+        if self.formatted is not None:
+            result["formatted"] = self.formatted
+        if self.details:
+            result.update(self.details)
+        return result
+
+
+@dataclass(slots=True)
+class ExtractionRecord:
+    """Envelope comum a todos os registros de extração"""
+
+    DATA_FIELDS: ClassVar[Tuple[str, ...]] = ()
+    _DATA_FIELD_SET: ClassVar[frozenset] = frozenset()
+
+    status: Optional[str] = None
+    message: Optional[str] = None
+    image_path: Optional[str] = None
+    document_type: Optional[str] = None
+    raw_response: Optional[str] = None
+    validations: Optional[Dict[str, ValidationResult]] = None
+    # Campos retornados pelo modelo que não fazem parte do esquema
+    extra: Optional[Dict[str, Any]] = None
+    # Demais chaves do resultado (failure, quality, cascade, deadline...), preservadas como vieram
+    envelope_extra: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, result: Dict[str, Any], keep_raw_response: bool = False) -> "ExtractionRecord":
+        """
+        Converte o dict de resultado em registro.
+
+        Args:
+            result: Dict retornado por extract_from_image / ferramentas do agente
+            keep_raw_response: Se False, descarta raw_response (duplica `data`)
+
+        Returns:
+            Instância do registro
+        """
+        data = result.get("data")
+        if not isinstance(data, dict):
+            data = {}
+        record = cls(**{f: data.get(f) for f in cls.DATA_FIELDS})
+
+        record.status = _intern(result.get("status"))
+        record.message = _intern(result.get("message"))
+        record.image_path = result.get("image_path")
+        record.document_type = _intern(result.get("document_type"))
+        if keep_raw_response:
+            record.raw_response = result.get("raw_response")
+
+        validations = result.get("validations")
+        if validations and isinstance(validations, dict):
+            record.validations = {
+                _intern(name): ValidationResult.from_dict(v) if isinstance(v, dict) else v
+                for name, v in validations.items()
+            }
+
+        known = cls._DATA_FIELD_SET
+        record.extra = {k: v for k, v in data.items() if k not in known} or None
+        envelope_extra = {k: v for k, v in result.items() if k not in _MAPPED_KEYS}
+        # "data"/"validations" fora do formato (ex: o modelo devolveu uma lista) ficam como vieram
+        for key in ("data", "validations"):
+            if result.get(key) is not None and not isinstance(result[key], dict):
+                envelope_extra[key] = result[key]
+        record.envelope_extra = envelope_extra or None
+
+        return record
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        """Campos extraídos no formato do dict `data` (campos nulos omitidos)"""
+        data = {}
+        for f in self.DATA_FIELDS:
+            value = getattr(self, f)
+            if value is not None:
+                data[f] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Reconstrói o dict de resultado original"""
+        result: Dict[str, Any] = {}
+        for key in ENVELOPE_KEYS:
+            value = getattr(self, key)
+            if value is not None:
+                result[key] = value
+        data = self.data
+        # Resultados de erro sem campos continuam sem "data"
+        if data or self.status == "success":
+            result["data"] = data
+        if self.raw_response is not None:
+            result["raw_response"] = self.raw_response
+        if self.validations is not None:
+            result["validations"] = {
+                name: v.to_dict() if isinstance(v, ValidationResult) else v
+                for name, v in self.validations.items()
+            }
+        if self.envelope_extra:
+            result.update(self.envelope_extra)
+        return result
+
+
+@dataclass(slots=True)
+class RGRecord(ExtractionRecord):
+    """Registro de RG (campos do prompt "rg")"""
+
+    tipo_documento: Optional[str] = None
+    numero_rg: Optional[str] = None
+    orgao_emissor: Optional[str] = None
+    uf_emissor: Optional[str] = None
+    data_emissao: Optional[str] = None
+    nome_completo: Optional[str] = None
+    data_nascimento: Optional[str] = None
+    filiacao_pai: Optional[str] = None
+    filiacao_mae: Optional[str] = None
+    naturalidade: Optional[str] = None
+    cpf: Optional[str] = None
+    observacoes: Optional[str] = None
+
+
+@dataclass(slots=True)
+class CNHRecord(ExtractionRecord):
+    """Registro de CNH (campos do prompt "cnh")"""
+
+    tipo_documento: Optional[str] = None
+    numero_registro: Optional[str] = None
+    numero_espelho: Optional[str] = None
+    nome_completo: Optional[str] = None
+    data_nascimento: Optional[str] = None
+    cpf: Optional[str] = None
+    filiacao_pai: Optional[str] = None
+    filiacao_mae: Optional[str] = None
+    data_primeira_habilitacao: Optional[str] = None
+    data_emissao: Optional[str] = None
+    data_validade: Optional[str] = None
+    categoria: Optional[str] = None
+    local_emissao: Optional[str] = None
+    orgao_emissor: Optional[str] = None
+    numero_seguranca: Optional[str] = None
+    observacoes: Optional[str] = None
+    restricoes: Optional[str] = None
+
+
+@dataclass(slots=True)
+class CPFRecord(ExtractionRecord):
+    """Registro de CPF (campos do prompt "cpf")"""
+
+    tipo_documento: Optional[str] = None
+    numero_cpf: Optional[str] = None
+    nome_completo: Optional[str] = None
+    data_nascimento: Optional[str] = None
+    situacao_cadastral: Optional[str] = None
+    data_inscricao: Optional[str] = None
+    observacoes: Optional[str] = None
+
+
+@dataclass(slots=True)
+class CNPJRecord(ExtractionRecord):
+    """Registro de Cartão CNPJ (campos do prompt "cnpj")"""
+
+    tipo_documento: Optional[str] = None
+    numero_cnpj: Optional[str] = None
+    razao_social: Optional[str] = None
+    nome_fantasia: Optional[str] = None
+    data_abertura: Optional[str] = None
+    situacao_cadastral: Optional[str] = None
+    data_situacao_cadastral: Optional[str] = None
+    natureza_juridica: Optional[str] = None
+    cnae_principal: Optional[str] = None
+    logradouro: Optional[str] = None
+    numero: Optional[str] = None
+    complemento: Optional[str] = None
+    bairro: Optional[str] = None
+    municipio: Optional[str] = None
+    uf: Optional[str] = None
+    cep: Optional[str] = None
+    telefone: Optional[str] = None
+    email: Optional[str] = None
+    capital_social: Optional[str] = None
+    porte: Optional[str] = None
+    data_impressao: Optional[str] = None
+    observacoes: Optional[str] = None
+
+
+RECORD_TYPES: Dict[str, Type[ExtractionRecord]] = {
+    "rg": RGRecord,
+    "cnh": CNHRecord,
+    "cpf": CPFRecord,
+    "cnpj": CNPJRecord,
+}
+
+# Campos de dados de cada classe = campos declarados fora do envelope
+_ENVELOPE_FIELDS = {f.name for f in fields(ExtractionRecord)}
+for _record_type in RECORD_TYPES.values():
+    _record_type.DATA_FIELDS = tuple(
+        f.name for f in fields(_record_type) if f.name not in _ENVELOPE_FIELDS
+    )
+    _record_type._DATA_FIELD_SET = frozenset(_record_type.DATA_FIELDS)
+
+
+def record_from_dict(result: Dict[str, Any], keep_raw_response: bool = False) -> ExtractionRecord:
+    """
+    Converte um resultado de extração no registro do seu tipo de documento.
+
+    Args:
+        result: Dict retornado por extract_from_image / ferramentas do agente
+        keep_raw_response: Se False, descarta raw_response
+
+    Returns:
+        RGRecord, CNHRecord, CPFRecord, CNPJRecord ou ExtractionRecord genérico
+    """
+    data = result.get("data")
+    doc_type = (data.get("tipo_documento") if isinstance(data, dict) else None) or result.get("document_type") or ""
+    record_type = RECORD_TYPES.get(str(doc_type).lower(), ExtractionRecord)
+    return record_type.from_dict(result, keep_raw_response)
@@ -0,0 +1,185 @@
+"""
+Correção local de erros de leitura em CPF, CNPJ e CNH guiada pelos
+dígitos verificadores: testa as trocas de caracteres mais comuns
+(8/B, 0/O, 1/7, 5/S...) e só aceita um candidato se ele for o único válido.
+As correções são sugestões: quem chama decide se altera os dados
+"""
+from itertools import combinations, product
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from validators import DocumentValidator
+
+# Letras lidas no lugar de dígitos (sempre erro em um campo numérico)
+LETTER_DIGITS = {
+    "O": "0", "o": "0", "D": "0", "Q": "0",
+    "I": "1", "i": "1", "l": "1", "|": "1",
+    "Z": "2", "z": "2",
+    "A": "4",
+    "S": "5", "s": "5",
+    "G": "6", "b": "6",
+    "T": "7",
+    "B": "8",
+    "g": "9", "q": "9",
+}
+
+# Pares de dígitos parecidos (a troca de um dígito válido por outro)
+DIGIT_PAIRS = ("08", "17", "38", "56", "68", "89")
+DIGIT_CONFUSIONS: Dict[str, str] = {
+    digit: "".join(b if a == digit else a for a, b in DIGIT_PAIRS if digit in (a, b))
+    for digit in "0123456789"
+}
+
+# Tamanho e validador de cada tipo de número
+VALIDATORS: Dict[str, Tuple[int, Callable[[str], Dict[str, Any]]]] = {
+    "cpf": (11, DocumentValidator.validate_cpf),
+    "cnpj": (14, DocumentValidator.validate_cnpj),
+    "cnh": (11, DocumentValidator.validate_cnh),
+}
+
+# Confiança por tipo de correção (apenas letras trocadas, 1 dígito, 2 dígitos)
+CONFIDENCE_LEVELS = ("high", "medium", "low")
+DIGITS = "0123456789"
+
+
+def _slots(value: str) -> List[int]:
+    """Posições da string que carregam dígitos (ou letras lidas no lugar deles)"""
+    return [i for i, char in enumerate(value) if char.isdigit() or char in LETTER_DIGITS]
+
+
+def _replace(value: str, changes: Dict[int, str]) -> str:
+    """Aplica trocas por posição, preservando pontuação e formatação"""
+    chars = list(value)
+    for position, digit in changes.items():
+        chars[position] = digit
+    return "".join(chars)
+
+
+def correct_number(value: Optional[str], kind: str, max_substitutions: int = 2) -> Dict[str, Any]:
+    """
+    Tenta corrigir um CPF, CNPJ ou CNH lido com erro.
+
+    Letras no lugar de dígitos são trocadas diretamente (B -> 8, O -> 0).
+    Se o número ainda for inválido, testa trocas de 1 e depois de 2 dígitos
+    parecidos (1/7, 0/8...). Um candidato de 1 dígito só é "corrected" se
+    for o único número válido entre TODAS as trocas de 1 dígito, não só as
+    da tabela de confusões: o erro real pode estar fora dela, e aí o
+    candidato único da tabela seria outro número, válido mas errado. Também
+    é "ambiguous" se houver candidatos de 2 trocas da tabela (o número pode
+    ter 2 erros), e trocas de 2 dígitos (dezenas de números válidos
+    possíveis) são sempre "ambiguous".
+
+    Args:
+        value: Número como extraído (com ou sem formatação)
+        kind: "cpf", "cnpj" ou "cnh"
+        max_substitutions: Máximo de dígitos trocados (0, 1 ou 2)
+
+    Returns:
+        Dict com "status" ("valid", "corrected", "ambiguous" ou
+        "uncorrectable"), "original", e, quando corrigido, "corrected",
+        "confidence" ("high", "medium" ou "low") e "substitutions"
+    """
+    if kind not in VALIDATORS:
+        raise ValueError(f"Tipo sem dígito verificador: {kind} (opções: {', '.join(VALIDATORS)})")
+    length, validate = VALIDATORS[kind]
+
+    result: Dict[str, Any] = {"status": "uncorrectable", "original": value}
+    if not value:
+        return result
+
+    slots = _slots(value)
+    if len(slots) != length:
+        result["reason"] = f"{len(slots)} dígitos em vez de {length}"
+        return result
+
+    forced = {i: LETTER_DIGITS[value[i]] for i in slots if not value[i].isdigit()}
+    base = _replace(value, forced)
+
+    if validate(base)["valid"]:
+        if not forced:
+            result["status"] = "valid"
+            return result
+        return _corrected(result, value, base, forced, {}, "high")
+
+    # Trocas de dígitos: 1 posição, depois 2 (só se nenhuma de 1 funcionar)
+    for count in range(1, max_substitutions + 1):
+        candidates = _confusion_candidates(base, slots, validate, count)
+        if not candidates:
+            continue
+        result["status"] = "ambiguous"
+        result["candidates"] = [c for c, _ in candidates]
+        if len(candidates) == 1 and count == 1:
+            candidate, changes = candidates[0]
+            # Um número com 2 erros também pode estar a 1 troca de outro número válido
+            if (
+                _only_valid_neighbor(base, slots, validate, candidate)
+                and (max_substitutions < 2 or not _confusion_candidates(base, slots, validate, 2))
+            ):
+                del result["candidates"]
+                return _corrected(result, value, candidate, forced, changes, CONFIDENCE_LEVELS[count])
+            result["reason"] = "único na tabela de confusões, mas há outros números válidos próximos"
+        return result
+
+    return result
+
+
+def _confusion_candidates(
+    base: str,
+    slots: List[int],
+    validate: Callable[[str], Dict[str, Any]],
+    count: int
+) -> List[Tuple[str, Dict[int, str]]]:
+    """Números válidos trocando `count` dígitos por outros parecidos (DIGIT_CONFUSIONS)"""
+    candidates = []
+    for positions in combinations(slots, count):
+        options = [DIGIT_CONFUSIONS.get(base[p], "") for p in positions]
+        for digits in product(*options):
+            changes = dict(zip(positions, digits))
+            candidate = _replace(base, changes)
+            if validate(candidate)["valid"]:
+                candidates.append((candidate, changes))
+    return candidates
+
+
+def _only_valid_neighbor(
+    base: str,
+    slots: List[int],
+    validate: Callable[[str], Dict[str, Any]],
+    candidate: str
+) -> bool:
+    """True se nenhuma outra troca de 1 dígito (qualquer dígito, qualquer posição) for válida"""
+    for position in slots:
+        for digit in DIGITS:
+            if digit == base[position]:
+                continue
+            other = _replace(base, {position: digit})
+            if other != candidate and validate(other)["valid"]:
+                return False
+    return True
+
+
+def _corrected(
+    result: Dict[str, Any],
+    original: str,
+    corrected: str,
+    forced: Dict[int, str],
+    changes: Dict[int, str],
+    confidence: str
+) -> Dict[str, Any]:
+    substitutions = [
+        {"position": position, "from": original[position], "to": digit}
+        for position, digit in sorted({**forced, **changes}.items())
+    ]
+    result.update({
+        "status": "corrected",
+        "corrected": corrected,
+        "confidence": confidence,
+        "substitutions": substitutions
+    })
+    return result
+
+
+def confidence_at_least(confidence: str, minimum: Optional[str]) -> bool:
+    """True se a confiança é igual ou maior que o mínimo ("high" > "medium" > "low"; None = nunca)"""
+    if minimum is None:
+        return False
+    return CONFIDENCE_LEVELS.index(confidence) <= CONFIDENCE_LEVELS.index(minimum)
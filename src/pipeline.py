@@ -0,0 +1,295 @@
+"""
+Pipeline em dois estágios para lotes de documentos:
+preparação de imagens em ProcessPoolExecutor (CPU) alimentando,
+por uma fila limitada, um pool de threads de requisições ao Gemini (I/O)
+"""
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from dead_letters import DeadLetterStore, failure_category
+from deadlines import Deadline, current_deadline, deadline_context
+from event_log import log_event
+from image_prep import DEFAULT_MAX_SIDE, prepare_image
+from result_sinks import ResultSink
+from scheduler import request_context
+from validation_rules import ValidationEngine
+
+# Marca de fim da fila para as threads de requisição
+_DONE = object()
+
+# Arquivos multipágina seguem direto para extract_from_image (páginas em paralelo)
+MULTIPAGE_SUFFIXES = (".tif", ".tiff", ".pdf")
+
+
+def _guarded(step: str, result: Dict[str, Any], fn: Callable[..., Any], *args: Any) -> None:
+    """Executa um passo após a extração (fila de falhas, saída, progresso) sem derrubar a thread"""
+    try:
+        fn(*args)
+    except Exception as e:
+        log_event(
+            "pipeline.error", "Erro em {step}: {image_path}: {error}", "ERROR",
+            step=step, image_path=result.get("image_path"), error=str(e)
+        )
+
+
+class StageStats:
+    """Contadores de um estágio do pipeline (thread-safe)"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.first_start: Optional[float] = None
+        self.last_end: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, start: float, end: float, busy: Optional[float] = None) -> None:
+        with self._lock:
+            self.items += 1
+            self.busy_seconds += busy if busy is not None else end - start
+            if self.first_start is None or start < self.first_start:
+                self.first_start = start
+            if self.last_end is None or end > self.last_end:
+                self.last_end = end
+
+    def to_dict(self) -> Dict[str, Any]:
+        wall = (self.last_end - self.first_start) if self.items else 0.0
+        return {
+            "items": self.items,
+            "wall_seconds": round(wall, 3),
+            "busy_seconds": round(self.busy_seconds, 3),
+            "items_per_second": round(self.items / wall, 2) if wall > 0 else None,
+            "avg_seconds": round(self.busy_seconds / self.items, 4) if self.items else None
+        }
+
+
+class ExtractionPipeline:
+    """Executa extract_batch com preparação e requisições em paralelo"""
+
+    def __init__(
+        self,
+        extractor: Any,
+        prep_workers: Optional[int] = None,
+        request_workers: int = 8,
+        queue_size: int = 32,
+        max_side: Optional[int] = DEFAULT_MAX_SIDE
+    ):
+        """
+        Inicializa o pipeline.
+
+        Args:
+            extractor: DocumentExtractor usado no estágio de requisições
+            prep_workers: Processos de preparação (padrão: número de núcleos)
+            request_workers: Threads de requisição simultâneas ao Gemini (se o
+                extrator tiver rate_controller, o limitador adaptativo decide
+                quantas delas chamam ao mesmo tempo)
+            queue_size: Imagens preparadas aguardando envio (limita a memória)
+            max_side: Maior lado das imagens enviadas
+        """
+        self.extractor = extractor
+        self.prep_workers = prep_workers or os.cpu_count() or 1
+        self.request_workers = request_workers
+        self.queue_size = queue_size
+        self.max_side = max_side
+
+    def run(
+        self,
+        image_paths: List[str],
+        document_type: str = "auto",
+        sink: Optional[ResultSink] = None,
+        validate: bool = False,
+        priority: str = "bulk",
+        tenant: Optional[str] = None,
+        on_result: Optional[Callable[[Dict[str, Any], float], None]] = None,
+        dead_letters: Optional[DeadLetterStore] = None,
+        deadline: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Processa um lote de imagens.
+
+        Args:
+            image_paths: Lista de caminhos de imagens
+            document_type: Tipo do documento
+            sink: Destino opcional para os resultados
+            validate: Se True, aplica as regras de validation_rules
+            priority: Classe no escalonador (ver scheduler.PRIORITIES)
+            tenant: Dono do lote na fila justa (padrão: um id por lote)
+            on_result: Chamada a cada documento concluído com (resultado,
+                segundos da requisição), ex: para exibir o progresso
+            dead_letters: Fila onde as falhas são guardadas por categoria
+            deadline: Prazo do lote inteiro em segundos; esgotado, os
+                documentos restantes saem na hora com status "timeout"
+                (limitado pelo prazo de quem chamou, como em extract_batch)
+
+        Returns:
+            Dict no formato de extract_batch, com "stages" (vazão por estágio)
+        """
+        prep_stats = StageStats("prep")
+        request_stats = StageStats("request")
+        prepared_queue: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_size)
+        results: List[Dict[str, Any]] = []
+        results_lock = threading.Lock()
+        engine = ValidationEngine() if validate else None
+        prepare = partial(
+            prepare_image,
+            max_side=self.max_side,
+            crop=getattr(self.extractor, "crop_documents", False),
+            check_quality=getattr(self.extractor, "quality_gate", None) is not None
+        )
+
+        log_event(
+            "pipeline.start",
+            "Pipeline: {documents} documentos, {prep_workers} processos de preparação, "
+            "{request_workers} threads de requisição",
+            documents=len(image_paths), prep_workers=self.prep_workers, request_workers=self.request_workers
+        )
+        started = time.perf_counter()
+
+        tenant = tenant or f"lote-{uuid.uuid4().hex[:8]}"
+        # As threads de requisição não herdam o contexto: o prazo de quem chamou vai junto
+        batch_deadline = Deadline(deadline, current_deadline()) if deadline else current_deadline()
+
+        def extract(prepared: Dict[str, Any]) -> Dict[str, Any]:
+            with request_context(priority, tenant), deadline_context(deadline=batch_deadline):
+                if prepared.get("status") == "multipage":
+                    return self.extractor.extract_from_image(prepared["image_path"], document_type)
+                return self.extractor.extract_from_prepared(prepared, document_type)
+
+        def request_worker() -> None:
+            while True:
+                prepared = prepared_queue.get()
+                if prepared is _DONE:
+                    return
+                start = time.perf_counter()
+                result: Optional[Dict[str, Any]] = None
+                try:
+                    result = extract(prepared)
+                    if engine is not None:
+                        engine.validate_batch([result])
+                except Exception as e:
+                    # Uma falha inesperada vira o resultado do documento: a thread não pode morrer
+                    # (com todas mortas, _produce ficaria preso na fila cheia)
+                    log_event(
+                        "pipeline.error", "Erro no pipeline: {image_path}: {error}", "ERROR",
+                        image_path=prepared.get("image_path"), error=str(e)
+                    )
+                    result = {
+                        **(result or {}),
+                        "status": "error",
+                        "message": f"Erro ao processar documento: {e}",
+                        "image_path": prepared.get("image_path"),
+                        "failure": failure_category(e)
+                    }
+                end = time.perf_counter()
+                request_stats.record(start, end)
+
+                if dead_letters is not None:
+                    _guarded("dead_letters", result, dead_letters.record, [result])
+                with results_lock:
+                    results.append(result)
+                    if sink is not None:
+                        _guarded("sink", result, sink.write, result)
+                if on_result is not None:
+                    _guarded("on_result", result, on_result, result, end - start)
+
+        # Com controle adaptativo, o limitador decide quantas threads chamam ao mesmo tempo
+        controller = getattr(self.extractor, "rate_controller", None)
+        workers = max(self.request_workers, controller.max_concurrency) if controller else self.request_workers
+
+        threads = [
+            threading.Thread(target=request_worker, name=f"extract-request-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            self._produce(image_paths, prepare, prepared_queue, prep_stats)
+        finally:
+            for _ in threads:
+                prepared_queue.put(_DONE)
+            for thread in threads:
+                thread.join()
+
+        if sink is not None:
+            sink.flush()
+
+        elapsed = time.perf_counter() - started
+        successes = [r for r in results if r["status"] == "success"]
+        errors = [r for r in results if r["status"] != "success"]
+
+        stages = {
+            "prep": prep_stats.to_dict(),
+            "request": request_stats.to_dict(),
+            "total_seconds": round(elapsed, 3),
+            "items_per_second": round(len(results) / elapsed, 2) if elapsed > 0 else None
+        }
+        if controller is not None:
+            stages["rate"] = controller.stats()
+        scheduler = getattr(self.extractor, "scheduler", None)
+        if scheduler is not None:
+            stages["scheduler"] = scheduler.stats()
+        cascade = getattr(self.extractor, "cascade", None)
+        if cascade is not None:
+            stages["cascade"] = cascade.stats()
+        client_pool = getattr(self.extractor, "client_pool", None)
+        if client_pool is not None:
+            stages["clients"] = client_pool.stats()
+        deadline_stats = getattr(self.extractor, "deadline_stats", None)
+        if deadline_stats is not None and deadline_stats.stats():
+            stages["deadlines"] = deadline_stats.stats()
+        log_event("pipeline.done", "Pipeline concluído: {stages}", stages=stages)
+
+        return {
+            "status": "completed",
+            "total": len(image_paths),
+            "success": len(successes),
+            "errors": len(errors),
+            "timeouts": sum(1 for r in errors if r["status"] == "timeout"),
+            "results": successes,
+            "error_details": errors,
+            "stages": stages
+        }
+
+    def _produce(self, image_paths, prepare, prepared_queue, prep_stats) -> None:
+        """Submete a preparação com janela limitada e alimenta a fila"""
+        window = self.queue_size + self.prep_workers
+        paths = iter(image_paths)
+        in_flight = {}
+
+        with ProcessPoolExecutor(max_workers=self.prep_workers) as pool:
+            while True:
+                while len(in_flight) < window:
+                    path = next(paths, None)
+                    if path is None:
+                        break
+                    if Path(path).suffix.lower() in MULTIPAGE_SUFFIXES:
+                        prepared_queue.put({"status": "multipage", "image_path": path})
+                        continue
+                    in_flight[pool.submit(prepare, path)] = (path, time.perf_counter())
+
+                if not in_flight:
+                    return
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, submitted = in_flight.pop(future)
+                    try:
+                        prepared = future.result()
+                    except Exception as e:
+                        prepared = {
+                            "status": "error",
+                            "message": f"Erro ao preparar imagem: {str(e)}",
+                            "image_path": path,
+                            "failure": "unreadable_image"
+                        }
+                    prep_stats.record(submitted, time.perf_counter(), prepared.get("seconds", 0.0))
+                    # Bloqueia quando a fila está cheia: o estágio de rede dita o ritmo
+                    prepared_queue.put(prepared)
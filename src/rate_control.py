@@ -0,0 +1,354 @@
+"""
+Controle de vazão das chamadas ao Gemini: limite de concorrência adaptativo
+(AIMD, guiado por latência p95, erros e 429) e orçamento de requisições e
+tokens por minuto (token bucket)
+"""
+import math
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+from loguru import logger
+
+from deadlines import DeadlineExceeded, current_deadline
+
+# Custo de uma imagem no Gemini: 258 tokens por bloco de até 768x768
+IMAGE_TILE_TOKENS = 258
+IMAGE_TILE_SIDE = 768
+# Estimativa da resposta (JSON de um documento), corrigida pelo uso real
+OUTPUT_TOKENS_ESTIMATE = 400
+
+
+def is_throttle_error(error: BaseException) -> bool:
+    """True para erros de cota/limite de taxa (HTTP 429 / RESOURCE_EXHAUSTED)"""
+    if getattr(error, "code", None) == 429 or type(error).__name__ == "ResourceExhausted":
+        return True
+    text = str(error)
+    return "429" in text or "RESOURCE_EXHAUSTED" in text or "quota" in text.lower()
+
+
+def estimate_tokens(
+    prompt: str,
+    image_sizes: Iterable[Tuple[int, int]],
+    output_tokens: int = OUTPUT_TOKENS_ESTIMATE
+) -> int:
+    """
+    Estimativa dos tokens de uma chamada, antes de enviá-la.
+
+    Args:
+        prompt: Texto do prompt
+        image_sizes: (largura, altura) de cada imagem enviada
+        output_tokens: Tokens esperados na resposta
+
+    Returns:
+        Tokens de entrada (texto ~4 caracteres/token, imagens em blocos) + saída
+    """
+    tokens = len(prompt) // 4 + output_tokens
+    for width, height in image_sizes:
+        tiles = math.ceil(width / IMAGE_TILE_SIDE) * math.ceil(height / IMAGE_TILE_SIDE)
+        tokens += IMAGE_TILE_TOKENS * max(1, tiles)
+    return tokens
+
+
+def response_tokens(response: Any) -> Optional[int]:
+    """Tokens efetivamente cobrados (usage_metadata da resposta), se disponíveis"""
+    usage = getattr(response, "usage_metadata", None)
+    total = getattr(usage, "total_token_count", None)
+    return int(total) if total else None
+
+
+class TokenBucket:
+    """Balde de fichas thread-safe: `rate` fichas por `period` segundos"""
+
+    def __init__(self, rate: float, period: float = 60.0, capacity: Optional[float] = None):
+        """
+        Inicializa o balde.
+
+        Args:
+            rate: Fichas liberadas por período (ex: requisições por minuto)
+            period: Duração do período em segundos
+            capacity: Rajada máxima (padrão: 1/10 do período, no mínimo 1)
+        """
+        self.rate = rate
+        self.period = period
+        self.capacity = capacity or max(1.0, rate / 10)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.waited_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate / self.period)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """
+        Retira fichas, esperando o reabastecimento se necessário.
+
+        Args:
+            amount: Fichas necessárias (limitadas à capacidade do balde)
+            timeout: Espera máxima em segundos (None = sem limite)
+
+        Returns:
+            True se as fichas foram obtidas, False se o tempo esgotou
+        """
+        amount = min(amount, self.capacity)
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    self.waited_seconds += now - started
+                    return True
+                wait = (amount - self.tokens) * self.period / self.rate
+            if timeout is not None and now - started + wait > timeout:
+                return False
+            time.sleep(min(wait, 0.25))
+
+    def available(self) -> float:
+        """Fichas disponíveis agora (sem retirá-las)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+    def charge(self, amount: float) -> None:
+        """Ajusta o saldo após a chamada (negativo devolve fichas; pode ficar em débito)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class AdaptiveLimiter:
+    """
+    Limite de chamadas simultâneas com aumento aditivo e redução
+    multiplicativa (AIMD).
+
+    A cada `window` chamadas concluídas, o limite sobe 1 (dobra antes da
+    primeira redução) se a latência p95 e a taxa de erros estiverem
+    saudáveis, e cai pela metade caso contrário.
+    Um 429 reduz o limite imediatamente (no máximo uma vez por `cooldown`).
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        target_p95: Optional[float] = None,
+        max_error_rate: float = 0.05,
+        window: int = 20,
+        backoff: float = 0.5,
+        cooldown: float = 1.0
+    ):
+        """
+        Inicializa o limitador.
+
+        Args:
+            initial: Limite inicial de chamadas simultâneas
+            min_limit: Limite mínimo
+            max_limit: Limite máximo
+            target_p95: Latência p95 aceitável em segundos (padrão: 2x a
+                menor p95 observada, ou seja, a latência sem fila no servidor)
+            max_error_rate: Taxa de erros (não-429) aceitável na janela
+            window: Chamadas por janela de avaliação
+            backoff: Fator de redução
+            cooldown: Intervalo mínimo entre reduções por 429
+        """
+        self.limit = float(min(initial, max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_p95 = target_p95
+        self.max_error_rate = max_error_rate
+        self.window = window
+        self.backoff = backoff
+        self.cooldown = cooldown
+
+        self.in_flight = 0
+        self.peak_limit = self.limit
+        self.increases = 0
+        self.decreases = 0
+        self.throttled = 0
+        self.last_p95: Optional[float] = None
+        self._best_p95: Optional[float] = None
+        self._samples: deque = deque()
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Aguarda uma vaga abaixo do limite atual"""
+        with self._cond:
+            ok = self._cond.wait_for(lambda: self.in_flight < int(self.limit), timeout)
+            if ok:
+                self.in_flight += 1
+            return ok
+
+    def release(self, latency: float, outcome: str = "ok") -> None:
+        """
+        Libera a vaga e registra o resultado da chamada.
+
+        Args:
+            latency: Duração da chamada em segundos
+            outcome: "ok", "error" ou "throttled"
+        """
+        with self._cond:
+            self.in_flight -= 1
+            if outcome == "throttled":
+                self.throttled += 1
+                now = time.monotonic()
+                if now - self._last_decrease >= self.cooldown:
+                    self._decrease(now, "429")
+                    self._samples.clear()
+            else:
+                self._samples.append((latency, outcome == "error"))
+                if len(self._samples) >= self.window:
+                    self._evaluate()
+            self._cond.notify_all()
+
+    def _evaluate(self) -> None:
+        """Ajusta o limite ao fim de uma janela de chamadas"""
+        latencies = sorted(latency for latency, _ in self._samples)
+        errors = sum(1 for _, error in self._samples if error)
+        self._samples.clear()
+
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.last_p95 = p95
+        if self._best_p95 is None or p95 < self._best_p95:
+            self._best_p95 = p95
+        target = self.target_p95 or 2 * self._best_p95
+
+        if errors / len(latencies) > self.max_error_rate:
+            self._decrease(time.monotonic(), f"taxa de erros {errors}/{len(latencies)}")
+        elif p95 > target:
+            self._decrease(time.monotonic(), f"p95 {p95:.2f}s > {target:.2f}s")
+        elif self.limit < self.max_limit and self.in_flight >= int(self.limit) - 1:
+            # Só cresce se o limite atual está de fato sendo usado; até a
+            # primeira redução dobra (partida lenta), depois soma 1
+            self.limit = min(float(self.max_limit), self.limit * 2 if not self.decreases else self.limit + 1)
+            self.increases += 1
+            self.peak_limit = max(self.peak_limit, self.limit)
+
+    def _decrease(self, now: float, reason: str) -> None:
+        self.limit = max(float(self.min_limit), self.limit * self.backoff)
+        self.decreases += 1
+        self._last_decrease = now
+        logger.debug(f"Concorrência reduzida para {int(self.limit)} ({reason})")
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado atual do limitador"""
+        with self._cond:
+            return {
+                "limit": int(self.limit),
+                "peak_limit": int(self.peak_limit),
+                "in_flight": self.in_flight,
+                "increases": self.increases,
+                "decreases": self.decreases,
+                "throttled": self.throttled,
+                "last_p95": round(self.last_p95, 3) if self.last_p95 is not None else None
+            }
+
+
+class RateController:
+    """Envolve as chamadas ao modelo com orçamento RPM/TPM, AIMD e novas tentativas em 429"""
+
+    def __init__(
+        self,
+        limiter: Optional[AdaptiveLimiter] = None,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        period: float = 60.0,
+        max_retries: int = 3,
+        retry_delay: float = 1.0
+    ):
+        """
+        Inicializa o controlador.
+
+        Args:
+            limiter: Limitador de concorrência (padrão: AdaptiveLimiter())
+            rpm: Requisições por período (None = sem limite)
+            tpm: Tokens por período (None = sem limite)
+            period: Duração do período em segundos (60 = por minuto)
+            max_retries: Novas tentativas após um 429
+            retry_delay: Espera base entre tentativas (exponencial, com jitter)
+        """
+        self.limiter = limiter or AdaptiveLimiter()
+        self.requests = TokenBucket(rpm, period) if rpm else None
+        self.tokens = TokenBucket(tpm, period) if tpm else None
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self.calls = 0
+        self.retries = 0
+        self.tokens_used = 0
+        self._lock = threading.Lock()
+
+    @property
+    def max_concurrency(self) -> int:
+        return self.limiter.max_limit
+
+    def call(self, fn: Callable[[], Any], estimated_tokens: int = 0) -> Any:
+        """
+        Executa uma chamada respeitando o orçamento e o limite de concorrência.
+
+        Args:
+            fn: Função sem argumentos que faz a requisição
+            estimated_tokens: Tokens estimados (ver estimate_tokens)
+
+        Returns:
+            O retorno de fn
+
+        Raises:
+            A exceção de fn, se não for 429 ou se as tentativas acabarem;
+            DeadlineExceeded se o prazo do contexto (ver deadlines) acabar
+            esperando o orçamento, uma vaga ou a próxima tentativa
+        """
+        deadline = current_deadline()
+        for attempt in range(self.max_retries + 1):
+            if self.requests is not None and not self.requests.acquire(1, deadline and deadline.timeout()):
+                raise DeadlineExceeded("queue", deadline)
+            if (
+                self.tokens is not None and estimated_tokens
+                and not self.tokens.acquire(estimated_tokens, deadline and deadline.timeout())
+            ):
+                raise DeadlineExceeded("queue", deadline)
+
+            if not self.limiter.acquire(deadline and deadline.timeout()):
+                raise DeadlineExceeded("queue", deadline)
+            start = time.perf_counter()
+            try:
+                response = fn()
+            except Exception as e:
+                throttled = is_throttle_error(e)
+                self.limiter.release(time.perf_counter() - start, "throttled" if throttled else "error")
+                if not throttled or attempt == self.max_retries:
+                    raise
+                with self._lock:
+                    self.retries += 1
+                delay = self.retry_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
+                if deadline is None:
+                    time.sleep(delay)
+                else:
+                    deadline.sleep(delay, "retry")
+                continue
+
+            self.limiter.release(time.perf_counter() - start, "ok")
+            used = response_tokens(response) or estimated_tokens
+            if self.tokens is not None and estimated_tokens:
+                self.tokens.charge(used - min(estimated_tokens, self.tokens.capacity))
+            with self._lock:
+                self.calls += 1
+                self.tokens_used += used
+            return response
+
+    def stats(self) -> Dict[str, Any]:
+        """Chamadas, novas tentativas, tokens, espera no orçamento e estado do AIMD"""
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "tokens_used": self.tokens_used,
+            "rpm_wait_seconds": round(self.requests.waited_seconds, 3) if self.requests else 0.0,
+            "tpm_wait_seconds": round(self.tokens.waited_seconds, 3) if self.tokens else 0.0,
+            "concurrency": self.limiter.stats()
+        }
@@ -0,0 +1,391 @@
+"""
+Destinos (sinks) de gravação em massa para resultados de extração.
+Suporta: JSONL (opcionalmente gzip/zstd), SQLite e CSV por tipo de documento
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional
+
+from event_log import log_event
+
+
+class ResultSink:
+    """Interface base de um destino de resultados com escrita bufferizada"""
+
+    def __init__(self, path: str):
+        """
+        Inicializa o sink.
+
+        Args:
+            path: Caminho do arquivo (ou diretório) de saída
+        """
+        self.path = Path(path)
+        self.records = 0
+        self.bytes_written = 0
+        self._write_seconds = 0.0
+        self._closed = False
+
+    def write(self, result: Dict[str, Any]) -> None:
+        """Grava um resultado (bufferizado)"""
+        self.write_many([result])
+
+    def write_many(self, results: Iterable[Dict[str, Any]]) -> None:
+        """Grava vários resultados (bufferizado)"""
+        start = time.perf_counter()
+        count = self._write_many(results)
+        self._write_seconds += time.perf_counter() - start
+        self.records += count
+
+    def flush(self) -> None:
+        """Descarrega o buffer para o disco"""
+        start = time.perf_counter()
+        self._flush()
+        self._write_seconds += time.perf_counter() - start
+
+    def close(self) -> None:
+        """Descarrega e fecha o sink"""
+        if self._closed:
+            return
+        self.flush()
+        self._close()
+        self._closed = True
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna métricas de vazão do sink.
+
+        Returns:
+            Dict com registros, bytes, tempo e registros/s
+        """
+        seconds = self._write_seconds
+        return {
+            "sink": type(self).__name__,
+            "path": str(self.path),
+            "records": self.records,
+            "bytes": self.bytes_written,
+            "seconds": round(seconds, 6),
+            "records_per_second": round(self.records / seconds, 1) if seconds > 0 else None
+        }
+
+    def __enter__(self) -> "ResultSink":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    # Implementações concretas
+    def _write_many(self, results: Iterable[Dict[str, Any]]) -> int:
+        raise NotImplementedError
+
+    def _flush(self) -> None:
+        raise NotImplementedError
+
+    def _close(self) -> None:
+        raise NotImplementedError
+
+
+class JsonlSink(ResultSink):
+    """Grava um resultado por linha (JSON Lines), com compressão opcional"""
+
+    COMPRESSIONS = (None, "gzip", "zstd")
+
+    def __init__(
+        self,
+        path: str,
+        compression: Optional[str] = None,
+        buffer_size: int = 1024 * 1024
+    ):
+        """
+        Inicializa o sink JSONL em modo append.
+
+        Args:
+            path: Caminho do arquivo .jsonl (.jsonl.gz / .jsonl.zst)
+            compression: None, "gzip" ou "zstd"
+            buffer_size: Tamanho do buffer de escrita em bytes
+        """
+        super().__init__(path)
+        if compression not in self.COMPRESSIONS:
+            raise ValueError(f"Compressão não suportada: {compression}")
+
+        self.compression = compression
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Cada abertura em append gera um novo membro/frame, o que é válido
+        # tanto para gzip quanto para zstd
+        if compression == "gzip":
+            raw = open(self.path, "ab")
+            self._raw = raw
+            self._file = io.BufferedWriter(gzip.GzipFile(fileobj=raw, mode="ab"), buffer_size)
+        elif compression == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                raise ValueError("Compressão zstd requer o pacote 'zstandard' (pip install zstandard)")
+            raw = open(self.path, "ab")
+            self._raw = raw
+            self._file = io.BufferedWriter(
+                zstandard.ZstdCompressor().stream_writer(raw, closefd=False),
+                buffer_size
+            )
+        else:
+            self._raw = None
+            self._file = open(self.path, "ab", buffering=buffer_size)
+
+    def _write_many(self, results: Iterable[Dict[str, Any]]) -> int:
+        count = 0
+        for result in results:
+            line = json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+            self._file.write(line)
+            self.bytes_written += len(line)
+            count += 1
+        return count
+
+    def _flush(self) -> None:
+        self._file.flush()
+
+    def _close(self) -> None:
+        self._file.close()
+        if self._raw is not None:
+            self._raw.close()
+
+
+class SqliteSink(ResultSink):
+    """Grava resultados em uma tabela SQLite, em transações por lote"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS extractions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            image_path TEXT,
+            document_type TEXT,
+            status TEXT,
+            message TEXT,
+            data TEXT,
+            validations TEXT,
+            created_at TEXT
+        )
+    """
+
+    def __init__(self, path: str, batch_size: int = 500):
+        """
+        Inicializa o sink SQLite.
+
+        Args:
+            path: Caminho do arquivo .db
+            batch_size: Quantidade de registros por transação
+        """
+        super().__init__(path)
+        self.batch_size = batch_size
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(self.SCHEMA)
+        self._conn.commit()
+        self._pending: List[tuple] = []
+
+    def _write_many(self, results: Iterable[Dict[str, Any]]) -> int:
+        count = 0
+        now = datetime.now().isoformat(timespec="seconds")
+        for result in results:
+            data = json.dumps(result.get("data"), ensure_ascii=False, separators=(",", ":"))
+            validations = result.get("validations")
+            if validations is not None:
+                validations = json.dumps(validations, ensure_ascii=False, separators=(",", ":"))
+            self._pending.append((
+                result.get("image_path"),
+                result.get("document_type"),
+                result.get("status"),
+                result.get("message"),
+                data,
+                validations,
+                now
+            ))
+            self.bytes_written += len(data) + len(validations or "")
+            count += 1
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+        return count
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO extractions "
+                "(image_path, document_type, status, message, data, validations, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._pending
+            )
+        self._pending = []
+
+    def _close(self) -> None:
+        self._conn.close()
+
+
+class CsvSink(ResultSink):
+    """Grava um arquivo CSV por tipo de documento dentro de um diretório"""
+
+    BASE_COLUMNS = ["image_path", "status"]
+
+    def __init__(
+        self,
+        directory: str,
+        fieldnames: Optional[Dict[str, List[str]]] = None,
+        buffer_size: int = 256 * 1024
+    ):
+        """
+        Inicializa o sink CSV.
+
+        Args:
+            directory: Diretório onde os CSVs (rg.csv, cnh.csv, ...) serão criados
+            fieldnames: Colunas por tipo de documento. Se ausente, usa as chaves
+                do primeiro registro de cada tipo; campos que só aparecem em
+                registros seguintes não cabem no cabeçalho e são contados em
+                stats()["dropped_columns"]
+            buffer_size: Tamanho do buffer de escrita em bytes
+        """
+        super().__init__(directory)
+        self.fieldnames = fieldnames or {}
+        self.buffer_size = buffer_size
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._files: Dict[str, Any] = {}
+        self._writers: Dict[str, csv.DictWriter] = {}
+        self._columns: Dict[str, frozenset] = {}
+        # tipo -> coluna fora do cabeçalho -> registros em que ela foi descartada
+        self.dropped_columns: Dict[str, Dict[str, int]] = {}
+
+    def _writer_for(self, doc_type: str, data: Dict[str, Any]) -> csv.DictWriter:
+        writer = self._writers.get(doc_type)
+        if writer is not None:
+            return writer
+
+        csv_path = self.path / f"{doc_type}.csv"
+        is_new = not csv_path.exists() or csv_path.stat().st_size == 0
+
+        if is_new:
+            columns = self.fieldnames.get(doc_type) or list(data.keys())
+            fieldnames = self.BASE_COLUMNS + [c for c in columns if c not in self.BASE_COLUMNS]
+        else:
+            # Reaproveita o cabeçalho existente para manter as colunas alinhadas
+            with open(csv_path, newline="", encoding="utf-8") as existing:
+                fieldnames = next(csv.reader(existing))
+
+        f = open(csv_path, "a", newline="", encoding="utf-8", buffering=self.buffer_size)
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+        if is_new:
+            writer.writeheader()
+
+        self._files[doc_type] = f
+        self._writers[doc_type] = writer
+        self._columns[doc_type] = frozenset(fieldnames)
+        return writer
+
+    def _count_dropped(self, doc_type: str, row: Dict[str, Any]) -> None:
+        """Conta (e avisa na primeira vez) os campos que não cabem no cabeçalho do CSV"""
+        columns = self._columns[doc_type]
+        for key in row:
+            if key in columns:
+                continue
+            dropped = self.dropped_columns.setdefault(doc_type, {})
+            if key not in dropped:
+                log_event(
+                    "sink.dropped_column", "Coluna {column} fora do cabeçalho de {csv}; valor descartado",
+                    "WARNING", column=key, csv=f"{doc_type}.csv"
+                )
+            dropped[key] = dropped.get(key, 0) + 1
+
+    def _write_many(self, results: Iterable[Dict[str, Any]]) -> int:
+        count = 0
+        for result in results:
+            data = result.get("data")
+            if not isinstance(data, dict):
+                data = {}
+            # O modelo pode devolver tipo_documento fora do formato (número, lista...)
+            doc_type = data.get("tipo_documento") or result.get("document_type")
+            doc_type = doc_type.lower() if isinstance(doc_type, str) else "desconhecido"
+            row = {k: v for k, v in data.items() if not isinstance(v, (dict, list))}
+            row["image_path"] = result.get("image_path")
+            row["status"] = result.get("status")
+
+            writer = self._writer_for(doc_type, data)
+            if not row.keys() <= self._columns[doc_type]:
+                self._count_dropped(doc_type, row)
+            writer.writerow(row)
+            self.bytes_written += sum(len(str(v)) for v in row.values() if v is not None)
+            count += 1
+        return count
+
+    def _flush(self) -> None:
+        for f in self._files.values():
+            f.flush()
+
+    def _close(self) -> None:
+        for f in self._files.values():
+            f.close()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        if self.dropped_columns:
+            stats["dropped_columns"] = self.dropped_columns
+        return stats
+
+
+def sink_kind(output: str) -> Optional[str]:
+    """
+    Infere o tipo de sink pela extensão do caminho de saída.
+
+    Args:
+        output: Caminho de saída
+
+    Returns:
+        "jsonl", "sqlite", "csv" (diretório existente ou caminho terminado
+        em separador, ex: "saida/") ou None
+    """
+    name = Path(output).name.lower()
+
+    if name.endswith((".db", ".sqlite", ".sqlite3")):
+        return "sqlite"
+    if name.endswith((".jsonl", ".jsonl.gz", ".jsonl.zst", ".ndjson")):
+        return "jsonl"
+    # Um nome sem extensão ("resultado") não vira diretório por engano
+    if output.endswith(("/", os.sep)) or Path(output).is_dir():
+        return "csv"
+    return None
+
+
+def create_sink(output: str, kind: Optional[str] = None, **kwargs) -> ResultSink:
+    """
+    Cria o sink apropriado a partir do caminho de saída.
+
+    Args:
+        output: Caminho de saída (.jsonl, .jsonl.gz, .jsonl.zst, .db/.sqlite, ou diretório
+            para CSV: existente ou terminado em "/")
+        kind: Força o tipo ("jsonl", "sqlite", "csv"); se None, infere pela extensão
+        **kwargs: Parâmetros repassados ao sink
+
+    Returns:
+        Instância de ResultSink
+    """
+    kind = kind or sink_kind(output)
+
+    if kind == "jsonl":
+        name = output.lower()
+        if "compression" not in kwargs:
+            if name.endswith(".gz"):
+                kwargs["compression"] = "gzip"
+            elif name.endswith(".zst"):
+                kwargs["compression"] = "zstd"
+        return JsonlSink(output, **kwargs)
+    if kind == "sqlite":
+        return SqliteSink(output, **kwargs)
+    if kind == "csv":
+        return CsvSink(output, **kwargs)
+
+    raise ValueError(f"Não foi possível inferir o tipo de sink para: {output}")
@@ -0,0 +1,251 @@
+"""
+Escalonador central das chamadas ao Gemini: classes de prioridade
+(interactive, normal, bulk), fila justa ponderada entre tenants/lotes
+dentro de cada classe e promoção por tempo de espera (anti-inanição)
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from deadlines import DeadlineExceeded, current_deadline
+
+# Em ordem de precedência
+PRIORITIES = ("interactive", "normal", "bulk")
+DEFAULT_PRIORITY = "normal"
+DEFAULT_TENANT = "default"
+
+# Prioridade/tenant da chamada em curso (propagado por request_context)
+_current_request: ContextVar[Tuple[str, str]] = ContextVar(
+    "current_request", default=(DEFAULT_PRIORITY, DEFAULT_TENANT)
+)
+
+
+@contextmanager
+def request_context(priority: str, tenant: Optional[str] = None) -> Iterator[None]:
+    """
+    Define a prioridade e o tenant das chamadas feitas dentro do bloco.
+
+    Args:
+        priority: "interactive", "normal" ou "bulk"
+        tenant: Usuário, sessão ou lote dono das chamadas
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"Prioridade inválida: {priority} (opções: {', '.join(PRIORITIES)})")
+    token = _current_request.set((priority, tenant or DEFAULT_TENANT))
+    try:
+        yield
+    finally:
+        _current_request.reset(token)
+
+
+def current_request() -> Tuple[str, str]:
+    """(prioridade, tenant) do contexto atual"""
+    return _current_request.get()
+
+
+class _Ticket:
+    """Chamada aguardando liberação"""
+
+    __slots__ = ("rank", "tenant", "tag", "seq", "enqueued", "granted")
+
+    def __init__(self, rank: int, tenant: str, tag: float, seq: int):
+        self.rank = rank
+        self.tenant = tenant
+        self.tag = tag
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.granted = threading.Event()
+
+
+class _ClassStats:
+    """Tempo de espera de uma classe de prioridade"""
+
+    def __init__(self):
+        self.submitted = 0
+        self.granted = 0
+        self.promoted = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.recent: deque = deque(maxlen=1000)
+
+    def to_dict(self, waiting: int) -> Dict[str, Any]:
+        recent = sorted(self.recent)
+        return {
+            "submitted": self.submitted,
+            "granted": self.granted,
+            "waiting": waiting,
+            "promoted": self.promoted,
+            "avg_wait": round(self.wait_total / self.granted, 4) if self.granted else None,
+            "p95_wait": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 4) if recent else None,
+            "max_wait": round(self.wait_max, 4)
+        }
+
+
+class RequestScheduler:
+    """
+    Libera chamadas até o limite de concorrência, na ordem:
+
+    1. classe de prioridade (interactive > normal > bulk), com a classe
+       efetiva subindo um nível a cada `aging_seconds` de espera;
+    2. dentro da classe, fila justa ponderada (WFQ) entre tenants: cada
+       tenant recebe uma fatia proporcional ao seu peso, de modo que um
+       lote com milhares de imagens não bloqueia os demais.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: Union[int, Callable[[], int]] = 8,
+        aging_seconds: float = 30.0,
+        tenant_weights: Optional[Dict[str, float]] = None
+    ):
+        """
+        Inicializa o escalonador.
+
+        Args:
+            max_concurrent: Chamadas simultâneas, ou função que devolve o
+                limite atual (ex: o do AdaptiveLimiter de rate_control)
+            aging_seconds: Espera após a qual uma chamada sobe uma classe
+            tenant_weights: Peso de cada tenant na fila justa (padrão 1.0)
+        """
+        self._capacity = max_concurrent if callable(max_concurrent) else (lambda: max_concurrent)
+        self.aging_seconds = aging_seconds
+        self.tenant_weights = dict(tenant_weights or {})
+
+        self.running = 0
+        self._waiting: List[_Ticket] = []
+        self._seq = 0
+        # Tempo virtual por classe e última marca de cada (classe, tenant)
+        self._virtual = [0.0] * len(PRIORITIES)
+        self._finish: Dict[Tuple[int, str], float] = {}
+        self._stats = {name: _ClassStats() for name in PRIORITIES}
+        self._lock = threading.Lock()
+
+    def set_weight(self, tenant: str, weight: float) -> None:
+        """Define o peso de um tenant (2.0 = o dobro da vazão de um tenant 1.0)"""
+        with self._lock:
+            self.tenant_weights[tenant] = weight
+
+    def run(
+        self,
+        fn: Callable[[], Any],
+        priority: Optional[str] = None,
+        tenant: Optional[str] = None,
+        cost: float = 1.0
+    ) -> Any:
+        """
+        Executa fn quando houver vaga para a chamada.
+
+        Args:
+            fn: Função sem argumentos que faz a requisição
+            priority: Classe (padrão: a do request_context atual)
+            tenant: Dono da chamada (padrão: o do request_context atual)
+            cost: Custo na fila justa (ex: tokens estimados / 1000)
+
+        Returns:
+            O retorno de fn
+        """
+        with self.slot(priority, tenant, cost):
+            return fn()
+
+    @contextmanager
+    def slot(
+        self,
+        priority: Optional[str] = None,
+        tenant: Optional[str] = None,
+        cost: float = 1.0
+    ) -> Iterator[None]:
+        """
+        Reserva uma vaga (bloqueia até a liberação) e a devolve ao sair.
+
+        Raises:
+            DeadlineExceeded: O prazo do contexto (ver deadlines) acabou na fila
+        """
+        context_priority, context_tenant = current_request()
+        priority = priority or context_priority
+        tenant = tenant or context_tenant
+        if priority not in PRIORITIES:
+            raise ValueError(f"Prioridade inválida: {priority} (opções: {', '.join(PRIORITIES)})")
+
+        ticket = self._enqueue(PRIORITIES.index(priority), tenant, cost)
+        deadline = current_deadline()
+        if not ticket.granted.wait(deadline and deadline.timeout()):
+            with self._lock:
+                if ticket.granted.is_set():
+                    # Liberada no mesmo instante: devolve a vaga
+                    self.running -= 1
+                    self._dispatch()
+                else:
+                    self._waiting.remove(ticket)
+            raise DeadlineExceeded("queue", deadline)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.running -= 1
+                self._dispatch()
+
+    def _enqueue(self, rank: int, tenant: str, cost: float) -> _Ticket:
+        with self._lock:
+            key = (rank, tenant)
+            start = max(self._virtual[rank], self._finish.get(key, 0.0))
+            tag = start + cost / self.tenant_weights.get(tenant, 1.0)
+            self._finish[key] = tag
+            self._seq += 1
+            ticket = _Ticket(rank, tenant, tag, self._seq)
+            self._waiting.append(ticket)
+            self._stats[PRIORITIES[rank]].submitted += 1
+            self._dispatch()
+        return ticket
+
+    def _effective_rank(self, ticket: _Ticket, now: float) -> int:
+        """Classe após a promoção por tempo de espera"""
+        if not self.aging_seconds:
+            return ticket.rank
+        return max(0, ticket.rank - int((now - ticket.enqueued) / self.aging_seconds))
+
+    def _order(self, ticket: _Ticket, now: float) -> Tuple[int, int, float, int]:
+        """Chave de liberação: promovidas primeiro (as mais antigas), depois a fila justa"""
+        rank = self._effective_rank(ticket, now)
+        if rank < ticket.rank:
+            return (rank, 0, ticket.enqueued, ticket.seq)
+        return (rank, 1, ticket.tag, ticket.seq)
+
+    def _dispatch(self) -> None:
+        """Libera as próximas chamadas enquanto houver vaga (com o lock)"""
+        capacity = max(1, int(self._capacity()))
+        now = time.monotonic()
+        while self._waiting and self.running < capacity:
+            ticket = min(self._waiting, key=lambda t: self._order(t, now))
+            self._waiting.remove(ticket)
+            self.running += 1
+            self._virtual[ticket.rank] = max(self._virtual[ticket.rank], ticket.tag)
+
+            stats = self._stats[PRIORITIES[ticket.rank]]
+            wait = now - ticket.enqueued
+            stats.granted += 1
+            stats.wait_total += wait
+            stats.wait_max = max(stats.wait_max, wait)
+            stats.recent.append(wait)
+            if self._effective_rank(ticket, now) < ticket.rank:
+                stats.promoted += 1
+
+            ticket.granted.set()
+
+        if len(self._finish) > 4096:
+            # Tenants ociosos voltam ao tempo virtual corrente de qualquer forma
+            self._finish = {k: v for k, v in self._finish.items() if v > self._virtual[k[0]]}
+
+    def stats(self) -> Dict[str, Any]:
+        """Chamadas em execução e espera por classe de prioridade"""
+        with self._lock:
+            waiting = {name: 0 for name in PRIORITIES}
+            for ticket in self._waiting:
+                waiting[PRIORITIES[ticket.rank]] += 1
+            return {
+                "running": self.running,
+                "capacity": int(self._capacity()),
+                "classes": {name: self._stats[name].to_dict(waiting[name]) for name in PRIORITIES}
+            }
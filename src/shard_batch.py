@@ -0,0 +1,445 @@
+"""
+Lotes divididos em fragmentos (shards) para vários processos ou máquinas:
+o manifesto vira arquivos de fragmento em um diretório de trabalho, cada
+worker reserva um fragmento com um arquivo de lease (criação exclusiva),
+renova o lease enquanto processa com extract_batch e, ao terminar, publica a
+saída do fragmento. Leases vencidos (worker morto) são retomados por outro
+worker. Só usa o sistema de arquivos (local ou compartilhado, ex: NFS)
+
+Estrutura do diretório de trabalho:
+    plan.json                  fragmentos e total de documentos
+    shards/shard-00000.txt     caminhos do fragmento (um por linha)
+    leases/shard-00000.lease   dono atual (mtime = última renovação)
+    outputs/shard-00000.jsonl  resultados do fragmento concluído
+    done/shard-00000.json      estatísticas do fragmento concluído
+"""
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from event_log import log_event
+from result_sinks import JsonlSink, create_sink
+
+# Documentos por fragmento
+SHARD_SIZE = 500
+
+# Um lease sem renovação por este tempo é considerado abandonado
+LEASE_SECONDS = 300.0
+
+# Folga para a diferença entre o relógio do servidor de arquivos (mtime do
+# lease) e o do host que confere a validade (NTP mantém bem abaixo disso)
+CLOCK_SKEW_SECONDS = 30.0
+
+# Espera entre tentativas quando os fragmentos restantes estão com outros workers
+POLL_SECONDS = 5.0
+
+
+def default_owner() -> str:
+    """Identificação do worker: host:pid"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    """Grava em um arquivo temporário e renomeia (leitores nunca veem o arquivo pela metade)"""
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _create_exclusive(path: Path, text: str) -> bool:
+    """Cria o arquivo só se ele não existir (atômico também em NFS v3+)"""
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    return True
+
+
+def plan_shards(
+    work_dir: str,
+    paths: List[str],
+    shard_size: int = SHARD_SIZE,
+    wait_seconds: float = 60.0
+) -> Dict[str, Any]:
+    """
+    Divide o lote em fragmentos (ou carrega a divisão já feita por outro worker).
+
+    Args:
+        work_dir: Diretório de trabalho compartilhado
+        paths: Caminhos das imagens, na ordem do manifesto
+        shard_size: Documentos por fragmento
+        wait_seconds: Quanto esperar se outro worker estiver criando o plano
+
+    Returns:
+        Plano: {"inputs_hash", "total", "shard_size", "shards": [{"id", "count"}]}
+
+    Raises:
+        ValueError: Se o diretório já tiver o plano de outro lote
+    """
+    root = Path(work_dir)
+    for name in ("shards", "leases", "outputs", "done"):
+        (root / name).mkdir(parents=True, exist_ok=True)
+
+    inputs_hash = hashlib.sha256("\n".join(paths).encode("utf-8")).hexdigest()[:16]
+    plan_path = root / "plan.json"
+    lock = root / "plan.lock"
+
+    deadline = time.monotonic() + wait_seconds
+    while not plan_path.exists():
+        if _create_exclusive(lock, default_owner()):
+            try:
+                shards = []
+                for index, start in enumerate(range(0, len(paths), shard_size)):
+                    shard_id = f"shard-{index:05d}"
+                    chunk = paths[start:start + shard_size]
+                    _write_atomic(root / "shards" / f"{shard_id}.txt", "\n".join(chunk) + "\n")
+                    shards.append({"id": shard_id, "count": len(chunk)})
+                plan = {
+                    "inputs_hash": inputs_hash,
+                    "total": len(paths),
+                    "shard_size": shard_size,
+                    "created_by": default_owner(),
+                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "shards": shards
+                }
+                _write_atomic(plan_path, json.dumps(plan, ensure_ascii=False, indent=2))
+                log_event("shard.plan", "Lote dividido em {shards} fragmentos ({total} documentos)",
+                          shards=len(shards), total=len(paths), work_dir=work_dir)
+                return plan
+            finally:
+                lock.unlink(missing_ok=True)
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Plano não criado em {wait_seconds}s (remova {lock} se o worker morreu)")
+        time.sleep(0.2)
+
+    plan = load_plan(work_dir)
+    if plan["inputs_hash"] != inputs_hash:
+        raise ValueError(
+            f"{work_dir} já tem o plano de outro lote ({plan['total']} documentos); "
+            f"use outro diretório de trabalho"
+        )
+    return plan
+
+
+def load_plan(work_dir: str) -> Dict[str, Any]:
+    """Plano criado por plan_shards"""
+    with open(Path(work_dir) / "plan.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class ShardLeases:
+    """Reserva de fragmentos por arquivos de lease com validade"""
+
+    def __init__(self, work_dir: str, owner: Optional[str] = None, lease_seconds: float = LEASE_SECONDS):
+        """
+        Inicializa as reservas de um worker.
+
+        Args:
+            work_dir: Diretório de trabalho
+            owner: Identificação do worker (padrão: host:pid)
+            lease_seconds: Validade de um lease sem renovação
+        """
+        self.root = Path(work_dir)
+        self.owner = owner or default_owner()
+        self.lease_seconds = lease_seconds
+        self.re_leased = 0
+
+    def _lease(self, shard_id: str) -> Path:
+        return self.root / "leases" / f"{shard_id}.lease"
+
+    def is_done(self, shard_id: str) -> bool:
+        return (self.root / "done" / f"{shard_id}.json").exists()
+
+    def owner_of(self, shard_id: str) -> Optional[str]:
+        """Dono atual do lease (None se livre)"""
+        try:
+            return json.loads(self._lease(shard_id).read_text(encoding="utf-8"))["owner"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def _stale(self, path: Path) -> bool:
+        """True se o arquivo não é tocado há mais de lease_seconds (com folga de relógio)"""
+        # mtime vem do relógio do servidor de arquivos e time.time() do host local:
+        # CLOCK_SKEW_SECONDS evita retomar um lease vivo de um host adiantado
+        return time.time() - path.stat().st_mtime > self.lease_seconds + CLOCK_SKEW_SECONDS
+
+    def expired(self, shard_id: str) -> bool:
+        """True se o lease existe e não é renovado há mais de lease_seconds"""
+        try:
+            return self._stale(self._lease(shard_id))
+        except FileNotFoundError:
+            return False
+
+    def claim(self, shard_id: str) -> bool:
+        """
+        Tenta reservar um fragmento.
+
+        Um lease vencido só é removido por quem cria o arquivo ".break" do
+        fragmento (também exclusivo), depois de conferir de novo a validade:
+        dois workers que o viram vencido não removem o lease novo um do outro.
+
+        Returns:
+            True se o fragmento ficou com este worker
+        """
+        if self.is_done(shard_id):
+            return False
+        lease = self._lease(shard_id)
+        content = json.dumps({"owner": self.owner, "claimed_at": time.strftime("%Y-%m-%dT%H:%M:%S")})
+        if _create_exclusive(lease, content):
+            return True
+        if not self.expired(shard_id):
+            return False
+
+        breaker = lease.with_name(f"{lease.name}.break")
+        if not _create_exclusive(breaker, self.owner):
+            try:
+                # Quem estava retomando morreu no meio
+                if self._stale(breaker):
+                    breaker.unlink(missing_ok=True)
+            except FileNotFoundError:
+                pass
+            return False
+        try:
+            if not self.expired(shard_id):
+                return False
+            previous = self.owner_of(shard_id)
+            lease.unlink(missing_ok=True)
+            if not _create_exclusive(lease, content):
+                return False
+        finally:
+            breaker.unlink(missing_ok=True)
+        self.re_leased += 1
+        log_event("shard.re_leased", "Fragmento {shard} retomado (lease de {previous} venceu)",
+                  level="WARNING", shard=shard_id, previous=previous, owner=self.owner)
+        return True
+
+    def renew(self, shard_id: str) -> bool:
+        """Renova o lease; False se ele venceu e outro worker assumiu"""
+        if self.owner_of(shard_id) != self.owner:
+            return False
+        os.utime(self._lease(shard_id))
+        return True
+
+    def release(self, shard_id: str) -> None:
+        """Libera o lease (se ainda for deste worker)"""
+        if self.owner_of(shard_id) == self.owner:
+            self._lease(shard_id).unlink(missing_ok=True)
+
+    def complete(self, shard_id: str, stats: Dict[str, Any]) -> None:
+        """Marca o fragmento como concluído e libera o lease"""
+        _write_atomic(self.root / "done" / f"{shard_id}.json", json.dumps(stats, ensure_ascii=False))
+        self.release(shard_id)
+
+
+class _Heartbeat:
+    """Renova um lease em segundo plano enquanto o fragmento é processado"""
+
+    def __init__(self, leases: ShardLeases, shard_id: str):
+        self.leases = leases
+        self.shard_id = shard_id
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-{shard_id}", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.leases.lease_seconds / 3):
+            try:
+                renewed = self.leases.renew(self.shard_id)
+            except FileNotFoundError:
+                # O lease sumiu entre owner_of e utime (retomado por outro worker)
+                renewed = False
+            except OSError as e:
+                # Falha passageira do sistema de arquivos: o lease ainda vale, tenta de novo
+                log_event("shard.renew_error", "Erro ao renovar o lease de {shard}: {error}", level="WARNING",
+                          shard=self.shard_id, owner=self.leases.owner, error=str(e))
+                continue
+            if not renewed:
+                self.lost = True
+                log_event("shard.lease_lost", "Lease de {shard} perdido", level="WARNING",
+                          shard=self.shard_id, owner=self.leases.owner)
+                return
+
+    def __enter__(self) -> "_Heartbeat":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(
+    work_dir: str,
+    extractor: Any,
+    document_type: str = "auto",
+    validate: bool = False,
+    owner: Optional[str] = None,
+    lease_seconds: float = LEASE_SECONDS,
+    poll_seconds: float = POLL_SECONDS,
+    on_shard: Optional[Callable[[Dict[str, Any]], None]] = None,
+    dead_letters: Any = None
+) -> Dict[str, Any]:
+    """
+    Processa fragmentos do plano até todos estarem concluídos.
+
+    Quando os fragmentos restantes estão reservados por outros workers,
+    espera: se algum deles morrer, o lease vence e o fragmento é retomado.
+
+    Args:
+        work_dir: Diretório de trabalho (com plano, ver plan_shards)
+        extractor: DocumentExtractor deste worker
+        document_type: Tipo do documento
+        validate: Se True, aplica as regras de validation_rules
+        owner: Identificação do worker (padrão: host:pid)
+        lease_seconds: Validade de um lease sem renovação
+        poll_seconds: Espera entre tentativas de reservar
+        on_shard: Chamada com as estatísticas de cada fragmento concluído
+        dead_letters: DeadLetterStore onde as falhas são guardadas
+
+    Returns:
+        Dict com fragmentos e documentos processados por este worker
+    """
+    root = Path(work_dir)
+    plan = load_plan(work_dir)
+    leases = ShardLeases(work_dir, owner, lease_seconds)
+    totals = {"owner": leases.owner, "shards": 0, "documents": 0, "success": 0, "errors": 0,
+              "lost_leases": 0, "seconds": 0.0}
+
+    while True:
+        pending = [shard for shard in plan["shards"] if not leases.is_done(shard["id"])]
+        if not pending:
+            break
+        shard = next((shard for shard in pending if leases.claim(shard["id"])), None)
+        if shard is None:
+            time.sleep(poll_seconds)
+            continue
+
+        shard_id = shard["id"]
+        paths = (root / "shards" / f"{shard_id}.txt").read_text(encoding="utf-8").split("\n")
+        paths = [path for path in paths if path]
+        output = root / "outputs" / f"{shard_id}.jsonl"
+        partial = output.with_name(f".{shard_id}.{uuid.uuid4().hex[:8]}.part")
+
+        start = time.perf_counter()
+        try:
+            with _Heartbeat(leases, shard_id) as heartbeat:
+                with JsonlSink(str(partial)) as sink:
+                    result = extractor.extract_batch(
+                        paths, document_type, sink=sink, compact=True, validate=validate,
+                        dead_letters=dead_letters
+                    )
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            leases.release(shard_id)
+            raise
+        seconds = time.perf_counter() - start
+
+        if heartbeat.lost or leases.owner_of(shard_id) != leases.owner:
+            # Outro worker retomou o fragmento; a saída dele é a que vale
+            partial.unlink(missing_ok=True)
+            totals["lost_leases"] += 1
+            continue
+
+        os.replace(partial, output)
+        stats = {
+            "id": shard_id,
+            "owner": leases.owner,
+            "documents": result["total"],
+            "success": result["success"],
+            "errors": result["errors"],
+            "seconds": round(seconds, 3),
+            "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        }
+        leases.complete(shard_id, stats)
+        log_event("shard.done", "Fragmento {shard} concluído: {documents} documentos em {seconds}s",
+                  shard=shard_id, documents=result["total"], seconds=stats["seconds"], owner=leases.owner)
+
+        totals["shards"] += 1
+        totals["documents"] += result["total"]
+        totals["success"] += result["success"]
+        totals["errors"] += result["errors"]
+        totals["seconds"] += seconds
+        if on_shard is not None:
+            on_shard(stats)
+
+    totals["re_leased"] = leases.re_leased
+    totals["seconds"] = round(totals["seconds"], 3)
+    return totals
+
+
+def shard_status(work_dir: str, lease_seconds: float = LEASE_SECONDS) -> Dict[str, Any]:
+    """
+    Situação dos fragmentos: concluídos, em andamento, abandonados e pendentes.
+
+    Args:
+        work_dir: Diretório de trabalho
+        lease_seconds: Validade de um lease sem renovação
+
+    Returns:
+        Dict com as contagens e os documentos concluídos
+    """
+    plan = load_plan(work_dir)
+    leases = ShardLeases(work_dir, "status", lease_seconds)
+    status = {"shards": len(plan["shards"]), "done": 0, "running": 0, "expired": 0, "pending": 0,
+              "documents": plan["total"], "documents_done": 0}
+    for shard in plan["shards"]:
+        if leases.is_done(shard["id"]):
+            status["done"] += 1
+            status["documents_done"] += shard["count"]
+        elif leases.owner_of(shard["id"]) is None:
+            status["pending"] += 1
+        elif leases.expired(shard["id"]):
+            status["expired"] += 1
+        else:
+            status["running"] += 1
+    return status
+
+
+def merge_outputs(work_dir: str, output: str, **sink_options: Any) -> Dict[str, Any]:
+    """
+    Junta as saídas dos fragmentos, na ordem do plano, em um sink final.
+
+    Args:
+        work_dir: Diretório de trabalho com todos os fragmentos concluídos
+        output: Destino (.jsonl(.gz/.zst), .db ou diretório CSV, ver result_sinks)
+        **sink_options: Parâmetros repassados a create_sink
+
+    Returns:
+        Estatísticas do sink final
+
+    Raises:
+        ValueError: Se algum fragmento não estiver concluído
+    """
+    root = Path(work_dir)
+    plan = load_plan(work_dir)
+    missing = [shard["id"] for shard in plan["shards"] if not (root / "done" / f"{shard['id']}.json").exists()]
+    if missing:
+        raise ValueError(f"{len(missing)} fragmentos não concluídos (ex: {missing[0]})")
+
+    with create_sink(output, **sink_options) as sink:
+        for shard in plan["shards"]:
+            with open(root / "outputs" / f"{shard['id']}.jsonl", encoding="utf-8") as f:
+                batch = []
+                for line in f:
+                    if line.strip():
+                        batch.append(json.loads(line))
+                    if len(batch) >= 1000:
+                        sink.write_many(batch)
+                        batch = []
+                sink.write_many(batch)
+    log_event("shard.merged", "Saídas de {shards} fragmentos gravadas em {output}",
+              shards=len(plan["shards"]), output=output)
+    return sink.stats()
+
+
+def claim_merge(work_dir: str) -> bool:
+    """True para um único worker (o que deve juntar as saídas); os demais recebem False"""
+    return _create_exclusive(Path(work_dir) / "merge.lock", default_owner())
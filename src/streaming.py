@@ -0,0 +1,313 @@
+"""
+Extração em streaming: a resposta do modelo chega aos trechos e cada campo
+do JSON é emitido assim que o seu valor termina, com as validações (CPF,
+CNH, datas) rodando no mesmo momento, em vez de esperar a resposta inteira
+"""
+import asyncio
+import json
+import queue
+import threading
+import time
+from contextvars import copy_context
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from event_log import log_event
+from validation_rules import ValidationEngine, resolve_document_type
+
+# Recebe cada evento: "field", "validation" e, por último, "done"
+EventCallback = Callable[[Dict[str, Any]], None]
+
+# Marca de fim da fila de eventos
+_END = object()
+
+
+def chunk_text(chunk: Any) -> str:
+    """Texto de um trecho da resposta (trechos só com metadados não têm texto)"""
+    try:
+        return chunk.text or ""
+    except ValueError:
+        return ""
+
+
+class IncrementalJSONParser:
+    """Lê um objeto JSON aos pedaços e devolve os campos do primeiro nível à medida que terminam"""
+
+    def __init__(self):
+        self._prefix = ""
+        self._buffer = ""
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = 0
+        self.closed = False
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """
+        Acrescenta um trecho da resposta.
+
+        Texto antes da primeira chave (ex: ```json) é ignorado; campos com
+        objetos ou listas como valor saem quando o valor inteiro fecha.
+
+        Args:
+            text: Próximo trecho
+
+        Returns:
+            Lista de (campo, valor) completados por este trecho
+        """
+        fields: List[Tuple[str, Any]] = []
+        if self.closed or not text:
+            return fields
+
+        if not self._buffer:
+            self._prefix += text
+            brace = self._prefix.find("{")
+            if brace < 0:
+                return fields
+            text, self._prefix = self._prefix[brace:], ""
+
+        offset = len(self._buffer)
+        self._buffer += text
+        for index in range(offset, len(self._buffer)):
+            char = self._buffer[index]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._member_start = index + 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    fields.extend(self._member(index))
+                    self.closed = True
+                    break
+            elif char == "," and self._depth == 1:
+                fields.extend(self._member(index))
+                self._member_start = index + 1
+        return fields
+
+    def _member(self, end: int) -> List[Tuple[str, Any]]:
+        """Par "campo": valor entre o início do membro atual e `end`"""
+        member = self._buffer[self._member_start:end].strip()
+        if not member:
+            return []
+        try:
+            return list(json.loads("{" + member + "}").items())
+        except json.JSONDecodeError:
+            # Trecho malformado: o parse da resposta completa decide no final
+            return []
+
+
+class FieldStream:
+    """Campos e validações de uma extração em streaming, emitidos como eventos"""
+
+    def __init__(
+        self,
+        document_type: str = "auto",
+        on_event: Optional[EventCallback] = None,
+        engine: Optional[ValidationEngine] = None
+    ):
+        """
+        Inicializa o fluxo.
+
+        Args:
+            document_type: Tipo do documento ("auto" usa o tipo_documento lido)
+            on_event: Chamada a cada evento (na thread que consome a resposta)
+            engine: Motor de validação; None não valida
+        """
+        self.document_type = document_type
+        self.on_event = on_event or (lambda event: None)
+        self.engine = engine
+        self.parser = IncrementalJSONParser()
+        self.data: Dict[str, Any] = {}
+        self.validations: Dict[str, Any] = {}
+        self.chunks = 0
+        self.first_field_seconds: Optional[float] = None
+        self.start = time.perf_counter()
+
+    def _elapsed(self) -> float:
+        return round(time.perf_counter() - self.start, 3)
+
+    def restart(self) -> None:
+        """Nova tentativa da chamada: descarta o texto parcial (campos já emitidos não se repetem)"""
+        self.parser = IncrementalJSONParser()
+
+    def feed(self, text: str) -> None:
+        """Consome um trecho da resposta do modelo"""
+        self.chunks += 1
+        for field, value in self.parser.feed(text):
+            self._field(field, value)
+            if self.engine is not None:
+                self._validate_ready()
+
+    def _field(self, field: str, value: Any, **extra: Any) -> None:
+        if field in self.data and self.data[field] == value:
+            return
+        self.data[field] = value
+        if self.first_field_seconds is None:
+            self.first_field_seconds = self._elapsed()
+        self.on_event({"event": "field", "field": field, "value": value, "seconds": self._elapsed(), **extra})
+
+    def _validation(self, name: str, fields: Tuple[str, ...], outcome: Dict[str, Any]) -> None:
+        self.validations[name] = outcome
+        self.on_event({
+            "event": "validation",
+            "rule": name,
+            "fields": list(fields),
+            "valid": outcome.get("valid"),
+            "result": outcome,
+            "seconds": self._elapsed()
+        })
+
+    def _validate_ready(self) -> None:
+        """Roda as regras cujos campos já chegaram todos"""
+        document_type = resolve_document_type({"document_type": self.document_type, "data": self.data})
+        for rule in self.engine.rules_for(document_type, self.data):
+            if rule.name in self.validations:
+                continue
+            if any(field not in self.data for field in rule.fields + rule.optional_fields):
+                continue
+            args = rule.arguments(self.data)
+            if args is not None:
+                self._validation(rule.name, rule.fields, rule.run_one(args))
+
+    def finish(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Conclui o fluxo com o resultado da extração e emite o evento "done".
+
+        Campos que o parse incremental não emitiu (ou leu diferente do parse
+        da resposta completa) saem agora; com validação, o resultado passa
+        pelo ValidationEngine completo (com a correção local de OCR) e as
+        validações que mudaram são emitidas de novo.
+
+        Args:
+            result: Resultado de extract_from_image (alterado no lugar)
+
+        Returns:
+            O mesmo resultado, com "stream" (trechos, tempo até o primeiro
+            campo e duração) se a extração deu certo
+        """
+        data = result.get("data")
+        if result.get("status") == "success" and isinstance(data, dict) and "raw_text" not in data:
+            for field, value in data.items():
+                self._field(field, value)
+
+            if self.engine is not None:
+                document_type = resolve_document_type(result)
+                self.engine.validate_batch([result], document_type)
+                # Campos alterados pela validação (correção de OCR aplicada com
+                # min_confidence; sem ele as correções ficam só em "corrections")
+                for field, value in data.items():
+                    self._field(field, value, corrected=True)
+                rules = {rule.name: rule.fields for rule in self.engine.rules_for(document_type, data)}
+                for name, outcome in (result.get("validations") or {}).items():
+                    if self.validations.get(name) != outcome:
+                        self._validation(name, rules.get(name, ()), outcome)
+
+        if result.get("status") == "success":
+            result["stream"] = {
+                "chunks": self.chunks,
+                "first_field_seconds": self.first_field_seconds,
+                "seconds": self._elapsed()
+            }
+            log_event(
+                "extraction.stream", "Streaming concluído: primeiro campo em {first_field_seconds}s de {seconds}s",
+                image_path=result.get("image_path"), **result["stream"]
+            )
+        self.on_event({"event": "done", "result": result, "seconds": self._elapsed()})
+        return result
+
+
+def iter_events(
+    run: Callable[[EventCallback], Any],
+    on_abandon: Optional[Callable[[], None]] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Executa run(on_event) em uma thread e devolve os eventos à medida que chegam.
+
+    Args:
+        run: Função que recebe o callback de eventos (ex: extract_streaming)
+        on_abandon: Chamada se o consumidor fechar o iterador antes do fim
+            (ex: Deadline.cancel, para a extração parar de ler a resposta)
+
+    Returns:
+        Iterador de eventos; exceções de run são relançadas no final
+    """
+    events: "queue.Queue[Any]" = queue.Queue()
+    errors: List[BaseException] = []
+
+    def target() -> None:
+        try:
+            run(events.put)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            events.put(_END)
+
+    # A thread herda a prioridade/tenant de quem chamou (ver scheduler.request_context)
+    thread = threading.Thread(target=copy_context().run, args=(target,), name="extract-stream", daemon=True)
+    thread.start()
+    finished = False
+    try:
+        while True:
+            event = events.get()
+            if event is _END:
+                finished = True
+                break
+            yield event
+    finally:
+        if not finished and on_abandon is not None:
+            on_abandon()
+    thread.join()
+    if errors:
+        raise errors[0]
+
+
+async def aiter_events(
+    run: Callable[[EventCallback], Any],
+    on_abandon: Optional[Callable[[], None]] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Versão assíncrona de iter_events: run roda no executor padrão do loop.
+
+    Args:
+        run: Função que recebe o callback de eventos (ex: extract_streaming)
+        on_abandon: Chamada se o consumidor desistir antes do fim (break,
+            aclose ou tarefa cancelada)
+
+    Returns:
+        Iterador assíncrono de eventos; exceções de run são relançadas no final
+    """
+    loop = asyncio.get_running_loop()
+    events: "asyncio.Queue[Any]" = asyncio.Queue()
+
+    def emit(event: Any) -> None:
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+    def target() -> Any:
+        try:
+            return run(emit)
+        finally:
+            emit(_END)
+
+    future = loop.run_in_executor(None, copy_context().run, target)
+    finished = False
+    try:
+        while True:
+            event = await events.get()
+            if event is _END:
+                finished = True
+                break
+            yield event
+    finally:
+        if not finished and on_abandon is not None:
+            on_abandon()
+    await future
@@ -0,0 +1,157 @@
+"""
+Resultados compactos para as ferramentas do agente: o LLM recebe só os
+campos extraídos e veredictos curtos das validações; o resultado completo
+(raw_response, validações detalhadas, métricas) fica no servidor sob um
+handle que pode ser consultado depois
+"""
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def validation_verdict(outcome: Any) -> str:
+    """
+    Resume uma validação em uma frase curta.
+
+    Args:
+        outcome: Dict de resultado de um validador
+
+    Returns:
+        Ex: "válido", "inválido: Dígitos verificadores inválidos",
+        "válida, vence em 533 dias", "vencida"
+    """
+    if not isinstance(outcome, dict):
+        return str(outcome)
+    if not outcome.get("valid", False):
+        return f"inválido: {outcome.get('error', 'motivo não informado')}"
+    if "vencida" in outcome:
+        if outcome["vencida"]:
+            return "vencida"
+        return f"válida, vence em {outcome.get('dias_para_vencer', 0)} dias"
+    if outcome.get("is_future"):
+        return "válido (data futura)"
+    return "válido"
+
+
+def compact_result(result: Dict[str, Any], handle: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Versão enxuta de um resultado de extração para o contexto do LLM.
+
+    Args:
+        result: Resultado de extract_from_image (com ou sem validações)
+        handle: Handle do resultado completo em ResultRegistry
+
+    Returns:
+        Dict com status, tipo, campos não nulos e veredictos das validações
+    """
+    if result.get("status") != "success":
+        compact = {
+            "status": result.get("status", "error"),
+            "message": result.get("message"),
+            "image_path": result.get("image_path")
+        }
+        if result.get("failure"):
+            compact["failure"] = result["failure"]
+    else:
+        data = result.get("data")
+        compact = {
+            "status": "success",
+            "image_path": result.get("image_path"),
+            "document_type": result.get("document_type"),
+            "data": (
+                {k: v for k, v in data.items() if v not in (None, "")}
+                if isinstance(data, dict) else data
+            )
+        }
+        if result.get("validations"):
+            compact["validations"] = {
+                name: validation_verdict(outcome) for name, outcome in result["validations"].items()
+            }
+
+    if result.get("corrections"):
+        compact["corrections"] = {
+            field: _correction_note(correction) for field, correction in result["corrections"].items()
+        }
+
+    requery = result.get("requery")
+    if requery:
+        compact["requery"] = {"fields": requery.get("fields"), "changed": sorted(requery.get("changed") or {})}
+        if requery.get("error"):
+            compact["requery"]["error"] = requery["error"]
+
+    issues = (result.get("quality") or {}).get("issues")
+    if issues:
+        compact["quality"] = issues
+    if result.get("stream"):
+        compact["stream"] = result["stream"]
+    if handle:
+        compact["handle"] = handle
+    return compact
+
+
+def _correction_note(correction: Dict[str, Any]) -> str:
+    """Resume uma correção de ocr_correction (aplicada, sugerida ou ambígua)"""
+    if correction.get("status") == "ambiguous":
+        return f"ambíguo: {len(correction.get('candidates', []))} candidatos"
+    if correction.get("applied"):
+        return f"corrigido de {correction['original']} (confiança {correction['confidence']})"
+    return f"sugestão: {correction['corrected']} (confiança {correction['confidence']})"
+
+
+class ResultRegistry:
+    """Resultados completos mantidos no servidor (LRU limitado, thread-safe)"""
+
+    def __init__(self, max_items: int = 1000):
+        """
+        Inicializa o registro.
+
+        Args:
+            max_items: Resultados guardados; os mais antigos são descartados
+        """
+        self.max_items = max_items
+        self._items: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, result: Dict[str, Any]) -> str:
+        """Guarda um resultado e devolve o handle"""
+        handle = f"res_{uuid.uuid4().hex[:10]}"
+        with self._lock:
+            self._items[handle] = result
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return handle
+
+    def get(self, handle: str) -> Optional[Dict[str, Any]]:
+        """Resultado completo de um handle (None se expirou ou não existe)"""
+        with self._lock:
+            result = self._items.get(handle)
+            if result is not None:
+                self._items.move_to_end(handle)
+            return result
+
+    def resolve(self, data: Any) -> Any:
+        """
+        Troca um handle (ou um resultado compacto com "handle") pelo resultado completo.
+
+        Args:
+            data: Handle, resultado compacto ou qualquer outro valor
+
+        Returns:
+            O resultado completo, ou `data` inalterado se não houver handle válido
+        """
+        handle = data.get("handle") if isinstance(data, dict) else data
+        if isinstance(handle, str):
+            full = self.get(handle)
+            if full is not None:
+                return full
+        return data
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+def approx_tokens(payload: Any) -> int:
+    """Tokens aproximados de um payload serializado em JSON (~4 caracteres/token)"""
+    return len(json.dumps(payload, ensure_ascii=False)) // 4 + 1
@@ -0,0 +1,315 @@
+"""
+Registro declarativo de regras de validação por tipo de documento
+e motor que aplica as regras a um lote inteiro de resultados
+"""
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from date_engine import validate_dates_bulk, validate_expirations_bulk
+from ocr_correction import confidence_at_least, correct_number
+from validators import DocumentValidator
+
+
+def field_text(value: Any) -> Optional[str]:
+    """
+    Valor de um campo como texto para os validadores.
+
+    O modelo às vezes devolve números ("cpf": 11144477735), que viram str;
+    listas e dicts (ex: "uf_emissor": ["SP"]) não são validados (None).
+    """
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, (int, float)):
+        return str(value)
+    return None
+
+
+@dataclass(frozen=True)
+class FieldRule:
+    """Regra: valida um ou mais campos de `data` e grava em validations[name]"""
+
+    # Chave no dict de validações (ex: "cpf", "validade_cnh")
+    name: str
+    # Campos obrigatórios, passados em ordem ao validador
+    fields: Tuple[str, ...]
+    validator: Callable[..., Dict[str, Any]]
+    # Campos opcionais, passados após os obrigatórios (None se ausentes)
+    optional_fields: Tuple[str, ...] = ()
+    # Validador em lote: recebe lista de tuplas de argumentos
+    bulk: Optional[Callable[[List[tuple]], List[Dict[str, Any]]]] = None
+    # Tipo para ocr_correction ("cpf", "cnpj", "cnh") quando a regra falha
+    corrector: Optional[str] = None
+
+    def arguments(self, data: Dict[str, Any]) -> Optional[tuple]:
+        """Argumentos do validador para um documento (None se faltar campo)"""
+        values = []
+        for field in self.fields:
+            value = field_text(data.get(field))
+            if not value:
+                return None
+            values.append(value)
+        for field in self.optional_fields:
+            values.append(field_text(data.get(field)))
+        return tuple(values)
+
+    def run_bulk(self, args_list: List[tuple]) -> List[Dict[str, Any]]:
+        """Executa a regra sobre vários documentos"""
+        if self.bulk is not None:
+            return self.bulk(args_list)
+        return DocumentValidator.validate_batch(self.validator, args_list)
+
+    def run_one(self, args: tuple) -> Dict[str, Any]:
+        """Executa a regra sobre um documento; um erro vira validação inválida"""
+        try:
+            return self.run_bulk([args])[0]
+        except Exception as e:
+            return {"valid": False, "error": f"Erro na validação: {e}"}
+
+
+def cpf_rule(field: str) -> FieldRule:
+    return FieldRule("cpf", (field,), DocumentValidator.validate_cpf, corrector="cpf")
+
+
+def cnpj_rule(field: str) -> FieldRule:
+    return FieldRule("cnpj", (field,), DocumentValidator.validate_cnpj, corrector="cnpj")
+
+
+def date_rule(field: str) -> FieldRule:
+    return FieldRule(field, (field,), DocumentValidator.validate_date, bulk=validate_dates_bulk)
+
+
+# Regras por tipo de documento, na ordem em que aparecem em `validations`
+VALIDATION_RULES: Dict[str, List[FieldRule]] = {
+    "rg": [
+        cpf_rule("cpf"),
+        date_rule("data_nascimento"),
+        date_rule("data_emissao"),
+        FieldRule("rg", ("numero_rg",), DocumentValidator.validate_rg, optional_fields=("uf_emissor",)),
+    ],
+    "cnh": [
+        FieldRule("cnh", ("numero_registro",), DocumentValidator.validate_cnh, corrector="cnh"),
+        cpf_rule("cpf"),
+        date_rule("data_nascimento"),
+        FieldRule(
+            "validade_cnh",
+            ("data_emissao", "data_validade"),
+            DocumentValidator.validate_cnh_expiration,
+            bulk=validate_expirations_bulk
+        ),
+    ],
+    "cpf": [
+        cpf_rule("numero_cpf"),
+        date_rule("data_nascimento"),
+    ],
+    "cnpj": [
+        cnpj_rule("numero_cnpj"),
+        date_rule("data_abertura"),
+        date_rule("data_situacao_cadastral"),
+    ],
+}
+
+# Regras inferidas pelo nome do campo, para tipos sem regras registradas
+FIELD_RULES: Dict[str, Callable[[str], FieldRule]] = {
+    "cpf": cpf_rule,
+    "numero_cpf": cpf_rule,
+    "cnpj": cnpj_rule,
+    "numero_cnpj": cnpj_rule,
+}
+
+
+class ValidationEngine:
+    """Aplica as regras de validação a documentos individuais ou em lote"""
+
+    def __init__(
+        self,
+        rules: Optional[Dict[str, List[FieldRule]]] = None,
+        correct: bool = True,
+        min_confidence: Optional[str] = None
+    ):
+        """
+        Inicializa o motor.
+
+        Args:
+            rules: Regras por tipo de documento (padrão: VALIDATION_RULES)
+            correct: Se True, números que falham no dígito verificador passam
+                pela correção local de OCR (ver ocr_correction)
+            min_confidence: Confiança mínima para aplicar a correção aos dados
+                ("high" = só letras trocadas); None (padrão) nunca altera os
+                dados e a correção fica apenas sugerida em "corrections"
+        """
+        self.rules = {k: list(v) for k, v in (rules or VALIDATION_RULES).items()}
+        self.correct = correct
+        self.min_confidence = min_confidence
+
+    def register(self, document_type: str, rule: FieldRule) -> None:
+        """Adiciona uma regra a um tipo de documento"""
+        self.rules.setdefault(document_type.lower(), []).append(rule)
+
+    def rules_for(self, document_type: str, data: Dict[str, Any]) -> List[FieldRule]:
+        """
+        Regras de um tipo de documento.
+
+        Tipos sem regras registradas recebem regras inferidas pelos nomes
+        dos campos (cpf/cnpj pelos dígitos verificadores, data_* como datas),
+        cada uma com o nome do campo ("cpf" e "numero_cpf" não se sobrescrevem).
+
+        Args:
+            document_type: Tipo do documento
+            data: Dados extraídos (usados na inferência)
+
+        Returns:
+            Lista de regras
+        """
+        rules = self.rules.get((document_type or "").lower())
+        if rules is not None:
+            return rules
+
+        inferred = []
+        for field in data:
+            if field in FIELD_RULES:
+                inferred.append(replace(FIELD_RULES[field](field), name=field))
+            elif field.startswith("data_"):
+                inferred.append(date_rule(field))
+        return inferred
+
+    def validate(self, data: Dict[str, Any], document_type: str) -> Dict[str, Any]:
+        """
+        Valida os dados extraídos de um documento.
+
+        Args:
+            data: Dados extraídos (result["data"])
+            document_type: Tipo do documento
+
+        Returns:
+            Dict de validações (nome da regra -> resultado)
+        """
+        result = {"status": "success", "document_type": document_type, "data": data}
+        self.validate_batch([result])
+        return result.get("validations", {})
+
+    def validate_batch(
+        self,
+        results: List[Dict[str, Any]],
+        document_type: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Valida um lote de resultados de extração em uma única passada.
+
+        As chamadas são agrupadas por validador: todos os CPFs do lote vão
+        para um único validate_batch, todas as datas para outro, etc.
+        Cada resultado bem-sucedido recebe a chave "validations".
+
+        Args:
+            results: Resultados de extract_from_image
+            document_type: Força o tipo de todos os resultados (padrão: o
+                document_type de cada resultado ou o tipo detectado)
+
+        Returns:
+            A mesma lista de resultados, atualizada
+        """
+        # validador -> (regra, lista de (índice, regra do item, argumentos))
+        groups: Dict[Any, Tuple[FieldRule, List[Tuple[int, FieldRule, tuple]]]] = {}
+        pending: List[Optional[Dict[str, Any]]] = []
+
+        for index, result in enumerate(results):
+            data = result.get("data")
+            if result.get("status") != "success" or not isinstance(data, dict):
+                pending.append(None)
+                continue
+
+            validations: Dict[str, Any] = {}
+            pending.append(validations)
+            try:
+                doc_type = document_type or resolve_document_type(result)
+                for rule in self.rules_for(doc_type, data):
+                    args = rule.arguments(data)
+                    if args is None:
+                        continue
+                    # Reserva a posição para manter a ordem das regras
+                    validations[rule.name] = None
+                    key = (rule.validator, rule.bulk)
+                    groups.setdefault(key, (rule, []))[1].append((index, rule, args))
+            except Exception as e:
+                # Um documento com dados inesperados não derruba o lote
+                validations["erro"] = {"valid": False, "error": f"Erro na validação: {e}"}
+
+        for rule, items in groups.values():
+            try:
+                outcomes = rule.run_bulk([args for _, _, args in items])
+            except Exception:
+                # Refaz item a item para isolar o valor que falhou
+                outcomes = [item_rule.run_one(args) for _, item_rule, args in items]
+            for (index, item_rule, _), outcome in zip(items, outcomes):
+                if self.correct and item_rule.corrector and not outcome.get("valid"):
+                    try:
+                        outcome = self._correct(results[index], item_rule, outcome)
+                    except Exception:
+                        pass
+                pending[index][item_rule.name] = outcome
+
+        for result, validations in zip(results, pending):
+            if validations is not None:
+                result["validations"] = validations
+
+        return results
+
+    def failed_fields(self, result: Dict[str, Any], document_type: Optional[str] = None) -> List[str]:
+        """
+        Campos cujas validações falharam em um resultado já validado.
+
+        Args:
+            result: Resultado com "validations"
+            document_type: Força o tipo (padrão: resolve_document_type)
+
+        Returns:
+            Campos obrigatórios das regras inválidas, sem repetição
+        """
+        validations = result.get("validations") or {}
+        data = result.get("data")
+        if not validations or not isinstance(data, dict):
+            return []
+
+        fields: List[str] = []
+        for rule in self.rules_for(document_type or resolve_document_type(result), data):
+            outcome = validations.get(rule.name)
+            if isinstance(outcome, dict) and not outcome.get("valid", True):
+                fields.extend(field for field in rule.fields if field not in fields)
+        return fields
+
+    def _correct(self, result: Dict[str, Any], rule: FieldRule, outcome: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Tenta corrigir localmente um número que falhou na validação.
+
+        A correção fica registrada em result["corrections"][campo] como
+        sugestão; só com min_confidence definido e uma correção única com
+        confiança suficiente o campo em result["data"] é substituído (o
+        valor lido fica em "original") e revalidado.
+        """
+        field = rule.fields[0]
+        data = result["data"]
+        correction = correct_number(field_text(data.get(field)), rule.corrector)
+        if correction["status"] not in ("corrected", "ambiguous"):
+            return outcome
+
+        correction["applied"] = (
+            correction["status"] == "corrected"
+            and confidence_at_least(correction["confidence"], self.min_confidence)
+        )
+        result.setdefault("corrections", {})[field] = correction
+        if not correction["applied"]:
+            return outcome
+
+        data[field] = correction["corrected"]
+        return rule.validator(correction["corrected"])
+
+
+def resolve_document_type(result: Dict[str, Any]) -> str:
+    """Tipo do documento: o solicitado ou, em "auto", o detectado pelo modelo"""
+    doc_type = (result.get("document_type") or "auto").lower()
+    if doc_type == "auto":
+        doc_type = str(result["data"].get("tipo_documento") or "auto").lower()
+    return doc_type
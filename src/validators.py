@@ -2,9 +2,11 @@
 Validadores para documentos brasileiros (CPF, CNH, RG, datas)
 """
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, List, Sequence
 import re
 
+from date_engine import DateEngine
+
 
 class DocumentValidator:
     """Validador de documentos brasileiros"""
@@ -188,17 +190,21 @@ class DocumentValidator:
         }
 
     @staticmethod
-    def validate_date(date_str: str, date_format: str = "%d/%m/%Y") -> Dict[str, Any]:
+    def validate_date(date_str: str, date_format: Optional[str] = None) -> Dict[str, Any]:
         """
         Valida e parseia uma data.
 
         Args:
             date_str: Data no formato string
-            date_format: Formato esperado da data
+            date_format: Formato strptime exigido. Se None, aceita DD/MM/AAAA,
+                DD-MM-AA, DD.MM.AAAA e ISO (ver date_engine)
 
         Returns:
             Dict com status e data parseada
         """
+        if date_format is None:
+            return DateEngine().validate(date_str)
+
         if not date_str:
             return {
                 "valid": False,
@@ -269,37 +275,59 @@ class DocumentValidator:
         Returns:
             Dict com análise das datas
         """
-        emissao_result = DocumentValidator.validate_date(emissao)
-        validade_result = DocumentValidator.validate_date(validade)
+        return DateEngine().validate_expiration(emissao, validade)
 
-        if not emissao_result["valid"] or not validade_result["valid"]:
-            return {
-                "valid": False,
-                "error": "Datas inválidas",
-                "emissao": emissao_result,
-                "validade": validade_result
-            }
+    # ==================== VALIDAÇÃO EM LOTE ====================
 
-        emissao_date = datetime.strptime(emissao_result["date"], "%Y-%m-%d")
-        validade_date = datetime.strptime(validade_result["date"], "%Y-%m-%d")
+    @staticmethod
+    def validate_batch(
+        validator: Callable[..., Dict[str, Any]],
+        args_list: Sequence[tuple]
+    ) -> List[Dict[str, Any]]:
+        """
+        Aplica um validador a muitos valores de uma vez.
 
-        if validade_date <= emissao_date:
-            return {
-                "valid": False,
-                "error": "Data de validade deve ser posterior à emissão",
-                "emissao": emissao_result,
-                "validade": validade_result
-            }
+        Cada combinação distinta de argumentos é validada uma única vez
+        (o mesmo CPF costuma aparecer em RG, CNH e CPF do mesmo titular).
 
-        # Verifica se está vencida
-        hoje = datetime.now()
-        dias_para_vencer = (validade_date - hoje).days
+        Args:
+            validator: Função de validação (ex: DocumentValidator.validate_cpf)
+            args_list: Lista de tuplas de argumentos, uma por valor
 
-        return {
-            "valid": True,
-            "emissao": emissao_result,
-            "validade": validade_result,
-            "status": "vencida" if dias_para_vencer < 0 else "válida",
-            "dias_para_vencer": dias_para_vencer if dias_para_vencer > 0 else 0,
-            "vencida": dias_para_vencer < 0
-        }
+        Returns:
+            Lista de resultados, na mesma ordem de args_list
+        """
+        cache: Dict[tuple, Dict[str, Any]] = {}
+        results = []
+        for args in args_list:
+            result = cache.get(args)
+            if result is None:
+                result = cache[args] = validator(*args)
+            # Cada registro recebe sua própria cópia do resultado
+            results.append(_copy_result(result))
+        return results
+
+    @staticmethod
+    def validate_cpf_batch(cpfs: Sequence[str]) -> List[Dict[str, Any]]:
+        """Valida uma lista de CPFs"""
+        return DocumentValidator.validate_batch(DocumentValidator.validate_cpf, [(c,) for c in cpfs])
+
+    @staticmethod
+    def validate_cnpj_batch(cnpjs: Sequence[str]) -> List[Dict[str, Any]]:
+        """Valida uma lista de CNPJs"""
+        return DocumentValidator.validate_batch(DocumentValidator.validate_cnpj, [(c,) for c in cnpjs])
+
+    @staticmethod
+    def validate_date_batch(dates: Sequence[str]) -> List[Dict[str, Any]]:
+        """Valida uma coluna de datas com uma única data de referência"""
+        return DateEngine().validate_column(dates)
+
+    @staticmethod
+    def validate_cnh_batch(cnhs: Sequence[str]) -> List[Dict[str, Any]]:
+        """Valida uma lista de números de CNH"""
+        return DocumentValidator.validate_batch(DocumentValidator.validate_cnh, [(c,) for c in cnhs])
+
+
+def _copy_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Cópia dos dicts de resultado (inclusive aninhados, como em validate_cnh_expiration)"""
+    return {k: _copy_result(v) if isinstance(v, dict) else v for k, v in result.items()}
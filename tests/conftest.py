@@ -0,0 +1,64 @@
+"""
+Configuração comum dos testes: módulos de src/ no path e extrator com o
+backend falso do Gemini (dispensa API key e rede)
+"""
+import json
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+os.environ.setdefault("GOOGLE_API_KEY", "teste")
+
+from fake_backend import SAMPLE_DATA, FakeGeminiModel  # noqa: E402
+
+
+def sample_result(i: int = 0, **data) -> dict:
+    """Resultado de extract_from_image de uma CNH fictícia (campos sobrescritos por `data`)"""
+    # Registro de CNH com dígitos verificadores válidos
+    fields = dict(SAMPLE_DATA, numero_registro="01000000082", nome_completo=f"Pessoa Exemplo {i}")
+    fields.update(data)
+    return {
+        "status": "success",
+        "message": "Documento processado com sucesso",
+        "image_path": f"data/cnh_{i}.jpg",
+        "document_type": "cnh",
+        "data": fields
+    }
+
+
+@pytest.fixture
+def make_extractor():
+    """Cria DocumentExtractor com FakeGeminiModel (latência zero por padrão)"""
+    from document_extractor import DocumentExtractor
+
+    def make(response: dict = None, latency: float = 0.0, **kwargs):
+        extractor = DocumentExtractor(**kwargs)
+        extractor.model = FakeGeminiModel(
+            latency, response_text=json.dumps(response, ensure_ascii=False) if response else None
+        )
+        return extractor
+
+    return make
+
+
+@pytest.fixture
+def images(tmp_path):
+    """Gera n JPEGs pequenos em tmp_path"""
+    from PIL import Image, ImageDraw
+
+    def make(n: int, prefix: str = "doc"):
+        image = Image.new("RGB", (1200, 800), (200, 190, 170))
+        draw = ImageDraw.Draw(image)
+        for y in range(0, 800, 40):
+            draw.line([(0, y), (1200, y + 20)], fill=(40, 40, 40), width=3)
+        paths = []
+        for i in range(n):
+            path = tmp_path / f"{prefix}_{i}.jpg"
+            image.save(path, quality=85)
+            paths.append(str(path))
+        return paths
+
+    return make
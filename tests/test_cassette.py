@@ -0,0 +1,71 @@
+"""Testes da gravação e reprodução das respostas (cassetes)"""
+import pytest
+
+from cassette import Cassette, CassetteMiss, CassetteModel, request_key, use_cassette
+from fake_backend import FakeGeminiModel
+
+
+def test_cassette_record_and_replay(make_extractor, images, tmp_path):
+    paths = images(3)
+    path = str(tmp_path / "sessao.jsonl")
+
+    recorder = make_extractor()
+    use_cassette(recorder, path, "record")
+    recorded = [recorder.extract_from_image(p, "cnh") for p in paths]
+
+    # Reprodução sem backend: as mesmas respostas, sem chamar o modelo
+    player = make_extractor()
+    player.model = None
+    cassette = use_cassette(player, path, "replay", latency="zero")
+    replayed = [player.extract_from_image(p, "cnh") for p in paths]
+
+    assert [r["data"] for r in replayed] == [r["data"] for r in recorded]
+    assert cassette.stats()["hits"] == 3
+
+
+def test_cassette_miss_in_replay(make_extractor, tmp_path):
+    extractor = make_extractor()
+    use_cassette(extractor, str(tmp_path / "vazio.jsonl"), "replay")
+    with pytest.raises(CassetteMiss):
+        extractor.model.generate_content(["prompt"])
+
+
+def test_request_key_hashes_prompt_and_images():
+    key = request_key(["prompt", {"mime_type": "image/jpeg", "data": b"a"}], "gemini-2.5-flash")
+    assert key["model"] == "gemini-2.5-flash"
+    assert len(key["image_hashes"]) == 1
+    assert key["key"] != request_key(["prompt", {"data": b"b"}], "gemini-2.5-flash")["key"]
+    assert key["key"] != request_key(["outro", {"data": b"a"}], "gemini-2.5-flash")["key"]
+    assert key["key"] != request_key(["prompt", {"data": b"a"}], "gemini-2.5-pro")["key"]
+
+
+def test_auto_mode_records_only_misses(tmp_path):
+    path = str(tmp_path / "auto.jsonl")
+    backend = FakeGeminiModel(0.0)
+    model = CassetteModel(backend, Cassette(path), "m", mode="auto", latency="zero")
+    model.generate_content(["a"])
+    model.generate_content(["a"])
+    model.generate_content(["b"])
+
+    assert backend.calls == 2
+    assert model.cassette.stats()["hits"] == 1
+    # Reaberto do disco, o cassete tem as duas respostas
+    assert Cassette(path).stats()["entries"] == 2
+
+
+def test_stream_record_and_replay(tmp_path):
+    path = str(tmp_path / "stream.jsonl")
+    recorder = CassetteModel(FakeGeminiModel(0.0), Cassette(path), "m", mode="record")
+    recorded = "".join(chunk.text for chunk in recorder.generate_content(["a"], stream=True))
+
+    player = CassetteModel(None, Cassette(path), "m", latency="zero")
+    replayed = "".join(chunk.text for chunk in player.generate_content(["a"], stream=True))
+    assert replayed == recorded
+
+
+def test_invalid_mode_and_latency(tmp_path):
+    cassette = Cassette(str(tmp_path / "x.jsonl"))
+    with pytest.raises(ValueError):
+        CassetteModel(None, cassette, "m", mode="gravar")
+    with pytest.raises(ValueError):
+        CassetteModel(None, cassette, "m", latency="rápida")
@@ -0,0 +1,130 @@
+"""Testes do pool de clientes do Gemini por processo"""
+import pytest
+
+import client_pool
+from client_pool import ClientPool, get_client_pool
+from fake_backend import FakeGeminiModel
+from key_pool import ApiKey, KeyPool
+
+
+class ColdModel(FakeGeminiModel):
+    """Modelo sem rede: o aquecimento falha"""
+
+    def count_tokens(self, contents, **kwargs):
+        raise ConnectionError("sem rede")
+
+
+def test_models_are_shared_and_reused():
+    pool = ClientPool(model_factory=lambda name: FakeGeminiModel(0.0))
+    model = pool.model("gemini-2.5-flash")
+    assert pool.model("gemini-2.5-flash") is model
+
+    for _ in range(3):
+        model.generate_content(["prompt"])
+
+    stats = pool.stats()
+    assert stats["clients_created"] == 1
+    assert stats["requests"] == 3
+    # Sem aquecimento, a primeira requisição abre a conexão
+    assert stats["reused"] == 2
+    assert stats["first_request_seconds"] is not None
+    assert stats["keys"] is None
+
+
+def test_warm_up():
+    pool = ClientPool(model_factory=lambda name: FakeGeminiModel(0.0))
+    pool.warm_up(["a", "b", "a"])
+    pool.model("a").generate_content(["prompt"])
+
+    stats = pool.stats()
+    assert stats["warmed"] == {"a": True, "b": True}
+    assert stats["reused"] == 1
+    assert pool.model("a").model.connected
+
+
+def test_warm_up_failure_is_not_fatal():
+    pool = ClientPool(model_factory=lambda name: ColdModel(0.0))
+    pool.warm_up(["a"], background=True)
+    pool.wait_warm(5)
+    assert pool.warmed == {"a": False}
+    assert pool.warmup_seconds is not None
+
+
+def test_new_pool_after_fork(monkeypatch):
+    factory = lambda name: FakeGeminiModel(0.0)  # noqa: E731
+    monkeypatch.setattr(client_pool, "_pool", None)
+    parent = get_client_pool(model_factory=factory)
+    assert get_client_pool() is parent
+    inherited = parent.model("a")
+
+    # Simula o processo filho: o pool herdado é de outro pid
+    parent.pid = -1
+    child = get_client_pool()
+    assert child is not parent
+    assert child.model_factory is factory
+
+    inherited.generate_content(["prompt"])
+    assert child.stats()["requests"] == 1
+    assert parent.requests == 0
+
+
+def keyed_pool(**models):
+    """Pool com uma chave por modelo falso (chave -> FakeGeminiModel)"""
+    return ClientPool(
+        model_factory=lambda name, key: models[key],
+        key_pool=KeyPool([ApiKey(key) for key in models])
+    )
+
+
+def test_calls_spread_across_keys():
+    pool = keyed_pool(chave1=FakeGeminiModel(0.0), chave2=FakeGeminiModel(0.0))
+    model = pool.model("a")
+    for _ in range(4):
+        model.generate_content(["prompt"])
+
+    stats = pool.stats()
+    assert stats["clients_created"] == 2
+    assert [key["calls"] for key in stats["keys"]["per_key"]] == [2, 2]
+
+
+def test_refused_key_fails_over():
+    refused = FakeGeminiModel(0.0, invalid_key=True)
+    pool = keyed_pool(chave1=refused, chave2=FakeGeminiModel(0.0))
+    model = pool.model("a")
+    for _ in range(3):
+        model.generate_content(["prompt"])
+
+    assert refused.calls <= 1
+    stats = pool.stats()["keys"]
+    assert stats["healthy"] == 1
+    assert [key["calls"] for key in stats["per_key"]] == [0, 3]
+
+
+def test_sdk_client_per_key():
+    pytest.importorskip("google.generativeai")
+    if not client_pool.keyed_clients_supported():
+        pytest.skip("versão do SDK sem cliente por chave")
+    pool = ClientPool(key_pool=KeyPool([ApiKey("chave1"), ApiKey("chave2")]))
+    first = pool._create("gemini-2.5-flash", "chave1")
+    assert first._client is pool._create("gemini-2.5-flash", "chave1")._client
+    assert first._client is not pool._create("gemini-2.5-flash", "chave2")._client
+
+
+def test_public_sdk_path_when_unsupported(monkeypatch):
+    genai = pytest.importorskip("google.generativeai")
+    configured = []
+
+    monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+    monkeypatch.setattr(client_pool, "keyed_clients_supported", lambda: False)
+    monkeypatch.setattr(genai, "configure", lambda **options: configured.append(options["api_key"]))
+    monkeypatch.setattr(genai, "GenerativeModel", lambda name: FakeGeminiModel(0.0))
+
+    pool = ClientPool(key_pool=KeyPool([ApiKey("chave1"), ApiKey("chave2")]))
+    model = pool.model("a")
+    for _ in range(2):
+        model.generate_content(["prompt"])
+
+    # Cada chamada reconfigura o SDK com a chave escolhida pelo pool
+    assert configured[0] == "chave1"
+    assert sorted(configured[1:]) == ["chave1", "chave2"]
+    assert isinstance(model._for_key(pool.key_pool.keys[0]), client_pool.ConfiguredModel)
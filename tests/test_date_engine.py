@@ -0,0 +1,95 @@
+"""Testes do motor de datas"""
+from datetime import date
+
+import pytest
+
+from date_engine import CENTURY_PIVOT, DateEngine, parse_date, validate_expirations_bulk
+from validators import DocumentValidator
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("15/05/1990", date(1990, 5, 15)),
+    ("15-05-1990", date(1990, 5, 15)),
+    ("15.05.1990", date(1990, 5, 15)),
+    (" 15/05/1990 ", date(1990, 5, 15)),
+    ("5/3/2020", date(2020, 3, 5)),
+    ("1/12/1990", date(1990, 12, 1)),
+    ("05/3/2020", date(2020, 3, 5)),
+    ("5.03.2020", date(2020, 3, 5)),
+    ("1990-05-15", date(1990, 5, 15)),
+    ("1990-05-15T10:30:00", date(1990, 5, 15)),
+    ("1990-05-15 10:30", date(1990, 5, 15)),
+])
+def test_parse_date_formats(text, expected):
+    assert parse_date(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "31/02/2020",
+    "15/13/1990",
+    "15/05-1990",
+    "15//1990",
+    "15/05/199",
+    "123/05/1990",
+    "1/2/3/2020",
+    "aa/bb/cccc",
+    "15051990",
+    "1990/05/15",
+    "",
+])
+def test_parse_date_rejects_invalid(text):
+    assert parse_date(text) is None
+
+
+def test_two_digit_year_pivot():
+    assert parse_date(f"01/01/{CENTURY_PIVOT:02d}") == date(2000 + CENTURY_PIVOT, 1, 1)
+    assert parse_date(f"01/01/{CENTURY_PIVOT + 1:02d}") == date(1901 + CENTURY_PIVOT, 1, 1)
+    assert parse_date("5/3/20") == date(2020, 3, 5)
+
+
+def test_validate_uses_reference_date():
+    engine = DateEngine(today=date(2020, 6, 1))
+    result = engine.validate("5/3/2020")
+    assert result == {
+        "valid": True,
+        "date": "2020-03-05",
+        "formatted": "5/3/2020",
+        "is_future": False,
+        "age_years": 0
+    }
+    assert engine.validate("15/05/1990")["age_years"] == 30
+    assert engine.validate("01/01/2021")["is_future"]
+
+
+def test_validate_invalid_values():
+    engine = DateEngine()
+    assert engine.validate(None)["error"] == "Data não fornecida"
+    assert not engine.validate("31/02/2020")["valid"]
+    # Valores que não são texto não quebram a validação
+    assert not engine.validate(20200305)["valid"]
+
+
+def test_validate_expiration():
+    engine = DateEngine(today=date(2024, 1, 1))
+    result = engine.validate_expiration("1/3/2020", "01/03/2030")
+    assert result["valid"] and result["status"] == "válida" and not result["vencida"]
+    assert result["dias_para_vencer"] == (date(2030, 3, 1) - date(2024, 1, 1)).days
+
+    expired = engine.validate_expiration("01/03/2015", "01/03/2020")
+    assert expired["vencida"] and expired["dias_para_vencer"] == 0
+
+    assert engine.validate_expiration("01/03/2030", "01/03/2020")["error"] == "Data de validade deve ser posterior à emissão"
+    assert engine.validate_expiration("xx", "01/03/2020")["error"] == "Datas inválidas"
+
+
+def test_validate_records_and_bulk():
+    records = [{"data_nascimento": "5/3/2020"}, {}, {"data_nascimento": "31/02/2020"}]
+    column = DateEngine().validate_records(records, ["data_nascimento"])["data_nascimento"]
+    assert column[0]["valid"] and column[1] is None and not column[2]["valid"]
+
+    assert [r["valid"] for r in validate_expirations_bulk([("01/03/2020", "01/03/2030"), ("x", "y")])] == [True, False]
+
+
+def test_document_validator_accepts_one_digit_day_and_month():
+    assert DocumentValidator.validate_date("5/3/2020")["date"] == "2020-03-05"
+    assert DocumentValidator.validate_cnh_expiration("1/12/2019", "1/12/2029")["valid"]
@@ -0,0 +1,123 @@
+"""Testes da fila de falhas (classificação, fila persistente e reprocessamento)"""
+import pytest
+from conftest import sample_result
+
+from dead_letters import DeadLetterStore, classify_failure, failure_category, redrive
+from deadlines import DeadlineExceeded
+from fake_backend import BackendTimeout, QuotaExceeded
+from scheduler import RequestScheduler
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DeadLetterStore(str(tmp_path / "falhas.db"))
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize("error, category", [
+    (QuotaExceeded("429 Resource has been exhausted"), "quota"),
+    (Exception("RESOURCE_EXHAUSTED: quota"), "quota"),
+    (BackendTimeout("504 Deadline Exceeded"), "timeout"),
+    (TimeoutError("lento"), "timeout"),
+    (DeadlineExceeded("model"), "timeout"),
+    (ValueError("resposta estranha"), "error"),
+])
+def test_failure_category(error, category):
+    assert failure_category(error) == category
+
+
+def test_classify_failure():
+    assert classify_failure(sample_result(0)) is None
+    assert classify_failure({"status": "error", "failure": "quality"}) == "quality"
+    # Resultados antigos, só com a mensagem
+    assert classify_failure({"status": "error", "message": "Arquivo não encontrado: x.jpg"}) == "missing_file"
+    assert classify_failure({"status": "error", "message": "Erro ao preparar imagem: x"}) == "unreadable_image"
+    assert classify_failure({"status": "error", "message": "429 quota exceeded"}) == "quota"
+
+    unparsed = sample_result(0)
+    unparsed["data"] = {"raw_text": "não é JSON"}
+    assert classify_failure(unparsed) == "parse"
+
+    invalid = sample_result(0)
+    invalid["validations"] = {"cpf": {"valid": False, "error": "Dígitos verificadores inválidos"}}
+    assert classify_failure(invalid) == "validation"
+
+
+def test_record_counts_attempts(store):
+    failure = {"status": "error", "message": "429", "image_path": "a.jpg", "failure": "quota"}
+    assert store.record([failure, sample_result(0)]) == 1
+    store.record([dict(failure, failure="timeout")])
+
+    [entry] = store.pending(None)
+    assert entry["category"] == "timeout"
+    assert entry["attempts"] == 2
+    assert store.pending(["quota"]) == []
+    assert store.pending(None, max_attempts=2) == []
+
+    store.resolve(["a.jpg"])
+    assert store.counts() == {"pending": {}, "pending_total": 0, "resolved": 1}
+
+
+def test_redrive_resolves_and_requeues(store, make_extractor, images):
+    ok, broken = images(2)
+    store.record([
+        {"status": "error", "image_path": ok, "document_type": "cnh", "failure": "quota"},
+        {"status": "error", "image_path": broken, "document_type": "cnh", "failure": "timeout"},
+    ])
+    extractor = make_extractor(sample_result(0)["data"])
+    extract = extractor.extract_from_image
+
+    def flaky(image_path, document_type="auto"):
+        if image_path == broken:
+            raise BackendTimeout("504 Deadline Exceeded")
+        return extract(image_path, document_type)
+
+    extractor.extract_from_image = flaky
+    summary = redrive(store, extractor, workers=2)
+
+    # A exceção de um documento não interrompe a rodada: volta à fila classificada
+    assert summary["redriven"] == 2
+    assert summary["resolved"] == 1
+    assert summary["still_failing"] == {"timeout": 1}
+    [entry] = store.pending(None)
+    assert entry["image_path"] == broken
+    assert entry["attempts"] == 2
+
+
+def test_redrive_rejects_unknown_category(store, make_extractor):
+    with pytest.raises(ValueError):
+        redrive(store, make_extractor(), categories=["inexistente"])
+
+
+def test_redrive_caps_validation_attempts(store, make_extractor, images):
+    fresh, repeated = images(2)
+    invalid = {"cnh": {"valid": False, "error": "Dígitos verificadores inválidos"}}
+    store.record([
+        dict(sample_result(0), image_path=fresh, validations=invalid),
+        dict(sample_result(1), image_path=repeated, validations=invalid),
+    ])
+    # Já relido uma vez sem sucesso: atingiu MAX_VALIDATION_ATTEMPTS
+    store.record([dict(sample_result(1), image_path=repeated, validations=invalid)])
+    extractor = make_extractor({"numero_registro": "01000000082"})
+
+    summary = redrive(store, extractor, categories=None)
+
+    assert summary["redriven"] == 1
+    assert summary["resolved"] == 1
+    assert extractor.model.calls == 1
+    assert [e["image_path"] for e in store.pending(None)] == [repeated]
+    assert redrive(store, extractor, categories=["validation"], max_validation_attempts=None)["redriven"] == 1
+
+
+def test_redrive_shares_or_replaces_scheduler(store, make_extractor, images):
+    shared = RequestScheduler()
+    own = RequestScheduler()
+    extractor = make_extractor(sample_result(0)["data"], scheduler=shared)
+    store.record([{"status": "error", "image_path": images(1)[0], "document_type": "cnh", "failure": "quota"}])
+
+    redrive(store, extractor, scheduler=own)
+
+    assert own.stats()["classes"]["bulk"]["granted"] == 1
+    assert shared.stats()["classes"]["bulk"]["granted"] == 0
+    assert extractor.scheduler is shared
@@ -0,0 +1,84 @@
+"""Testes dos prazos por requisição"""
+import time
+
+import pytest
+from conftest import sample_result
+
+from deadlines import Deadline, DeadlineExceeded, DeadlineStats, current_deadline, deadline_context, parse_budgets
+
+
+def test_parse_budgets():
+    assert parse_budgets(" cnh=20, RG=25.5 ,") == {"cnh": 20.0, "rg": 25.5}
+    assert parse_budgets("") == {}
+    with pytest.raises(ValueError):
+        parse_budgets("cnh=rápido")
+
+
+def test_child_deadline_never_outlives_parent():
+    parent = Deadline(0.5)
+    child = Deadline(60, parent)
+    assert child.remaining() <= 0.5
+    assert Deadline(None, parent).expires_at == parent.expires_at
+    assert Deadline().remaining() is None
+
+    parent.cancel()
+    assert child.cancelled and child.expired
+    with pytest.raises(DeadlineExceeded, match="cancelada"):
+        child.check("request")
+
+
+def test_timeout_and_sleep():
+    deadline = Deadline(0.2)
+    assert deadline.timeout(120) <= 0.2
+    assert Deadline().timeout(120) == 120
+    with pytest.raises(DeadlineExceeded, match="0.2s esgotado"):
+        deadline.sleep(1.0, "retry")
+
+
+def test_deadline_context_nesting():
+    assert current_deadline() is None
+    with deadline_context(10) as outer:
+        with deadline_context(60) as inner:
+            assert current_deadline() is inner
+            assert inner.expires_at == outer.expires_at
+        with deadline_context() as same:
+            assert same is outer
+        assert current_deadline() is outer
+    assert current_deadline() is None
+
+
+def test_stats():
+    stats = DeadlineStats()
+    stats.record("cnh", Deadline(10), missed=False)
+    cancelled = Deadline(10)
+    cancelled.cancel()
+    stats.record("cnh", cancelled, missed=True, stage="request")
+
+    summary = stats.stats()["cnh"]
+    assert summary["documents"] == 2
+    assert summary["miss_rate"] == 0.5
+    assert summary["cancelled"] == 1
+    assert summary["stages"] == {"request": 1}
+
+
+def test_slo_budget_times_out_extraction(make_extractor, images):
+    extractor = make_extractor(latency=1.0, slo_budgets={"cnh": 0.2})
+    start = time.perf_counter()
+    result = extractor.extract_from_image(images(1)[0], "cnh")
+
+    assert time.perf_counter() - start < 0.9
+    assert result["status"] == "timeout"
+    assert result["failure"] == "timeout"
+    assert result["deadline"]["budget_seconds"] == 0.2
+    assert extractor.deadline_stats.stats()["cnh"]["missed"] == 1
+
+
+def test_reextract_fields_respects_deadline(make_extractor, images):
+    extractor = make_extractor(latency=1.0)
+    result = dict(sample_result(0), image_path=images(1)[0])
+
+    with deadline_context(0.1):
+        extractor.reextract_fields(result, fields=["cpf"])
+
+    assert "Deadline Exceeded" in result["requery"]["error"]
+    assert result["requery"]["seconds"] < 0.9
@@ -0,0 +1,82 @@
+"""Testes do log estruturado de eventos"""
+import io
+import json
+import sys
+
+import pytest
+from loguru import logger
+
+import event_log
+from event_log import configure_logging, log_event, set_sample_rate
+
+
+@pytest.fixture
+def log_lines():
+    """Eventos emitidos como JSON em memória; devolve o handler padrão no final"""
+    stream = io.StringIO()
+    configure_logging("INFO", stream, serialize=True, enqueue=False)
+
+    def lines():
+        return [json.loads(line)["record"] for line in stream.getvalue().splitlines()]
+
+    yield lines
+    configure_logging("DEBUG", sys.stderr, enqueue=False)
+
+
+class Expensive:
+    """Conta quantas vezes foi convertido em texto"""
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __format__(self, spec):
+        self.formatted += 1
+        return "caro"
+
+
+def test_fields_go_to_extra(log_lines):
+    log_event("extraction.success", "Concluído: {image_path}", image_path="a.jpg", seconds=1.5)
+    record = log_lines()[0]
+
+    assert record["message"] == "Concluído: a.jpg"
+    assert record["extra"] == {"event": "extraction.success", "image_path": "a.jpg", "seconds": 1.5}
+    assert record["level"]["name"] == "INFO"
+
+
+def test_message_is_formatted_lazily(log_lines):
+    value = Expensive()
+    log_event("debug.event", "Valor: {value}", "DEBUG", value=value)
+    assert value.formatted == 0
+    assert log_lines() == []
+
+    log_event("info.event", "Valor: {value}", value=value)
+    assert value.formatted == 1
+
+
+def test_sampling_skips_info_but_never_warnings(log_lines):
+    set_sample_rate("extraction.success", 0.25)
+    for i in range(8):
+        log_event("extraction.success", "ok {i}", i=i)
+        log_event("extraction.error", "falha {i}", "ERROR", i=i)
+
+    events = [record["extra"]["event"] for record in log_lines()]
+    assert events.count("extraction.success") == 2
+    assert events.count("extraction.error") == 8
+
+
+def test_configure_logging_resets_sampling():
+    configure_logging("INFO", io.StringIO(), enqueue=False, sample_rates={"a": 0.5})
+    assert event_log._sample_rates == {"a": 0.5}
+    configure_logging("DEBUG", sys.stderr, enqueue=False)
+    assert event_log._sample_rates == {}
+
+
+def test_background_sink_flushes_on_remove(tmp_path):
+    path = tmp_path / "eventos.log"
+    handler = configure_logging("INFO", str(path), serialize=True)
+    log_event("pipeline.done", "Pipeline concluído: {stages}", stages={"total_seconds": 1.0})
+    logger.remove(handler)
+
+    record = json.loads(path.read_text(encoding="utf-8"))["record"]
+    assert record["extra"]["stages"] == {"total_seconds": 1.0}
+    configure_logging("DEBUG", sys.stderr, enqueue=False)
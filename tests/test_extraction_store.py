@@ -0,0 +1,99 @@
+"""Testes do banco consultável de extrações"""
+import threading
+
+import pytest
+from conftest import sample_result
+
+from extraction_store import ExtractionStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ExtractionStore(str(tmp_path / "extracoes.db"), schemas={"cnh": ["cpf", "nome_completo"]})
+    yield store
+    store.close()
+
+
+def test_query_by_indexed_fields(store):
+    store.write_many([
+        sample_result(0, nome_completo="José da Silva", data_validade="10/01/2030"),
+        sample_result(1, nome_completo="Maria Souza", cpf="529.982.247-25", data_validade="10/01/2026"),
+    ])
+
+    assert [r["image_path"] for r in store.query(cpf="52998224725")] == ["data/cnh_1.jpg"]
+    assert [r["image_path"] for r in store.query(nome="jose da")] == ["data/cnh_0.jpg"]
+    assert [r["image_path"] for r in store.query(validade_de="2029-01-01")] == ["data/cnh_0.jpg"]
+    assert [r["image_path"] for r in store.query(validade_ate="31/12/2026")] == ["data/cnh_1.jpg"]
+    assert store.count() == {"cnh": 2}
+    assert store.get_fields("data/cnh_1.jpg")["cpf"] == "529.982.247-25"
+
+
+def test_reextraction_replaces_record(store):
+    store.write(sample_result(0, nome_completo="Nome Antigo"))
+    store.write(sample_result(0, nome_completo="Nome Novo"))
+
+    results = store.query()
+    assert len(results) == 1
+    assert results[0]["data"]["nome_completo"] == "Nome Novo"
+
+
+def test_failed_results_are_not_stored(store):
+    store.write({"status": "error", "message": "Arquivo não encontrado: x.jpg", "image_path": "x.jpg"})
+    assert store.query() == []
+
+
+def test_blank_name_does_not_filter(store):
+    store.write(sample_result(0))
+    assert len(store.query(nome="   ")) == 1
+
+
+def test_invalid_date_is_rejected(store):
+    store.write(sample_result(0))
+    with pytest.raises(ValueError):
+        store.query(validade_de="amanhã")
+
+
+def test_concurrent_writes_and_queries(tmp_path):
+    store = ExtractionStore(str(tmp_path / "extracoes.db"), batch_size=7)
+    errors = []
+
+    def worker(n: int) -> None:
+        try:
+            for i in range(100):
+                result = sample_result(i)
+                result["image_path"] = f"data/{n}_{i}.jpg"
+                store.write(result)
+                if i % 25 == 0:
+                    store.query(nome="pessoa")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert store.count() == {"cnh": 600}
+    store.close()
+
+
+def test_bad_row_does_not_block_store(store):
+    odd = sample_result(1, tipo_documento=["CNH"])
+    odd["data"]["nao_serializavel"] = {1, 2}
+    store.write_many([sample_result(0), odd, sample_result(2, tipo_documento=7)])
+
+    # O registro que não pôde ser gravado é descartado; os demais continuam consultáveis
+    assert sorted(r["image_path"] for r in store.query()) == ["data/cnh_0.jpg", "data/cnh_2.jpg"]
+    store.write(sample_result(3))
+    assert len(store.query()) == 3
+
+
+def test_non_string_document_type(store):
+    result = sample_result(0)
+    result["data"]["tipo_documento"] = ["CNH"]
+    store.write(result)
+
+    [stored] = store.query()
+    assert stored["document_type"] == "cnh"
@@ -0,0 +1,79 @@
+"""Testes da reextração seletiva de campos"""
+import io
+
+import pytest
+from conftest import sample_result
+from PIL import Image
+
+from document_extractor import DocumentExtractor
+from field_requery import build_field_prompt, crop_region, field_formats, field_region
+from validation_rules import ValidationEngine
+
+
+def test_field_formats_from_prompt():
+    formats = field_formats(DocumentExtractor.PROMPTS["cnh"])
+    assert formats["cpf"] == "XXX.XXX.XXX-XX"
+    assert "numero_registro" in formats
+
+
+def test_build_field_prompt_only_asks_for_fields():
+    prompt = build_field_prompt("cnh", ["cpf"], {"cpf": "XXX.XXX.XXX-XX", "rg": "X"})
+    assert '"cpf": "XXX.XXX.XXX-XX"' in prompt
+    assert '"rg"' not in prompt
+    assert "CNH" in prompt
+    assert "documento brasileiro" in build_field_prompt("auto", ["cpf"], {})
+
+
+def test_field_region_covers_all_fields():
+    region = field_region("CNH", ["cpf", "categoria"])
+    assert region == pytest.approx((0.50, 0.20, 1.0, 0.95))
+    assert field_region("cnh", ["cpf", "observacoes"]) is None
+    assert field_region("rg", ["cpf"]) is None
+
+
+def test_crop_region():
+    buffer = io.BytesIO()
+    Image.new("RGB", (200, 100), (255, 255, 255)).save(buffer, format="JPEG")
+    data, size = crop_region(buffer.getvalue(), (0.5, 0.0, 1.0, 0.5))
+    assert size == (100, 50)
+    assert Image.open(io.BytesIO(data)).size == (100, 50)
+
+
+def test_reextract_failed_fields(make_extractor, images):
+    extractor = make_extractor({"cpf": "111.444.777-35"})
+    engine = ValidationEngine(correct=False)
+    result = dict(sample_result(0, cpf="111.444.777-36"), image_path=images(1)[0])
+    engine.validate_batch([result])
+    assert not result["validations"]["cpf"]["valid"]
+
+    extractor.reextract_fields(result, engine=engine)
+
+    assert extractor.model.calls == 1
+    assert result["data"]["cpf"] == "111.444.777-35"
+    assert result["validations"]["cpf"]["valid"]
+    assert result["requery"]["fields"] == ["cpf"]
+    assert result["requery"]["changed"] == {"cpf": {"before": "111.444.777-36", "after": "111.444.777-35"}}
+    assert result["requery"]["attempts"] == 1
+
+
+def test_reextract_skips_valid_and_failed_results(make_extractor, images):
+    extractor = make_extractor()
+    valid = dict(sample_result(0), image_path=images(1)[0])
+    ValidationEngine().validate_batch([valid])
+    error = {"status": "error", "message": "x", "image_path": "x.jpg"}
+
+    extractor.reextract_fields(valid)
+    extractor.reextract_fields(error)
+
+    assert extractor.model.calls == 0
+    assert "requery" not in valid and "requery" not in error
+
+
+def test_reextract_records_errors(make_extractor, tmp_path):
+    extractor = make_extractor()
+    result = dict(sample_result(0), image_path=str(tmp_path / "sumiu.jpg"))
+
+    extractor.reextract_fields(result, fields=["cpf"])
+
+    assert result["requery"]["error"].startswith("Arquivo não encontrado")
+    assert result["data"]["cpf"] == "111.444.777-35"
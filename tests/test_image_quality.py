@@ -0,0 +1,48 @@
+"""Testes da verificação local de qualidade da imagem"""
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter
+
+from image_quality import QualityThresholds, measure_quality, quality_issues
+
+
+def document(size=(1200, 800)) -> Image.Image:
+    """Página clara com várias linhas de texto"""
+    image = Image.new("RGB", size, (236, 234, 220))
+    draw = ImageDraw.Draw(image)
+    for line in range(size[1] // 30):
+        draw.text((40, 20 + line * 30), "NOME COMPLETO 123.456.789-09 RG 12.345.678-9", fill=(20, 20, 20))
+    return image
+
+
+def test_sharp_document_passes():
+    metrics = measure_quality(document())
+    assert quality_issues(metrics) == []
+    assert (metrics["width"], metrics["height"]) == (1200, 800)
+
+
+def test_clean_white_scan_is_not_overexposed():
+    scan = Image.new("RGB", (1240, 1754), (255, 255, 255))
+    draw = ImageDraw.Draw(scan)
+    for line in range(50):
+        draw.text((100, 100 + line * 30), "CNPJ 12.345.678/0001-95 RAZAO SOCIAL EXEMPLO LTDA", fill=(0, 0, 0))
+    assert quality_issues(measure_quality(scan)) == []
+
+
+def test_detects_blur():
+    issues = quality_issues(measure_quality(document().filter(ImageFilter.GaussianBlur(15))))
+    assert any("desfocada" in issue for issue in issues)
+
+
+def test_detects_dark_image():
+    issues = quality_issues(measure_quality(ImageEnhance.Brightness(document()).enhance(0.15)))
+    assert any("escura" in issue for issue in issues)
+
+
+def test_detects_low_resolution_from_original_size():
+    metrics = measure_quality(document(), original_size=(400, 266))
+    assert quality_issues(metrics)[0].startswith("Resolução muito baixa (400x266)")
+
+
+def test_custom_thresholds():
+    metrics = measure_quality(document())
+    assert quality_issues(metrics, QualityThresholds(min_side=1000))
+    assert quality_issues(metrics, QualityThresholds(min_sharpness=1e9))
@@ -0,0 +1,58 @@
+"""Testes do recorte local do documento"""
+from PIL import Image, ImageDraw
+
+from image_prep import prepare_image
+from image_roi import crop_document
+
+
+def card_photo(cards: int = 1, angle: float = 8.0, size=(1500, 1000)) -> Image.Image:
+    """Cartão(ões) com texto sobre uma mesa texturizada"""
+    photo = Image.new("RGB", size, (92, 64, 45))
+    draw = ImageDraw.Draw(photo)
+    for y in range(0, size[1], 25):
+        draw.line([(0, y), (size[0], y + 60)], fill=(80, 55, 38), width=2)
+
+    card_w, card_h = 428, 270
+    for i in range(cards):
+        card = Image.new("RGB", (card_w, card_h), (236, 234, 220))
+        card_draw = ImageDraw.Draw(card)
+        for line in range(5):
+            card_draw.text((20, 30 + line * 40), "NOME COMPLETO 123.456.789-09", fill=(20, 20, 20))
+        card = card.rotate(angle, expand=True, fillcolor=(92, 64, 45))
+        photo.paste(card, (150 + i * (card_w + 100), 300))
+    return photo
+
+
+def test_crops_tilted_card():
+    roi = crop_document(card_photo(1))
+
+    assert len(roi["regions"]) == 1
+    assert roi["area_ratio"] < 0.3
+    crop = roi["images"][0]
+    # A perspectiva corrigida devolve a proporção do cartão (~1,59)
+    assert 1.3 < crop.width / crop.height < 1.9
+
+
+def test_splits_front_and_back_side_by_side():
+    roi = crop_document(card_photo(2, angle=0.0))
+    assert len(roi["regions"]) == 2
+    assert len(roi["images"]) == 2
+
+
+def test_keeps_image_without_document():
+    image = Image.new("RGB", (800, 600), (200, 200, 200))
+    roi = crop_document(image)
+    assert roi["images"] == [image]
+    assert roi["regions"] == []
+    assert roi["area_ratio"] == 1.0
+
+
+def test_prepare_image_with_crop(tmp_path):
+    path = tmp_path / "foto.jpg"
+    card_photo(1).save(path, quality=90)
+    prepared = prepare_image(str(path), crop=True)
+
+    assert prepared["status"] == "success"
+    assert len(prepared["parts"]) == 1
+    assert prepared["data"] == prepared["parts"][0]["data"]
+    assert prepared["roi"]["sizes"][0] == prepared["size"]
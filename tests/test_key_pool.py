@@ -0,0 +1,114 @@
+"""Testes do pool de chaves da API (orçamento, quarentena e configuração)"""
+import pytest
+
+from fake_backend import QuotaExceeded
+from key_pool import ApiKey, KeyPool, key_error_kind, parse_key
+
+AUTH_ERROR = ValueError("400 API key not valid. Please pass a valid API key. [API_KEY_INVALID]")
+
+
+def test_parse_key():
+    assert parse_key(" AIzaA ") == {"key": "AIzaA", "rpm": None, "tpm": None}
+    assert parse_key("AIzaA:60") == {"key": "AIzaA", "rpm": 60.0, "tpm": None}
+    assert parse_key("AIzaA:60:1000000") == {"key": "AIzaA", "rpm": 60.0, "tpm": 1000000.0}
+    assert parse_key("AIzaA::500") == {"key": "AIzaA", "rpm": None, "tpm": 500.0}
+    with pytest.raises(ValueError, match=r"\.\.\.IzaA"):
+        parse_key("AIzaA:muito")
+
+
+@pytest.mark.parametrize("error, kind", [
+    (AUTH_ERROR, "auth"),
+    (Exception("403 PERMISSION_DENIED"), "auth"),
+    (QuotaExceeded("429 Resource has been exhausted"), "quota"),
+    (ValueError("resposta estranha"), None),
+])
+def test_key_error_kind(error, kind):
+    assert key_error_kind(error) == kind
+
+
+def test_from_specs_dedupes_and_shares_budget():
+    pool = KeyPool.from_specs(["chave1", "chave2:30", "chave1:90", ""], rpm=60, tpm=1000, share=2)
+
+    assert [key.key for key in pool.keys] == ["chave1", "chave2"]
+    assert [(key.rpm, key.tpm) for key in pool.keys] == [(30.0, 500.0), (15.0, 500.0)]
+    assert pool.keys[0].label == "...ave1"
+
+
+def test_from_env(monkeypatch, tmp_path):
+    monkeypatch.delenv("GOOGLE_API_KEYS", raising=False)
+    monkeypatch.delenv("GOOGLE_API_KEYS_FILE", raising=False)
+    monkeypatch.delenv("GEMINI_KEY_RPM", raising=False)
+    monkeypatch.delenv("GEMINI_KEY_TPM", raising=False)
+    assert KeyPool.from_env() is None
+
+    keys_file = tmp_path / "chaves.txt"
+    keys_file.write_text("# chaves do lote\nchave3:10\n\nchave4  # reserva\n", encoding="utf-8")
+    monkeypatch.setenv("GOOGLE_API_KEYS", "chave1, chave2")
+    monkeypatch.setenv("GOOGLE_API_KEYS_FILE", str(keys_file))
+    monkeypatch.setenv("GEMINI_KEY_RPM", "20")
+
+    pool = KeyPool.from_env()
+    assert [key.key for key in pool.keys] == ["chave1", "chave2", "chave3", "chave4"]
+    assert [key.rpm for key in pool.keys] == [20.0, 20.0, 10.0, 20.0]
+    assert all(key.tpm is None for key in pool.keys)
+
+
+def test_acquire_spreads_and_release_counts():
+    pool = KeyPool([ApiKey("chave1"), ApiKey("chave2")])
+    first, second = pool.acquire(), pool.acquire()
+    assert {first.key, second.key} == {"chave1", "chave2"}
+
+    pool.release(first)
+    pool.release(second, error=ValueError("resposta estranha"))
+    stats = pool.stats()
+    assert stats["healthy"] == 2 and stats["quarantines"] == 0
+    by_key = {key["key"]: key for key in stats["per_key"]}
+    assert by_key[first.label]["calls"] == 1 and by_key[second.label]["errors"] == 1
+    assert all(key["in_flight"] == 0 for key in stats["per_key"])
+
+
+def test_quota_quarantine_and_backoff():
+    pool = KeyPool([ApiKey("chave1"), ApiKey("chave2")], quota_quarantine=60)
+    throttled = pool.acquire()
+    pool.release(throttled, error=QuotaExceeded("429 Resource has been exhausted"))
+
+    # A chave em quarentena fica de fora até voltar
+    for _ in range(3):
+        key = pool.acquire()
+        assert key is not throttled
+        pool.release(key)
+    assert pool.choose() is not throttled
+
+    stats = pool.stats()
+    assert stats["healthy"] == 1 and stats["quarantines"] == 1
+    [quarantined] = [key for key in stats["per_key"] if not key["healthy"]]
+    assert quarantined["quarantine_reason"] == "quota" and quarantined["throttled"] == 1
+    assert 0 < quarantined["quarantine_seconds"] <= 60
+
+    # 429 seguido: a quarentena dobra
+    throttled.quarantined_until = 0.0
+    pool.release(pool.acquire(), error=QuotaExceeded("429"))
+    pool.release(pool.acquire(), error=QuotaExceeded("429"))
+    assert max(key["quarantine_seconds"] for key in pool.stats()["per_key"]) > 60
+
+
+def test_all_keys_refused():
+    pool = KeyPool([ApiKey("chave1"), ApiKey("chave2")])
+    for _ in range(2):
+        pool.release(pool.acquire(), error=AUTH_ERROR)
+
+    assert not pool.has_healthy()
+    with pytest.raises(PermissionError, match="API_KEY_INVALID"):
+        pool.acquire()
+
+
+def test_clone_resets_counters():
+    pool = KeyPool([ApiKey("chave1", rpm=30, tpm=1000)], quota_quarantine=5, auth_quarantine=50)
+    pool.release(pool.acquire(), error=AUTH_ERROR)
+
+    clone = pool.clone()
+    [key] = clone.keys
+    assert (key.key, key.rpm, key.tpm) == ("chave1", 30, 1000)
+    assert (clone.quota_quarantine, clone.auth_quarantine) == (5, 50)
+    assert clone.has_healthy() and key.errors == 0
+    assert clone.stats()["quarantines"] == 0
@@ -0,0 +1,91 @@
+"""Testes da cascata de modelos"""
+import json
+
+import pytest
+from conftest import sample_result
+
+from fake_backend import SAMPLE_DATA, FakeGeminiModel
+from model_cascade import ModelCascade, escalation_reason, parse_routes
+
+VALID = json.dumps(sample_result(0)["data"], ensure_ascii=False)
+# SAMPLE_DATA traz um registro de CNH com dígitos verificadores inválidos
+INVALID = json.dumps(SAMPLE_DATA, ensure_ascii=False)
+
+
+def cascade(backends, routes=None):
+    routes = routes or {"default": tuple(backends)}
+    return ModelCascade(routes, model_factory=lambda name: FakeGeminiModel(0.0, **backends[name]))
+
+
+def test_parse_routes():
+    assert parse_routes(" a, b ,,") == ("a", "b")
+    assert parse_routes("") == ()
+
+
+def test_rejects_invalid_routes():
+    with pytest.raises(ValueError, match="default"):
+        ModelCascade({"cnh": ("gemini-2.5-flash",)})
+    with pytest.raises(ValueError, match="default"):
+        ModelCascade({"default": []})
+    with pytest.raises(ValueError, match="cnpj"):
+        ModelCascade({"default": ("gemini-2.5-flash",), "CNPJ": ()})
+
+
+def test_tiers_by_document_type():
+    models = ModelCascade({"default": ("leve", "forte"), "CNPJ": ("forte",)})
+    assert models.tiers("cnpj") == ("forte",)
+    assert models.tiers("cnh") == ("leve", "forte")
+    assert models.tiers(None) == ("leve", "forte")
+
+
+def test_escalation_reason():
+    assert escalation_reason({"raw_text": "{"}, None) == "parse"
+    assert escalation_reason("texto", None) == "parse"
+    assert escalation_reason({"cpf": "x"}, {"cpf": {"valid": False}}) == "validation"
+    assert escalation_reason({"cpf": "x"}, {"cpf": {"valid": True}}) is None
+
+
+def test_accepts_first_valid_answer(make_extractor, images):
+    models = cascade({"leve": {"response_text": VALID}, "forte": {"response_text": VALID}})
+    result = make_extractor(cascade=models).extract_from_image(images(1)[0], "cnh")
+
+    assert result["status"] == "success"
+    assert result["cascade"]["model"] == "leve"
+    assert "forte" not in models.models
+    assert models.stats()["escalation_rate"] == 0.0
+
+
+def test_escalates_on_validation_and_parse(make_extractor, images):
+    models = cascade({
+        "quebrado": {"response_text": VALID, "malformed_rate": 1.0},
+        "leve": {"response_text": INVALID},
+        "forte": {"response_text": VALID},
+    })
+    result = make_extractor(cascade=models).extract_from_image(images(1)[0], "cnh")
+
+    assert result["cascade"]["model"] == "forte"
+    assert [a["reason"] for a in result["cascade"]["attempts"]] == ["parse", "validation", None]
+    assert result["validations"]["cnh"]["valid"]
+    stats = models.stats()
+    assert stats["escalation_rate"] == 1.0 and stats["unresolved"] == 0
+    assert stats["tiers"]["leve"]["failed"]["validation"] == 1
+    assert stats["cost_usd"] == 0.0
+
+
+def test_last_model_errors_propagate(make_extractor, images):
+    models = cascade({"leve": {"invalid_key": True}, "forte": {"invalid_key": True}})
+    result = make_extractor(cascade=models).extract_from_image(images(1)[0], "cnh")
+
+    assert result["status"] == "error"
+    assert "API key not valid" in result["message"]
+    assert models.stats()["unresolved"] == 1
+
+
+def test_keeps_last_answer_when_unresolved(make_extractor, images):
+    models = cascade({"leve": {"response_text": INVALID}, "forte": {"response_text": INVALID}})
+    result = make_extractor(cascade=models).extract_from_image(images(1)[0], "cnh")
+
+    assert result["status"] == "success"
+    assert result["cascade"]["model"] == "forte"
+    assert not result["validations"]["cnh"]["valid"]
+    assert models.stats()["unresolved"] == 1
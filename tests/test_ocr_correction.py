@@ -0,0 +1,76 @@
+"""Testes da correção local de OCR guiada pelos dígitos verificadores"""
+import pytest
+from conftest import sample_result
+
+from ocr_correction import confidence_at_least, correct_number
+from validation_rules import ValidationEngine
+
+
+def test_valid_number_is_untouched():
+    assert correct_number("111.444.777-35", "cpf") == {"status": "valid", "original": "111.444.777-35"}
+
+
+@pytest.mark.parametrize("value, kind, expected", [
+    ("111.444.777-3S", "cpf", "111.444.777-35"),
+    ("1I1.444.777-35", "cpf", "111.444.777-35"),
+    ("0100000008Z", "cnh", "01000000082"),
+    ("11.222.333/000I-81", "cnpj", "11.222.333/0001-81"),
+])
+def test_letters_read_as_digits(value, kind, expected):
+    correction = correct_number(value, kind)
+    assert correction["status"] == "corrected"
+    assert correction["corrected"] == expected
+    assert correction["confidence"] == "high"
+
+
+def test_single_confused_digit():
+    correction = correct_number("111.444.177-35", "cpf")
+    assert correction["corrected"] == "111.444.777-35"
+    assert correction["confidence"] == "medium"
+    # A formatação original é preservada e a troca é registrada pela posição
+    assert correction["substitutions"] == [{"position": 8, "from": "1", "to": "7"}]
+
+
+def test_ambiguous_when_several_numbers_fit():
+    correction = correct_number("01000000088", "cnh")
+    assert correction["status"] == "ambiguous"
+    assert len(correction["candidates"]) > 1
+    assert "corrected" not in correction
+
+
+def test_uncorrectable_inputs():
+    assert correct_number(None, "cpf")["status"] == "uncorrectable"
+    assert correct_number("111.444.777", "cpf")["reason"] == "9 dígitos em vez de 11"
+    assert correct_number("111.444.177-35", "cpf", max_substitutions=0)["status"] == "uncorrectable"
+    with pytest.raises(ValueError):
+        correct_number("123", "rg")
+
+
+def test_confidence_at_least():
+    assert confidence_at_least("high", "medium")
+    assert confidence_at_least("medium", "medium")
+    assert not confidence_at_least("low", "medium")
+    assert not confidence_at_least("high", None)
+
+
+def test_engine_suggests_without_min_confidence():
+    result = sample_result(0, cpf="111.444.177-35")
+    ValidationEngine().validate_batch([result])
+
+    assert result["data"]["cpf"] == "111.444.177-35"
+    assert not result["validations"]["cpf"]["valid"]
+    assert result["corrections"]["cpf"]["corrected"] == "111.444.777-35"
+    assert not result["corrections"]["cpf"]["applied"]
+
+
+def test_engine_applies_with_min_confidence():
+    medium = sample_result(0, cpf="111.444.177-35")
+    high_only = sample_result(1, cpf="111.444.177-35")
+    ValidationEngine(min_confidence="medium").validate_batch([medium])
+    ValidationEngine(min_confidence="high").validate_batch([high_only])
+
+    assert medium["data"]["cpf"] == "111.444.777-35"
+    assert medium["validations"]["cpf"]["valid"]
+    assert medium["corrections"]["cpf"]["applied"]
+    assert high_only["data"]["cpf"] == "111.444.177-35"
+    assert not high_only["corrections"]["cpf"]["applied"]
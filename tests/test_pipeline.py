@@ -0,0 +1,99 @@
+"""Testes do pipeline em dois estágios e da extração com backend falso"""
+from concurrent.futures import ThreadPoolExecutor
+
+import pipeline
+from dead_letters import DeadLetterStore
+from deadlines import deadline_context
+from pipeline import ExtractionPipeline
+from result_sinks import JsonlSink
+
+
+def test_extract_with_fake_backend(make_extractor, images):
+    extractor = make_extractor()
+    result = extractor.extract_from_image(images(1)[0], "cnh")
+
+    assert result["status"] == "success"
+    assert result["data"]["cpf"] == "111.444.777-35"
+    assert extractor.model.calls == 1
+
+
+def test_pipeline_completes_batch(make_extractor, images, tmp_path):
+    paths = images(6)
+    output = tmp_path / "saida.jsonl"
+    with JsonlSink(str(output)) as sink:
+        batch = ExtractionPipeline(make_extractor(), prep_workers=2, request_workers=2).run(
+            paths, "cnh", sink=sink, validate=True
+        )
+
+    assert batch["success"] == 6
+    assert all(r["validations"]["cpf"]["valid"] for r in batch["results"])
+    assert len(output.read_text(encoding="utf-8").splitlines()) == 6
+    assert batch["stages"]["request"]["items"] == 6
+
+
+def test_pipeline_survives_per_item_errors(make_extractor, images, tmp_path):
+    paths = images(12)
+    # CPF numérico: o motor de validação não pode derrubar a thread
+    extractor = make_extractor({"tipo_documento": "CNH", "cpf": 11144477735})
+    extract = extractor.extract_from_prepared
+
+    def flaky(prepared, document_type):
+        if prepared["image_path"].endswith(("_3.jpg", "_7.jpg")):
+            raise RuntimeError("falha inesperada")
+        return extract(prepared, document_type)
+
+    extractor.extract_from_prepared = flaky
+    dead_letters = DeadLetterStore(str(tmp_path / "falhas.db"))
+    seen = []
+    # Fila pequena e poucas threads: com uma thread morta o lote travaria
+    batch = ExtractionPipeline(extractor, prep_workers=2, request_workers=2, queue_size=2).run(
+        paths, "cnh", validate=True, dead_letters=dead_letters,
+        on_result=lambda result, seconds: seen.append(result["image_path"])
+    )
+
+    assert batch["success"] == 10
+    assert batch["errors"] == 2
+    assert len(seen) == 12
+    errors = batch["error_details"]
+    assert all(e["status"] == "error" and e["failure"] == "error" for e in errors)
+    assert "falha inesperada" in errors[0]["message"]
+    assert dead_letters.counts()["pending"] == {"error": 2}
+    dead_letters.close()
+
+
+def test_pipeline_reports_missing_files(make_extractor, images, tmp_path):
+    paths = images(2) + [str(tmp_path / "nao_existe.jpg")]
+    batch = ExtractionPipeline(make_extractor(), prep_workers=1, request_workers=2).run(paths, "cnh")
+
+    assert batch["success"] == 2
+    assert batch["error_details"][0]["image_path"].endswith("nao_existe.jpg")
+
+
+def test_pipeline_prep_exceptions_carry_failure(make_extractor, images, tmp_path, monkeypatch):
+    def broken(path, **kwargs):
+        raise OSError("processo de preparação caiu")
+
+    # Threads no lugar de processos para a falha simulada valer no estágio de preparação
+    monkeypatch.setattr(pipeline, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(pipeline, "prepare_image", broken)
+    dead_letters = DeadLetterStore(str(tmp_path / "falhas.db"))
+    batch = ExtractionPipeline(make_extractor(), prep_workers=1, request_workers=1).run(
+        images(2), "cnh", dead_letters=dead_letters
+    )
+
+    assert batch["errors"] == 2
+    assert all(e["failure"] == "unreadable_image" for e in batch["error_details"])
+    assert dead_letters.counts()["pending"] == {"unreadable_image": 2}
+    dead_letters.close()
+
+
+def test_pipeline_inherits_caller_deadline(make_extractor, images):
+    extractor = make_extractor()
+    # O prazo do lote (60s) não pode estender o de quem chamou (já esgotado)
+    with deadline_context(seconds=0):
+        batch = ExtractionPipeline(extractor, prep_workers=1, request_workers=2).run(
+            images(3), "cnh", deadline=60
+        )
+
+    assert batch["timeouts"] == 3
+    assert extractor.model.calls == 0
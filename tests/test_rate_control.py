@@ -0,0 +1,96 @@
+"""Testes do controle de vazão (balde de fichas, AIMD e novas tentativas em 429)"""
+import pytest
+
+from deadlines import DeadlineExceeded, deadline_context
+from fake_backend import FakeGeminiModel, QuotaExceeded
+from rate_control import AdaptiveLimiter, RateController, TokenBucket, is_throttle_error
+
+
+def test_token_bucket_respects_capacity_and_timeout():
+    bucket = TokenBucket(rate=60, period=60.0, capacity=2)
+
+    assert bucket.acquire(1, timeout=0)
+    assert bucket.acquire(1, timeout=0)
+    # Vazio: a próxima ficha leva ~1s, mais que o timeout
+    assert not bucket.acquire(1, timeout=0.05)
+    assert bucket.available() < 1
+
+
+def test_token_bucket_charge_can_go_into_debt():
+    bucket = TokenBucket(rate=1000, period=60.0, capacity=100)
+    bucket.charge(150)
+    assert bucket.available() < 0
+
+
+def test_limiter_halves_on_throttle():
+    limiter = AdaptiveLimiter(initial=8, cooldown=0)
+    assert limiter.acquire(timeout=0)
+    limiter.release(0.1, "throttled")
+
+    assert int(limiter.limit) == 4
+    assert limiter.throttled == 1
+
+
+def test_limiter_grows_after_healthy_window():
+    limiter = AdaptiveLimiter(initial=2, max_limit=16, window=4)
+    # Uma chamada longa mantém o limite em uso enquanto as outras terminam
+    assert limiter.acquire(timeout=0)
+    for _ in range(4):
+        assert limiter.acquire(timeout=0)
+        limiter.release(0.1)
+
+    assert limiter.limit == 4
+    assert limiter.increases >= 1
+
+
+def test_limiter_blocks_above_limit():
+    limiter = AdaptiveLimiter(initial=1)
+    assert limiter.acquire(timeout=0)
+    assert not limiter.acquire(timeout=0.01)
+    limiter.release(0.1)
+    assert limiter.acquire(timeout=0)
+
+
+def test_controller_retries_429_then_succeeds():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise QuotaExceeded("429 Resource has been exhausted")
+        return "ok"
+
+    controller = RateController(AdaptiveLimiter(cooldown=0), retry_delay=0)
+    assert controller.call(flaky) == "ok"
+    assert controller.retries == 2
+    assert controller.calls == 1
+
+
+def test_controller_does_not_retry_other_errors():
+    def broken():
+        raise ValueError("erro qualquer")
+
+    controller = RateController(retry_delay=0)
+    with pytest.raises(ValueError):
+        controller.call(broken)
+    assert controller.retries == 0
+    assert controller.limiter.in_flight == 0
+
+
+def test_controller_raises_when_retries_run_out():
+    model = FakeGeminiModel(latency=0.0, requests_per_window=1)
+    controller = RateController(max_retries=1, retry_delay=0)
+
+    controller.call(lambda: model.generate_content(["x"]))
+    with pytest.raises(Exception) as error:
+        controller.call(lambda: model.generate_content(["x"]))
+    assert is_throttle_error(error.value)
+
+
+def test_controller_stops_waiting_at_deadline():
+    controller = RateController(rpm=1, period=60.0)
+    controller.call(lambda: "ok")
+
+    with deadline_context(0.05):
+        with pytest.raises(DeadlineExceeded):
+            controller.call(lambda: "ok")
@@ -0,0 +1,50 @@
+"""Testes dos registros compactos (models.records)"""
+from conftest import sample_result
+
+from models import CNHRecord, ExtractionRecord, record_from_dict
+
+
+def test_round_trip_keeps_every_key():
+    result = sample_result(0)
+    result["data"]["campo_novo"] = "x"
+    result["validations"] = {"cpf": {"valid": True, "cpf": "11144477735", "formatted": "111.444.777-35"}}
+    result["quality"] = {"issues": []}
+    result["cascade"] = {"model": "gemini-2.5-flash-lite", "escalated": False}
+    result["corrections"] = {"cpf": {"status": "ambiguous"}}
+
+    record = record_from_dict(result)
+    assert isinstance(record, CNHRecord)
+    assert record.cpf == "111.444.777-35"
+    assert record.to_dict() == result
+
+
+def test_error_result_round_trip():
+    error = {
+        "status": "timeout",
+        "message": "Prazo de 30s esgotado (model)",
+        "image_path": "a.jpg",
+        "failure": "timeout",
+        "deadline": {"budget": 30, "stage": "model"}
+    }
+    record = record_from_dict(error)
+    assert type(record) is ExtractionRecord
+    # Sem "data": {} acrescentado
+    assert record.to_dict() == error
+
+
+def test_non_dict_data_is_kept():
+    result = {"status": "success", "image_path": "a.jpg", "document_type": "cnh", "data": [{"cpf": "1"}]}
+    record = record_from_dict(result)
+
+    assert record.data == {}
+    assert record.to_dict() == result
+
+
+def test_compact_batch_with_array_response(make_extractor, images):
+    # O modelo respondeu uma lista JSON em vez de um objeto
+    extractor = make_extractor()
+    extractor.model.response_text = '[{"tipo_documento": "CNH"}]'
+    batch = extractor.extract_batch(images(2), "cnh", compact=True)
+
+    assert batch["total"] == 2
+    assert len(batch["results"]) + len(batch["error_details"]) == 2
@@ -0,0 +1,97 @@
+"""Testes dos sinks de gravação em massa"""
+import csv
+import gzip
+import json
+import sqlite3
+
+import pytest
+from conftest import sample_result
+
+from result_sinks import CsvSink, JsonlSink, SqliteSink, create_sink, sink_kind
+
+
+def test_sink_kind(tmp_path):
+    assert sink_kind("saida.jsonl") == "jsonl"
+    assert sink_kind("saida.jsonl.gz") == "jsonl"
+    assert sink_kind("saida.db") == "sqlite"
+    assert sink_kind(str(tmp_path)) == "csv"
+    assert sink_kind("novo/diretorio/") == "csv"
+    # Sem extensão e sem diretório: fica com o JSON de save_extraction
+    assert sink_kind(str(tmp_path / "resultado")) is None
+    assert sink_kind("saida.json") is None
+
+
+def test_create_sink_rejects_unknown(tmp_path):
+    with pytest.raises(ValueError):
+        create_sink(str(tmp_path / "saida.txt"))
+
+
+def test_jsonl_appends_across_sinks(tmp_path):
+    path = tmp_path / "saida.jsonl"
+    with JsonlSink(str(path)) as sink:
+        sink.write_many([sample_result(0), sample_result(1)])
+    with JsonlSink(str(path)) as sink:
+        sink.write(sample_result(2))
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["image_path"] for line in lines] == [f"data/cnh_{i}.jpg" for i in range(3)]
+    assert sink.stats()["records"] == 1
+
+
+def test_jsonl_gzip(tmp_path):
+    path = tmp_path / "saida.jsonl.gz"
+    with create_sink(str(path)) as sink:
+        sink.write_many([sample_result(i) for i in range(5)])
+    with JsonlSink(str(path), compression="gzip") as sink:
+        sink.write(sample_result(5))
+
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == 6
+
+
+def test_sqlite_sink(tmp_path):
+    path = tmp_path / "saida.db"
+    with SqliteSink(str(path), batch_size=2) as sink:
+        sink.write_many([sample_result(i) for i in range(5)])
+
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0] == 5
+
+
+def test_csv_one_file_per_type(tmp_path):
+    rg = {"status": "success", "image_path": "rg.jpg", "data": {"tipo_documento": "RG", "numero_rg": "1"}}
+    with CsvSink(str(tmp_path)) as sink:
+        sink.write_many([sample_result(0), rg, sample_result(1)])
+
+    with open(tmp_path / "cnh.csv", newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["image_path"] for row in rows] == ["data/cnh_0.jpg", "data/cnh_1.jpg"]
+    assert rows[0]["cpf"] == "111.444.777-35"
+    assert (tmp_path / "rg.csv").exists()
+
+
+def test_csv_unexpected_document_type(tmp_path):
+    odd = {"status": "success", "image_path": "x.jpg", "data": {"tipo_documento": ["CNH"], "cpf": "1"}}
+    not_dict = {"status": "error", "image_path": "y.jpg", "data": "texto solto"}
+    with CsvSink(str(tmp_path)) as sink:
+        sink.write_many([odd, not_dict])
+
+    with open(tmp_path / "desconhecido.csv", newline="", encoding="utf-8") as f:
+        assert len(list(csv.DictReader(f))) == 2
+
+
+def test_csv_counts_columns_outside_header(tmp_path):
+    first = {"status": "success", "image_path": "a.jpg", "data": {"tipo_documento": "OUTRO", "campo_a": "1"}}
+    later = {"status": "success", "image_path": "b.jpg", "data": {"tipo_documento": "OUTRO", "campo_b": "2"}}
+    with CsvSink(str(tmp_path)) as sink:
+        sink.write_many([first, later, later])
+
+    assert sink.stats()["dropped_columns"] == {"outro": {"campo_b": 2}}
+
+
+def test_csv_with_fieldnames_keeps_columns(tmp_path):
+    result = {"status": "success", "image_path": "a.jpg", "data": {"tipo_documento": "RG", "numero_rg": "1"}}
+    with CsvSink(str(tmp_path), fieldnames={"rg": ["tipo_documento", "numero_rg"]}) as sink:
+        sink.write(result)
+
+    assert "dropped_columns" not in sink.stats()
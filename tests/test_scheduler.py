@@ -0,0 +1,78 @@
+"""Testes do escalonador (prioridades, fila justa entre tenants e prazos)"""
+import threading
+import time
+
+import pytest
+
+from deadlines import DeadlineExceeded, deadline_context
+from scheduler import RequestScheduler, request_context
+
+
+def _waiting(scheduler: RequestScheduler) -> int:
+    return sum(c["waiting"] for c in scheduler.stats()["classes"].values())
+
+
+def _release_order(scheduler: RequestScheduler, calls):
+    """
+    Enfileira as chamadas (prioridade, tenant, rótulo) com a única vaga
+    ocupada e devolve a ordem em que foram liberadas.
+    """
+    order = []
+    threads = []
+    with scheduler.slot("interactive", "ocupa"):
+        for priority, tenant, label in calls:
+            thread = threading.Thread(
+                target=scheduler.run, args=(lambda label=label: order.append(label), priority, tenant)
+            )
+            thread.start()
+            threads.append(thread)
+            # Garante a ordem de chegada
+            while _waiting(scheduler) < len(threads):
+                time.sleep(0.001)
+    for thread in threads:
+        thread.join(5)
+    return order
+
+
+def test_higher_priority_goes_first():
+    scheduler = RequestScheduler(max_concurrent=1, aging_seconds=0)
+    order = _release_order(scheduler, [
+        ("bulk", "lote", "bulk"),
+        ("normal", "chat", "normal"),
+        ("interactive", "chat", "interactive"),
+    ])
+    assert order == ["interactive", "normal", "bulk"]
+
+
+def test_fair_queue_between_tenants():
+    scheduler = RequestScheduler(max_concurrent=1, aging_seconds=0)
+    calls = [("bulk", "grande", f"grande-{i}") for i in range(4)] + [("bulk", "pequeno", "pequeno-0")]
+    order = _release_order(scheduler, calls)
+
+    # O tenant que chegou depois não espera o lote inteiro do outro
+    assert order.index("pequeno-0") <= 1
+    assert [label for label in order if label.startswith("grande")] == [f"grande-{i}" for i in range(4)]
+
+
+def test_request_context_sets_defaults():
+    scheduler = RequestScheduler(max_concurrent=2)
+    with request_context("interactive", "usuario"):
+        scheduler.run(lambda: None)
+    assert scheduler.stats()["classes"]["interactive"]["granted"] == 1
+
+
+def test_invalid_priority():
+    scheduler = RequestScheduler()
+    with pytest.raises(ValueError):
+        scheduler.run(lambda: None, priority="urgente")
+
+
+def test_deadline_expires_in_queue():
+    scheduler = RequestScheduler(max_concurrent=1)
+    with scheduler.slot():
+        with deadline_context(0.05):
+            with pytest.raises(DeadlineExceeded):
+                scheduler.run(lambda: None)
+    # A chamada desistente saiu da fila e a vaga voltou
+    assert _waiting(scheduler) == 0
+    assert scheduler.stats()["running"] == 0
@@ -0,0 +1,101 @@
+"""Testes dos lotes fragmentados (leases, heartbeat e junção das saídas)"""
+import json
+import os
+import time
+
+import pytest
+
+from shard_batch import (
+    CLOCK_SKEW_SECONDS, ShardLeases, _Heartbeat, merge_outputs, plan_shards, run_worker, shard_status
+)
+
+
+def _age(path, seconds: float) -> None:
+    """Recua o mtime do arquivo (lease sem renovação há `seconds`)"""
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+def test_plan_is_shared_and_checked(tmp_path):
+    plan = plan_shards(str(tmp_path), [f"img_{i}.jpg" for i in range(5)], shard_size=2)
+    assert [shard["count"] for shard in plan["shards"]] == [2, 2, 1]
+    # Outro worker com as mesmas entradas carrega o mesmo plano
+    assert plan_shards(str(tmp_path), [f"img_{i}.jpg" for i in range(5)], shard_size=2) == plan
+    with pytest.raises(ValueError):
+        plan_shards(str(tmp_path), ["outro.jpg"])
+
+
+def test_claim_is_exclusive(tmp_path):
+    plan_shards(str(tmp_path), ["a.jpg"], shard_size=1)
+    first = ShardLeases(str(tmp_path), "w1")
+    second = ShardLeases(str(tmp_path), "w2")
+
+    assert first.claim("shard-00000")
+    assert not second.claim("shard-00000")
+    assert first.owner_of("shard-00000") == "w1"
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    plan_shards(str(tmp_path), ["a.jpg"], shard_size=1)
+    first = ShardLeases(str(tmp_path), "w1", lease_seconds=10)
+    second = ShardLeases(str(tmp_path), "w2", lease_seconds=10)
+    assert first.claim("shard-00000")
+    lease = first._lease("shard-00000")
+
+    # Vencido pelo relógio local, mas dentro da folga de relógio: continua com w1
+    _age(lease, 10 + CLOCK_SKEW_SECONDS / 2)
+    assert not second.claim("shard-00000")
+
+    _age(lease, 10 + CLOCK_SKEW_SECONDS + 1)
+    assert second.claim("shard-00000")
+    assert second.re_leased == 1
+    assert not first.renew("shard-00000")
+
+
+def test_heartbeat_renews_lease(tmp_path):
+    plan_shards(str(tmp_path), ["a.jpg"], shard_size=1)
+    leases = ShardLeases(str(tmp_path), "w1", lease_seconds=0.15)
+    assert leases.claim("shard-00000")
+    lease = leases._lease("shard-00000")
+    _age(lease, 60)
+
+    with _Heartbeat(leases, "shard-00000") as heartbeat:
+        time.sleep(0.2)
+    assert not heartbeat.lost
+    assert time.time() - lease.stat().st_mtime < 5
+
+
+def test_heartbeat_marks_lost_when_lease_vanishes(tmp_path, monkeypatch):
+    plan_shards(str(tmp_path), ["a.jpg"], shard_size=1)
+    leases = ShardLeases(str(tmp_path), "w1", lease_seconds=0.15)
+    assert leases.claim("shard-00000")
+    owner_of = leases.owner_of
+
+    def racy_owner_of(shard_id):
+        # Outro worker remove o lease logo depois da conferência do dono
+        owner = owner_of(shard_id)
+        leases._lease(shard_id).unlink(missing_ok=True)
+        return owner
+
+    monkeypatch.setattr(leases, "owner_of", racy_owner_of)
+    with _Heartbeat(leases, "shard-00000") as heartbeat:
+        time.sleep(0.2)
+    assert heartbeat.lost
+
+
+def test_workers_split_and_merge(make_extractor, images, tmp_path):
+    paths = images(5)
+    work_dir = str(tmp_path / "trabalho")
+    plan_shards(work_dir, paths, shard_size=2)
+
+    totals = run_worker(work_dir, make_extractor(), "cnh", owner="w1", poll_seconds=0.01)
+    assert totals["shards"] == 3
+    assert totals["success"] == 5
+    # Sem fragmentos pendentes, um segundo worker termina sem processar nada
+    assert run_worker(work_dir, make_extractor(), "cnh", owner="w2", poll_seconds=0.01)["shards"] == 0
+
+    output = tmp_path / "final.jsonl"
+    merge_outputs(work_dir, str(output))
+    merged = [json.loads(line)["image_path"] for line in output.read_text(encoding="utf-8").splitlines()]
+    assert merged == paths
+    assert shard_status(work_dir)["done"] == 3
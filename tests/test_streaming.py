@@ -0,0 +1,91 @@
+"""Testes da extração em streaming"""
+import asyncio
+import json
+import time
+
+from conftest import sample_result
+
+from scheduler import RequestScheduler, current_request
+from streaming import FieldStream, IncrementalJSONParser
+from validation_rules import ValidationEngine
+
+
+def test_incremental_parser_emits_completed_fields():
+    parser = IncrementalJSONParser()
+    text = json.dumps({"nome": "Ana", "cpf": "111.444.777-35", "extra": {"a": [1, 2]}})
+    fields = []
+    for i in range(0, len(text), 7):
+        fields.extend(parser.feed(text[i:i + 7]))
+
+    assert fields == [("nome", "Ana"), ("cpf", "111.444.777-35"), ("extra", {"a": [1, 2]})]
+
+
+def test_field_stream_validates_as_soon_as_fields_arrive():
+    events = []
+    stream = FieldStream("cnh", events.append, ValidationEngine(correct=False))
+    stream.feed('{"cpf": "111.444.777-35", "nome_completo": "Ana"}')
+
+    assert [e["event"] for e in events] == ["field", "validation", "field"]
+    assert events[1]["rule"] == "cpf" and events[1]["valid"]
+
+
+def test_correction_suggestions_do_not_change_streamed_fields():
+    events = []
+    stream = FieldStream("cnh", events.append, ValidationEngine())
+    result = sample_result(0, cpf="111.444.177-35")
+    stream.feed(json.dumps(result["data"]))
+    stream.finish(result)
+
+    # Sem min_confidence a correção é só sugestão: nenhum campo reemitido
+    assert not any(e.get("corrected") for e in events)
+    assert result["corrections"]["cpf"]["corrected"] == "111.444.777-35"
+
+    applied = []
+    stream = FieldStream("cnh", applied.append, ValidationEngine(min_confidence="medium"))
+    result = sample_result(0, cpf="111.444.177-35")
+    stream.feed(json.dumps(result["data"]))
+    stream.finish(result)
+    assert [e["value"] for e in applied if e.get("corrected")] == ["111.444.777-35"]
+
+
+def test_extract_stream_events(make_extractor, images):
+    extractor = make_extractor(sample_result(0)["data"])
+    events = list(extractor.extract_stream(images(1)[0], "cnh"))
+
+    assert events[-1]["event"] == "done"
+    result = events[-1]["result"]
+    assert result["status"] == "success"
+    assert result["stream"]["first_field_seconds"] is not None
+    fields = {e["field"] for e in events if e["event"] == "field"}
+    assert fields == set(result["data"])
+
+
+def test_abandoned_stream_cancels_extraction(make_extractor, images):
+    extractor = make_extractor(sample_result(0)["data"], latency=0.5)
+    events = extractor.extract_stream(images(1)[0], "cnh")
+    next(events)
+    events.close()
+
+    # A thread da extração percebe o cancelamento no próximo trecho
+    for _ in range(100):
+        if extractor.deadline_stats.stats():
+            break
+        time.sleep(0.05)
+    assert extractor.deadline_stats.stats()["cnh"]["cancelled"] == 1
+
+
+def test_async_stream_priority_stays_in_extraction(make_extractor, images):
+    scheduler = RequestScheduler()
+    extractor = make_extractor(sample_result(0)["data"], scheduler=scheduler)
+    path = images(1)[0]
+
+    async def consume():
+        seen = []
+        async for event in extractor.aextract_stream(path, "cnh", priority="interactive", tenant="chat"):
+            # O consumidor continua no seu próprio contexto entre os eventos
+            seen.append(current_request())
+        return seen
+
+    seen = asyncio.run(consume())
+    assert set(seen) == {("normal", "default")}
+    assert scheduler.stats()["classes"]["interactive"]["granted"] == 1
@@ -0,0 +1,69 @@
+"""Testes dos resultados compactos das ferramentas do agente"""
+from conftest import sample_result
+
+from tool_results import ResultRegistry, approx_tokens, compact_result, validation_verdict
+from validation_rules import ValidationEngine
+
+
+def test_validation_verdicts():
+    assert validation_verdict({"valid": True}) == "válido"
+    assert validation_verdict({"valid": False, "error": "CPF inválido"}) == "inválido: CPF inválido"
+    assert validation_verdict({"valid": False}) == "inválido: motivo não informado"
+    assert validation_verdict({"valid": True, "vencida": False, "dias_para_vencer": 30}) == "válida, vence em 30 dias"
+    assert validation_verdict({"valid": True, "vencida": True}) == "vencida"
+    assert validation_verdict({"valid": True, "is_future": True}) == "válido (data futura)"
+    assert validation_verdict("ok") == "ok"
+
+
+def test_compact_success_result():
+    result = sample_result(0, observacoes=None, categoria="")
+    result["raw_response"] = "{...}"
+    ValidationEngine(correct=False).validate_batch([result])
+    compact = compact_result(result, handle="res_1")
+
+    assert compact["handle"] == "res_1"
+    assert "raw_response" not in compact
+    assert "observacoes" not in compact["data"] and "categoria" not in compact["data"]
+    assert compact["validations"]["cpf"] == "válido"
+    assert approx_tokens(compact) < approx_tokens(result)
+
+
+def test_compact_error_keeps_failure():
+    error = {"status": "timeout", "message": "Prazo esgotado", "image_path": "x.jpg", "failure": "timeout"}
+    assert compact_result(error) == {
+        "status": "timeout", "message": "Prazo esgotado", "image_path": "x.jpg", "failure": "timeout"
+    }
+
+
+def test_compact_notes_corrections_and_requery():
+    result = sample_result(0)
+    result["corrections"] = {
+        "cpf": {"original": "111.444.777-3S", "corrected": "111.444.777-35", "confidence": 0.9, "applied": True},
+        "cnh": {"original": "0100000008Z", "corrected": "01000000082", "confidence": 0.6, "applied": False},
+        "rg": {"status": "ambiguous", "candidates": ["1", "2"]}
+    }
+    result["requery"] = {"fields": ["cpf"], "changed": {"cpf": "x"}, "error": None}
+    compact = compact_result(result)
+
+    assert compact["corrections"] == {
+        "cpf": "corrigido de 111.444.777-3S (confiança 0.9)",
+        "cnh": "sugestão: 01000000082 (confiança 0.6)",
+        "rg": "ambíguo: 2 candidatos"
+    }
+    assert compact["requery"] == {"fields": ["cpf"], "changed": ["cpf"]}
+
+
+def test_registry_lru_and_resolve():
+    registry = ResultRegistry(max_items=2)
+    first = registry.put({"n": 1})
+    second = registry.put({"n": 2})
+    # Consultar renova o item: o descartado é o menos usado
+    registry.get(first)
+    registry.put({"n": 3})
+
+    assert len(registry) == 2
+    assert registry.get(second) is None
+    assert registry.resolve({"handle": first}) == {"n": 1}
+    assert registry.resolve(first) == {"n": 1}
+    assert registry.resolve({"handle": "res_inexistente"}) == {"handle": "res_inexistente"}
+    assert registry.resolve(42) == 42
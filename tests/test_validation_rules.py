@@ -0,0 +1,112 @@
+"""Testes do motor de validação em lote"""
+from conftest import sample_result
+
+from validation_rules import FieldRule, ValidationEngine, field_text
+
+
+def test_validates_batch_by_document_type():
+    good = sample_result(0)
+    bad = sample_result(1, cpf="123.456.789-00")
+    ValidationEngine(correct=False).validate_batch([good, bad])
+
+    assert good["validations"]["cpf"]["valid"]
+    assert good["validations"]["data_nascimento"]["valid"]
+    assert not bad["validations"]["cpf"]["valid"]
+    # A ordem das validações segue a das regras
+    assert list(good["validations"]) == ["cnh", "cpf", "data_nascimento", "validade_cnh"]
+
+
+def test_skips_failed_results():
+    error = {"status": "error", "message": "Arquivo não encontrado: x.jpg", "image_path": "x.jpg"}
+    ValidationEngine().validate_batch([error])
+    assert "validations" not in error
+
+
+def test_non_string_values():
+    result = sample_result(0, cpf=11144477735, numero_registro={"valor": "123"}, data_nascimento=["15/05/1990"])
+    ValidationEngine().validate_batch([result])
+
+    assert result["validations"]["cpf"]["valid"]
+    # Listas e dicts não são validados
+    assert "cnh" not in result["validations"]
+    assert "data_nascimento" not in result["validations"]
+
+
+def test_field_text():
+    assert field_text(11144477735) == "11144477735"
+    assert field_text(123.0) == "123"
+    assert field_text(True) is None
+    assert field_text(["SP"]) is None
+    assert field_text(" x ") == " x "
+
+
+def test_validator_error_is_isolated_per_item():
+    def fragile(value):
+        if value == "quebra":
+            raise RuntimeError("valor inesperado")
+        return {"valid": True}
+
+    engine = ValidationEngine(rules={"teste": [FieldRule("campo", ("campo",), fragile)]})
+    results = [
+        {"status": "success", "document_type": "teste", "data": {"campo": value}}
+        for value in ("ok", "quebra", "ok")
+    ]
+    engine.validate_batch(results)
+
+    assert results[0]["validations"]["campo"] == {"valid": True}
+    assert not results[1]["validations"]["campo"]["valid"]
+    assert "valor inesperado" in results[1]["validations"]["campo"]["error"]
+    assert results[2]["validations"]["campo"] == {"valid": True}
+
+
+def test_ocr_correction_is_only_suggested_by_default():
+    result = sample_result(0, cpf="111.444.777-3S")
+    ValidationEngine().validate_batch([result])
+
+    assert result["data"]["cpf"] == "111.444.777-3S"
+    assert not result["validations"]["cpf"]["valid"]
+    correction = result["corrections"]["cpf"]
+    assert correction["corrected"] == "111.444.777-35"
+    assert not correction["applied"]
+
+
+def test_ocr_correction_applied_with_min_confidence():
+    result = sample_result(0, cpf="111.444.777-3S")
+    ValidationEngine(min_confidence="high").validate_batch([result])
+
+    assert result["data"]["cpf"] == "111.444.777-35"
+    assert result["validations"]["cpf"]["valid"]
+    assert result["corrections"]["cpf"]["original"] == "111.444.777-3S"
+
+
+def test_failed_fields():
+    engine = ValidationEngine(correct=False)
+    result = sample_result(0, cpf="123.456.789-00", data_nascimento="31/02/1990")
+    engine.validate_batch([result])
+
+    assert engine.failed_fields(result) == ["cpf", "data_nascimento"]
+
+
+def test_rules_inferred_for_unknown_type():
+    result = {
+        "status": "success",
+        "document_type": "auto",
+        "data": {"tipo_documento": "OUTRO", "numero_cpf": "111.444.777-35", "data_emissao": "01/01/2020"}
+    }
+    ValidationEngine().validate_batch([result])
+    assert result["validations"]["numero_cpf"]["valid"]
+    assert result["validations"]["data_emissao"]["valid"]
+
+
+def test_inferred_rules_named_after_field():
+    result = {
+        "status": "success",
+        "document_type": "auto",
+        "data": {"tipo_documento": "OUTRO", "cpf": "111.444.777-35", "numero_cpf": "123.456.789-00"}
+    }
+    engine = ValidationEngine(correct=False)
+    engine.validate_batch([result])
+
+    assert result["validations"]["cpf"]["valid"]
+    assert not result["validations"]["numero_cpf"]["valid"]
+    assert engine.failed_fields(result) == ["numero_cpf"]